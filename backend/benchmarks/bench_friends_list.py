@@ -0,0 +1,133 @@
+"""
+Friends list benchmark - round trips and latency at 10 / 100 / 1,000 friends
+Runs routes/social.load_friends_list against a local mongod and compares it
+with the previous per-friendship users.find_one hydration.
+
+Usage (from backend/):
+    mongod --dbpath /tmp/pbx-bench --port 27017 &
+    python -m benchmarks.bench_friends_list --sizes 10 100 1000
+
+Reports, per size and implementation:
+- Mongo commands (round trips) per request, broken down by command name
+- p50 / p99 / mean latency per request
+
+Each user also has 10% as many pending incoming and outgoing requests.
+Note: legacy stops at 100 friendships (its to_list cap); batched returns the
+first page of up to FRIENDS_MAX_PAGE_SIZE per section with exact totals.
+"""
+import argparse
+import asyncio
+import os
+import statistics
+import sys
+import time
+import uuid
+from datetime import datetime, timedelta, timezone
+from pathlib import Path
+
+from motor.motor_asyncio import AsyncIOMotorClient
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from benchmarks.bench_transfer_pipeline import CommandCounter, percentile  # noqa: E402
+from routes.social import load_friends_list, setup_social_indexes, FRIENDS_MAX_PAGE_SIZE  # noqa: E402
+
+DEFAULT_URI = os.environ.get("BENCH_MONGO_URL", "mongodb://localhost:27017")
+DEFAULT_DB = os.environ.get("BENCH_DB_NAME", "pbx_bench_friends")
+
+
+async def legacy_friends_list(db, user_id: str):
+    """Previous implementation: capped find + one users.find_one per friendship"""
+    all_friendships = await db.friendships.find({
+        "$or": [
+            {"requester_user_id": user_id},
+            {"addressee_user_id": user_id}
+        ],
+        "status": {"$ne": "blocked"}
+    }).to_list(100)
+    hydrated = []
+    for f in all_friendships:
+        other_user_id = f["addressee_user_id"] if f["requester_user_id"] == user_id else f["requester_user_id"]
+        hydrated.append((f, await db.users.find_one({"user_id": other_user_id}, {"_id": 0})))
+    return hydrated
+
+
+async def seed_user(db, friends: int) -> str:
+    user_id = f"bench_user_{uuid.uuid4().hex[:8]}"
+    pending = max(1, friends // 10)
+    now = datetime.now(timezone.utc)
+    users, friendships = [{"user_id": user_id, "display_name": "Bench User"}], []
+
+    def add(i, status, outgoing):
+        other_id = f"{user_id}_peer_{status}_{i}"
+        users.append({"user_id": other_id, "display_name": f"Peer {i}", "email": f"{other_id}@example.com"})
+        friendships.append({
+            "friendship_id": f"fr_{uuid.uuid4().hex[:12]}",
+            "requester_user_id": user_id if outgoing else other_id,
+            "addressee_user_id": other_id if outgoing else user_id,
+            "status": status,
+            "created_at": now - timedelta(seconds=i),
+        })
+
+    for i in range(friends):
+        add(i, "accepted", outgoing=i % 2 == 0)
+    for i in range(pending):
+        add(i, "pending", outgoing=False)
+        add(pending + i, "pending", outgoing=True)
+
+    await db.users.insert_many(users)
+    await db.friendships.insert_many(friendships)
+    return user_id
+
+
+async def run_case(counter, name, size, iterations, call):
+    latencies = []
+    counter.reset()
+    counter.enabled = True
+    for _ in range(iterations):
+        start = time.perf_counter()
+        await call()
+        latencies.append((time.perf_counter() - start) * 1000)
+    counter.enabled = False
+
+    total_commands = sum(counter.counts.values())
+    print(f"\n[{name} @ {size} friends] {iterations} requests")
+    print(f"  round trips / request: {total_commands / iterations:.2f}")
+    for command, count in counter.counts.most_common():
+        print(f"    {command:<20} {count / iterations:.2f}")
+    print(f"  latency p50: {percentile(latencies, 50):.2f} ms")
+    print(f"  latency p99: {percentile(latencies, 99):.2f} ms")
+    print(f"  latency mean: {statistics.mean(latencies):.2f} ms")
+
+
+async def main(args):
+    counter = CommandCounter()
+    client = AsyncIOMotorClient(args.uri, event_listeners=[counter])
+    await client.drop_database(args.db)
+    db = client[args.db]
+    await setup_social_indexes(db)
+    await db.users.create_index("user_id")
+
+    for size in args.sizes:
+        user_id = await seed_user(db, size)
+        await load_friends_list(db, user_id, FRIENDS_MAX_PAGE_SIZE)  # warm pool + caches
+
+        await run_case(counter, "legacy", size, args.iterations, lambda: legacy_friends_list(db, user_id))
+        await run_case(
+            counter, "batched", size, args.iterations,
+            lambda: load_friends_list(db, user_id, FRIENDS_MAX_PAGE_SIZE)
+        )
+
+    if not args.keep:
+        await client.drop_database(args.db)
+    client.close()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--uri", default=DEFAULT_URI)
+    parser.add_argument("--db", default=DEFAULT_DB)
+    parser.add_argument("--sizes", type=int, nargs="+", default=[10, 100, 1000])
+    parser.add_argument("--iterations", type=int, default=50)
+    parser.add_argument("--keep", action="store_true", help="Keep the benchmark database")
+    asyncio.run(main(parser.parse_args()))
@@ -0,0 +1,131 @@
+"""
+Outbound HTTP benchmark - per-call clients vs pooled app-lifetime clients
+Runs both patterns against a local stub server and reports new connections
+(handshakes) and latency per request.
+
+Usage (from backend/):
+    python -m benchmarks.bench_http_clients --requests 500
+    # emulate a remote API: each new connection costs ~2 RTTs of handshake
+    python -m benchmarks.bench_http_clients --handshake-ms 40
+    # TLS (self-signed): adds the real TLS handshake to every new connection
+    python -m benchmarks.bench_http_clients --certfile cert.pem --keyfile key.pem
+
+Scenarios:
+- per_call: `async with httpx.AsyncClient()` per request (previous FX code)
+- pooled:   services/http_clients.OutboundHttp (one client per integration)
+"""
+import argparse
+import asyncio
+import http.server
+import ssl
+import statistics
+import sys
+import threading
+import time
+from pathlib import Path
+
+import httpx
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from services.http_clients import OutboundHttp, Integration  # noqa: E402
+
+STUB_BODY = b'{"base": "USD", "rates": {"PHP": 56.25}}'
+
+
+class StubHandler(http.server.BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"  # keep-alive
+
+    def setup(self):
+        super().setup()
+        self.server.connections += 1
+        if self.server.handshake_delay:
+            time.sleep(self.server.handshake_delay)
+
+    def do_GET(self):
+        self.send_response(200)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(STUB_BODY)))
+        self.end_headers()
+        self.wfile.write(STUB_BODY)
+
+    def log_message(self, format, *args):
+        pass
+
+
+def start_stub_server(args):
+    server = http.server.ThreadingHTTPServer(("127.0.0.1", 0), StubHandler)
+    server.daemon_threads = True
+    server.connections = 0
+    server.handshake_delay = args.handshake_ms / 1000
+    scheme = "http"
+    if args.certfile:
+        context = ssl.SSLContext(ssl.PROTOCOL_TLS_SERVER)
+        context.load_cert_chain(args.certfile, args.keyfile)
+        server.socket = context.wrap_socket(server.socket, server_side=True)
+        scheme = "https"
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server, f"{scheme}://127.0.0.1:{server.server_address[1]}"
+
+
+def percentile(samples, pct):
+    ordered = sorted(samples)
+    index = min(len(ordered) - 1, max(0, int(round(pct / 100 * len(ordered))) - 1))
+    return ordered[index]
+
+
+async def run_scenario(server, name, requests, concurrency, send):
+    latencies = []
+    semaphore = asyncio.Semaphore(concurrency)
+    server.connections = 0
+
+    async def one():
+        async with semaphore:
+            start = time.perf_counter()
+            response = await send()
+            response.raise_for_status()
+            latencies.append((time.perf_counter() - start) * 1000)
+
+    start = time.perf_counter()
+    await asyncio.gather(*[one() for _ in range(requests)])
+    elapsed = time.perf_counter() - start
+
+    print(f"\n[{name}] {requests} requests, concurrency {concurrency}")
+    print(f"  new connections: {server.connections} ({server.connections / requests:.2f} / request)")
+    print(f"  latency p50: {percentile(latencies, 50):.2f} ms")
+    print(f"  latency p99: {percentile(latencies, 99):.2f} ms")
+    print(f"  latency mean: {statistics.mean(latencies):.2f} ms")
+    print(f"  throughput: {requests / elapsed:.0f} req/s")
+
+
+async def main(args):
+    server, base_url = start_stub_server(args)
+    verify = False if args.certfile else True
+
+    async def per_call():
+        async with httpx.AsyncClient(verify=verify) as client:
+            return await client.get(f"{base_url}/latest.json", timeout=5.0)
+
+    outbound = OutboundHttp({
+        "stub": Integration("stub", base_url=base_url, timeout=httpx.Timeout(5.0), verify=verify),
+    })
+    await outbound.start()
+
+    async def pooled():
+        return await outbound.request("stub", "GET", "/latest.json")
+
+    await run_scenario(server, "per_call", args.requests, args.concurrency, per_call)
+    await run_scenario(server, "pooled", args.requests, args.concurrency, pooled)
+
+    await outbound.close()
+    server.shutdown()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--requests", type=int, default=500)
+    parser.add_argument("--concurrency", type=int, default=10)
+    parser.add_argument("--handshake-ms", type=float, default=0.0, help="Extra delay per new connection")
+    parser.add_argument("--certfile", help="Serve the stub over TLS with this certificate")
+    parser.add_argument("--keyfile", help="Private key for --certfile")
+    asyncio.run(main(parser.parse_args()))
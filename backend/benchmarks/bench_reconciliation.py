@@ -0,0 +1,149 @@
+"""
+Book reconciliation benchmark - per-user $group loop vs reconciliation/ engine
+Seeds synthetic wallets and ledger rows (default 1M wallets, 50M rows) into a
+local mongod, with a known set of wallets knocked off balance, then times:
+
+- per-user: the GET /api/admin/reconciliation/wallet/{user_id} approach
+  (find_one + $group per wallet), on a sample and extrapolated to the book
+- book:     reconcile_book() with 1 shard and with --shards in a process pool
+
+and checks the engine found exactly the injected discrepancies.
+
+Usage (from backend/):
+    mongod --dbpath /tmp/pbx-bench --port 27017 &
+    python -m benchmarks.bench_reconciliation --wallets 1000000 --ledger-rows 50000000 --shards 8
+
+Seeding 50M ledger rows takes a long while; pass --keep to reuse the
+database on later runs (seeding is skipped when it already holds the rows).
+"""
+import argparse
+import asyncio
+import os
+import random
+import sys
+import time
+from pathlib import Path
+
+from motor.motor_asyncio import AsyncIOMotorClient
+from pymongo import MongoClient
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from database.indexes import apply_indexes  # noqa: E402
+from reconciliation import reconcile_book  # noqa: E402
+from utils.money import entry_amount, wallet_balances  # noqa: E402
+
+DEFAULT_URI = os.environ.get("BENCH_MONGO_URL", "mongodb://localhost:27017")
+DEFAULT_DB = os.environ.get("BENCH_DB_NAME", "pbx_bench_reconciliation")
+SEED_BATCH_SIZE = 20_000
+DISCREPANCY_RATE = 0.001  # wallets knocked off balance
+
+
+def user_id(i: int) -> str:
+    return f"bench_user_{i:08d}"
+
+
+def seed(db, wallets: int, ledger_rows: int, uri: str, name: str) -> set:
+    """Seed (or reuse) the book; returns the user_ids whose USD wallet is off by +1.00"""
+    rng = random.Random(42)
+    broken = {user_id(i) for i in rng.sample(range(wallets), max(1, int(wallets * DISCREPANCY_RATE)))}
+
+    if db.wallets.estimated_document_count() >= wallets and db.ledger.estimated_document_count() >= ledger_rows:
+        print(f"Reusing {wallets} seeded wallets / {ledger_rows} ledger rows")
+        return broken
+
+    db.wallets.drop()
+    db.ledger.drop()
+    start = time.perf_counter()
+    per_user = max(1, ledger_rows // wallets)
+    wallet_batch, ledger_batch = [], []
+
+    for i in range(wallets):
+        uid = user_id(i)
+        usd = php = 0.0
+        for n in range(per_user):
+            currency = "USD" if n % 3 else "PHP"
+            amount = round(rng.uniform(-50, 100), 2)
+            ledger_batch.append({
+                "user_id": uid, "currency": currency, **entry_amount(amount, currency), "type": "bench", "seq": n
+            })
+            if currency == "USD":
+                usd += amount
+            else:
+                php += amount
+        if uid in broken:
+            usd += 1.0
+        wallet_batch.append({"user_id": uid, **wallet_balances(round(usd, 2), round(php, 2))})
+
+        if len(ledger_batch) >= SEED_BATCH_SIZE:
+            db.ledger.insert_many(ledger_batch, ordered=False)
+            ledger_batch = []
+        if len(wallet_batch) >= SEED_BATCH_SIZE:
+            db.wallets.insert_many(wallet_batch, ordered=False)
+            wallet_batch = []
+
+    if ledger_batch:
+        db.ledger.insert_many(ledger_batch, ordered=False)
+    if wallet_batch:
+        db.wallets.insert_many(wallet_batch, ordered=False)
+
+    async def indexes():
+        motor_client = AsyncIOMotorClient(uri)
+        try:
+            await apply_indexes(motor_client[name], ["wallets", "ledger"])
+        finally:
+            motor_client.close()
+
+    asyncio.run(indexes())
+    print(f"Seeded {wallets} wallets / {wallets * per_user} ledger rows in {time.perf_counter() - start:.1f}s")
+    return broken
+
+
+def per_user_sample(db, wallets: int, sample: int) -> float:
+    """Seconds per wallet for the per-user check, measured on `sample` wallets"""
+    rng = random.Random(7)
+    start = time.perf_counter()
+    for i in rng.sample(range(wallets), min(sample, wallets)):
+        uid = user_id(i)
+        db.wallets.find_one({"user_id": uid}, {"_id": 0})
+        list(db.ledger.aggregate([
+            {"$match": {"user_id": uid}},
+            {"$group": {"_id": "$currency", "total": {"$sum": "$amount"}}}
+        ]))
+    return (time.perf_counter() - start) / min(sample, wallets)
+
+
+def main(args):
+    client = MongoClient(args.uri)
+    db = client[args.db]
+    broken = seed(db, args.wallets, args.ledger_rows, args.uri, args.db)
+
+    per_wallet = per_user_sample(db, args.wallets, args.sample)
+    print(f"\n[per-user] {per_wallet * 1000:.2f} ms/wallet on {args.sample} wallets "
+          f"-> ~{per_wallet * args.wallets / 60:.1f} min for the book")
+
+    for shards in sorted({1, args.shards}):
+        start = time.perf_counter()
+        summary, discrepancies = reconcile_book(args.uri, args.db, shards=shards)
+        elapsed = time.perf_counter() - start
+        found = set(discrepancies["user_id"])
+        print(f"\n[book / {shards} shard(s)] {elapsed:.1f}s")
+        print(f"  wallets: {summary['wallets']}, ledger entries: {summary['ledger_entries']}")
+        print(f"  discrepancies: {summary['discrepancies']} (injected {len(broken)}, "
+              f"match: {found == broken})")
+
+    if not args.keep:
+        client.drop_database(args.db)
+    client.close()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--uri", default=DEFAULT_URI)
+    parser.add_argument("--db", default=DEFAULT_DB)
+    parser.add_argument("--wallets", type=int, default=1_000_000)
+    parser.add_argument("--ledger-rows", type=int, default=50_000_000)
+    parser.add_argument("--shards", type=int, default=os.cpu_count() or 4)
+    parser.add_argument("--sample", type=int, default=2000, help="Wallets timed for the per-user check")
+    parser.add_argument("--keep", action="store_true", help="Keep the benchmark database")
+    main(parser.parse_args())
@@ -0,0 +1,135 @@
+"""
+People search benchmark - regex scan vs search_tokens index at 1M users
+Runs the users search (GET /api/users/search) both ways against a local
+mongod: the previous unanchored case-insensitive $regex over email / phone /
+display_name, and the utils/search.py token filter on idx_users_search_tokens.
+
+Usage (from backend/):
+    mongod --dbpath /tmp/pbx-bench --port 27017 &
+    python -m benchmarks.bench_search --users 1000000
+
+Reports, per query and implementation:
+- documents examined (explain executionStats)
+- p50 / p99 / mean latency per request
+
+Seeding 1M users takes a few minutes; pass --keep to reuse the database
+on later runs (seeding is skipped when it already holds --users documents).
+"""
+import argparse
+import asyncio
+import os
+import random
+import statistics
+import sys
+import time
+from pathlib import Path
+
+from motor.motor_asyncio import AsyncIOMotorClient
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from benchmarks.bench_transfer_pipeline import percentile  # noqa: E402
+from database.indexes import apply_indexes  # noqa: E402
+from utils.search import token_filter, user_search_tokens  # noqa: E402
+
+DEFAULT_URI = os.environ.get("BENCH_MONGO_URL", "mongodb://localhost:27017")
+DEFAULT_DB = os.environ.get("BENCH_DB_NAME", "pbx_bench_search")
+SEED_BATCH_SIZE = 10_000
+RESULT_LIMIT = 10
+
+FIRST_NAMES = ["maria", "jose", "juan", "ana", "mark", "angel", "john", "kristine", "paolo", "liza",
+               "ramon", "grace", "miguel", "joy", "carlo", "bea", "rafael", "nina", "enzo", "trisha"]
+LAST_NAMES = ["santos", "reyes", "cruz", "bautista", "ocampo", "garcia", "mendoza", "torres",
+              "tomas", "andrada", "castillo", "flores", "villanueva", "ramos", "dela cruz"]
+
+# (label, query) - common prefix, narrow name, email, phone, no match
+QUERIES = [
+    ("common prefix", "mar"),
+    ("full name", "maria santos"),
+    ("email", "jose.reyes42"),
+    ("phone", "0917 555"),
+    ("no match", "zzqx"),
+]
+
+
+def legacy_filter(q: str) -> dict:
+    """Previous implementation: unanchored case-insensitive regex per field"""
+    query = q.lower().strip()
+    return {
+        "$or": [
+            {"email": {"$regex": query, "$options": "i"}},
+            {"phone": {"$regex": query, "$options": "i"}},
+            {"display_name": {"$regex": query, "$options": "i"}},
+        ]
+    }
+
+
+def synthetic_user(i: int, rng: random.Random) -> dict:
+    first, last = rng.choice(FIRST_NAMES), rng.choice(LAST_NAMES)
+    user = {
+        "user_id": f"bench_user_{i:08d}",
+        "display_name": f"{first.title()} {last.title()}",
+        "email": f"{first}.{last.replace(' ', '')}{i % 1000}@example.com",
+        "phone": f"+63917{rng.randrange(10**7):07d}",
+    }
+    user["search_tokens"] = user_search_tokens(user)
+    return user
+
+
+async def seed(db, count: int):
+    existing = await db.users.estimated_document_count()
+    if existing >= count:
+        print(f"Reusing {existing} seeded users")
+        return
+    await db.users.drop()
+    rng = random.Random(42)
+    start = time.perf_counter()
+    for offset in range(0, count, SEED_BATCH_SIZE):
+        batch = [synthetic_user(i, rng) for i in range(offset, min(offset + SEED_BATCH_SIZE, count))]
+        await db.users.insert_many(batch, ordered=False)
+    await apply_indexes(db, ["users"])
+    print(f"Seeded {count} users in {time.perf_counter() - start:.1f}s")
+
+
+async def run_case(db, name, label, search_filter, iterations):
+    explain = await db.users.find(search_filter).limit(RESULT_LIMIT).explain()
+    stats = explain.get("executionStats", {})
+
+    latencies = []
+    for _ in range(iterations):
+        start = time.perf_counter()
+        await db.users.find(
+            search_filter,
+            {"_id": 0, "user_id": 1, "email": 1, "phone": 1, "display_name": 1}
+        ).limit(RESULT_LIMIT).to_list(RESULT_LIMIT)
+        latencies.append((time.perf_counter() - start) * 1000)
+
+    print(f"\n[{name} / {label}] {iterations} requests")
+    print(f"  docs examined: {stats.get('totalDocsExamined', '?')}, keys examined: {stats.get('totalKeysExamined', '?')}")
+    print(f"  latency p50: {percentile(latencies, 50):.2f} ms")
+    print(f"  latency p99: {percentile(latencies, 99):.2f} ms")
+    print(f"  latency mean: {statistics.mean(latencies):.2f} ms")
+
+
+async def main(args):
+    client = AsyncIOMotorClient(args.uri)
+    db = client[args.db]
+    await seed(db, args.users)
+
+    for label, q in QUERIES:
+        await run_case(db, "regex", label, legacy_filter(q), args.iterations)
+        await run_case(db, "tokens", label, token_filter(q), args.iterations)
+
+    if not args.keep:
+        await client.drop_database(args.db)
+    client.close()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--uri", default=DEFAULT_URI)
+    parser.add_argument("--db", default=DEFAULT_DB)
+    parser.add_argument("--users", type=int, default=1_000_000)
+    parser.add_argument("--iterations", type=int, default=20)
+    parser.add_argument("--keep", action="store_true", help="Keep the benchmark database")
+    asyncio.run(main(parser.parse_args()))
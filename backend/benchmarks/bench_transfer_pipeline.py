@@ -0,0 +1,138 @@
+"""
+Transfer pipeline benchmark - round trips and latency per transfer
+Runs utils/ledger.create_transfer_atomic against a local mongod replica set.
+
+Usage (from backend/):
+    mongod --replSet rs0 --dbpath /tmp/rs0 --port 27017 &
+    mongosh --eval 'rs.initiate()'
+    python -m benchmarks.bench_transfer_pipeline --transfers 2000
+
+Reports, per scenario:
+- Mongo commands (round trips) per transfer, broken down by command name
+- p50 / p99 / mean latency per transfer
+
+Scenarios:
+- fresh:  sender -> new recipient (recipient wallet upserted)
+- warm:   sender -> existing recipient
+- replay: same idempotency key re-sent (DuplicateKeyError -> original tx)
+"""
+import argparse
+import asyncio
+import os
+import statistics
+import sys
+import time
+import uuid
+from collections import Counter
+from pathlib import Path
+
+from motor.motor_asyncio import AsyncIOMotorClient
+from pymongo import monitoring
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from utils.ledger import create_transfer_atomic, setup_ledger_indexes  # noqa: E402
+
+DEFAULT_URI = os.environ.get("BENCH_MONGO_URL", "mongodb://localhost:27017/?replicaSet=rs0")
+DEFAULT_DB = os.environ.get("BENCH_DB_NAME", "pbx_bench_transfers")
+
+
+class CommandCounter(monitoring.CommandListener):
+    """Counts commands sent by the application (heartbeats are not reported here)"""
+
+    def __init__(self):
+        self.counts = Counter()
+        self.enabled = False
+
+    def started(self, event):
+        if self.enabled:
+            self.counts[event.command_name] += 1
+
+    def succeeded(self, event):
+        pass
+
+    def failed(self, event):
+        pass
+
+    def reset(self):
+        self.counts = Counter()
+
+
+def percentile(samples, pct):
+    ordered = sorted(samples)
+    index = min(len(ordered) - 1, max(0, int(round(pct / 100 * len(ordered))) - 1))
+    return ordered[index]
+
+
+async def run_scenario(db, counter, name, transfers, make_args):
+    latencies = []
+    counter.reset()
+    counter.enabled = True
+    for i in range(transfers):
+        kwargs = make_args(i)
+        start = time.perf_counter()
+        try:
+            await create_transfer_atomic(db, **kwargs)
+        finally:
+            latencies.append((time.perf_counter() - start) * 1000)
+    counter.enabled = False
+
+    total_commands = sum(counter.counts.values())
+    print(f"\n[{name}] {transfers} transfers")
+    print(f"  round trips / transfer: {total_commands / transfers:.2f}")
+    for command, count in counter.counts.most_common():
+        print(f"    {command:<20} {count / transfers:.2f}")
+    print(f"  latency p50: {percentile(latencies, 50):.2f} ms")
+    print(f"  latency p99: {percentile(latencies, 99):.2f} ms")
+    print(f"  latency mean: {statistics.mean(latencies):.2f} ms")
+
+
+async def main(args):
+    counter = CommandCounter()
+    client = AsyncIOMotorClient(args.uri, event_listeners=[counter])
+    await client.drop_database(args.db)
+    db = client[args.db]
+    await setup_ledger_indexes(db)
+
+    sender = f"bench_sender_{uuid.uuid4().hex[:8]}"
+    await db.wallets.insert_one({"user_id": sender, "usd_balance": 10_000_000.0, "php_balance": 0.0})
+    warm_recipient = f"bench_recipient_{uuid.uuid4().hex[:8]}"
+    await db.wallets.insert_one({"user_id": warm_recipient, "usd_balance": 0.0, "php_balance": 0.0})
+
+    # Warm the connection pool so handshakes are not counted
+    for _ in range(20):
+        await create_transfer_atomic(db, sender, warm_recipient, 1.0)
+
+    run_id = uuid.uuid4().hex[:8]
+
+    await run_scenario(db, counter, "fresh", args.transfers, lambda i: {
+        "from_user_id": sender,
+        "to_user_id": f"bench_new_{run_id}_{i}",
+        "amount": 1.0,
+        "idempotency_key": f"fresh_{run_id}_{i}",
+    })
+    await run_scenario(db, counter, "warm", args.transfers, lambda i: {
+        "from_user_id": sender,
+        "to_user_id": warm_recipient,
+        "amount": 1.0,
+        "idempotency_key": f"warm_{run_id}_{i}",
+    })
+    await run_scenario(db, counter, "replay", args.transfers, lambda i: {
+        "from_user_id": sender,
+        "to_user_id": warm_recipient,
+        "amount": 1.0,
+        "idempotency_key": f"warm_{run_id}_{i}",
+    })
+
+    if not args.keep:
+        await client.drop_database(args.db)
+    client.close()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--uri", default=DEFAULT_URI)
+    parser.add_argument("--db", default=DEFAULT_DB)
+    parser.add_argument("--transfers", type=int, default=1000)
+    parser.add_argument("--keep", action="store_true", help="Keep the benchmark database")
+    asyncio.run(main(parser.parse_args()))
@@ -0,0 +1,347 @@
+"""
+PBX Index Registry - index specs for every collection in one place
+Applied by apply_indexes() from server.startup_event. createIndex is a no-op
+when an identical index already exists, so this is safe on every restart.
+Each index is created on its own: a failure (e.g. existing duplicates
+blocking a unique index) is logged without skipping the rest.
+
+Conventions:
+- unique where the code already assumes one document per key (find_one on it,
+  check-then-insert)
+- sparse / partial filters keep optional keys out of unique constraints
+- names are kept stable; renaming an existing index makes createIndex fail
+"""
+
+from typing import Dict, Iterable, List, Optional
+import logging
+
+from pymongo import IndexModel, ASCENDING, DESCENDING
+from pymongo.errors import PyMongoError
+
+logger = logging.getLogger(__name__)
+
+REALTIME_EVENTS_TTL_SECONDS = 300
+MAGIC_LINKS_RETENTION_SECONDS = 24 * 3600
+
+
+INDEXES: Dict[str, List[IndexModel]] = {
+    # ---------------- Identity ----------------
+    "users": [
+        IndexModel("email", unique=True, sparse=True, name="email_unique_sparse"),
+        IndexModel("user_id", unique=True, name="user_id_unique"),
+        # Recipient lookup by email OR phone - both branches need an index
+        IndexModel("phone", sparse=True, name="idx_users_phone"),
+        # Recipient resolution: canonical "email:..." / "phone:+E.164" keys (utils/identifiers.py).
+        # Users without a valid email/phone have no identifiers field at all.
+        IndexModel(
+            "identifiers",
+            unique=True,
+            partialFilterExpression={"identifiers": {"$exists": True}},
+            name="idx_users_identifiers_unique"
+        ),
+        IndexModel([("created_at", DESCENDING)], name="idx_users_created"),
+        # People search: prefix tokens of email / phone / name (utils/search.py)
+        IndexModel("search_tokens", name="idx_users_search_tokens"),
+    ],
+    "profiles": [
+        IndexModel("profile_id", unique=True, name="idx_profiles_profile_id"),
+        IndexModel(
+            "handle",
+            unique=True,
+            partialFilterExpression={"handle": {"$type": "string"}},
+            name="idx_profiles_handle_unique"
+        ),
+        IndexModel([("user_id", ASCENDING), ("type", ASCENDING)], name="idx_profiles_user_type"),
+        # Business discovery, verified first
+        IndexModel(
+            [("type", ASCENDING), ("verified", DESCENDING), ("created_at", DESCENDING)],
+            name="idx_profiles_type_verified_created"
+        ),
+        # Business discovery by category (canonical spelling, equality match)
+        IndexModel(
+            [("type", ASCENDING), ("category", ASCENDING), ("verified", DESCENDING), ("created_at", DESCENDING)],
+            name="idx_profiles_type_category_verified_created"
+        ),
+        # People / business search by handle and name prefixes
+        IndexModel([("type", ASCENDING), ("search_tokens", ASCENDING)], name="idx_profiles_type_search_tokens"),
+    ],
+    "sessions": [
+        IndexModel("token", unique=True, name="idx_sessions_token"),
+    ],
+    "session_states": [
+        IndexModel("user_id", name="idx_session_states_user_id"),
+    ],
+    "magic_links": [
+        IndexModel("token_hash", unique=True, name="idx_magic_links_token_hash"),
+        # Expired links are removed by the TTL monitor a day after expiry
+        IndexModel(
+            "expires_at",
+            expireAfterSeconds=MAGIC_LINKS_RETENTION_SECONDS,
+            name="idx_magic_links_ttl"
+        ),
+        IndexModel([("used", ASCENDING), ("used_at", ASCENDING)], name="idx_magic_links_used"),
+    ],
+    "leads": [
+        IndexModel("email", unique=True, name="email_1"),
+        IndexModel([("created_at", DESCENDING)], name="idx_leads_created"),
+    ],
+
+    # ---------------- Money ----------------
+    "wallets": [
+        # One wallet per user - transfers upsert recipient wallets with $setOnInsert
+        IndexModel("user_id", unique=True, sparse=True, name="idx_wallets_user_id"),
+        # Legacy wallets keyed by userId (routes/wallet.py checks it first)
+        IndexModel("userId", sparse=True, name="idx_wallets_legacy_user_id"),
+    ],
+    "ledger_tx": [
+        IndexModel("idempotency_key", unique=True, sparse=True, name="idx_ledger_tx_idempotency_key"),
+        IndexModel("tx_id", unique=True, name="idx_ledger_tx_tx_id"),
+        IndexModel([("from_user_id", ASCENDING), ("created_at", DESCENDING)], name="idx_ledger_tx_from_user"),
+        IndexModel([("to_user_id", ASCENDING), ("created_at", DESCENDING)], name="idx_ledger_tx_to_user"),
+        # Admin listing, and the integrity scanner's (created_at, tx_id) walk
+        IndexModel([("created_at", DESCENDING), ("tx_id", DESCENDING)], name="idx_ledger_tx_created_tx"),
+    ],
+    "ledger": [
+        IndexModel("ledger_tx_id", name="idx_ledger_tx_ref"),
+        # Statements and the activity feed keyset, (created_at, _id) DESC
+        IndexModel(
+            [("user_id", ASCENDING), ("created_at", DESCENDING), ("_id", DESCENDING)],
+            name="idx_ledger_user_created_id"
+        ),
+        # Typed history (bill payments, transfers out, internal transfers in, activity ?type=)
+        IndexModel(
+            [("user_id", ASCENDING), ("type", ASCENDING), ("created_at", DESCENDING), ("_id", DESCENDING)],
+            name="idx_ledger_user_type_created_id"
+        ),
+        IndexModel([("created_at", DESCENDING)], name="idx_ledger_created"),
+        # Prevents duplicate entries
+        IndexModel(
+            [("tx_id", ASCENDING), ("user_id", ASCENDING), ("entry_type", ASCENDING)],
+            unique=True,
+            name="idx_ledger_unique_entry"
+        ),
+    ],
+    "integrity_findings": [
+        # Open findings, newest first (admin); _id is {tx_id}:{check}
+        IndexModel([("status", ASCENDING), ("first_seen_at", DESCENDING)], name="idx_integrity_findings_status_seen"),
+        IndexModel("tx_id", name="idx_integrity_findings_tx_id"),
+    ],
+    "reconciliation_runs": [
+        IndexModel("run_id", unique=True, name="idx_reconciliation_runs_run_id"),
+        # One running book reconciliation at a time (finished runs fall out of the index)
+        IndexModel(
+            "status",
+            unique=True,
+            partialFilterExpression={"status": "running"},
+            name="idx_reconciliation_runs_running_unique"
+        ),
+    ],
+    "statement_exports": [
+        IndexModel("job_id", unique=True, name="idx_statement_exports_job_id"),
+        # Stalled / queued jobs resumed on startup
+        IndexModel("status", name="idx_statement_exports_status"),
+        # Finished artifacts expire with their chunks
+        IndexModel("expires_at", expireAfterSeconds=0, name="idx_statement_exports_ttl"),
+    ],
+    "statement_export_chunks": [
+        IndexModel([("job_id", ASCENDING), ("seq", ASCENDING)], name="idx_statement_export_chunks_job_seq"),
+        IndexModel("expires_at", expireAfterSeconds=0, name="idx_statement_export_chunks_ttl"),
+    ],
+    "ledger_summaries": [
+        # Statement summary (period "all") and monthly rollups; _id is user|period|type|currency
+        IndexModel([("user_id", ASCENDING), ("period", ASCENDING)], name="idx_ledger_summaries_user_period"),
+    ],
+    "velocity_counters": [
+        # Expired day/month buckets are removed by the TTL monitor
+        IndexModel("expires_at", expireAfterSeconds=0, name="idx_velocity_counters_ttl"),
+        # Per-user listing (admin / support views)
+        IndexModel(
+            [("user_id", ASCENDING), ("metric", ASCENDING), ("bucket", DESCENDING)],
+            name="idx_velocity_counters_user_metric"
+        ),
+    ],
+    "fx_locks": [
+        IndexModel("lock_id", unique=True, name="idx_fx_locks_lock_id"),
+        # Expired locks are removed by the TTL monitor
+        IndexModel("expires_at", expireAfterSeconds=0, name="idx_fx_locks_ttl"),
+    ],
+    "saved_billers": [
+        # Save-biller checks before inserting
+        IndexModel(
+            [("user_id", ASCENDING), ("biller_code", ASCENDING), ("account_no", ASCENDING)],
+            unique=True,
+            name="idx_saved_billers_user_biller"
+        ),
+    ],
+    "linked_banks": [
+        IndexModel("id", unique=True, name="idx_linked_banks_id"),
+        IndexModel([("user_id", ASCENDING), ("status", ASCENDING)], name="idx_linked_banks_user_status"),
+    ],
+    "banks": [
+        IndexModel([("user_id", ASCENDING), ("created_at", DESCENDING)], name="idx_banks_user_created"),
+    ],
+    "pending_transfers": [
+        IndexModel(
+            [("user_id", ASCENDING), ("created_at", DESCENDING), ("_id", DESCENDING)],
+            name="idx_pending_transfers_user_created_id"
+        ),
+    ],
+    "transactions": [
+        # Circle mints (routes/circle.py) - activity feed
+        IndexModel(
+            [("user_id", ASCENDING), ("created_at", DESCENDING), ("_id", DESCENDING)],
+            name="idx_transactions_user_created_id"
+        ),
+        # Wallet conversions (routes/wallet.py, Netlify camelCase schema) - activity feed
+        IndexModel(
+            [("userId", ASCENDING), ("createdAt", DESCENDING), ("_id", DESCENDING)],
+            name="idx_transactions_userid_createdat_id"
+        ),
+    ],
+
+    # ---------------- Audit ----------------
+    "audit_log": [
+        IndexModel("audit_id", unique=True, name="idx_audit_id"),
+        IndexModel([("actor_user_id", ASCENDING), ("created_at", DESCENDING)], name="idx_audit_actor"),
+        IndexModel(
+            [("target_type", ASCENDING), ("target_id", ASCENDING), ("created_at", DESCENDING)],
+            name="idx_audit_target"
+        ),
+        IndexModel([("action", ASCENDING), ("created_at", DESCENDING)], name="idx_audit_action"),
+        IndexModel("created_at", name="idx_audit_created"),
+    ],
+
+    # ---------------- Social ----------------
+    "friendships": [
+        # One friendship per pair (existing documents keyed by migrations/m0001_pair_keys)
+        IndexModel(
+            "pair_key",
+            unique=True,
+            partialFilterExpression={"pair_key": {"$exists": True}},
+            name="idx_friendships_pair_key_unique"
+        ),
+        # Friends list sections, newest first
+        IndexModel(
+            [("requester_user_id", ASCENDING), ("status", ASCENDING),
+             ("created_at", DESCENDING), ("friendship_id", DESCENDING)],
+            name="idx_friendships_requester_user_id_status_created"
+        ),
+        IndexModel(
+            [("addressee_user_id", ASCENDING), ("status", ASCENDING),
+             ("created_at", DESCENDING), ("friendship_id", DESCENDING)],
+            name="idx_friendships_addressee_user_id_status_created"
+        ),
+    ],
+    "conversations": [
+        # Inbox: each participant's conversations, most recent first (keyset pagination)
+        IndexModel(
+            [("user1_id", ASCENDING), ("last_message_at", DESCENDING), ("conversation_id", DESCENDING)],
+            name="idx_conversations_user1_id_recent"
+        ),
+        IndexModel(
+            [("user2_id", ASCENDING), ("last_message_at", DESCENDING), ("conversation_id", DESCENDING)],
+            name="idx_conversations_user2_id_recent"
+        ),
+        IndexModel("conversation_id", name="idx_conversations_conversation_id"),
+        IndexModel(
+            "pair_key",
+            unique=True,
+            partialFilterExpression={"pair_key": {"$exists": True}},
+            name="idx_conversations_pair_key_unique"
+        ),
+    ],
+    "messages": [
+        # Chat history keyset pagination + last-message backfill
+        IndexModel(
+            [("conversation_id", ASCENDING), ("created_at", DESCENDING), ("message_id", DESCENDING)],
+            name="idx_messages_conversation_created_id"
+        ),
+        # Idempotent replay of in-chat payments
+        IndexModel("payment.tx_id", sparse=True, name="idx_messages_payment_tx"),
+    ],
+    "invites": [
+        IndexModel("invite_id", unique=True, name="idx_invites_invite_id"),
+        IndexModel(
+            [("inviter_user_id", ASCENDING), ("status", ASCENDING), ("created_at", DESCENDING)],
+            name="idx_invites_inviter_status_created"
+        ),
+        IndexModel(
+            [("inviter_user_id", ASCENDING), ("created_at", DESCENDING)],
+            name="idx_invites_inviter_created"
+        ),
+        # Matching pending invites on signup
+        IndexModel(
+            [("contact", ASCENDING), ("contact_type", ASCENDING), ("status", ASCENDING)],
+            name="idx_invites_contact"
+        ),
+    ],
+    "realtime_events": [
+        # Change-stream events expire shortly after delivery
+        IndexModel(
+            "created_at",
+            expireAfterSeconds=REALTIME_EVENTS_TTL_SECONDS,
+            name="idx_realtime_events_ttl"
+        ),
+    ],
+
+    # ---------------- Notifications ----------------
+    "notification_logs": [
+        IndexModel(
+            [("user_id", ASCENDING), ("channel", ASCENDING), ("created_at", DESCENDING)],
+            name="idx_notification_logs_user_channel_created"
+        ),
+    ],
+    "notification_preferences": [
+        IndexModel("user_id", unique=True, name="idx_notification_preferences_user_id"),
+    ],
+}
+
+# Superseded indexes, dropped when present
+RETIRED_INDEXES: Dict[str, List[str]] = {
+    # Prefix of idx_messages_conversation_created_id
+    "messages": ["idx_messages_conversation_created"],
+    # Prefix of idx_ledger_tx_created_tx
+    "ledger_tx": ["idx_ledger_tx_created"],
+    # Prefixes of idx_ledger_user_created_id / idx_ledger_user_type_created_id
+    "ledger": ["idx_ledger_user_created", "idx_ledger_user_type_created"],
+    # Prefix of idx_pending_transfers_user_created_id
+    "pending_transfers": ["idx_pending_transfers_user_created"],
+    # Non-unique; replaced by idx_reconciliation_runs_running_unique
+    "reconciliation_runs": ["idx_reconciliation_runs_status"],
+}
+
+
+async def apply_indexes(db, collections: Optional[Iterable[str]] = None) -> bool:
+    """
+    Create the registry's indexes (all collections, or just `collections`).
+    Returns False if any index could not be created.
+    """
+    names = list(collections) if collections is not None else list(INDEXES)
+    ok = True
+
+    for name in names:
+        coll = db[name]
+        created = 0
+        for model in INDEXES[name]:
+            try:
+                await coll.create_indexes([model])
+                created += 1
+            except PyMongoError as e:
+                ok = False
+                logger.warning(f"Index {name}.{model.document['name']} not created: {e}")
+
+        retired = RETIRED_INDEXES.get(name)
+        if retired:
+            try:
+                existing = await coll.index_information()
+                for index_name in retired:
+                    if index_name in existing:
+                        await coll.drop_index(index_name)
+                        logger.info(f"Dropped superseded index {name}.{index_name}")
+            except PyMongoError as e:
+                logger.warning(f"Could not drop superseded indexes on {name}: {e}")
+
+        logger.debug(f"Indexes ensured on {name}: {created}/{len(INDEXES[name])}")
+
+    logger.info(f"Indexes applied to {len(names)} collections" + ("" if ok else " (with warnings)"))
+    return ok
@@ -0,0 +1,144 @@
+"""
+PBX Data Migrations - one-off document backfills, applied once per database
+Each migration module defines NAME and `async def up(db) -> dict`; applied
+migrations are recorded in the schema_migrations collection so every
+migration runs exactly once, even with several workers starting together.
+
+A running migration holds a lease (lease_owner / lease_until) that its
+worker renews while up() runs. A migration whose worker died is reclaimed
+once the lease expires, and failed ones on the next run. Migrations apply
+strictly in order: a worker stops at the first migration it cannot claim
+(held by another worker) and leaves the rest for a later run.
+
+Run (from backend/):
+    python -m migrations            # apply pending migrations
+    python -m migrations --status   # list applied / pending
+
+Pending migrations are also applied by server.startup_event.
+"""
+
+from datetime import datetime, timezone, timedelta
+from typing import List, Dict, Any
+from pymongo.errors import DuplicateKeyError
+import asyncio
+import logging
+import uuid
+
+from migrations import (
+    m0001_pair_keys, m0002_search_tokens, m0003_identifiers, m0004_ledger_summaries, m0005_minor_units,
+    m0006_business_categories, m0007_summary_minor_totals,
+)
+
+logger = logging.getLogger(__name__)
+
+# Applied in order
+MIGRATIONS = [
+    m0001_pair_keys,
+    m0002_search_tokens,
+    m0003_identifiers,
+    m0004_ledger_summaries,
+    m0005_minor_units,
+    m0006_business_categories,
+    m0007_summary_minor_totals,
+]
+
+
+MIGRATION_LEASE_SECONDS = 120
+MIGRATION_HEARTBEAT_SECONDS = 30
+
+# Claim outcomes
+CLAIMED = "claimed"
+APPLIED = "applied"
+BUSY = "busy"
+
+
+def utc_now():
+    return datetime.now(timezone.utc)
+
+
+def _lease(worker_id: str, now) -> Dict[str, Any]:
+    return {"lease_owner": worker_id, "lease_until": now + timedelta(seconds=MIGRATION_LEASE_SECONDS)}
+
+
+async def _claim(db, name: str, worker_id: str) -> str:
+    """Mark a migration as running under this worker's lease"""
+    now = utc_now()
+    try:
+        await db.schema_migrations.insert_one(
+            {"_id": name, "status": "running", "started_at": now, **_lease(worker_id, now)}
+        )
+        return CLAIMED
+    except DuplicateKeyError:
+        pass
+    # Retry migrations that failed, or whose worker died mid-run (lease expired;
+    # rows from before leases have none)
+    result = await db.schema_migrations.update_one(
+        {"_id": name, "$or": [
+            {"status": "failed"},
+            {"status": "running", "lease_until": None},
+            {"status": "running", "lease_until": {"$lt": now}},
+        ]},
+        {"$set": {"status": "running", "started_at": now, **_lease(worker_id, now)}, "$unset": {"error": ""}}
+    )
+    if result.modified_count == 1:
+        return CLAIMED
+    record = await db.schema_migrations.find_one({"_id": name}, {"status": 1})
+    return APPLIED if record and record.get("status") == "applied" else BUSY
+
+
+async def _heartbeat(db, name: str, worker_id: str):
+    """Renew the lease while up() runs"""
+    while True:
+        await asyncio.sleep(MIGRATION_HEARTBEAT_SECONDS)
+        try:
+            await db.schema_migrations.update_one(
+                {"_id": name, "lease_owner": worker_id, "status": "running"},
+                {"$set": _lease(worker_id, utc_now())}
+            )
+        except Exception as e:
+            logger.warning(f"Migration {name}: lease renewal failed: {e}")
+
+
+async def run_pending_migrations(db) -> List[str]:
+    """Apply pending migrations in order; returns the names applied by this call"""
+    worker_id = f"worker_{uuid.uuid4().hex[:12]}"
+    applied = []
+    for migration in MIGRATIONS:
+        name = migration.NAME
+        claim = await _claim(db, name, worker_id)
+        if claim == APPLIED:
+            continue
+        if claim == BUSY:
+            # Later migrations may depend on this one - leave them for a later run
+            logger.info(f"Migration {name} is running on another worker; later migrations wait")
+            break
+        
+        logger.info(f"Applying migration {name}")
+        heartbeat = asyncio.create_task(_heartbeat(db, name, worker_id))
+        try:
+            result = await migration.up(db)
+        except Exception as e:
+            await db.schema_migrations.update_one(
+                {"_id": name, "lease_owner": worker_id},
+                {"$set": {"status": "failed", "error": str(e), "failed_at": utc_now(), "lease_until": None}}
+            )
+            logger.error(f"Migration {name} failed: {e}")
+            raise
+        finally:
+            heartbeat.cancel()
+        
+        await db.schema_migrations.update_one(
+            {"_id": name},
+            {"$set": {"status": "applied", "applied_at": utc_now(), "result": result or {}, "lease_until": None}}
+        )
+        logger.info(f"Migration {name} applied: {result}")
+        applied.append(name)
+    return applied
+
+
+async def migration_status(db) -> List[Dict[str, Any]]:
+    records = {r["_id"]: r async for r in db.schema_migrations.find({})}
+    return [
+        {"name": m.NAME, "status": records.get(m.NAME, {}).get("status", "pending")}
+        for m in MIGRATIONS
+    ]
@@ -0,0 +1,38 @@
+"""
+Apply pending data migrations.
+
+Usage (from backend/):
+    python -m migrations
+    python -m migrations --status
+"""
+import argparse
+import asyncio
+import logging
+from pathlib import Path
+
+from dotenv import load_dotenv
+
+load_dotenv(Path(__file__).resolve().parent.parent / '.env')
+
+from database.connection import connect_to_mongo, close_mongo_connection  # noqa: E402
+from migrations import run_pending_migrations, migration_status  # noqa: E402
+
+
+async def main(args):
+    db = await connect_to_mongo()
+    try:
+        if args.status:
+            for row in await migration_status(db):
+                print(f"{row['name']:<40} {row['status']}")
+        else:
+            applied = await run_pending_migrations(db)
+            print(f"Applied {len(applied)} migration(s): {', '.join(applied) or '-'}")
+    finally:
+        await close_mongo_connection()
+
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO)
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--status", action="store_true", help="List applied / pending migrations")
+    asyncio.run(main(parser.parse_args()))
@@ -0,0 +1,119 @@
+"""
+0001 - canonical pair_key on friendships and conversations
+
+Backfills pair_key (see routes.social.pair_key) and resolves pairs that
+already have more than one document, so the unique pair_key indexes can hold:
+- friendships: keep the most significant record (accepted > blocked >
+  pending > declined, oldest first); the rest move to friendships_duplicates
+- conversations: keep the oldest; messages of the others are re-pointed to it
+  and the duplicates move to conversations_duplicates. The kept conversation's
+  last_message is cleared so the inbox re-derives it.
+
+Personal conversations are keyed by user ids, business conversations
+(profile1_id/profile2_id) by profile ids.
+"""
+
+from datetime import datetime
+from typing import Dict, List
+from pymongo import UpdateOne
+import logging
+
+from routes.social import pair_key, setup_social_indexes
+
+logger = logging.getLogger(__name__)
+
+NAME = "0001_pair_keys"
+WRITE_CHUNK_SIZE = 1000
+
+FRIENDSHIP_STATUS_RANK = {"accepted": 0, "blocked": 1, "pending": 2, "declined": 3}
+
+
+def _created_at(doc: dict):
+    return doc.get("created_at") or datetime.max
+
+
+def _conversation_key(doc: dict) -> str:
+    if doc.get("profile1_id") and doc.get("profile2_id"):
+        return pair_key(doc["profile1_id"], doc["profile2_id"])
+    return pair_key(doc["user1_id"], doc["user2_id"])
+
+
+async def _flush(collection, ops: List[UpdateOne]):
+    if ops:
+        await collection.bulk_write(ops, ordered=False)
+        ops.clear()
+
+
+async def _archive(db, collection_name: str, docs: List[dict]):
+    """Move duplicate documents to <collection>_duplicates"""
+    if not docs:
+        return
+    await db[f"{collection_name}_duplicates"].insert_many(docs, ordered=False)
+    await db[collection_name].delete_many({"_id": {"$in": [d["_id"] for d in docs]}})
+
+
+async def _migrate_friendships(db) -> Dict[str, int]:
+    groups: Dict[str, List[dict]] = {}
+    async for doc in db.friendships.find({}):
+        groups.setdefault(pair_key(doc["requester_user_id"], doc["addressee_user_id"]), []).append(doc)
+    
+    ops, duplicates, updated = [], [], 0
+    for key, docs in groups.items():
+        docs.sort(key=lambda d: (FRIENDSHIP_STATUS_RANK.get(d.get("status"), 9), _created_at(d)))
+        keeper, extra = docs[0], docs[1:]
+        duplicates.extend(extra)
+        if keeper.get("pair_key") != key:
+            ops.append(UpdateOne({"_id": keeper["_id"]}, {"$set": {"pair_key": key}}))
+            updated += 1
+        if len(ops) >= WRITE_CHUNK_SIZE:
+            await _flush(db.friendships, ops)
+    
+    # Archive duplicates first - they may carry the same pair_key
+    await _archive(db, "friendships", duplicates)
+    await _flush(db.friendships, ops)
+    return {"friendships_keyed": updated, "friendships_archived": len(duplicates)}
+
+
+async def _migrate_conversations(db) -> Dict[str, int]:
+    groups: Dict[str, List[dict]] = {}
+    async for doc in db.conversations.find({}):
+        groups.setdefault(_conversation_key(doc), []).append(doc)
+    
+    ops, duplicates, message_moves, updated = [], [], 0, 0
+    for key, docs in groups.items():
+        docs.sort(key=_created_at)
+        keeper, extra = docs[0], docs[1:]
+        update = {"$set": {"pair_key": key}}
+        if extra:
+            duplicates.extend(extra)
+            moved = await db.messages.update_many(
+                {"conversation_id": {"$in": [d["conversation_id"] for d in extra]}},
+                {"$set": {"conversation_id": keeper["conversation_id"]}}
+            )
+            message_moves += moved.modified_count
+            latest = max((d.get("last_message_at") for d in docs if d.get("last_message_at")), default=None)
+            if latest:
+                update["$set"]["last_message_at"] = latest
+            update["$unset"] = {"last_message": ""}
+        if keeper.get("pair_key") != key or extra:
+            ops.append(UpdateOne({"_id": keeper["_id"]}, update))
+            updated += 1
+        if len(ops) >= WRITE_CHUNK_SIZE:
+            await _flush(db.conversations, ops)
+    
+    await _archive(db, "conversations", duplicates)
+    await _flush(db.conversations, ops)
+    return {
+        "conversations_keyed": updated,
+        "conversations_archived": len(duplicates),
+        "messages_repointed": message_moves
+    }
+
+
+async def up(db) -> Dict[str, int]:
+    result = {}
+    result.update(await _migrate_friendships(db))
+    result.update(await _migrate_conversations(db))
+    # Unique indexes could not be built while duplicates existed
+    await setup_social_indexes(db)
+    return result
@@ -0,0 +1,50 @@
+"""
+0002 - search_tokens on users and profiles
+
+Backfills the prefix tokens people / business search matches on (see
+utils/search.py). Documents written since the search index shipped already
+carry them; this recomputes every document so older ones become searchable.
+"""
+
+from typing import Callable, Dict, List
+from pymongo import UpdateOne
+import logging
+
+from utils.search import (
+    BUSINESS_PROFILE_SEARCH_FIELDS, PERSONAL_PROFILE_SEARCH_FIELDS, USER_SEARCH_FIELDS,
+    profile_search_tokens, user_search_tokens
+)
+
+logger = logging.getLogger(__name__)
+
+NAME = "0002_search_tokens"
+WRITE_CHUNK_SIZE = 1000
+
+
+async def _flush(collection, ops: List[UpdateOne]):
+    if ops:
+        await collection.bulk_write(ops, ordered=False)
+        ops.clear()
+
+
+async def _backfill(collection, fields, tokens_for: Callable[[dict], List[str]]) -> int:
+    projection = {"_id": 1, "search_tokens": 1, **{field: 1 for field in fields}}
+    ops, updated = [], 0
+    async for doc in collection.find({}, projection):
+        tokens = tokens_for(doc)
+        if doc.get("search_tokens") == tokens:
+            continue
+        ops.append(UpdateOne({"_id": doc["_id"]}, {"$set": {"search_tokens": tokens}}))
+        updated += 1
+        if len(ops) >= WRITE_CHUNK_SIZE:
+            await _flush(collection, ops)
+    await _flush(collection, ops)
+    return updated
+
+
+async def up(db) -> Dict[str, int]:
+    profile_fields = {"type", *PERSONAL_PROFILE_SEARCH_FIELDS, *BUSINESS_PROFILE_SEARCH_FIELDS}
+    return {
+        "users_tokenized": await _backfill(db.users, USER_SEARCH_FIELDS, user_search_tokens),
+        "profiles_tokenized": await _backfill(db.profiles, profile_fields, profile_search_tokens),
+    }
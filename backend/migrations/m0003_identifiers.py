@@ -0,0 +1,56 @@
+"""
+0003 - canonical identifiers on users
+
+Backfills `identifiers` (see utils/identifiers.py) so recipient resolution
+finds users created before it: lowercased email and E.164 phone keys.
+Users whose email/phone normalizes to a key another user already holds
+(e.g. "+63 917..." and "0917..." on two accounts) are left without that
+user's identifiers and reported as conflicts for manual review.
+"""
+
+from typing import Dict, List
+from pymongo import UpdateOne
+from pymongo.errors import BulkWriteError
+import logging
+
+from utils.identifiers import user_identifiers
+
+logger = logging.getLogger(__name__)
+
+NAME = "0003_identifiers"
+WRITE_CHUNK_SIZE = 1000
+
+DUPLICATE_KEY_ERROR = 11000
+
+
+async def _flush(collection, ops: List[UpdateOne], user_ids: List, conflicts: List[str]):
+    if not ops:
+        return
+    try:
+        await collection.bulk_write(ops, ordered=False)
+    except BulkWriteError as e:
+        errors = e.details.get("writeErrors", [])
+        if any(err.get("code") != DUPLICATE_KEY_ERROR for err in errors):
+            raise
+        conflicts.extend(str(user_ids[err["index"]]) for err in errors)
+    ops.clear()
+    user_ids.clear()
+
+
+async def up(db) -> Dict[str, int]:
+    ops, user_ids, conflicts, updated = [], [], [], 0
+    async for user in db.users.find({}, {"_id": 1, "user_id": 1, "email": 1, "phone": 1, "identifiers": 1}):
+        keys = user_identifiers(user)
+        if keys == (user.get("identifiers") or []):
+            continue
+        update = {"$set": {"identifiers": keys}} if keys else {"$unset": {"identifiers": ""}}
+        ops.append(UpdateOne({"_id": user["_id"]}, update))
+        user_ids.append(user.get("user_id", user["_id"]))
+        updated += 1
+        if len(ops) >= WRITE_CHUNK_SIZE:
+            await _flush(db.users, ops, user_ids, conflicts)
+    await _flush(db.users, ops, user_ids, conflicts)
+
+    if conflicts:
+        logger.warning(f"Users sharing an email/phone, left without identifiers: {conflicts}")
+    return {"users_identified": updated - len(conflicts), "identifier_conflicts": len(conflicts)}
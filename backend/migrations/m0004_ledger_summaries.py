@@ -0,0 +1,48 @@
+"""
+0004 - ledger_summaries backfill
+
+Builds the statement running totals (see utils/ledger_summaries.py) from the
+existing ledger: lifetime and monthly totals per user / type / currency.
+Ledger writes made after this keep them current.
+
+Workers already serve ledger writes while this runs, so a write can land
+mid-rebuild and be counted twice or missed. Users whose summaries disagree
+with the ledger afterwards are rebuilt one by one (a short window each)
+until they check out; if some never do, the migration fails and is retried
+on the next run instead of being recorded as applied.
+"""
+
+from typing import Dict
+import logging
+
+from utils.ledger_summaries import check_summaries, rebuild_summaries
+
+logger = logging.getLogger(__name__)
+
+NAME = "0004_ledger_summaries"
+REPAIR_ATTEMPTS = 5
+
+
+async def _repair_user(db, user_id: str) -> bool:
+    """Rebuild one user's summaries until they match the ledger"""
+    for _ in range(REPAIR_ATTEMPTS):
+        await rebuild_summaries(db, user_id)
+        if (await check_summaries(db, user_id))["is_consistent"]:
+            return True
+    return False
+
+
+async def up(db) -> Dict[str, int]:
+    result = await rebuild_summaries(db)
+    check = await check_summaries(db)
+
+    users = sorted({m["user_id"] for m in check["mismatches"]})
+    unrepaired = [user_id for user_id in users if not await _repair_user(db, user_id)]
+    if unrepaired:
+        raise RuntimeError(
+            f"Ledger summaries still inconsistent for {len(unrepaired)} user(s) "
+            f"after {REPAIR_ATTEMPTS} rebuilds: {unrepaired[:20]}"
+        )
+    if users:
+        logger.info(f"Rebuilt ledger summaries for {len(users)} user(s) written to mid-backfill")
+    return {**result, "users_repaired": len(users)}
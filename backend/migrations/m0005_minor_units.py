@@ -0,0 +1,100 @@
+"""
+0005 - integer minor units next to the float money fields
+
+Backfills the int64 twins written by utils/money.py:
+
+- wallets:   usd_balance_minor / php_balance_minor
+- ledger:    amount_minor
+- ledger_tx: amount_minor
+
+Ledger amounts never change, so entries only get the field when it is
+missing. Wallet balances keep moving while this runs, and a wallet created
+before the deploy whose first dual-written $inc lands before the backfill
+ends up holding only that delta in *_minor. So every wallet whose minor
+field is missing or disagrees with its float is set from the float, guarded
+on the float being unchanged; wallets written to in between are re-read and
+retried.
+"""
+
+from typing import Any, Dict, List
+from pymongo import UpdateOne
+import logging
+
+from utils.money import BALANCE_FIELDS, minor_field, to_minor
+
+logger = logging.getLogger(__name__)
+
+NAME = "0005_minor_units"
+WRITE_CHUNK_SIZE = 1000
+WALLET_RETRY_PASSES = 3
+
+WALLET_QUERY = {"$or": [{field: {"$exists": True}} for field in BALANCE_FIELDS.values()]}
+
+
+async def _backfill_amounts(collection) -> int:
+    """amount_minor on every document missing it; returns documents updated"""
+    ops: List[UpdateOne] = []
+    updated = 0
+    missing = {"amount_minor": {"$exists": False}}
+    async for doc in collection.find(missing, {"_id": 1, "amount": 1, "currency": 1}):
+        ops.append(UpdateOne(
+            {"_id": doc["_id"], **missing},
+            {"$set": {"amount_minor": to_minor(doc.get("amount"), doc.get("currency"))}}
+        ))
+        if len(ops) >= WRITE_CHUNK_SIZE:
+            updated += (await collection.bulk_write(ops, ordered=False)).modified_count
+            ops = []
+    if ops:
+        updated += (await collection.bulk_write(ops, ordered=False)).modified_count
+    return updated
+
+
+def _wallet_update(wallet: Dict[str, Any]):
+    """Compare-and-set of the minor balances, or None when they already agree"""
+    guard, minors = {"_id": wallet["_id"]}, {}
+    for currency, field in BALANCE_FIELDS.items():
+        expected = to_minor(wallet.get(field), currency)
+        guard[field] = wallet.get(field)
+        if wallet.get(minor_field(field)) != expected:
+            minors[minor_field(field)] = expected
+    return UpdateOne(guard, {"$set": minors}) if minors else None
+
+
+async def _backfill_wallets(db) -> Dict[str, int]:
+    projection = {"_id": 1, **{f: 1 for field in BALANCE_FIELDS.values() for f in (field, minor_field(field))}}
+    query: Dict[str, Any] = WALLET_QUERY
+    updated, pending = 0, []
+
+    for _ in range(WALLET_RETRY_PASSES):
+        ops: List[UpdateOne] = []
+        pending = []
+        async for wallet in db.wallets.find(query, projection):
+            op = _wallet_update(wallet)
+            if op is None:
+                continue
+            ops.append(op)
+            pending.append(wallet["_id"])
+            if len(ops) >= WRITE_CHUNK_SIZE:
+                updated += (await db.wallets.bulk_write(ops, ordered=False)).modified_count
+                ops = []
+        if ops:
+            updated += (await db.wallets.bulk_write(ops, ordered=False)).modified_count
+        if not pending:
+            break
+        # Guards that missed (balance moved mid-pass) show up again on a re-read
+        query = {"_id": {"$in": pending}}
+    else:
+        pending = [w["_id"] async for w in db.wallets.find(query, projection) if _wallet_update(w) is not None]
+
+    if pending:
+        logger.warning(f"Wallets still without matching minor balances: {pending[:20]}")
+    return {"wallets_updated": updated, "wallets_unsettled": len(pending)}
+
+
+async def up(db) -> Dict[str, int]:
+    wallets = await _backfill_wallets(db)
+    return {
+        **wallets,
+        "ledger_entries_updated": await _backfill_amounts(db.ledger),
+        "ledger_tx_updated": await _backfill_amounts(db.ledger_tx),
+    }
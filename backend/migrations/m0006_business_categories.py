@@ -0,0 +1,54 @@
+"""
+0006 - canonical business categories
+
+Business discovery filters on category by equality (idx_profiles_type_category_
+verified_created), and writes now store the exact spelling from
+routes.profiles.BUSINESS_CATEGORIES. This rewrites older free-text values:
+case / whitespace variants become the canonical category, anything else
+becomes "Other" (the original text is kept in category_original).
+"""
+
+from typing import Dict, List
+from pymongo import UpdateOne
+import logging
+
+from routes.profiles import BUSINESS_CATEGORIES, ProfileType, normalize_category
+
+logger = logging.getLogger(__name__)
+
+NAME = "0006_business_categories"
+WRITE_CHUNK_SIZE = 1000
+
+
+async def _flush(collection, ops: List[UpdateOne]):
+    if ops:
+        await collection.bulk_write(ops, ordered=False)
+        ops.clear()
+
+
+async def up(db) -> Dict[str, int]:
+    query = {
+        "type": ProfileType.BUSINESS,
+        "category": {"$exists": True, "$nin": [None, *BUSINESS_CATEGORIES]}
+    }
+    ops, normalized, other = [], 0, 0
+    async for profile in db.profiles.find(query, {"_id": 1, "category": 1}):
+        original = profile["category"]
+        category = normalize_category(original) if isinstance(original, str) else None
+        if category is not None:
+            update = {"$set": {"category": category}}
+            normalized += 1
+        elif isinstance(original, str) and not original.strip():
+            update = {"$set": {"category": None}}
+            normalized += 1
+        else:
+            update = {"$set": {"category": "Other", "category_original": original}}
+            other += 1
+        ops.append(UpdateOne({"_id": profile["_id"], "category": original}, update))
+        if len(ops) >= WRITE_CHUNK_SIZE:
+            await _flush(db.profiles, ops)
+    await _flush(db.profiles, ops)
+
+    if other:
+        logger.info(f"{other} business profiles had an unknown category, now 'Other'")
+    return {"categories_normalized": normalized, "categories_other": other}
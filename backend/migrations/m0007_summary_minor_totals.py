@@ -0,0 +1,19 @@
+"""
+0007 - exact minor-unit totals on ledger_summaries
+
+check_summaries now compares total_minor (the $sum of amount_minor) instead
+of the float total within a tolerance. Summaries built by 0004 have no
+total_minor yet, and the first $inc after the deploy would start it from
+that one delta - so every user's summaries are rebuilt from the ledger, with
+the same repair pass as 0004 for users written to mid-rebuild.
+"""
+
+from typing import Dict
+
+from migrations import m0004_ledger_summaries
+
+NAME = "0007_summary_minor_totals"
+
+
+async def up(db) -> Dict[str, int]:
+    return await m0004_ledger_summaries.up(db)
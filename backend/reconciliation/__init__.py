@@ -0,0 +1,257 @@
+"""
+PBX Book Reconciliation - every wallet against the ledger in one pass
+GET /api/admin/reconciliation/wallet/{user_id} checks one user with its own
+$group. This checks the whole book: per shard of the user_id keyspace it
+
+1. streams `wallets` (user_id, usd/php_balance_minor) into flat int64 arrays
+2. runs ONE ledger aggregate grouped by (user_id, currency), $sum of
+   amount_minor
+3. outer-joins the two in pandas and keeps rows where
+   |wallet balance - ledger total| > threshold
+
+Balances and totals are integer minor units (utils/money.py), so $sum and
+the pandas arithmetic are exact and the default threshold of 0 means ==.
+Documents written before migration 0005 fall back to their float field,
+rounded to minor units.
+
+Shards are user_id ranges with roughly equal wallet counts; with shards > 1
+they run in a process pool, each worker holding its own MongoClient. Ledger
+rows for users without a wallet land in the shard their user_id falls in and
+are reported as "missing_wallet".
+
+Run (from backend/):
+    python -m reconciliation --shards 8 --output discrepancies.csv
+Also started from POST /api/admin/reconciliation/book (summary + top
+discrepancies stored in reconciliation_runs).
+
+Legacy wallets keyed by `userId` (routes/wallet.py) have no ledger and are
+not reconciled, as in the per-user check.
+"""
+
+from array import array
+from concurrent.futures import ProcessPoolExecutor
+from typing import Any, Dict, List, Optional, Tuple
+import logging
+import multiprocessing
+import os
+import time
+
+import numpy as np
+import pandas as pd
+from pymongo import MongoClient
+
+from utils.money import AMOUNT_MINOR, BALANCE_FIELDS, from_minor, minor_digits, minor_field, stored_minor, to_minor
+
+logger = logging.getLogger(__name__)
+
+RECONCILIATION_THRESHOLD = 0.0  # currency units; 0 = exact
+READ_BATCH_SIZE = 10_000
+
+# Wallet balance field per ledger currency
+WALLET_BALANCE_FIELDS = BALANCE_FIELDS
+
+DISCREPANCY_COLUMNS = [
+    "user_id", "currency", "wallet_balance", "ledger_total", "entries", "difference", "difference_minor", "issue"
+]
+
+ShardBounds = Tuple[Optional[str], Optional[str]]  # [lower, upper) user_id range
+
+
+def shard_match(bounds: ShardBounds) -> Dict[str, Any]:
+    lower, upper = bounds
+    user_range: Dict[str, Any] = {"$type": "string"}
+    if lower is not None:
+        user_range["$gte"] = lower
+    if upper is not None:
+        user_range["$lt"] = upper
+    return {"user_id": user_range}
+
+
+def shard_bounds(db, shards: int) -> List[ShardBounds]:
+    """Split the wallet user_id keyspace into `shards` ranges of about equal size"""
+    total = db.wallets.count_documents({"user_id": {"$type": "string"}})
+    if shards <= 1 or total < shards:
+        return [(None, None)]
+
+    cuts = []
+    for i in range(1, shards):
+        doc = next(db.wallets.find(
+            {"user_id": {"$type": "string"}}, {"_id": 0, "user_id": 1}
+        ).sort("user_id", 1).hint("idx_wallets_user_id").skip(total * i // shards).limit(1), None)
+        if doc and (not cuts or doc["user_id"] > cuts[-1]):
+            cuts.append(doc["user_id"])
+
+    edges = [None] + cuts + [None]
+    return list(zip(edges[:-1], edges[1:]))
+
+
+def load_wallets(db, bounds: ShardBounds) -> pd.DataFrame:
+    """Wallet balances in long form: user_id, currency, wallet_balance_minor"""
+    user_ids: List[str] = []
+    balances = {currency: array("q") for currency in WALLET_BALANCE_FIELDS}
+    projection = {
+        "_id": 0, "user_id": 1,
+        **{f: 1 for field in WALLET_BALANCE_FIELDS.values() for f in (field, minor_field(field))}
+    }
+
+    for wallet in db.wallets.find(shard_match(bounds), projection, batch_size=READ_BATCH_SIZE):
+        user_ids.append(wallet["user_id"])
+        for currency, field in WALLET_BALANCE_FIELDS.items():
+            balances[currency].append(stored_minor(wallet, field, currency))
+
+    count = len(user_ids)
+    return pd.DataFrame({
+        "user_id": np.tile(np.array(user_ids, dtype=object), len(WALLET_BALANCE_FIELDS)),
+        "currency": np.repeat(np.array(list(WALLET_BALANCE_FIELDS), dtype=object), count),
+        "wallet_balance_minor": np.concatenate(
+            [np.frombuffer(balances[currency], dtype=np.int64) for currency in WALLET_BALANCE_FIELDS]
+        ) if count else np.empty(0, dtype=np.int64),
+    })
+
+
+def load_ledger_totals(db, bounds: ShardBounds) -> pd.DataFrame:
+    """Ledger totals per (user_id, currency) in minor units, from a single $group"""
+    user_ids: List[str] = []
+    currencies: List[str] = []
+    totals = array("q")
+    entries = array("q")
+
+    pipeline = [
+        {"$match": shard_match(bounds)},
+        {"$group": {
+            "_id": {"user_id": "$user_id", "currency": "$currency"},
+            "total": {"$sum": AMOUNT_MINOR},
+            "entries": {"$sum": 1}
+        }}
+    ]
+    for row in db.ledger.aggregate(pipeline, allowDiskUse=True, batchSize=READ_BATCH_SIZE):
+        user_ids.append(row["_id"]["user_id"])
+        currencies.append(row["_id"].get("currency"))
+        totals.append(int(row["total"] or 0))
+        entries.append(row["entries"])
+
+    return pd.DataFrame({
+        "user_id": np.array(user_ids, dtype=object),
+        "currency": np.array(currencies, dtype=object),
+        "ledger_total_minor": np.frombuffer(totals, dtype=np.int64) if totals else np.empty(0, dtype=np.int64),
+        "entries": np.frombuffer(entries, dtype=np.int64) if entries else np.empty(0, dtype=np.int64),
+    })
+
+
+def find_discrepancies(wallets: pd.DataFrame, ledger: pd.DataFrame, threshold: float = RECONCILIATION_THRESHOLD) -> pd.DataFrame:
+    """
+    (user_id, currency) rows whose wallet balance and ledger total differ by more than
+    `threshold` (currency units, compared in integer minor units - 0 means any difference)
+    """
+    merged = wallets.merge(ledger, on=["user_id", "currency"], how="outer")
+    for column in ("wallet_balance_minor", "ledger_total_minor", "entries"):
+        merged[column] = merged[column].fillna(0).astype(np.int64)
+    merged["difference_minor"] = merged["wallet_balance_minor"] - merged["ledger_total_minor"]
+
+    flagged = merged[merged["difference_minor"].abs() > int(to_minor(threshold))].copy()
+    flagged["issue"] = np.where(
+        flagged["user_id"].isin(wallets["user_id"]), "balance_mismatch", "missing_wallet"
+    )
+    scale = 10.0 ** flagged["currency"].map(minor_digits).astype(np.int64)
+    flagged["wallet_balance"] = flagged["wallet_balance_minor"] / scale
+    flagged["ledger_total"] = flagged["ledger_total_minor"] / scale
+    flagged["difference"] = flagged["difference_minor"] / scale
+    flagged = flagged.reindex(flagged["difference_minor"].abs().sort_values(ascending=False).index)
+    return flagged[DISCREPANCY_COLUMNS].reset_index(drop=True)
+
+
+def reconcile_shard(mongo_uri: str, db_name: str, bounds: ShardBounds, threshold: float) -> Tuple[Dict[str, Any], pd.DataFrame]:
+    """Reconcile one user_id range (process pool entry point - opens its own client)"""
+    client = MongoClient(mongo_uri)
+    try:
+        db = client[db_name]
+        wallets = load_wallets(db, bounds)
+        ledger = load_ledger_totals(db, bounds)
+    finally:
+        client.close()
+
+    discrepancies = find_discrepancies(wallets, ledger, threshold)
+    stats = {
+        "wallets": len(wallets) // len(WALLET_BALANCE_FIELDS),
+        "ledger_groups": len(ledger),
+        "ledger_entries": int(ledger["entries"].sum()),
+        "discrepancies": len(discrepancies),
+    }
+    return stats, discrepancies
+
+
+def reconcile_book(
+    mongo_uri: str,
+    db_name: str,
+    shards: int = 1,
+    threshold: float = RECONCILIATION_THRESHOLD,
+    processes: Optional[int] = None
+) -> Tuple[Dict[str, Any], pd.DataFrame]:
+    """
+    Reconcile every wallet against the ledger.
+    Returns (summary, discrepancies sorted by |difference| descending).
+    """
+    started = time.perf_counter()
+    client = MongoClient(mongo_uri)
+    try:
+        bounds = shard_bounds(client[db_name], shards)
+    finally:
+        # Pool workers open their own clients
+        client.close()
+
+    if len(bounds) == 1:
+        results = [reconcile_shard(mongo_uri, db_name, bounds[0], threshold)]
+    else:
+        workers = min(processes or os.cpu_count() or 1, len(bounds))
+        with ProcessPoolExecutor(max_workers=workers, mp_context=multiprocessing.get_context("spawn")) as pool:
+            results = list(pool.map(
+                reconcile_shard,
+                [mongo_uri] * len(bounds), [db_name] * len(bounds), bounds, [threshold] * len(bounds)
+            ))
+
+    frames = [frame for _, frame in results if len(frame)]
+    discrepancies = pd.concat(frames, ignore_index=True) if frames else pd.DataFrame(columns=DISCREPANCY_COLUMNS)
+    discrepancies = discrepancies.reindex(
+        discrepancies["difference_minor"].abs().sort_values(ascending=False).index
+    ).reset_index(drop=True)
+
+    by_currency = discrepancies.groupby("currency")["difference_minor"].agg(
+        count="size", absolute_total=lambda d: int(d.abs().sum())
+    ) if len(discrepancies) else pd.DataFrame(columns=["count", "absolute_total"])
+
+    summary = {
+        "shards": len(bounds),
+        "threshold": threshold,
+        "wallets": sum(stats["wallets"] for stats, _ in results),
+        "ledger_groups": sum(stats["ledger_groups"] for stats, _ in results),
+        "ledger_entries": sum(stats["ledger_entries"] for stats, _ in results),
+        "discrepancies": len(discrepancies),
+        "by_currency": {
+            currency: {"count": int(row["count"]), "absolute_total": from_minor(row["absolute_total"], currency)}
+            for currency, row in by_currency.iterrows()
+        },
+        "duration_seconds": round(time.perf_counter() - started, 2),
+        "is_balanced": len(discrepancies) == 0,
+    }
+    logger.info(
+        f"Book reconciliation: {summary['wallets']} wallets, {summary['ledger_entries']} ledger entries, "
+        f"{summary['discrepancies']} discrepancies in {summary['duration_seconds']}s ({len(bounds)} shards)"
+    )
+    return summary, discrepancies
+
+
+def discrepancy_records(discrepancies: pd.DataFrame, limit: Optional[int] = None) -> List[Dict[str, Any]]:
+    """JSON-ready rows (amounts in currency units)"""
+    rows = discrepancies.head(limit) if limit is not None else discrepancies
+    return [
+        {
+            "user_id": row.user_id,
+            "currency": row.currency,
+            "wallet_balance": float(row.wallet_balance),
+            "ledger_total": float(row.ledger_total),
+            "entries": int(row.entries),
+            "difference": float(row.difference),
+            "issue": row.issue,
+        }
+        for row in rows.itertuples(index=False)
+    ]
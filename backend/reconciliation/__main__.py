@@ -0,0 +1,50 @@
+"""
+Reconcile every wallet against the ledger.
+
+Usage (from backend/):
+    python -m reconciliation
+    python -m reconciliation --shards 8 --threshold 0.01 --output discrepancies.csv
+
+Exits 1 when discrepancies are found (for nightly cron / CI alerting).
+"""
+import argparse
+import json
+import logging
+import sys
+from pathlib import Path
+
+from dotenv import load_dotenv
+
+load_dotenv(Path(__file__).resolve().parent.parent / '.env')
+
+from database.connection import get_mongodb_uri, get_db_name  # noqa: E402
+from reconciliation import RECONCILIATION_THRESHOLD, discrepancy_records, reconcile_book  # noqa: E402
+
+
+def main(args) -> int:
+    summary, discrepancies = reconcile_book(
+        get_mongodb_uri(), get_db_name(),
+        shards=args.shards, threshold=args.threshold, processes=args.processes
+    )
+    print(json.dumps(summary, indent=2))
+
+    if args.output:
+        discrepancies.to_csv(args.output, index=False, float_format="%.2f")
+        print(f"Wrote {len(discrepancies)} discrepancies to {args.output}")
+    else:
+        for row in discrepancy_records(discrepancies, args.show):
+            print(f"{row['user_id']:<40} {row['currency']:<4} wallet {row['wallet_balance']:>14,.2f}  "
+                  f"ledger {row['ledger_total']:>14,.2f}  diff {row['difference']:>12,.2f}  {row['issue']}")
+
+    return 0 if summary["is_balanced"] else 1
+
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO)
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--shards", type=int, default=1, help="user_id ranges, run in a process pool when > 1")
+    parser.add_argument("--processes", type=int, default=None, help="Pool size (default: CPU count)")
+    parser.add_argument("--threshold", type=float, default=RECONCILIATION_THRESHOLD)
+    parser.add_argument("--output", help="Write every discrepancy to this CSV file")
+    parser.add_argument("--show", type=int, default=50, help="Discrepancies to print without --output")
+    sys.exit(main(parser.parse_args()))
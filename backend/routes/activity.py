@@ -0,0 +1,301 @@
+"""
+PBX Activity - one money-history feed across every source
+Replaces calling /recipient/transfers/history, /recipient/bills/history,
+/internal/incoming, /banks/transfers and /recipient/statements separately
+(each capped at 50 rows and sorted on its own).
+
+Sources (newest first, each read through its own indexed cursor):
+- ledger              transfers, bills, conversions, business payments
+- pending_transfers   ACH add-money / withdrawals (routes/banks.py)
+- transactions        Circle mints (user_id / created_at) and legacy wallet
+                      conversions (userId / createdAt, Netlify schema)
+- session_states      demo-session activity (one document per user)
+
+Each page reads at most limit + 1 rows per source, heap-merges them on
+(created_at, source, id) and returns an opaque keyset cursor for the next page.
+"""
+from fastapi import APIRouter, HTTPException, Request
+from typing import Any, AsyncIterator, Callable, Dict, List, Optional
+from datetime import datetime, timezone
+import asyncio
+import heapq
+import logging
+
+from bson import ObjectId
+
+from database.connection import get_database
+from routes.social import encode_cursor, decode_cursor
+
+router = APIRouter(prefix="/api/activity", tags=["activity"])
+logger = logging.getLogger(__name__)
+
+ACTIVITY_PAGE_SIZE = 20
+ACTIVITY_MAX_PAGE_SIZE = 100
+
+
+def get_user_id_from_headers(request: Request) -> str:
+    """Extract user ID from session token"""
+    token = request.headers.get("X-Session-Token", "")
+    return token[:36] if token else None
+
+
+def as_naive_utc(value: Any) -> Optional[datetime]:
+    """Mongo hands back naive UTC datetimes - compare everything in that form"""
+    if isinstance(value, str):
+        try:
+            value = datetime.fromisoformat(value.replace("Z", "+00:00"))
+        except ValueError:
+            return None
+    if not isinstance(value, datetime):
+        return None
+    if value.tzinfo:
+        value = value.astimezone(timezone.utc).replace(tzinfo=None)
+    return value
+
+
+# ============================================================
+# NORMALIZERS - one activity item shape for every source
+# ============================================================
+
+def ledger_item(doc: dict) -> dict:
+    return {
+        "id": doc.get("tx_id") or doc.get("txn_id") or str(doc["_id"]),
+        "type": doc.get("type"),
+        "category": doc.get("category"),
+        "description": doc.get("description") or doc.get("note"),
+        "currency": doc.get("currency"),
+        "amount": doc.get("amount"),
+        "status": doc.get("status", "completed"),
+        "counterparty": doc.get("counterparty"),
+    }
+
+
+def bank_transfer_item(doc: dict) -> dict:
+    amount = doc.get("amount") or 0
+    return {
+        "id": doc.get("transfer_id") or str(doc["_id"]),
+        "type": doc.get("type"),
+        "category": "Bank Transfer",
+        "description": f"{doc.get('bank_name') or 'Bank'} ••{doc.get('bank_last4') or ''}".strip(),
+        "currency": doc.get("currency", "USD"),
+        "amount": amount if doc.get("direction") == "in" else -amount,
+        "status": doc.get("status"),
+        "estimated_arrival": doc.get("estimated_arrival"),
+    }
+
+
+def circle_transaction_item(doc: dict) -> dict:
+    return {
+        "id": doc.get("transaction_id") or str(doc["_id"]),
+        "type": doc.get("type"),
+        "category": "Add Money",
+        "description": None,
+        "currency": "USD",
+        "amount": doc.get("amount_usd"),
+        "status": doc.get("status"),
+    }
+
+
+def wallet_transaction_item(doc: dict) -> dict:
+    return {
+        "id": str(doc["_id"]),
+        "type": doc.get("type"),
+        "category": "Conversion",
+        "description": f"{doc.get('from')} → {doc.get('to')}",
+        "currency": doc.get("from"),
+        "amount": -(doc.get("amount_from") or 0),
+        "status": "completed",
+        "rate": doc.get("rate"),
+    }
+
+
+def session_activity_item(doc: dict) -> dict:
+    return {
+        "id": doc.get("id"),
+        "type": doc.get("type"),
+        "category": None,
+        "description": None,
+        "currency": "USD",
+        "amount": doc.get("amountUSD", doc.get("amount_usd")),
+        "status": doc.get("status"),
+    }
+
+
+# ============================================================
+# SOURCES
+# ============================================================
+
+class ActivitySource:
+    """One indexed (user, time DESC, _id DESC) cursor over a collection"""
+
+    def __init__(
+        self,
+        rank: int,
+        name: str,
+        collection: str,
+        user_field: str,
+        time_field: str,
+        normalize: Callable[[dict], dict],
+        currency_field: Optional[str] = None,
+        currency: Optional[str] = None,
+        extra_filter: Optional[dict] = None,
+    ):
+        self.rank = rank
+        self.name = name
+        self.collection = collection
+        self.user_field = user_field
+        self.time_field = time_field
+        self.normalize = normalize
+        self.currency_field = currency_field
+        self.currency = currency  # fixed currency when the documents carry none
+        self.extra_filter = extra_filter or {}
+
+    def query(self, user_id: str, types: List[str], currency: Optional[str], position) -> Optional[dict]:
+        """Filter for this source, or None if the currency filter rules it out"""
+        query = {self.user_field: user_id, **self.extra_filter}
+        if types:
+            query["type"] = {"$in": types}
+        if currency:
+            if self.currency_field:
+                query[self.currency_field] = currency
+            elif self.currency != currency:
+                return None
+        if position:
+            query.update(self.after(position))
+        return query
+
+    def after(self, position) -> dict:
+        """Rows after the cursor position in the merged (time, rank, id) DESC order"""
+        created_at, rank, last_id = position
+        if self.rank < rank:
+            return {self.time_field: {"$lte": created_at}}
+        if self.rank > rank:
+            return {self.time_field: {"$lt": created_at}}
+        return {"$or": [
+            {self.time_field: {"$lt": created_at}},
+            {self.time_field: created_at, "_id": {"$lt": ObjectId(last_id)}}
+        ]}
+
+    async def rows(self, db, user_id, types, currency, position, limit) -> AsyncIterator[tuple]:
+        query = self.query(user_id, types, currency, position)
+        if query is None:
+            return
+        cursor = db[self.collection].find(query).sort(
+            [(self.time_field, -1), ("_id", -1)]
+        ).limit(limit)
+        async for doc in cursor:
+            created_at = as_naive_utc(doc.get(self.time_field))
+            if created_at is None:
+                continue
+            yield (created_at, self.rank, str(doc["_id"]), self, doc)
+
+
+class SessionActivitySource:
+    """Demo-session activity - an array on the user's single session_states document"""
+
+    rank = 0
+    name = "session"
+
+    async def rows(self, db, user_id, types, currency, position, limit) -> AsyncIterator[tuple]:
+        if currency and currency != "USD":
+            return
+        state = await db.session_states.find_one({"user_id": user_id}, {"_id": 0, "activity": 1})
+        items = []
+        for item in (state or {}).get("activity") or []:
+            created_at = as_naive_utc(item.get("created_at"))
+            if created_at is None or (types and item.get("type") not in types):
+                continue
+            key = (created_at, self.rank, str(item.get("id")))
+            if position and key >= position:
+                continue
+            items.append(key + (self, item))
+        items.sort(key=lambda row: row[:3], reverse=True)
+        for row in items[:limit]:
+            yield row
+
+    def normalize(self, doc: dict) -> dict:
+        return session_activity_item(doc)
+
+
+SOURCES = [
+    SessionActivitySource(),
+    ActivitySource(1, "wallet", "transactions", "userId", "createdAt", wallet_transaction_item, currency_field="from"),
+    ActivitySource(2, "circle", "transactions", "user_id", "created_at", circle_transaction_item, currency="USD"),
+    ActivitySource(3, "bank", "pending_transfers", "user_id", "created_at", bank_transfer_item, currency_field="currency"),
+    ActivitySource(4, "ledger", "ledger", "user_id", "created_at", ledger_item, currency_field="currency"),
+]
+
+
+def parse_position(cursor: str) -> tuple:
+    """(created_at, source rank, id) from an activity cursor, or 400"""
+    created_at, tie_breaker = decode_cursor(cursor)
+    try:
+        rank, last_id = tie_breaker.split(":", 1)
+        rank = int(rank)
+        if any(s.rank == rank and isinstance(s, ActivitySource) for s in SOURCES):
+            ObjectId(last_id)
+        return as_naive_utc(created_at), rank, last_id
+    except Exception:
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+
+
+async def load_activity(
+    db,
+    user_id: str,
+    limit: int = ACTIVITY_PAGE_SIZE,
+    cursor: Optional[str] = None,
+    types: Optional[List[str]] = None,
+    currency: Optional[str] = None,
+) -> Dict[str, Any]:
+    """One page of the merged feed, newest first"""
+    position = parse_position(cursor) if cursor else None
+    types = types or []
+
+    async def fetch(source):
+        return [row async for row in source.rows(db, user_id, types, currency, position, limit + 1)]
+
+    # Each source list is already sorted DESC; merge lazily on (created_at, rank, id)
+    per_source = await asyncio.gather(*(fetch(source) for source in SOURCES))
+    merged = heapq.merge(*per_source, key=lambda row: row[:3], reverse=True)
+
+    items = []
+    last = None
+    for row in merged:
+        if len(items) == limit:
+            break
+        created_at, rank, row_id, source, doc = row
+        item = source.normalize(doc)
+        item["source"] = source.name
+        item["created_at"] = created_at.isoformat() + "Z"
+        items.append(item)
+        last = row
+
+    has_more = len(items) == limit and sum(len(rows) for rows in per_source) > limit
+    return {
+        "items": items,
+        "next_cursor": encode_cursor(last[0], f"{last[1]}:{last[2]}") if has_more and last else None,
+        "has_more": has_more,
+    }
+
+
+@router.get("")
+async def get_activity(
+    request: Request,
+    limit: int = ACTIVITY_PAGE_SIZE,
+    cursor: Optional[str] = None,
+    type: Optional[str] = None,
+    currency: Optional[str] = None
+):
+    """
+    Unified money activity (ledger, bank transfers, wallet transactions, session activity).
+    type: comma-separated entry types; cursor: next_cursor from the previous page.
+    """
+    user_id = get_user_id_from_headers(request)
+    if not user_id:
+        raise HTTPException(status_code=401, detail="No session token provided")
+
+    limit = max(1, min(limit, ACTIVITY_MAX_PAGE_SIZE))
+    types = [t.strip() for t in type.split(",") if t.strip()] if type else None
+
+    db = get_database()
+    return await load_activity(db, user_id, limit, cursor, types, currency.upper() if currency else None)
@@ -14,12 +14,19 @@ All admin actions are logged to the immutable audit_log collection.
 
 from fastapi import APIRouter, HTTPException, Request, Query
 from pydantic import BaseModel, Field
+from pymongo.errors import DuplicateKeyError
 from typing import Optional, List
 from datetime import datetime, timezone, timedelta
+import asyncio
 import logging
 import os
+import uuid
 
-from database.connection import get_database
+from database.connection import get_database, get_mongodb_uri, get_db_name
+from reconciliation import RECONCILIATION_THRESHOLD, discrepancy_records, reconcile_book
+from services.integrity_scanner import integrity_scanner
+from utils.money import AMOUNT_MINOR, BALANCE_FIELDS, from_minor, stored_minor
+from utils.wallet_cache import invalidate_wallet
 from utils.admin import (
     require_admin,
     write_audit_event,
@@ -33,6 +40,7 @@ from utils.ledger import (
     get_ledger_entries_for_tx,
     verify_ledger_integrity
 )
+from utils.ledger_summaries import check_summaries, rebuild_summaries
 
 router = APIRouter(prefix="/api/admin", tags=["admin"])
 logger = logging.getLogger(__name__)
@@ -375,43 +383,37 @@ async def reconcile_wallet(request: Request, user_id: str):
     if not wallet:
         raise HTTPException(status_code=404, detail="Wallet not found")
     
-    wallet_usd = wallet.get("usd_balance", 0)
-    wallet_php = wallet.get("php_balance", 0)
+    wallet_minor = {currency: stored_minor(wallet, field, currency) for currency, field in BALANCE_FIELDS.items()}
     
-    # Sum ledger entries
+    # Sum ledger entries in minor units (exact; see utils/money.py)
     pipeline = [
         {"$match": {"user_id": user_id}},
         {"$group": {
             "_id": "$currency",
-            "total": {"$sum": "$amount"}
+            "total": {"$sum": AMOUNT_MINOR}
         }}
     ]
     
     cursor = ledger_coll.aggregate(pipeline)
-    ledger_totals = {doc["_id"]: doc["total"] async for doc in cursor}
-    
-    ledger_usd = ledger_totals.get("USD", 0)
-    ledger_php = ledger_totals.get("PHP", 0)
+    ledger_minor = {doc["_id"]: int(doc["total"] or 0) async for doc in cursor}
     
     # Check for discrepancies
-    usd_diff = abs(wallet_usd - ledger_usd)
-    php_diff = abs(wallet_php - ledger_php)
-    
-    is_balanced = usd_diff < 0.01 and php_diff < 0.01
+    diff_minor = {currency: wallet_minor[currency] - ledger_minor.get(currency, 0) for currency in BALANCE_FIELDS}
+    is_balanced = all(diff == 0 for diff in diff_minor.values())
     
     result = {
         "user_id": user_id,
         "wallet_balances": {
-            "usd": wallet_usd,
-            "php": wallet_php
+            "usd": from_minor(wallet_minor["USD"], "USD"),
+            "php": from_minor(wallet_minor["PHP"], "PHP")
         },
         "ledger_computed": {
-            "usd": ledger_usd,
-            "php": ledger_php
+            "usd": from_minor(ledger_minor.get("USD", 0), "USD"),
+            "php": from_minor(ledger_minor.get("PHP", 0), "PHP")
         },
         "discrepancy": {
-            "usd": round(wallet_usd - ledger_usd, 2),
-            "php": round(wallet_php - ledger_php, 2)
+            "usd": from_minor(diff_minor["USD"], "USD"),
+            "php": from_minor(diff_minor["PHP"], "PHP")
         },
         "is_balanced": is_balanced,
         "status": "ok" if is_balanced else "DISCREPANCY_DETECTED"
@@ -448,6 +450,216 @@ async def check_transfer_integrity(request: Request, tx_id: str):
     return integrity
 
 
+@router.get("/integrity/scanner")
+async def get_integrity_scanner(request: Request):
+    """
+    Background ledger integrity scanner: checkpoint, lease holder and counters.
+    
+    Requires: admin_read permission
+    """
+    db = get_database()
+    await require_admin(db, request, required_permission="read:ledger")
+    
+    return await integrity_scanner.status()
+
+
+@router.get("/integrity/findings")
+async def list_integrity_findings(
+    request: Request,
+    status: str = "open",
+    check: Optional[str] = None,
+    limit: int = Query(default=50, le=500),
+    skip: int = Query(default=0, ge=0)
+):
+    """
+    Violations recorded by the integrity scanner, newest first.
+    
+    Requires: admin_read permission
+    """
+    db = get_database()
+    await require_admin(db, request, required_permission="read:ledger")
+    
+    query = {"status": status}
+    if check:
+        query["check"] = check
+    
+    findings = await db.integrity_findings.find(query, {"_id": 0}).sort(
+        "first_seen_at", -1
+    ).skip(skip).limit(limit).to_list(limit)
+    total = await db.integrity_findings.count_documents(query)
+    
+    return {"findings": findings, "total": total, "limit": limit, "skip": skip}
+
+
+@router.get("/reconciliation/ledger-summaries/{user_id}")
+async def reconcile_ledger_summaries(request: Request, user_id: str):
+    """
+    Compare a user's statement running totals (ledger_summaries) with the
+    full ledger aggregate. Mismatches are repaired with POST /ops/ledger-summaries/{user_id}/rebuild.
+    
+    Requires: admin_read permission
+    """
+    db = get_database()
+    await require_admin(db, request, required_permission="read:ledger")
+    
+    result = await check_summaries(db, user_id)
+    return {"user_id": user_id, **result, "status": "ok" if result["is_consistent"] else "DISCREPANCY_DETECTED"}
+
+
+# Discrepancies stored on a book reconciliation run (full list: python -m reconciliation --output)
+BOOK_RECONCILIATION_REPORT_LIMIT = 1000
+# A running run renews its lease while reconcile_book works; a run whose lease
+# lapsed (worker restarted or killed mid-run) is marked failed
+BOOK_RECONCILIATION_LEASE_SECONDS = 120
+BOOK_RECONCILIATION_HEARTBEAT_SECONDS = 30
+_book_reconciliation_tasks = set()
+
+
+class BookReconciliationRequest(BaseModel):
+    shards: int = Field(default=4, ge=1, le=64)
+    threshold: float = Field(default=RECONCILIATION_THRESHOLD, ge=0)
+
+
+def _book_run_lease(now: datetime) -> datetime:
+    return now + timedelta(seconds=BOOK_RECONCILIATION_LEASE_SECONDS)
+
+
+async def expire_book_reconciliations(db) -> int:
+    """Mark running book reconciliations whose lease lapsed as failed; returns runs expired"""
+    now = datetime.now(timezone.utc)
+    result = await db.reconciliation_runs.update_many(
+        {"status": "running", "$or": [{"lease_until": None}, {"lease_until": {"$lt": now}}]},
+        {"$set": {
+            "status": "failed",
+            "error": "Lease expired (worker stopped mid-run)",
+            "completed_at": now,
+            "lease_until": None
+        }}
+    )
+    if result.modified_count:
+        logger.warning(f"Expired {result.modified_count} stalled book reconciliation run(s)")
+    return result.modified_count
+
+
+async def _book_reconciliation_heartbeat(db, run_id: str, lease_owner: str):
+    """Renew the run's lease while reconcile_book runs"""
+    while True:
+        await asyncio.sleep(BOOK_RECONCILIATION_HEARTBEAT_SECONDS)
+        try:
+            await db.reconciliation_runs.update_one(
+                {"run_id": run_id, "status": "running", "lease_owner": lease_owner},
+                {"$set": {"lease_until": _book_run_lease(datetime.now(timezone.utc))}}
+            )
+        except Exception as e:
+            logger.warning(f"Book reconciliation {run_id}: lease renewal failed: {e}")
+
+
+async def run_book_reconciliation(db, run_id: str, lease_owner: str, shards: int, threshold: float):
+    """Run reconcile_book off the event loop and store its report on the run"""
+    # Only the lease holder finishes the run; an expired run stays failed
+    owned = {"run_id": run_id, "status": "running", "lease_owner": lease_owner}
+    heartbeat = asyncio.create_task(_book_reconciliation_heartbeat(db, run_id, lease_owner))
+    try:
+        summary, discrepancies = await asyncio.to_thread(
+            reconcile_book, get_mongodb_uri(), get_db_name(), shards, threshold
+        )
+        await db.reconciliation_runs.update_one(
+            owned,
+            {"$set": {
+                "status": "completed",
+                "summary": summary,
+                "discrepancies": discrepancy_records(discrepancies, BOOK_RECONCILIATION_REPORT_LIMIT),
+                "completed_at": datetime.now(timezone.utc),
+                "lease_until": None
+            }}
+        )
+    except Exception as e:
+        logger.error(f"Book reconciliation {run_id} failed: {e}")
+        await db.reconciliation_runs.update_one(
+            owned,
+            {"$set": {"status": "failed", "error": str(e), "completed_at": datetime.now(timezone.utc), "lease_until": None}}
+        )
+    finally:
+        heartbeat.cancel()
+
+
+@router.post("/reconciliation/book", status_code=202)
+async def start_book_reconciliation(request: Request, data: BookReconciliationRequest):
+    """
+    Reconcile every wallet against the ledger (reconciliation/ engine) in the background.
+    Poll GET /reconciliation/book/{run_id} for the summary and top discrepancies.
+    
+    Requires: admin_ops permission
+    """
+    db = get_database()
+    admin_user = await require_admin(
+        db, request,
+        allowed_roles=["admin_ops", "admin_super"],
+        required_permission="read:wallets"
+    )
+    
+    await expire_book_reconciliations(db)
+    
+    now = datetime.now(timezone.utc)
+    run = {
+        "run_id": f"recon_{uuid.uuid4().hex[:12]}",
+        "status": "running",
+        "shards": data.shards,
+        "threshold": data.threshold,
+        "started_by": admin_user.get("user_id"),
+        "started_at": now,
+        "lease_owner": f"worker_{uuid.uuid4().hex[:12]}",
+        "lease_until": _book_run_lease(now),
+    }
+    try:
+        # idx_reconciliation_runs_running_unique admits one running run
+        await db.reconciliation_runs.insert_one(run)
+    except DuplicateKeyError:
+        running = await db.reconciliation_runs.find_one({"status": "running"}, {"_id": 0, "run_id": 1})
+        detail = f"Reconciliation {running['run_id']} is already running" if running else "A reconciliation is already running"
+        raise HTTPException(status_code=409, detail=detail)
+    
+    await write_audit_event(
+        db=db,
+        actor_user_id=admin_user.get("user_id"),
+        actor_role=admin_user.get("admin_role"),
+        action="book_reconciliation",
+        target_type="ledger",
+        target_id=run["run_id"],
+        reason="Platform-wide wallet reconciliation",
+        request=request,
+        metadata={"shards": data.shards, "threshold": data.threshold}
+    )
+    
+    task = asyncio.create_task(
+        run_book_reconciliation(db, run["run_id"], run["lease_owner"], data.shards, data.threshold)
+    )
+    _book_reconciliation_tasks.add(task)
+    task.add_done_callback(_book_reconciliation_tasks.discard)
+    
+    return {"run_id": run["run_id"], "status": "running"}
+
+
+@router.get("/reconciliation/book/{run_id}")
+async def get_book_reconciliation(request: Request, run_id: str, limit: int = Query(default=100, le=BOOK_RECONCILIATION_REPORT_LIMIT)):
+    """
+    Book reconciliation status, summary and the largest discrepancies.
+    
+    Requires: admin_read permission
+    """
+    db = get_database()
+    await require_admin(db, request, required_permission="read:wallets")
+    await expire_book_reconciliations(db)
+    
+    run = await db.reconciliation_runs.find_one(
+        {"run_id": run_id},
+        {"_id": 0, "discrepancies": {"$slice": max(0, limit)}}
+    )
+    if not run:
+        raise HTTPException(status_code=404, detail="Reconciliation run not found")
+    return run
+
+
 # ============================================================
 # ADMIN OPS ENDPOINTS (admin_ops and above)
 # ============================================================
@@ -499,6 +711,83 @@ async def admin_resend_magic_link(request: Request, data: ResendMagicLinkRequest
     }
 
 
+class RebuildSummariesRequest(BaseModel):
+    reason: str = Field(..., min_length=10)
+
+
+@router.post("/ops/ledger-summaries/{user_id}/rebuild")
+async def admin_rebuild_ledger_summaries(request: Request, user_id: str, data: RebuildSummariesRequest):
+    """
+    Recompute a user's statement running totals from the ledger.
+    Requires: admin_ops permission
+    """
+    db = get_database()
+    admin_user = await require_admin(
+        db, request,
+        allowed_roles=["admin_ops", "admin_super"],
+        required_permission="write:user_support"
+    )
+    
+    result = await rebuild_summaries(db, user_id)
+    
+    await write_audit_event(
+        db=db,
+        actor_user_id=admin_user.get("user_id"),
+        actor_role=admin_user.get("admin_role"),
+        action="rebuild_ledger_summaries",
+        target_type="user",
+        target_id=user_id,
+        reason=data.reason,
+        request=request,
+        metadata=result
+    )
+    
+    return {"success": True, "user_id": user_id, **result}
+
+
+class ResolveFindingRequest(BaseModel):
+    reason: str = Field(..., min_length=10)
+
+
+@router.post("/ops/integrity/findings/{finding_id}/resolve")
+async def admin_resolve_integrity_finding(request: Request, finding_id: str, data: ResolveFindingRequest):
+    """
+    Mark an integrity finding as resolved (after the ledger was corrected or the finding explained).
+    Requires: admin_ops permission
+    """
+    db = get_database()
+    admin_user = await require_admin(
+        db, request,
+        allowed_roles=["admin_ops", "admin_super"],
+        required_permission="write:user_support"
+    )
+    
+    result = await db.integrity_findings.update_one(
+        {"_id": finding_id, "status": "open"},
+        {"$set": {
+            "status": "resolved",
+            "resolved_by": admin_user.get("user_id"),
+            "resolution": data.reason,
+            "resolved_at": datetime.now(timezone.utc)
+        }}
+    )
+    if result.matched_count == 0:
+        raise HTTPException(status_code=404, detail="Open finding not found")
+    
+    await write_audit_event(
+        db=db,
+        actor_user_id=admin_user.get("user_id"),
+        actor_role=admin_user.get("admin_role"),
+        action="resolve_integrity_finding",
+        target_type="ledger_tx",
+        target_id=finding_id,
+        reason=data.reason,
+        request=request
+    )
+    
+    return {"success": True, "finding_id": finding_id, "status": "resolved"}
+
+
 # ============================================================
 # ADMIN SUPER ENDPOINTS (admin_super only - high friction)
 # ============================================================
@@ -599,6 +888,7 @@ async def demo_mint(
         upsert=True,
         return_document=True
     )
+    await invalidate_wallet(data.userId)
     
     logger.info(f"Demo mint: {data.amount} {data.currency} to user {data.userId}")
     
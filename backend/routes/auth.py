@@ -16,6 +16,8 @@ import os
 
 from services.magic_link import verify_magic_link, create_magic_link
 from database.connection import get_database
+from utils.identifiers import recipient_cache, user_identifiers
+from utils.search import user_search_tokens
 
 router = APIRouter(prefix="/api/auth", tags=["auth"])
 logger = logging.getLogger(__name__)
@@ -154,9 +156,13 @@ async def login(data: LoginRequest):
                 "email": email,
                 "display_name": display_name,
                 "password_hash": None,
+                "search_tokens": user_search_tokens({"email": email, "display_name": display_name}),
+                "identifiers": user_identifiers({"email": email}),
                 "created_at": datetime.utcnow(),
                 "updated_at": datetime.utcnow(),
             })
+            # Drop a cached "not on PBX" answer for this email
+            recipient_cache.invalidate(user_identifiers({"email": email}))
             # Create wallet with 0 balances
             await wallets.update_one(
                 {"user_id": user_id},
@@ -245,9 +251,13 @@ async def register(data: RegisterRequest):
         "email": email,
         "display_name": display_name,
         "password_hash": password_hash,
+        "search_tokens": user_search_tokens({"email": email, "display_name": display_name}),
+        "identifiers": user_identifiers({"email": email}),
         "created_at": datetime.utcnow(),
         "updated_at": datetime.utcnow(),
     })
+    # Drop a cached "not on PBX" answer for this email
+    recipient_cache.invalidate(user_identifiers({"email": email}))
     
     # Create wallet with demo amounts (same as Netlify functions)
     await wallets.insert_one({
@@ -23,6 +23,8 @@ import uuid
 import logging
 
 from database.connection import get_database
+from utils.money import balance_inc
+from utils.wallet_cache import invalidate_wallet
 
 router = APIRouter(prefix="/api/banks", tags=["banks"])
 logger = logging.getLogger(__name__)
@@ -329,8 +331,9 @@ async def withdraw(request: Request, data: WithdrawRequest):
     # In production: move to held_balance, deduct only on settlement
     await wallets.update_one(
         {"user_id": user_id},
-        {"$inc": {"usd_balance": -data.amount}, "$set": {"updated_at": now}}
+        {"$inc": balance_inc("USD", -data.amount), "$set": {"updated_at": now}}
     )
+    await invalidate_wallet(user_id)
     
     # Update bank last_used_at
     await linked_banks.update_one(
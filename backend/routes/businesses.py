@@ -6,11 +6,17 @@ from fastapi import APIRouter, HTTPException, Request, BackgroundTasks
 from pydantic import BaseModel, Field
 from typing import Optional, List
 from datetime import datetime, timezone
+from pymongo.errors import DuplicateKeyError
 import logging
 import uuid
 
 from database.connection import get_database
-from routes.profiles import ProfileType, get_or_create_personal_profile
+from routes.profiles import BUSINESS_CATEGORIES, ProfileType, get_or_create_personal_profile, normalize_category
+from routes.social import pair_key, last_message_summary, set_last_message, publish_message
+from utils.ledger import insert_ledger_entries
+from utils.money import balance_inc, entry_amount, wallet_balances
+from utils.search import PROFILE_PROJECTION
+from utils.wallet_cache import get_cached_wallet, invalidate_wallet
 
 router = APIRouter(prefix="/api/businesses", tags=["businesses"])
 logger = logging.getLogger(__name__)
@@ -56,10 +62,14 @@ async def discover_businesses(request: Request, category: Optional[str] = None,
     
     query = {"type": ProfileType.BUSINESS}
     if category:
-        query["category"] = {"$regex": category, "$options": "i"}
+        # Categories are stored canonical (see BUSINESS_CATEGORIES) - equality on
+        # idx_profiles_type_category_verified_created
+        query["category"] = normalize_category(category)
+        if query["category"] is None:
+            return {"businesses": []}
     
     # Get businesses, prioritize verified
-    cursor = profiles_coll.find(query, {"_id": 0}).sort([
+    cursor = profiles_coll.find(query, PROFILE_PROJECTION).sort([
         ("verified", -1),
         ("created_at", -1)
     ]).limit(limit)
@@ -84,20 +94,7 @@ async def discover_businesses(request: Request, category: Optional[str] = None,
 @router.get("/categories")
 async def get_business_categories():
     """Get list of business categories"""
-    return {
-        "categories": [
-            "Retail & Shopping",
-            "Food & Dining",
-            "Services",
-            "Health & Wellness",
-            "Entertainment",
-            "Travel & Transport",
-            "Utilities & Bills",
-            "Education",
-            "Technology",
-            "Other"
-        ]
-    }
+    return {"categories": BUSINESS_CATEGORIES}
 
 
 @router.get("/paid")
@@ -145,7 +142,7 @@ async def get_businesses_paid(request: Request):
     
     # Get business profiles
     businesses = []
-    cursor = profiles_coll.find({"profile_id": {"$in": paid_biz_ids}}, {"_id": 0})
+    cursor = profiles_coll.find({"profile_id": {"$in": paid_biz_ids}}, PROFILE_PROJECTION)
     async for b in cursor:
         businesses.append({
             "profile_id": b.get("profile_id"),
@@ -171,7 +168,7 @@ async def get_business_profile(request: Request, profile_id: str):
     profile = await profiles_coll.find_one({
         "profile_id": profile_id,
         "type": ProfileType.BUSINESS
-    }, {"_id": 0})
+    }, PROFILE_PROJECTION)
     
     if not profile:
         raise HTTPException(status_code=404, detail="Business not found")
@@ -219,13 +216,9 @@ async def start_business_chat(request: Request, business_profile_id: str):
     user_profile = await get_or_create_personal_profile(db, user_id)
     user_profile_id = user_profile["profile_id"]
     
-    # Check for existing conversation
-    existing = await conversations.find_one({
-        "$or": [
-            {"profile1_id": user_profile_id, "profile2_id": business_profile_id},
-            {"profile1_id": business_profile_id, "profile2_id": user_profile_id}
-        ]
-    })
+    # Check for existing conversation (keyed by profile ids, not user ids)
+    key = pair_key(user_profile_id, business_profile_id)
+    existing = await conversations.find_one({"pair_key": key})
     
     if existing:
         return {
@@ -244,8 +237,19 @@ async def start_business_chat(request: Request, business_profile_id: str):
     now = utc_now()
     conversation_id = f"conv_{uuid.uuid4().hex[:12]}"
     
+    welcome_message = {
+        "message_id": f"msg_{uuid.uuid4().hex[:12]}",
+        "conversation_id": conversation_id,
+        "sender_profile_id": business_profile_id,
+        "sender_user_id": "system",
+        "type": "system",
+        "text": f"Welcome to {business.get('business_name')}! How can we help you?",
+        "created_at": now
+    }
+    
     conversation = {
         "conversation_id": conversation_id,
+        "pair_key": key,
         "profile1_id": user_profile_id,
         "profile2_id": business_profile_id,
         "profile1_type": "personal",
@@ -254,23 +258,20 @@ async def start_business_chat(request: Request, business_profile_id: str):
         "user1_id": user_id,
         "user2_id": business.get("user_id"),
         "created_at": now,
-        "last_message_at": now
+        "last_message_at": now,
+        "last_message": last_message_summary(welcome_message)
     }
     
-    await conversations.insert_one(conversation)
-    
-    # Create welcome message
-    await messages.insert_one({
-        "message_id": f"msg_{uuid.uuid4().hex[:12]}",
-        "conversation_id": conversation_id,
-        "sender_profile_id": business_profile_id,
-        "sender_user_id": "system",
-        "type": "system",
-        "text": f"Welcome to {business.get('business_name')}! How can we help you?",
-        "created_at": now
-    })
-    
-    logger.info(f"Business conversation created: {conversation_id}")
+    try:
+        await conversations.insert_one(conversation)
+    except DuplicateKeyError:
+        # Concurrent request created it first
+        existing = await conversations.find_one({"pair_key": key}, {"conversation_id": 1})
+        conversation_id = existing["conversation_id"]
+    else:
+        # Create welcome message
+        await messages.insert_one(welcome_message)
+        logger.info(f"Business conversation created: {conversation_id}")
     
     return {
         "conversation_id": conversation_id,
@@ -298,7 +299,6 @@ async def pay_business(request: Request, background_tasks: BackgroundTasks, data
     db = get_database()
     profiles_coll = db.profiles
     wallets = db.wallets
-    ledger = db.ledger
     conversations = db.conversations
     messages = db.messages
     
@@ -319,7 +319,7 @@ async def pay_business(request: Request, background_tasks: BackgroundTasks, data
     # Check sender wallet
     sender_wallet = await wallets.find_one({"user_id": user_id})
     if not sender_wallet:
-        sender_wallet = {"user_id": user_id, "usd_balance": 0.0, "php_balance": 0.0}
+        sender_wallet = {"user_id": user_id, **wallet_balances()}
         await wallets.insert_one(sender_wallet)
     
     if sender_wallet.get("usd_balance", 0) < data.amount_usd:
@@ -328,7 +328,7 @@ async def pay_business(request: Request, background_tasks: BackgroundTasks, data
     # Get or create business wallet
     biz_wallet = await wallets.find_one({"user_id": business_user_id})
     if not biz_wallet:
-        biz_wallet = {"user_id": business_user_id, "usd_balance": 0.0, "php_balance": 0.0}
+        biz_wallet = {"user_id": business_user_id, **wallet_balances()}
         await wallets.insert_one(biz_wallet)
     
     now = utc_now()
@@ -337,15 +337,16 @@ async def pay_business(request: Request, background_tasks: BackgroundTasks, data
     # Execute transfer
     await wallets.update_one(
         {"user_id": user_id},
-        {"$inc": {"usd_balance": -data.amount_usd}}
+        {"$inc": balance_inc("USD", -data.amount_usd)}
     )
     await wallets.update_one(
         {"user_id": business_user_id},
-        {"$inc": {"usd_balance": data.amount_usd}}
+        {"$inc": balance_inc("USD", data.amount_usd)}
     )
+    await invalidate_wallet(user_id, business_user_id)
     
     # Create ledger entries with profile info
-    await ledger.insert_one({
+    payment_out = {
         "tx_id": tx_id,
         "user_id": user_id,
         "from_profile_id": user_profile_id,
@@ -353,13 +354,13 @@ async def pay_business(request: Request, background_tasks: BackgroundTasks, data
         "to_profile_type": "business",
         "type": "business_payment_out",
         "currency": "USD",
-        "amount": -data.amount_usd,
+        **entry_amount(-data.amount_usd, "USD"),
         "counterparty_user_id": business_user_id,
         "note": data.note,
         "status": "completed",
         "created_at": now
-    })
-    await ledger.insert_one({
+    }
+    payment_in = {
         "tx_id": tx_id,
         "user_id": business_user_id,
         "from_profile_id": user_profile_id,
@@ -367,25 +368,23 @@ async def pay_business(request: Request, background_tasks: BackgroundTasks, data
         "to_profile_type": "business",
         "type": "business_payment_in",
         "currency": "USD",
-        "amount": data.amount_usd,
+        **entry_amount(data.amount_usd, "USD"),
         "counterparty_user_id": user_id,
         "note": data.note,
         "status": "completed",
         "created_at": now
-    })
+    }
+    await insert_ledger_entries(db, [payment_out, payment_in])
     
     # Get or create conversation with business
-    conversation = await conversations.find_one({
-        "$or": [
-            {"profile1_id": user_profile_id, "profile2_id": data.business_profile_id},
-            {"profile1_id": data.business_profile_id, "profile2_id": user_profile_id}
-        ]
-    })
+    key = pair_key(user_profile_id, data.business_profile_id)
+    conversation = await conversations.find_one({"pair_key": key}, {"conversation_id": 1})
     
     if not conversation:
         conversation_id = f"conv_{uuid.uuid4().hex[:12]}"
         conversation = {
             "conversation_id": conversation_id,
+            "pair_key": key,
             "profile1_id": user_profile_id,
             "profile2_id": data.business_profile_id,
             "profile1_type": "personal",
@@ -395,13 +394,18 @@ async def pay_business(request: Request, background_tasks: BackgroundTasks, data
             "created_at": now,
             "last_message_at": now
         }
-        await conversations.insert_one(conversation)
+        try:
+            await conversations.insert_one(conversation)
+        except DuplicateKeyError:
+            # Concurrent chat/payment created it first - the payment is already booked
+            conversation = await conversations.find_one({"pair_key": key}, {"conversation_id": 1})
+            conversation_id = conversation["conversation_id"]
     else:
         conversation_id = conversation["conversation_id"]
     
     # Create payment message bubble
     message_id = f"msg_{uuid.uuid4().hex[:12]}"
-    await messages.insert_one({
+    payment_message = {
         "message_id": message_id,
         "conversation_id": conversation_id,
         "sender_profile_id": user_profile_id,
@@ -415,18 +419,17 @@ async def pay_business(request: Request, background_tasks: BackgroundTasks, data
             "to_business": business.get("business_name")
         },
         "created_at": now
-    })
+    }
+    await messages.insert_one(payment_message)
     
     # Update conversation
-    await conversations.update_one(
-        {"conversation_id": conversation_id},
-        {"$set": {"last_message_at": now}}
-    )
+    await set_last_message(db, payment_message, business_user_id)
+    await publish_message(payment_message, business_user_id)
     
     logger.info(f"Business payment: {tx_id} from {user_id} to {data.business_profile_id} for ${data.amount_usd}")
     
     # Get updated balance
-    updated_wallet = await wallets.find_one({"user_id": user_id}, {"_id": 0, "usd_balance": 1})
+    updated_wallet = await get_cached_wallet(db, user_id)
     
     return {
         "success": True,
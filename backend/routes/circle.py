@@ -12,6 +12,7 @@ import logging
 
 from database.connection import get_database
 from utils.circle_client import circle_client
+from utils.wallet_cache import get_cached_wallet, invalidate_wallet
 from routes.auth import decode_jwt_token
 
 router = APIRouter(prefix="/api/circle", tags=["circle"])
@@ -151,6 +152,7 @@ async def create_circle_wallet(
             },
             upsert=True
         )
+        await invalidate_wallet(user_id)
         
         logger.info(f"[CIRCLE] Created wallet for user {user_id}: {wallet_data['wallet_id']}")
         
@@ -219,6 +221,7 @@ async def mint_usdc(
             },
             upsert=True
         )
+        await invalidate_wallet(user_id)
         wallet_doc = await wallets.find_one({"user_id": user_id})
     
     circle_wallet = wallet_doc.get("circle_wallet", {})
@@ -249,6 +252,7 @@ async def mint_usdc(
             },
             return_document=True
         )
+        await invalidate_wallet(user_id)
         
         # Record transaction
         await transactions.insert_one({
@@ -294,7 +298,7 @@ async def get_circle_balance(
     user_id = user["user_id"]
     
     db = get_database()
-    wallet = await db.wallets.find_one({"user_id": user_id})
+    wallet = await get_cached_wallet(db, user_id)
     
     if not wallet:
         return BalanceResponse(
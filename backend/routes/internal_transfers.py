@@ -3,14 +3,23 @@ PBX Internal Transfers - Closed-loop PBX-to-PBX transfers
 User lookup and instant internal transfers between PBX users
 """
 from fastapi import APIRouter, HTTPException, Request, BackgroundTasks
+from fastapi.responses import StreamingResponse
 from pydantic import BaseModel, Field
-from typing import Optional, List
+from typing import Optional, List, Dict
 from datetime import datetime, timezone
+import asyncio
+import json
 import logging
 import os
+import uuid
 
 from database.connection import get_database
-from services.notifications import send_transfer_notifications
+from routes.social import MessageType, pair_key, set_last_messages, publish_message
+from services.notifications import notify_pbx_to_pbx_recipient
+from utils.identifiers import identifier_key, resolve_user, user_identifiers
+from utils.ledger import get_idempotency_key, create_transfer_atomic, create_batch_transfer_atomic
+from utils.money import wallet_balances
+from utils.wallet_cache import get_cached_wallet
 
 router = APIRouter(prefix="/api/internal", tags=["internal"])
 logger = logging.getLogger(__name__)
@@ -55,6 +64,8 @@ class UserLookupRequest(BaseModel):
 # Transfer limits
 MAX_TRANSFER_PER_TXN = 5000.0  # $5,000 per transaction
 DAILY_TRANSFER_LIMIT = 25000.0  # $25,000 per day per sender
+MAX_BATCH_ITEMS = 2000  # payouts per batch request
+MAX_BATCH_TOTAL = 250000.0  # $250,000 per batch (the total also counts against DAILY_TRANSFER_LIMIT)
 
 
 class InternalTransferRequest(BaseModel):
@@ -63,6 +74,19 @@ class InternalTransferRequest(BaseModel):
     note: Optional[str] = Field(None, max_length=200)
 
 
+class BatchTransferItem(BaseModel):
+    recipient_user_id: Optional[str] = Field(None, description="Recipient PBX user ID")
+    recipient_identifier: Optional[str] = Field(None, description="Recipient email or phone (if no user ID)")
+    amount_usd: float = Field(..., description="Amount in USD")
+    note: Optional[str] = Field(None, max_length=200)
+    idempotency_key: Optional[str] = Field(None, max_length=200)
+
+
+class BatchTransferRequest(BaseModel):
+    items: List[BatchTransferItem] = Field(..., min_length=1, max_length=MAX_BATCH_ITEMS)
+    note: Optional[str] = Field(None, max_length=200, description="Default note for items without one")
+
+
 def get_user_id_from_headers(request: Request) -> str:
     """Extract user ID from session token"""
     token = request.headers.get("X-Session-Token", "")
@@ -73,6 +97,14 @@ def utc_now():
     return datetime.now(timezone.utc)
 
 
+MOCK_USERS_BY_IDENTIFIER = {key: u for u in MOCK_USERS for key in user_identifiers(u)}
+
+
+def find_mock_user(identifier: str) -> Optional[dict]:
+    """Match an email/phone against the demo directory"""
+    return MOCK_USERS_BY_IDENTIFIER.get(identifier_key(identifier))
+
+
 async def get_or_create_wallet(db, user_id: str) -> dict:
     """Get existing wallet or create new one with default balances"""
     wallets = db.wallets
@@ -83,8 +115,7 @@ async def get_or_create_wallet(db, user_id: str) -> dict:
         now = utc_now()
         wallet = {
             "user_id": user_id,
-            "usd_balance": DEFAULT_WALLET["usd_balance"],
-            "php_balance": DEFAULT_WALLET["php_balance"],
+            **wallet_balances(DEFAULT_WALLET["usd_balance"], DEFAULT_WALLET["php_balance"]),
             "created_at": now,
             "updated_at": now
         }
@@ -104,29 +135,17 @@ async def lookup_pbx_user(request: Request, data: UserLookupRequest):
     if not user_id:
         raise HTTPException(status_code=401, detail="No session token provided")
     
-    identifier = data.identifier.lower().strip()
+    identifier = data.identifier
     
     try:
         db = get_database()
-        users = db.users
         
-        # Search by email or phone (case-insensitive for email)
-        user = await users.find_one(
-            {
-                "$or": [
-                    {"email": identifier},
-                    {"phone": identifier}
-                ]
-            },
-            {"_id": 0, "user_id": 1, "email": 1, "phone": 1, "full_name": 1, "role": 1}
-        )
+        # Exact match on the canonical email / E.164 phone (cached)
+        user = await resolve_user(db, identifier)
         
         if not user:
             # Check mock users for demo
-            mock_user = next(
-                (u for u in MOCK_USERS if u["email"].lower() == identifier or u.get("phone") == identifier),
-                None
-            )
+            mock_user = find_mock_user(identifier)
             if mock_user:
                 return {
                     "found": True,
@@ -180,7 +199,8 @@ async def create_internal_transfer(request: Request, background_tasks: Backgroun
     - No fees
     - Max $5,000 per transaction
     - Max $25,000 per day per sender
-    - Creates ledger entries for both sender and recipient
+    - Atomic double-entry ledger write (ledger_tx header + 2 entries)
+    - Idempotency key support (header: Idempotency-Key)
     - Sends email + SMS notifications to recipient
     """
     sender_id = get_user_id_from_headers(request)
@@ -197,62 +217,19 @@ async def create_internal_transfer(request: Request, background_tasks: Backgroun
             detail=f"Transfer exceeds current PBX limits. Maximum ${MAX_TRANSFER_PER_TXN:,.0f} per transaction."
         )
     
-    identifier = data.recipient_identifier.lower().strip()
+    identifier = data.recipient_identifier
+    idempotency_key = get_idempotency_key(request)
     
     try:
         db = get_database()
         users = db.users
-        wallets = db.wallets
-        ledger = db.ledger
-        
-        # Check daily transfer limit
-        now = utc_now()
-        start_of_day = now.replace(hour=0, minute=0, second=0, microsecond=0)
-        
-        daily_total_cursor = ledger.aggregate([
-            {
-                "$match": {
-                    "user_id": sender_id,
-                    "type": "internal_transfer_out",
-                    "created_at": {"$gte": start_of_day}
-                }
-            },
-            {
-                "$group": {
-                    "_id": None,
-                    "total": {"$sum": {"$abs": "$amount"}}
-                }
-            }
-        ])
-        daily_total_result = await daily_total_cursor.to_list(1)
-        daily_total = daily_total_result[0]["total"] if daily_total_result else 0
-        
-        if daily_total + data.amount_usd > DAILY_TRANSFER_LIMIT:
-            remaining = DAILY_TRANSFER_LIMIT - daily_total
-            raise HTTPException(
-                status_code=400,
-                detail=f"Transfer exceeds daily PBX limit. You have ${remaining:,.2f} remaining today. Daily limit: ${DAILY_TRANSFER_LIMIT:,.0f}."
-            )
         
         # Find recipient
-        recipient = await users.find_one(
-            {
-                "$or": [
-                    {"email": identifier},
-                    {"phone": identifier}
-                ]
-            },
-            {"_id": 0}
-        )
+        recipient = await resolve_user(db, identifier)
         
         # Check mock users if not found
         if not recipient:
-            mock_user = next(
-                (u for u in MOCK_USERS if u["email"].lower() == identifier or u.get("phone") == identifier),
-                None
-            )
-            if mock_user:
-                recipient = mock_user
+            recipient = find_mock_user(identifier)
         
         if not recipient:
             raise HTTPException(status_code=404, detail="Recipient not found on PBX")
@@ -263,20 +240,6 @@ async def create_internal_transfer(request: Request, background_tasks: Backgroun
         if recipient_id == sender_id:
             raise HTTPException(status_code=400, detail="Cannot send to yourself")
         
-        # Get sender wallet
-        sender_wallet = await get_or_create_wallet(db, sender_id)
-        
-        # Check sufficient balance
-        if sender_wallet["usd_balance"] < data.amount_usd:
-            raise HTTPException(status_code=400, detail="Insufficient USD balance")
-        
-        # Generate transaction IDs
-        now = utc_now()
-        timestamp = int(now.timestamp())
-        transfer_id = f"int_{timestamp}_{sender_id[:8]}_{recipient_id[:8]}"
-        sender_txn_id = f"out_{timestamp}"
-        recipient_txn_id = f"in_{timestamp}"
-        
         # Get sender info for recipient's ledger entry
         sender_info = await users.find_one({"user_id": sender_id}, {"_id": 0, "email": 1, "full_name": 1})
         sender_display = sender_info.get("full_name") if sender_info else None
@@ -285,110 +248,76 @@ async def create_internal_transfer(request: Request, background_tasks: Backgroun
         recipient_display = recipient.get("full_name") or recipient.get("email", "").split("@")[0]
         recipient_email = recipient.get("email")
         
-        # === ATOMIC OPERATION START ===
-        # In production, use MongoDB transactions for true atomicity
-        # For now, use safe sequential operations with idempotency
-        
-        # 1. Debit sender wallet
-        sender_result = await wallets.update_one(
-            {"user_id": sender_id, "usd_balance": {"$gte": data.amount_usd}},
-            {
-                "$inc": {"usd_balance": -data.amount_usd},
-                "$set": {"updated_at": now}
-            }
-        )
-        
-        if sender_result.modified_count == 0:
-            raise HTTPException(status_code=400, detail="Insufficient balance or concurrent update")
+        entry_metadata = {
+            "transfer_type": "pbx_internal",
+            "fee": 0,
+            "instant": True
+        }
         
-        # 2. Credit recipient wallet (create if doesn't exist)
-        await wallets.update_one(
-            {"user_id": recipient_id},
-            {
-                "$inc": {"usd_balance": data.amount_usd},
-                "$set": {"updated_at": now},
-                "$setOnInsert": {
-                    "php_balance": DEFAULT_WALLET["php_balance"],
-                    "created_at": now
+        # Balance check, daily limit and idempotency are enforced inside the transaction
+        ledger_tx_result, is_duplicate = await create_transfer_atomic(
+            db=db,
+            from_user_id=sender_id,
+            to_user_id=recipient_id,
+            amount=data.amount_usd,
+            currency="USD",
+            note=data.note,
+            idempotency_key=idempotency_key,
+            transfer_type="pbx_transfer",
+            metadata={"source": "internal_transfer"},
+            daily_limit=DAILY_TRANSFER_LIMIT,
+            entry_fields={
+                "debit": {
+                    "category": "PBX Transfer",
+                    "description": f"Sent to {recipient_display}",
+                    "counterparty": {
+                        "user_id": recipient_id,
+                        "email": recipient_email,
+                        "display_name": recipient_display
+                    },
+                    "metadata": entry_metadata
+                },
+                "credit": {
+                    "category": "PBX Transfer",
+                    "description": f"Received from {sender_display or sender_email or 'PBX User'}",
+                    "counterparty": {
+                        "user_id": sender_id,
+                        "email": sender_email,
+                        "display_name": sender_display
+                    },
+                    "metadata": entry_metadata
                 }
-            },
-            upsert=True
+            }
         )
         
-        # 3. Create sender ledger entry
-        await ledger.insert_one({
-            "txn_id": sender_txn_id,
-            "transfer_id": transfer_id,
-            "user_id": sender_id,
-            "type": "internal_transfer_out",
-            "category": "PBX Transfer",
-            "description": f"Sent to {recipient_display}",
-            "currency": "USD",
-            "amount": -data.amount_usd,
-            "status": "completed",
-            "counterparty": {
-                "user_id": recipient_id,
-                "email": recipient_email,
-                "display_name": recipient_display
-            },
-            "note": data.note,
-            "metadata": {
-                "transfer_type": "pbx_internal",
-                "fee": 0,
-                "instant": True
-            },
-            "created_at": now
-        })
-        
-        # 4. Create recipient ledger entry
-        await ledger.insert_one({
-            "txn_id": recipient_txn_id,
-            "transfer_id": transfer_id,
-            "user_id": recipient_id,
-            "type": "internal_transfer_in",
-            "category": "PBX Transfer",
-            "description": f"Received from {sender_display or sender_email or 'PBX User'}",
-            "currency": "USD",
-            "amount": data.amount_usd,
-            "status": "completed",
-            "counterparty": {
-                "user_id": sender_id,
-                "email": sender_email,
-                "display_name": sender_display
-            },
-            "note": data.note,
-            "metadata": {
-                "transfer_type": "pbx_internal",
-                "fee": 0,
-                "instant": True
-            },
-            "created_at": now
-        })
-        
-        # === ATOMIC OPERATION END ===
-        
-        logger.info(f"Internal transfer completed: {sender_id} -> {recipient_id}, ${data.amount_usd}")
+        tx_id = ledger_tx_result["tx_id"]
+        created_at = ledger_tx_result.get("created_at") or utc_now()
         
-        # Send notifications to recipient (email + SMS) in background
-        # This doesn't block the transfer response
-        recipient_phone = recipient.get("phone")
-        background_tasks.add_task(
-            send_transfer_notifications,
-            recipient_email=recipient_email,
-            recipient_phone=recipient_phone,
-            recipient_user_id=recipient_id,
-            sender_name=sender_display or sender_email or "PBX User",
-            amount=data.amount_usd,
-            note=data.note
-        )
+        if is_duplicate:
+            logger.info(f"Idempotent replay: {tx_id} (key: {idempotency_key})")
+        else:
+            logger.info(f"Internal transfer completed: {tx_id} {sender_id} -> {recipient_id}, ${data.amount_usd}")
+            
+            # Send notifications to recipient (email + SMS) in background
+            # This doesn't block the transfer response
+            background_tasks.add_task(
+                notify_pbx_to_pbx_recipient,
+                recipient_email=recipient_email,
+                recipient_phone=recipient.get("phone"),
+                recipient_user_id=recipient_id,
+                sender_name=sender_display or sender_email or "PBX User",
+                amount=data.amount_usd,
+                transfer_id=tx_id,
+                note=data.note
+            )
         
         # Get updated sender balance
-        updated_wallet = await wallets.find_one({"user_id": sender_id}, {"_id": 0, "usd_balance": 1})
+        updated_wallet = await get_cached_wallet(db, sender_id)
         
         return {
             "success": True,
-            "transfer_id": transfer_id,
-            "transaction_id": sender_txn_id,
+            "transfer_id": tx_id,
+            "transaction_id": tx_id,
             "amount": data.amount_usd,
             "currency": "USD",
             "recipient": {
@@ -398,17 +327,327 @@ async def create_internal_transfer(request: Request, background_tasks: Backgroun
             "fee": 0,
             "status": "completed",
             "instant": True,
+            "is_duplicate": is_duplicate,
             "new_balance": updated_wallet.get("usd_balance", 0) if updated_wallet else 0,
-            "created_at": now.isoformat()
+            "created_at": created_at.isoformat() if isinstance(created_at, datetime) else str(created_at)
         }
         
-    except HTTPException:
+    except HTTPException as e:
+        # This endpoint has always returned string details (insufficient balance is structured in the ledger)
+        if isinstance(e.detail, dict) and e.status_code == 400:
+            raise HTTPException(status_code=400, detail=e.detail.get("message", "Transfer failed"))
         raise
     except Exception as e:
         logger.error(f"Error creating internal transfer: {e}")
         raise HTTPException(status_code=500, detail="Transfer failed. Please try again.")
 
 
+# ============================================================
+# BATCH TRANSFERS (payroll-style payouts)
+# ============================================================
+
+def display_name_for(user: dict) -> str:
+    return user.get("full_name") or user.get("email", "").split("@")[0] or "PBX User"
+
+
+async def resolve_batch_recipients(db, data: BatchTransferRequest):
+    """
+    Resolve every recipient with one users query.
+    Returns (recipients by item index, unresolved item indexes).
+    """
+    user_ids = {item.recipient_user_id for item in data.items if item.recipient_user_id}
+    keys = {
+        item.recipient_identifier: identifier_key(item.recipient_identifier)
+        for item in data.items
+        if not item.recipient_user_id and item.recipient_identifier
+    }
+    wanted_keys = {key for key in keys.values() if key}
+    
+    clauses = []
+    if user_ids:
+        clauses.append({"user_id": {"$in": list(user_ids)}})
+    if wanted_keys:
+        clauses.append({"identifiers": {"$in": list(wanted_keys)}})
+    
+    by_user_id = {}
+    by_key = {}
+    if clauses:
+        cursor = db.users.find(
+            {"$or": clauses},
+            {"_id": 0, "user_id": 1, "email": 1, "phone": 1, "full_name": 1}
+        )
+        async for user in cursor:
+            by_user_id[user["user_id"]] = user
+            for key in user_identifiers(user):
+                by_key[key] = user
+    
+    recipients = {}
+    unresolved = []
+    for index, item in enumerate(data.items):
+        if item.recipient_user_id:
+            recipient = by_user_id.get(item.recipient_user_id)
+        elif item.recipient_identifier:
+            recipient = by_key.get(keys[item.recipient_identifier]) or find_mock_user(item.recipient_identifier)
+        else:
+            recipient = None
+        
+        if recipient:
+            recipients[index] = recipient
+        else:
+            unresolved.append(index)
+    return recipients, unresolved
+
+
+async def post_batch_chat_messages(db, sender_id: str, sender_name: str, completed: List[dict], now) -> Dict[str, str]:
+    """
+    Add payment bubbles to existing conversations with each recipient.
+    One find, one insert_many, one bulk_write. Returns message_id by tx_id.
+    """
+    recipient_ids = list({r["to_user_id"] for r in completed})
+    if not recipient_ids:
+        return {}
+    
+    conversation_by_peer = {}
+    cursor = db.conversations.find(
+        {"pair_key": {"$in": [pair_key(sender_id, recipient_id) for recipient_id in recipient_ids]}},
+        {"_id": 0, "conversation_id": 1, "user1_id": 1, "user2_id": 1}
+    )
+    async for conversation in cursor:
+        peer_id = conversation["user2_id"] if conversation["user1_id"] == sender_id else conversation["user1_id"]
+        conversation_by_peer.setdefault(peer_id, conversation["conversation_id"])
+    
+    messages = []
+    recipient_by_message = {}
+    for r in completed:
+        conversation_id = conversation_by_peer.get(r["to_user_id"])
+        if not conversation_id:
+            continue
+        message_id = f"msg_{uuid.uuid4().hex[:12]}"
+        recipient_by_message[message_id] = r["to_user_id"]
+        messages.append({
+            "message_id": message_id,
+            "conversation_id": conversation_id,
+            "sender_user_id": sender_id,
+            "type": MessageType.PAYMENT,
+            "text": r.get("note"),
+            "payment": {
+                "tx_id": r["tx_id"],
+                "amount_usd": r["amount"],
+                "status": "completed",
+                "sender_name": sender_name
+            },
+            "created_at": now
+        })
+    
+    if not messages:
+        return {}
+    
+    await db.messages.insert_many(messages, ordered=False)
+    await set_last_messages(db, [(m, recipient_by_message[m["message_id"]]) for m in messages])
+    for m in messages:
+        await publish_message(m, recipient_by_message[m["message_id"]])
+    return {m["payment"]["tx_id"]: m["message_id"] for m in messages}
+
+
+async def notify_batch_recipients(sender_name: str, notifications: List[dict]):
+    """Send recipient notifications one after another (runs as a single background task)"""
+    for notification in notifications:
+        try:
+            await notify_pbx_to_pbx_recipient(sender_name=sender_name, **notification)
+        except Exception as e:
+            logger.error(f"Batch notification failed for {notification.get('transfer_id')}: {e}")
+
+
+async def run_batch_transfer(
+    db,
+    background_tasks: BackgroundTasks,
+    sender_id: str,
+    data: BatchTransferRequest,
+    batch_key: Optional[str],
+    on_progress=None
+) -> dict:
+    """Resolve recipients, execute the ledger batch, then post chat bubbles and notifications"""
+    recipients, unresolved = await resolve_batch_recipients(db, data)
+    
+    ledger_items = []
+    for index, recipient in recipients.items():
+        item = data.items[index]
+        idempotency_key = item.idempotency_key or (f"{batch_key}:{index}" if batch_key else None)
+        ledger_items.append({
+            "index": index,
+            "to_user_id": recipient["user_id"],
+            "amount": item.amount_usd,
+            "note": item.note or data.note,
+            "idempotency_key": idempotency_key
+        })
+    
+    total = sum(item["amount"] for item in ledger_items if item["amount"] > 0)
+    if total > MAX_BATCH_TOTAL:
+        raise HTTPException(
+            status_code=400,
+            detail=f"Batch exceeds current PBX limits. Maximum ${MAX_BATCH_TOTAL:,.0f} per batch."
+        )
+    
+    batch = await create_batch_transfer_atomic(
+        db,
+        from_user_id=sender_id,
+        items=ledger_items,
+        currency="USD",
+        transfer_type="pbx_transfer",
+        metadata={"source": "batch"},
+        on_progress=on_progress,
+        daily_limit=DAILY_TRANSFER_LIMIT
+    )
+    
+    now = utc_now()
+    sender_info = await db.users.find_one({"user_id": sender_id}, {"_id": 0, "email": 1, "full_name": 1})
+    sender_name = (sender_info.get("full_name") or sender_info.get("email")) if sender_info else None
+    sender_name = sender_name or "PBX User"
+    
+    notes = {item["index"]: item["note"] for item in ledger_items}
+    completed = [dict(r, note=notes.get(r["index"])) for r in batch["results"] if r["status"] == "completed"]
+    
+    message_ids = {}
+    try:
+        message_ids = await post_batch_chat_messages(db, sender_id, sender_name, completed, now)
+    except Exception as e:
+        # The money has moved - a missing chat bubble must not fail the batch
+        logger.error(f"Batch {batch['batch_id']}: failed to post chat messages: {e}")
+    
+    background_tasks.add_task(
+        notify_batch_recipients,
+        sender_name,
+        [
+            {
+                "recipient_email": recipients[r["index"]].get("email"),
+                "recipient_phone": recipients[r["index"]].get("phone"),
+                "recipient_user_id": r["to_user_id"],
+                "amount": r["amount"],
+                "transfer_id": r["tx_id"],
+                "note": r["note"]
+            }
+            for r in completed
+        ]
+    )
+    
+    results_by_index = {r["index"]: r for r in batch["results"]}
+    results = []
+    for index, item in enumerate(data.items):
+        r = results_by_index.get(index)
+        if r is None:
+            results.append({
+                "index": index,
+                "status": "failed",
+                "recipient_user_id": item.recipient_user_id,
+                "amount": item.amount_usd,
+                "tx_id": None,
+                "error": "Recipient not found on PBX"
+            })
+            continue
+        results.append({
+            "index": index,
+            "status": r["status"],
+            "recipient_user_id": r["to_user_id"],
+            "recipient_name": display_name_for(recipients[index]),
+            "amount": r["amount"],
+            "tx_id": r["tx_id"],
+            "message_id": message_ids.get(r["tx_id"]),
+            "error": r["error"]
+        })
+    
+    updated_wallet = await get_cached_wallet(db, sender_id)
+    
+    logger.info(
+        f"Batch transfer {batch['batch_id']}: {sender_id} paid {len(completed)}/{len(data.items)} items, "
+        f"${batch['total_debited']}"
+    )
+    
+    return {
+        "success": True,
+        "batch_id": batch["batch_id"],
+        "currency": "USD",
+        "total_items": len(data.items),
+        "completed": sum(1 for r in results if r["status"] == "completed"),
+        "duplicates": sum(1 for r in results if r["status"] == "duplicate"),
+        "failed": sum(1 for r in results if r["status"] == "failed"),
+        "unknown": sum(1 for r in results if r["status"] == "unknown"),
+        "total_debited": batch["total_debited"],
+        "new_balance": updated_wallet.get("usd_balance", 0) if updated_wallet else 0,
+        "results": results,
+        "created_at": now.isoformat()
+    }
+
+
+@router.post("/transfers/batch")
+async def create_batch_transfer(
+    request: Request,
+    background_tasks: BackgroundTasks,
+    data: BatchTransferRequest,
+    stream: bool = False
+):
+    """
+    Pay many PBX users in one request (payroll-style payouts).
+    
+    - USD only, up to 2,000 items, max $5,000 per item, max $250,000 per batch
+    - Sender is debited once for the batch total; the batch commits as a whole
+    - The batch total counts against the sender's daily PBX limit, shared with
+      single transfers; a batch that does not fit is rejected (400), nothing is paid
+    - Per-item idempotency_key; with an Idempotency-Key header, items without
+      their own key use "<header>:<index>" so a whole batch can be safely retried
+    - Payment bubbles are posted to existing conversations with each recipient
+    - Returns per-item results (completed / duplicate / failed, or unknown if
+      the item was paid but its ledger entries could not be written)
+    - ?stream=true responds with NDJSON: progress events, then the final result
+    """
+    sender_id = get_user_id_from_headers(request)
+    if not sender_id:
+        raise HTTPException(status_code=401, detail="No session token provided")
+    
+    batch_key = get_idempotency_key(request)
+    db = get_database()
+    
+    if not stream:
+        try:
+            return await run_batch_transfer(db, background_tasks, sender_id, data, batch_key)
+        except HTTPException:
+            raise
+        except Exception as e:
+            logger.error(f"Error creating batch transfer: {e}")
+            raise HTTPException(status_code=500, detail="Batch transfer failed. Please try again.")
+    
+    async def event_stream():
+        queue: asyncio.Queue = asyncio.Queue()
+        
+        async def on_progress(processed: int, total: int):
+            await queue.put({"event": "progress", "processed": processed, "total": total})
+        
+        async def run():
+            try:
+                result = await run_batch_transfer(db, background_tasks, sender_id, data, batch_key, on_progress)
+                await queue.put({"event": "result", **result})
+            except HTTPException as e:
+                await queue.put({"event": "error", "status_code": e.status_code, "detail": e.detail})
+            except Exception as e:
+                logger.error(f"Error creating batch transfer: {e}")
+                await queue.put({"event": "error", "status_code": 500, "detail": "Batch transfer failed. Please try again."})
+            finally:
+                await queue.put(None)
+        
+        # The batch runs to completion even if the client disconnects mid-stream
+        task = asyncio.create_task(run())
+        try:
+            yield json.dumps({"event": "accepted", "total_items": len(data.items)}) + "\n"
+            while True:
+                event = await queue.get()
+                if event is None:
+                    break
+                yield json.dumps(event, default=str) + "\n"
+        finally:
+            await task
+    
+    return StreamingResponse(event_stream(), media_type="application/x-ndjson")
+
+
 @router.get("/incoming")
 async def get_incoming_transfers(request: Request, limit: int = 10):
     """Get recent incoming PBX-to-PBX transfers for the current user."""
@@ -429,8 +668,8 @@ async def get_incoming_transfers(request: Request, limit: int = 10):
         return {
             "transfers": [
                 {
-                    "id": t.get("txn_id"),
-                    "transfer_id": t.get("transfer_id"),
+                    "id": t.get("txn_id") or t.get("tx_id"),
+                    "transfer_id": t.get("transfer_id") or t.get("tx_id"),
                     "amount": t.get("amount"),
                     "currency": t.get("currency"),
                     "from": t.get("counterparty", {}).get("display_name") or t.get("counterparty", {}).get("email") or "PBX User",
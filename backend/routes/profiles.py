@@ -12,10 +12,15 @@ import uuid
 import re
 
 from database.connection import get_database
+from utils.search import PROFILE_PROJECTION, handle_rank, normalize, profile_search_tokens, token_filter
+from utils.velocity import METRIC_BUSINESS_PROFILES, VelocityLimitExceeded, check_and_reserve, release
 
 router = APIRouter(prefix="/api/profiles", tags=["profiles"])
 logger = logging.getLogger(__name__)
 
+MAX_BUSINESS_PROFILES = 5  # per user
+SEARCH_LIMIT = 15
+
 
 def utc_now():
     return datetime.now(timezone.utc)
@@ -32,6 +37,38 @@ class ProfileType(str, Enum):
     BUSINESS = "business"
 
 
+# Business categories - stored in this exact spelling so discovery filters by equality
+BUSINESS_CATEGORIES = [
+    "Retail & Shopping",
+    "Food & Dining",
+    "Services",
+    "Health & Wellness",
+    "Entertainment",
+    "Travel & Transport",
+    "Utilities & Bills",
+    "Education",
+    "Technology",
+    "Other",
+]
+_CATEGORY_BY_KEY = {c.casefold(): c for c in BUSINESS_CATEGORIES}
+
+
+def normalize_category(value: Optional[str]) -> Optional[str]:
+    """Canonical category for any case / whitespace variant, None if unknown"""
+    if not value:
+        return None
+    return _CATEGORY_BY_KEY.get(" ".join(value.split()).casefold())
+
+
+def validate_category(v: Optional[str]) -> Optional[str]:
+    if v is None or not v.strip():
+        return None
+    category = normalize_category(v)
+    if category is None:
+        raise ValueError(f"Category must be one of: {', '.join(BUSINESS_CATEGORIES)}")
+    return category
+
+
 # ============================================================
 # REQUEST/RESPONSE MODELS
 # ============================================================
@@ -67,6 +104,11 @@ class CreateBusinessProfileRequest(BaseModel):
         if not re.match(r'^[a-z0-9_]{3,20}$', v):
             raise ValueError('Handle must be 3-20 chars, lowercase letters, numbers, underscores only')
         return v
+    
+    @field_validator('category')
+    @classmethod
+    def validate_category(cls, v):
+        return validate_category(v)
 
 
 class UpdateProfileRequest(BaseModel):
@@ -86,6 +128,11 @@ class UpdateProfileRequest(BaseModel):
             if not re.match(r'^[a-z0-9_]{3,20}$', v):
                 raise ValueError('Handle must be 3-20 chars, lowercase letters, numbers, underscores only')
         return v
+    
+    @field_validator('category')
+    @classmethod
+    def validate_category(cls, v):
+        return validate_category(v)
 
 
 # ============================================================
@@ -105,7 +152,7 @@ async def get_my_profiles(request: Request):
     profiles_coll = db.profiles
     
     # Get all profiles for this user
-    cursor = profiles_coll.find({"user_id": user_id}, {"_id": 0})
+    cursor = profiles_coll.find({"user_id": user_id}, PROFILE_PROJECTION)
     profiles = await cursor.to_list(10)
     
     # If no profiles exist, create default personal profile
@@ -141,7 +188,7 @@ async def get_active_profile(request: Request):
     if active_profile_id:
         profile = await profiles_coll.find_one(
             {"profile_id": active_profile_id, "user_id": user_id},
-            {"_id": 0}
+            PROFILE_PROJECTION
         )
         if profile:
             return {"profile": profile}
@@ -149,7 +196,7 @@ async def get_active_profile(request: Request):
     # Default to personal profile
     personal = await profiles_coll.find_one(
         {"user_id": user_id, "type": ProfileType.PERSONAL},
-        {"_id": 0}
+        PROFILE_PROJECTION
     )
     
     if not personal:
@@ -224,7 +271,7 @@ async def switch_active_profile(request: Request, profile_id: str):
     # Verify profile belongs to user
     profile = await profiles_coll.find_one(
         {"profile_id": profile_id, "user_id": user_id},
-        {"_id": 0}
+        PROFILE_PROJECTION
     )
     
     if not profile:
@@ -283,6 +330,7 @@ async def create_or_update_personal_profile(request: Request, data: CreatePerson
             update_fields["display_name"] = data.display_name
         if data.avatar_url:
             update_fields["avatar_url"] = data.avatar_url
+        update_fields["search_tokens"] = profile_search_tokens({**existing_personal, **update_fields})
         
         await profiles_coll.update_one(
             {"profile_id": existing_personal["profile_id"]},
@@ -291,7 +339,7 @@ async def create_or_update_personal_profile(request: Request, data: CreatePerson
         
         profile = await profiles_coll.find_one(
             {"profile_id": existing_personal["profile_id"]},
-            {"_id": 0}
+            PROFILE_PROJECTION
         )
     else:
         # Create new personal profile
@@ -306,8 +354,10 @@ async def create_or_update_personal_profile(request: Request, data: CreatePerson
             "created_at": now,
             "updated_at": now
         }
+        profile["search_tokens"] = profile_search_tokens(profile)
         await profiles_coll.insert_one(profile)
         del profile["_id"]
+        del profile["search_tokens"]
     
     logger.info(f"Personal profile created/updated for user {user_id}")
     
@@ -332,13 +382,21 @@ async def create_business_profile(request: Request, data: CreateBusinessProfileR
     if existing:
         raise HTTPException(status_code=409, detail="Business handle already taken")
     
-    # Check max business profiles (limit to 5 per user)
-    biz_count = await profiles_coll.count_documents({
-        "user_id": user_id,
-        "type": ProfileType.BUSINESS
-    })
-    if biz_count >= 5:
-        raise HTTPException(status_code=400, detail="Maximum 5 business profiles allowed")
+    # Reserve a slot against the user's lifetime business-profile counter.
+    # Users who predate the counter are seeded from their existing profiles once.
+    async def count_businesses():
+        return await profiles_coll.count_documents({
+            "user_id": user_id,
+            "type": ProfileType.BUSINESS
+        })
+    
+    try:
+        await check_and_reserve(
+            db, user_id, METRIC_BUSINESS_PROFILES, 1, MAX_BUSINESS_PROFILES,
+            period="total", seed=count_businesses
+        )
+    except VelocityLimitExceeded:
+        raise HTTPException(status_code=400, detail=f"Maximum {MAX_BUSINESS_PROFILES} business profiles allowed")
     
     now = utc_now()
     profile_id = f"biz_{uuid.uuid4().hex[:12]}"
@@ -355,13 +413,18 @@ async def create_business_profile(request: Request, data: CreateBusinessProfileR
         "created_at": now,
         "updated_at": now
     }
+    profile["search_tokens"] = profile_search_tokens(profile)
     
-    await profiles_coll.insert_one(profile)
+    try:
+        await profiles_coll.insert_one(profile)
+    except Exception:
+        await release(db, user_id, METRIC_BUSINESS_PROFILES, 1, period="total")
+        raise
     
     logger.info(f"Business profile {profile_id} created for user {user_id}")
     
     # Return without _id
-    profile_response = await profiles_coll.find_one({"profile_id": profile_id}, {"_id": 0})
+    profile_response = await profiles_coll.find_one({"profile_id": profile_id}, PROFILE_PROJECTION)
     
     return {"success": True, "profile": profile_response}
 
@@ -411,13 +474,14 @@ async def update_profile(request: Request, profile_id: str, data: UpdateProfileR
         update_fields["logo_url"] = data.logo_url
     if data.category is not None and profile["type"] == ProfileType.BUSINESS:
         update_fields["category"] = data.category
+    update_fields["search_tokens"] = profile_search_tokens({**profile, **update_fields})
     
     await profiles_coll.update_one(
         {"profile_id": profile_id},
         {"$set": update_fields}
     )
     
-    updated = await profiles_coll.find_one({"profile_id": profile_id}, {"_id": 0})
+    updated = await profiles_coll.find_one({"profile_id": profile_id}, PROFILE_PROJECTION)
     
     return {"success": True, "profile": updated}
 
@@ -446,7 +510,9 @@ async def delete_business_profile(request: Request, profile_id: str):
     if profile["type"] == ProfileType.PERSONAL:
         raise HTTPException(status_code=400, detail="Cannot delete personal profile")
     
-    await profiles_coll.delete_one({"profile_id": profile_id})
+    result = await profiles_coll.delete_one({"profile_id": profile_id})
+    if result.deleted_count:
+        await release(db, user_id, METRIC_BUSINESS_PROFILES, 1, period="total")
     
     logger.info(f"Business profile {profile_id} deleted by user {user_id}")
     
@@ -457,6 +523,28 @@ async def delete_business_profile(request: Request, profile_id: str):
 # SEARCH & DISCOVERY
 # ============================================================
 
+async def find_profiles(profiles_coll, profile_type: str, q: str) -> list:
+    """
+    Profiles of one type matching a search query via the search_tokens index.
+    An exact @handle match is looked up separately so it always ranks first,
+    then handle-prefix matches, then name matches.
+    """
+    tokens = token_filter(q)
+    if tokens is None:
+        return []
+    
+    profiles = await profiles_coll.find(
+        {"type": profile_type, **tokens}, PROFILE_PROJECTION
+    ).limit(SEARCH_LIMIT).to_list(SEARCH_LIMIT)
+    
+    exact = await profiles_coll.find_one({"handle": normalize(q), "type": profile_type}, PROFILE_PROJECTION)
+    if exact:
+        profiles = [exact] + [p for p in profiles if p["profile_id"] != exact["profile_id"]]
+    
+    profiles.sort(key=lambda p: handle_rank(q, p.get("handle")))
+    return profiles[:SEARCH_LIMIT]
+
+
 @router.get("/search/people")
 async def search_people(request: Request, q: str = ""):
     """
@@ -466,34 +554,21 @@ async def search_people(request: Request, q: str = ""):
     if not q or len(q) < 2:
         return {"profiles": []}
     
-    query = q.lower().strip()
-    
     db = get_database()
     profiles_coll = db.profiles
     users_coll = db.users
     
-    # Search personal profiles
-    profile_filter = {
-        "type": ProfileType.PERSONAL,
-        "$or": [
-            {"handle": {"$regex": query, "$options": "i"}},
-            {"display_name": {"$regex": query, "$options": "i"}},
-        ]
-    }
-    
-    cursor = profiles_coll.find(profile_filter, {"_id": 0}).limit(15)
-    profiles = await cursor.to_list(15)
+    # Search personal profiles (handle, display name)
+    profiles = await find_profiles(profiles_coll, ProfileType.PERSONAL, q)
     
     # Also search users by email/phone and link to profiles
-    user_filter = {
-        "$or": [
-            {"email": {"$regex": query, "$options": "i"}},
-            {"phone": {"$regex": query, "$options": "i"}},
-        ]
-    }
-    
-    user_cursor = users_coll.find(user_filter, {"_id": 0, "user_id": 1, "email": 1, "phone": 1}).limit(15)
-    users = await user_cursor.to_list(15)
+    users = []
+    user_filter = token_filter(q)
+    if user_filter:
+        user_cursor = users_coll.find(
+            user_filter, {"_id": 0, "user_id": 1, "email": 1, "phone": 1}
+        ).limit(SEARCH_LIMIT)
+        users = await user_cursor.to_list(SEARCH_LIMIT)
     
     # Get profiles for these users
     user_ids = [u["user_id"] for u in users]
@@ -501,8 +576,8 @@ async def search_people(request: Request, q: str = ""):
         user_profiles_cursor = profiles_coll.find({
             "user_id": {"$in": user_ids},
             "type": ProfileType.PERSONAL
-        }, {"_id": 0})
-        user_profiles = await user_profiles_cursor.to_list(15)
+        }, PROFILE_PROJECTION)
+        user_profiles = await user_profiles_cursor.to_list(SEARCH_LIMIT)
         
         # Merge user info into profiles
         user_map = {u["user_id"]: u for u in users}
@@ -519,7 +594,7 @@ async def search_people(request: Request, q: str = ""):
     
     # Format response
     results = []
-    for p in profiles[:15]:
+    for p in profiles[:SEARCH_LIMIT]:
         results.append({
             "profile_id": p.get("profile_id"),
             "user_id": p.get("user_id"),
@@ -542,22 +617,8 @@ async def search_businesses(request: Request, q: str = ""):
     if not q or len(q) < 2:
         return {"profiles": []}
     
-    query = q.lower().strip()
-    
     db = get_database()
-    profiles_coll = db.profiles
-    
-    # Search business profiles
-    profile_filter = {
-        "type": ProfileType.BUSINESS,
-        "$or": [
-            {"handle": {"$regex": query, "$options": "i"}},
-            {"business_name": {"$regex": query, "$options": "i"}},
-        ]
-    }
-    
-    cursor = profiles_coll.find(profile_filter, {"_id": 0}).limit(15)
-    profiles = await cursor.to_list(15)
+    profiles = await find_profiles(db.profiles, ProfileType.BUSINESS, q)
     
     # Format response
     results = []
@@ -584,7 +645,7 @@ async def get_profile(request: Request, profile_id: str):
     db = get_database()
     profiles_coll = db.profiles
     
-    profile = await profiles_coll.find_one({"profile_id": profile_id}, {"_id": 0})
+    profile = await profiles_coll.find_one({"profile_id": profile_id}, PROFILE_PROJECTION)
     
     if not profile:
         raise HTTPException(status_code=404, detail="Profile not found")
@@ -636,11 +697,12 @@ async def create_default_personal_profile(db, user_id: str) -> dict:
         "created_at": now,
         "updated_at": now
     }
+    profile["search_tokens"] = profile_search_tokens(profile)
     
     await profiles_coll.insert_one(profile)
     
     # Return without _id
-    return await profiles_coll.find_one({"profile_id": profile_id}, {"_id": 0})
+    return await profiles_coll.find_one({"profile_id": profile_id}, PROFILE_PROJECTION)
 
 
 async def get_or_create_personal_profile(db, user_id: str) -> dict:
@@ -650,7 +712,7 @@ async def get_or_create_personal_profile(db, user_id: str) -> dict:
     profile = await profiles_coll.find_one({
         "user_id": user_id,
         "type": ProfileType.PERSONAL
-    }, {"_id": 0})
+    }, PROFILE_PROJECTION)
     
     if profile:
         return profile
@@ -8,29 +8,33 @@ Database Collections:
 - saved_billers: User's saved biller accounts
 """
 from fastapi import APIRouter, HTTPException, status, Request, Response
+from fastapi.responses import JSONResponse, StreamingResponse
 from pydantic import BaseModel, Field
-from typing import List, Optional, Dict, Any
+from typing import List, Literal, Optional, Dict, Any
 from datetime import datetime, timezone
 import random
 import logging
 import os
-import httpx
 
 from database.connection import get_database
+from services.fx_rates import fx_rate_service
+from services.statement_exports import JOB_COMPLETED, statement_export_service
+from utils.fx_locks import create_fx_lock, convert_with_lock, FxLockError, InsufficientUsdBalance
+from utils.ledger import insert_ledger_entries
+from utils.ledger_summaries import PERIOD_ALL, get_range_totals, get_summary_totals
+from utils.money import balance_inc, entry_amount, wallet_balances
+from utils.statement_export import EXPORT_FORMATS, export_filename, export_query, stream_statement
+from utils.wallet_cache import get_cached_wallet, invalidate_wallet
 
 router = APIRouter(prefix="/api/recipient", tags=["recipient"])
 logger = logging.getLogger(__name__)
 
-# === FX Configuration ===
-OPENEXCHANGERATES_API_KEY = os.environ.get("OPENEXCHANGERATES_API_KEY", "")
-OPENEXCHANGERATES_BASE_URL = "https://openexchangerates.org/api"
-FX_API_TIMEOUT = 10.0  # seconds
-
 # === Constants ===
 PBX_SPREAD_BPS = 50  # 0.50% spread
 BANK_SPREAD_BPS = 250  # 2.5% typical bank spread
 RATE_LOCK_DURATION_SECONDS = 15 * 60  # 15 minutes
 MOCK_FX_RATE = 56.25  # Fallback USD/PHP rate when API unavailable
+STATEMENT_EXPORT_STREAM_MAX_DAYS = int(os.environ.get("STATEMENT_EXPORT_STREAM_MAX_DAYS", "92"))  # longer exports run as a job
 
 # === Static Reference Data ===
 BILLERS = [
@@ -100,12 +104,12 @@ class FxQuoteResponse(BaseModel):
 
 class LockRateRequest(BaseModel):
     amount_usd: float
-    locked_rate: Optional[float] = None
+    locked_rate: Optional[float] = None  # Ignored - locks are priced server-side
 
 
 class ConvertRequest(BaseModel):
     amount_usd: float
-    locked_rate: Optional[float] = None
+    locked_rate: Optional[float] = None  # Ignored - the rate comes from the lock or live FX
     lock_id: Optional[str] = None
 
 
@@ -134,45 +138,11 @@ class SaveBillerRequest(BaseModel):
 # === Helper Functions ===
 async def fetch_live_fx_rate() -> tuple[float, str]:
     """
-    Fetch live USD/PHP rate from OpenExchangeRates API.
-    Returns tuple of (rate, source) where source is 'live' or 'mock'.
-    Falls back to mock rate if API is unavailable.
+    Get the USD/PHP rate from the shared FX rate service (cached, refreshed in background).
+    Returns tuple of (rate, source) where source is 'live', 'stale' or 'mock'.
+    Falls back to mock rate if no live or recent rate is available.
     """
-    if not OPENEXCHANGERATES_API_KEY:
-        logger.warning("OPENEXCHANGERATES_API_KEY not configured, using mock rate")
-        return MOCK_FX_RATE, "mock"
-    
-    try:
-        async with httpx.AsyncClient(timeout=FX_API_TIMEOUT) as client:
-            response = await client.get(
-                f"{OPENEXCHANGERATES_BASE_URL}/latest.json",
-                params={
-                    "app_id": OPENEXCHANGERATES_API_KEY,
-                    "base": "USD",
-                    "symbols": "PHP"
-                }
-            )
-            response.raise_for_status()
-            
-            data = response.json()
-            
-            if "rates" not in data or "PHP" not in data["rates"]:
-                logger.error("Invalid response structure from OpenExchangeRates API")
-                return MOCK_FX_RATE, "mock"
-            
-            rate = float(data["rates"]["PHP"])
-            logger.info(f"Fetched live FX rate: 1 USD = {rate} PHP")
-            return rate, "live"
-            
-    except httpx.TimeoutException:
-        logger.warning("OpenExchangeRates API timeout, using mock rate")
-        return MOCK_FX_RATE, "mock"
-    except httpx.HTTPError as e:
-        logger.warning(f"OpenExchangeRates API HTTP error: {e}, using mock rate")
-        return MOCK_FX_RATE, "mock"
-    except Exception as e:
-        logger.warning(f"OpenExchangeRates API error: {e}, using mock rate")
-        return MOCK_FX_RATE, "mock"
+    return await fx_rate_service.get_rate("PHP", fallback=MOCK_FX_RATE)
 
 
 def get_mock_mid_market_rate():
@@ -198,15 +168,14 @@ async def get_or_create_wallet(db, user_id: str) -> dict:
     """Get existing wallet or create new one with default balances"""
     wallets = db.wallets
     
-    wallet = await wallets.find_one({"user_id": user_id}, {"_id": 0})
+    wallet = await get_cached_wallet(db, user_id)
     
     if not wallet:
         # Create new wallet with default balances
         now = utc_now()
         wallet = {
             "user_id": user_id,
-            "usd_balance": DEFAULT_WALLET["usd_balance"],
-            "php_balance": DEFAULT_WALLET["php_balance"],
+            **wallet_balances(DEFAULT_WALLET["usd_balance"], DEFAULT_WALLET["php_balance"]),
             "sub_wallets": DEFAULT_WALLET["sub_wallets"].copy(),
             "created_at": now,
             "updated_at": now
@@ -221,9 +190,7 @@ async def get_or_create_wallet(db, user_id: str) -> dict:
 async def record_transaction(db, user_id: str, txn_type: str, category: str, 
                             description: str, currency: str, amount: float,
                             metadata: dict = None) -> str:
-    """Record a transaction in the ledger"""
-    ledger = db.ledger
-    
+    """Record a transaction in the ledger (and its statement summaries, in one transaction)"""
     now = utc_now()
     txn_id = f"{txn_type[:4]}_{int(now.timestamp())}_{random.randint(1000, 9999)}"
     
@@ -234,13 +201,13 @@ async def record_transaction(db, user_id: str, txn_type: str, category: str,
         "category": category,
         "description": description,
         "currency": currency,
-        "amount": amount,
+        **entry_amount(amount, currency),
         "status": "completed",
         "created_at": now,
         "metadata": metadata or {}
     }
     
-    await ledger.insert_one(transaction)
+    await insert_ledger_entries(db, [transaction])
     logger.info(f"Recorded transaction: {txn_id} for user {user_id}")
     
     return txn_id
@@ -313,7 +280,7 @@ async def fund_wallet_simulation(request: Request, data: FundWalletRequest):
         result = await wallets.update_one(
             {"user_id": user_id},
             {
-                "$inc": {"usd_balance": data.amount},
+                "$inc": balance_inc("USD", data.amount),
                 "$set": {"updated_at": now}
             }
         )
@@ -321,6 +288,8 @@ async def fund_wallet_simulation(request: Request, data: FundWalletRequest):
         if result.modified_count == 0:
             raise HTTPException(status_code=500, detail="Failed to credit wallet")
         
+        await invalidate_wallet(user_id)
+        
         # Record in ledger with clear simulation flag
         txn_id = await record_transaction(
             db, user_id,
@@ -336,7 +305,7 @@ async def fund_wallet_simulation(request: Request, data: FundWalletRequest):
         )
         
         # Get updated wallet
-        wallet = await wallets.find_one({"user_id": user_id}, {"_id": 0})
+        wallet = await get_cached_wallet(db, user_id)
         
         logger.info(f"[SIMULATION] Wallet funded: user_id={user_id}, amount=${data.amount}")
         
@@ -390,33 +359,44 @@ async def get_fx_quote(amount_usd: float = 100):
 
 @router.post("/convert/lock")
 async def lock_fx_rate(request: Request, data: LockRateRequest):
-    """Lock an FX rate for 15 minutes (read-only - no Redis/TTL yet)"""
+    """Lock the current PBX rate for 15 minutes (stored server-side, single use)"""
     user_id = get_user_id_from_headers(request)
     
     if not user_id:
         raise HTTPException(status_code=401, detail="No session token provided")
     
-    # Fetch live rate for locking
+    if data.amount_usd <= 0:
+        raise HTTPException(status_code=400, detail="Invalid amount")
+    
+    # Rate is always priced server-side - a client-supplied locked_rate is ignored
     mid_rate, fx_source = await fetch_live_fx_rate()
     pbx_spread = mid_rate * (PBX_SPREAD_BPS / 10000)
-    pbx_rate = data.locked_rate or round(mid_rate - pbx_spread, 2)
+    pbx_rate = round(mid_rate - pbx_spread, 2)
     
-    lock_id = f"lock_{int(utc_now().timestamp())}_{random.randint(1000, 9999)}"
-    expires_at = utc_now().timestamp() + RATE_LOCK_DURATION_SECONDS
+    db = get_database()
+    lock = await create_fx_lock(
+        db, user_id,
+        rate=pbx_rate,
+        mid_market_rate=mid_rate,
+        source=fx_source,
+        amount_usd=data.amount_usd,
+        duration_seconds=RATE_LOCK_DURATION_SECONDS
+    )
     
     return {
         "success": True,
-        "lock_id": lock_id,
+        "lock_id": lock["lock_id"],
         "rate": pbx_rate,
+        "amount_usd": data.amount_usd,
         "source": fx_source,
-        "expires_at": datetime.fromtimestamp(expires_at, tz=timezone.utc).isoformat(),
+        "expires_at": lock["expires_at"].isoformat(),
         "expires_in_seconds": RATE_LOCK_DURATION_SECONDS
     }
 
 
 @router.post("/convert/execute")
 async def execute_conversion(request: Request, data: ConvertRequest):
-    """Execute USD → PHP conversion with real wallet update and live FX rate"""
+    """Execute USD → PHP conversion with real wallet update at a locked or live FX rate"""
     user_id = get_user_id_from_headers(request)
     
     if not user_id:
@@ -436,28 +416,40 @@ async def execute_conversion(request: Request, data: ConvertRequest):
         if wallet["usd_balance"] < data.amount_usd:
             raise HTTPException(status_code=400, detail="Insufficient USD balance")
         
-        # Get live FX rate (or use locked rate if provided)
-        mid_rate, fx_source = await fetch_live_fx_rate()
-        pbx_spread = mid_rate * (PBX_SPREAD_BPS / 10000)
-        rate = data.locked_rate or round(mid_rate - pbx_spread, 2)
-        amount_php = round(data.amount_usd * rate, 2)
-        
         now = utc_now()
         
-        # Update wallet balances atomically
-        result = await wallets.update_one(
-            {"user_id": user_id, "usd_balance": {"$gte": data.amount_usd}},
-            {
-                "$inc": {
-                    "usd_balance": -data.amount_usd,
-                    "php_balance": amount_php
-                },
-                "$set": {"updated_at": now}
-            }
-        )
-        
-        if result.modified_count == 0:
-            raise HTTPException(status_code=400, detail="Insufficient USD balance or concurrent update")
+        if data.lock_id:
+            # Locked rate - no FX lookup; the lock is consumed with the wallet update
+            try:
+                lock, amount_php = await convert_with_lock(db, user_id, data.lock_id, data.amount_usd)
+            except FxLockError as e:
+                raise HTTPException(status_code=400, detail=e.message)
+            except InsufficientUsdBalance:
+                raise HTTPException(status_code=400, detail="Insufficient USD balance or concurrent update")
+            rate, fx_source = lock["rate"], lock["source"]
+        else:
+            # No lock - convert at the current PBX rate (client-supplied rates are ignored)
+            mid_rate, fx_source = await fetch_live_fx_rate()
+            pbx_spread = mid_rate * (PBX_SPREAD_BPS / 10000)
+            rate = round(mid_rate - pbx_spread, 2)
+            amount_php = round(data.amount_usd * rate, 2)
+            
+            # Update wallet balances atomically
+            result = await wallets.update_one(
+                {"user_id": user_id, "usd_balance": {"$gte": data.amount_usd}},
+                {
+                    "$inc": {
+                        **balance_inc("USD", -data.amount_usd),
+                        **balance_inc("PHP", amount_php)
+                    },
+                    "$set": {"updated_at": now}
+                }
+            )
+            
+            if result.modified_count == 0:
+                raise HTTPException(status_code=400, detail="Insufficient USD balance or concurrent update")
+            
+            await invalidate_wallet(user_id)
         
         # Record transaction in ledger
         txn_id = await record_transaction(
@@ -639,7 +631,7 @@ async def pay_bill(request: Request, data: PayBillRequest):
         result = await wallets.update_one(
             {"user_id": user_id, "php_balance": {"$gte": data.amount}},
             {
-                "$inc": {"php_balance": -data.amount},
+                "$inc": balance_inc("PHP", -data.amount),
                 "$set": {"updated_at": now}
             }
         )
@@ -647,6 +639,8 @@ async def pay_bill(request: Request, data: PayBillRequest):
         if result.modified_count == 0:
             raise HTTPException(status_code=400, detail="Insufficient PHP balance or concurrent update")
         
+        await invalidate_wallet(user_id)
+        
         # Record transaction
         txn_id = await record_transaction(
             db, user_id,
@@ -795,7 +789,7 @@ async def create_transfer(request: Request, data: TransferRequest):
         result = await wallets.update_one(
             {"user_id": user_id, "php_balance": {"$gte": data.amount}},
             {
-                "$inc": {"php_balance": -data.amount},
+                "$inc": balance_inc("PHP", -data.amount),
                 "$set": {"updated_at": now}
             }
         )
@@ -803,6 +797,8 @@ async def create_transfer(request: Request, data: TransferRequest):
         if result.modified_count == 0:
             raise HTTPException(status_code=400, detail="Insufficient PHP balance or concurrent update")
         
+        await invalidate_wallet(user_id)
+        
         # Determine status (e-wallets instant, bank transfers processing)
         status = "completed" if method["type"] == "ewallet" else "processing"
         
@@ -849,6 +845,23 @@ async def create_transfer(request: Request, data: TransferRequest):
 
 
 # === Statements Endpoints ===
+STATEMENT_SUMMARY_FIELDS = {
+    "credit": "total_credits_usd",
+    "fx_conversion": "total_conversions",
+    "bill_payment": "total_bills_paid",
+    "transfer_out": "total_transfers",
+}
+
+
+def statement_summary(totals: Dict[str, Dict[str, float]]) -> Dict[str, float]:
+    """Statement summary fields from {type: {currency: total}} (currencies summed, as before)"""
+    summary = {field: 0 for field in STATEMENT_SUMMARY_FIELDS.values()}
+    for entry_type, field in STATEMENT_SUMMARY_FIELDS.items():
+        if entry_type in totals:
+            summary[field] = abs(sum(totals[entry_type].values()))
+    return summary
+
+
 @router.get("/statements")
 async def get_statements(
     request: Request,
@@ -903,55 +916,143 @@ async def get_statements(
                 "created_at": t.get("created_at").isoformat() if isinstance(t.get("created_at"), datetime) else str(t.get("created_at"))
             })
         
-        # Calculate summary from all user transactions
-        pipeline = [
-            {"$match": {"user_id": user_id}},
-            {"$group": {
-                "_id": "$type",
-                "total": {"$sum": "$amount"}
-            }}
-        ]
-        summary_cursor = ledger.aggregate(pipeline)
-        summary_data = await summary_cursor.to_list(10)
-        
-        summary = {
-            "total_credits_usd": 0,
-            "total_conversions": 0,
-            "total_bills_paid": 0,
-            "total_transfers": 0
-        }
-        for s in summary_data:
-            if s["_id"] == "credit":
-                summary["total_credits_usd"] = abs(s["total"])
-            elif s["_id"] == "fx_conversion":
-                summary["total_conversions"] = abs(s["total"])
-            elif s["_id"] == "bill_payment":
-                summary["total_bills_paid"] = abs(s["total"])
-            elif s["_id"] == "transfer_out":
-                summary["total_transfers"] = abs(s["total"])
+        # Lifetime summary from the running totals (utils/ledger_summaries.py)
+        summary = statement_summary(await get_summary_totals(db, user_id, PERIOD_ALL))
         
-        return {
+        response = {
             "transactions": formatted,
             "total": len(formatted),
             "summary": summary
         }
+        if start_date and end_date:
+            # Same totals for the requested range (monthly rollups + partial edge months)
+            response["range_summary"] = statement_summary(
+                await get_range_totals(db, user_id, query["created_at"]["$gte"], query["created_at"]["$lte"])
+            )
+        return response
         
     except Exception as e:
         logger.error(f"Error getting statements: {e}")
         raise HTTPException(status_code=500, detail="Failed to get statements")
 
 
+class ExportStatementRequest(BaseModel):
+    start_date: Optional[str] = None
+    end_date: Optional[str] = None
+    format: Literal["csv", "ndjson", "pdf"] = "pdf"
+    type: Optional[str] = None
+    currency: Optional[str] = None
+    background: bool = False
+
+
+def parse_statement_date(value: Optional[str]) -> Optional[datetime]:
+    if not value:
+        return None
+    try:
+        parsed = datetime.fromisoformat(value.replace('Z', '+00:00'))
+    except ValueError:
+        raise HTTPException(status_code=400, detail=f"Invalid date: {value}")
+    return parsed if parsed.tzinfo else parsed.replace(tzinfo=timezone.utc)
+
+
+def export_job_response(job: Dict[str, Any]) -> Dict[str, Any]:
+    response = {
+        "job_id": job["job_id"],
+        "status": job["status"],
+        "format": job["format"],
+        "filename": job["filename"],
+        "rows": job.get("rows", 0),
+        "size_bytes": job.get("size_bytes", 0),
+        "status_url": f"/api/recipient/statements/export/{job['job_id']}",
+    }
+    if job["status"] == JOB_COMPLETED:
+        response["download_url"] = f"/api/recipient/statements/export/{job['job_id']}/download"
+    return response
+
+
 @router.post("/statements/export")
-async def export_statement_pdf(request: Request):
-    """Export statement as PDF (mock - would generate real PDF in production)"""
+async def export_statement(request: Request, data: ExportStatementRequest):
+    """
+    Export a statement as CSV, NDJSON or PDF.
+    Ranges up to STATEMENT_EXPORT_STREAM_MAX_DAYS stream straight back; longer or
+    open-ended ranges (or background=true) start a job - 202 with its status_url.
+    """
     user_id = get_user_id_from_headers(request)
     
     if not user_id:
         raise HTTPException(status_code=401, detail="No session token provided")
     
-    return {
-        "success": True,
-        "message": "Statement PDF generated",
-        "download_url": "#",
-        "filename": f"PBX_Statement_{utc_now().strftime('%Y-%m-%d')}.pdf"
-    }
+    start = parse_statement_date(data.start_date)
+    end = parse_statement_date(data.end_date)
+    if start and end and start > end:
+        raise HTTPException(status_code=400, detail="start_date must be before end_date")
+    
+    db = get_database()
+    query = export_query(user_id, start, end, data.type, data.currency)
+    filename = export_filename(start, end, data.format)
+    title = filename.rsplit(".", 1)[0].replace("_", " ")
+    
+    streamable = start and end and (end - start).days <= STATEMENT_EXPORT_STREAM_MAX_DAYS
+    if streamable and not data.background:
+        return StreamingResponse(
+            stream_statement(db, query, data.format, title),
+            media_type=EXPORT_FORMATS[data.format][0],
+            headers={"Content-Disposition": f'attachment; filename="{filename}"'}
+        )
+    
+    try:
+        job = await statement_export_service.submit(db, user_id, query, data.format, title, filename)
+    except Exception as e:
+        logger.error(f"Error starting statement export: {e}")
+        raise HTTPException(status_code=500, detail="Failed to start statement export")
+    
+    return JSONResponse(status_code=status.HTTP_202_ACCEPTED, content=export_job_response(job))
+
+
+@router.get("/statements/export/{job_id}")
+async def get_statement_export(request: Request, job_id: str):
+    """Status of a background statement export"""
+    user_id = get_user_id_from_headers(request)
+    
+    if not user_id:
+        raise HTTPException(status_code=401, detail="No session token provided")
+    
+    db = get_database()
+    job = await db.statement_exports.find_one(
+        {"job_id": job_id, "user_id": user_id},
+        {"_id": 0, "query": 0, "encoder_state": 0, "checkpoint": 0}
+    )
+    if not job:
+        raise HTTPException(status_code=404, detail="Export not found")
+    
+    # Pick the job back up if the worker running it went away
+    statement_export_service.resume_if_stalled(job)
+    return export_job_response(job)
+
+
+@router.get("/statements/export/{job_id}/download")
+async def download_statement_export(request: Request, job_id: str):
+    """Download a finished background statement export"""
+    user_id = get_user_id_from_headers(request)
+    
+    if not user_id:
+        raise HTTPException(status_code=401, detail="No session token provided")
+    
+    db = get_database()
+    job = await db.statement_exports.find_one(
+        {"job_id": job_id, "user_id": user_id},
+        {"_id": 0, "status": 1, "format": 1, "filename": 1, "size_bytes": 1}
+    )
+    if not job:
+        raise HTTPException(status_code=404, detail="Export not found")
+    if job["status"] != JOB_COMPLETED:
+        raise HTTPException(status_code=409, detail=f"Export is {job['status']}")
+    
+    return StreamingResponse(
+        statement_export_service.iter_artifact(db, job_id),
+        media_type=EXPORT_FORMATS[job["format"]][0],
+        headers={
+            "Content-Disposition": f'attachment; filename="{job["filename"]}"',
+            "Content-Length": str(job["size_bytes"])
+        }
+    )
@@ -6,24 +6,63 @@ NOTE: Friendships are PERSONAL-ONLY (between personal profiles).
 Businesses do NOT have friends - they have chats and can be paid/messaged.
 """
 from fastapi import APIRouter, HTTPException, Request, BackgroundTasks
+from fastapi.responses import StreamingResponse
 from pydantic import BaseModel, Field
 from typing import Optional, List, Literal
 from datetime import datetime, timezone, timedelta
 from enum import Enum
+from pymongo import UpdateOne
+from pymongo.errors import DuplicateKeyError
+import asyncio
+import base64
 import logging
 import uuid
 
 from database.connection import get_database
+from database.indexes import apply_indexes
 from services.notifications import notify_pbx_to_pbx_recipient
+from services.realtime import (
+    realtime_hub, publish, format_sse, EVENT_MESSAGE, EVENT_FRIEND_REQUEST, EVENT_FRIEND_ACCEPTED,
+    KEEPALIVE_SECONDS, CLIENT_RETRY_MS
+)
+from utils.identifiers import resolve_user
+from utils.search import PROFILE_PROJECTION, profile_search_tokens
+from utils.velocity import METRIC_INVITE_FRIEND_REQUESTS, VelocityLimitExceeded, check_and_reserve, release
+from utils.wallet_cache import get_cached_wallet
 
 router = APIRouter(prefix="/api/social", tags=["social"])
 logger = logging.getLogger(__name__)
 
+# Max auto friend requests per inviter per day (invite viral loop)
+INVITE_AUTO_REQUESTS_PER_DAY = 20
+
+# Inbox pagination
+INBOX_PAGE_SIZE = 50
+INBOX_MAX_PAGE_SIZE = 100
+
+# Friends list pagination (per section)
+FRIENDS_PAGE_SIZE = 100
+FRIENDS_MAX_PAGE_SIZE = 500
+
+# Chat history pagination
+MESSAGES_PAGE_SIZE = 50
+MESSAGES_MAX_PAGE_SIZE = 200
+
 
 def utc_now():
     return datetime.now(timezone.utc)
 
 
+def pair_key(id_a: str, id_b: str) -> str:
+    """
+    Canonical key for an unordered pair of ids (user ids for friendships and
+    personal conversations, profile ids for business conversations).
+    One equality lookup replaces the two-sided $or; the unique index on it
+    prevents duplicate friendships/conversations for the same pair.
+    """
+    return ":".join(sorted((id_a, id_b)))
+
+
 def get_user_id_from_headers(request: Request) -> str:
     """Extract user ID from session token"""
     return request.headers.get("X-Session-Token", "")
@@ -37,7 +76,7 @@ async def get_or_create_personal_profile(db, user_id: str) -> dict:
     profile = await profiles_coll.find_one({
         "user_id": user_id,
         "type": "personal"
-    }, {"_id": 0})
+    }, PROFILE_PROJECTION)
     
     if profile:
         return profile
@@ -59,9 +98,10 @@ async def get_or_create_personal_profile(db, user_id: str) -> dict:
         "created_at": now,
         "updated_at": now
     }
+    profile["search_tokens"] = profile_search_tokens(profile)
     
     await profiles_coll.insert_one(profile)
-    return await profiles_coll.find_one({"profile_id": profile_id}, {"_id": 0})
+    return await profiles_coll.find_one({"profile_id": profile_id}, PROFILE_PROJECTION)
 
 
 # ============================================================
@@ -112,6 +152,22 @@ class QuickAddRequest(BaseModel):
 # FRIENDSHIP ENDPOINTS
 # ============================================================
 
+def check_can_request_friendship(existing: Optional[dict], user_id: str):
+    """Raise 400 if an existing friendship record blocks a new request"""
+    if not existing:
+        return
+    status = existing.get("status")
+    if status == FriendshipStatus.ACCEPTED:
+        raise HTTPException(status_code=400, detail="Already friends")
+    elif status == FriendshipStatus.PENDING:
+        if existing.get("requester_user_id") == user_id:
+            raise HTTPException(status_code=400, detail="Friend request already sent")
+        else:
+            raise HTTPException(status_code=400, detail="This user has already sent you a friend request")
+    elif status == FriendshipStatus.BLOCKED:
+        raise HTTPException(status_code=400, detail="Cannot send friend request")
+
+
 @router.post("/friends/request")
 async def send_friend_request(request: Request, data: FriendRequestCreate):
     """Send a friend request to another user"""
@@ -124,43 +180,56 @@ async def send_friend_request(request: Request, data: FriendRequestCreate):
     
     db = get_database()
     friendships = db.friendships
+    key = pair_key(user_id, data.addressee_user_id)
     
     # Check if friendship already exists
-    existing = await friendships.find_one({
-        "$or": [
-            {"requester_user_id": user_id, "addressee_user_id": data.addressee_user_id},
-            {"requester_user_id": data.addressee_user_id, "addressee_user_id": user_id}
-        ]
-    })
+    existing = await friendships.find_one({"pair_key": key})
+    check_can_request_friendship(existing, user_id)
     
-    if existing:
-        status = existing.get("status")
-        if status == FriendshipStatus.ACCEPTED:
-            raise HTTPException(status_code=400, detail="Already friends")
-        elif status == FriendshipStatus.PENDING:
-            if existing.get("requester_user_id") == user_id:
-                raise HTTPException(status_code=400, detail="Friend request already sent")
-            else:
-                raise HTTPException(status_code=400, detail="This user has already sent you a friend request")
-        elif status == FriendshipStatus.BLOCKED:
-            raise HTTPException(status_code=400, detail="Cannot send friend request")
-    
-    # Create new friend request
-    friendship_id = f"fr_{uuid.uuid4().hex[:12]}"
     now = utc_now()
     
-    friendship = {
-        "friendship_id": friendship_id,
-        "requester_user_id": user_id,
-        "addressee_user_id": data.addressee_user_id,
-        "status": FriendshipStatus.PENDING,
-        "created_at": now,
-        "updated_at": now
-    }
+    if existing:
+        # Previously declined - reuse the pair's record as a new request
+        friendship_id = existing["friendship_id"]
+        result = await friendships.update_one(
+            {"friendship_id": friendship_id, "status": FriendshipStatus.DECLINED},
+            {"$set": {
+                "requester_user_id": user_id,
+                "addressee_user_id": data.addressee_user_id,
+                "status": FriendshipStatus.PENDING,
+                "created_at": now,
+                "updated_at": now
+            }, "$unset": {"source": "", "invite_id": ""}}
+        )
+        if result.modified_count == 0:
+            check_can_request_friendship(await friendships.find_one({"pair_key": key}), user_id)
+    else:
+        # Create new friend request
+        friendship_id = f"fr_{uuid.uuid4().hex[:12]}"
+        friendship = {
+            "friendship_id": friendship_id,
+            "pair_key": key,
+            "requester_user_id": user_id,
+            "addressee_user_id": data.addressee_user_id,
+            "status": FriendshipStatus.PENDING,
+            "created_at": now,
+            "updated_at": now
+        }
+        try:
+            await friendships.insert_one(friendship)
+        except DuplicateKeyError:
+            # Concurrent request for the same pair won the insert
+            check_can_request_friendship(await friendships.find_one({"pair_key": key}), user_id)
+            raise HTTPException(status_code=400, detail="Friend request already sent")
     
-    await friendships.insert_one(friendship)
     logger.info(f"Friend request sent: {user_id} -> {data.addressee_user_id}")
     
+    await publish([data.addressee_user_id], EVENT_FRIEND_REQUEST, {
+        "friendship_id": friendship_id,
+        "requester_user_id": user_id,
+        "created_at": now.isoformat()
+    })
+    
     return {
         "success": True,
         "friendship_id": friendship_id,
@@ -247,6 +316,13 @@ async def handle_friend_action(request: Request, data: FriendRequestAction):
     
     logger.info(f"Friendship action: {data.action} on {data.friendship_id} by {user_id}")
     
+    if new_status == FriendshipStatus.ACCEPTED:
+        await publish([friendship.get("requester_user_id")], EVENT_FRIEND_ACCEPTED, {
+            "friendship_id": data.friendship_id,
+            "user_id": user_id,
+            "updated_at": now.isoformat()
+        })
+    
     return {
         "success": True,
         "friendship_id": data.friendship_id,
@@ -255,66 +331,143 @@ async def handle_friend_action(request: Request, data: FriendRequestAction):
     }
 
 
+FRIEND_LIST_SECTIONS = ("friends", "incoming_requests", "outgoing_requests")
+
+
+def friend_section_query(user_id: str, section: str) -> dict:
+    if section == "friends":
+        return {
+            "$or": [
+                {"requester_user_id": user_id},
+                {"addressee_user_id": user_id}
+            ],
+            "status": FriendshipStatus.ACCEPTED
+        }
+    if section == "incoming_requests":
+        return {"addressee_user_id": user_id, "status": FriendshipStatus.PENDING}
+    return {"requester_user_id": user_id, "status": FriendshipStatus.PENDING}
+
+
+async def count_friendships(db, user_id: str) -> dict:
+    """Friends / incoming / outgoing totals in one aggregation"""
+    counts = {section: 0 for section in FRIEND_LIST_SECTIONS}
+    cursor = db.friendships.aggregate([
+        {"$match": {
+            "$or": [
+                {"requester_user_id": user_id},
+                {"addressee_user_id": user_id}
+            ],
+            "status": {"$in": [FriendshipStatus.ACCEPTED, FriendshipStatus.PENDING]}
+        }},
+        {"$group": {
+            "_id": {"status": "$status", "outgoing": {"$eq": ["$requester_user_id", user_id]}},
+            "count": {"$sum": 1}
+        }}
+    ])
+    async for row in cursor:
+        if row["_id"]["status"] == FriendshipStatus.ACCEPTED:
+            counts["friends"] += row["count"]
+        elif row["_id"]["outgoing"]:
+            counts["outgoing_requests"] += row["count"]
+        else:
+            counts["incoming_requests"] += row["count"]
+    return counts
+
+
+async def load_friends_list(
+    db,
+    user_id: str,
+    limit: int = FRIENDS_PAGE_SIZE,
+    section: Optional[str] = None,
+    cursor: Optional[str] = None
+) -> dict:
+    """
+    One page of friends, incoming and outgoing requests (or of one section).
+    Round trips are constant in the number of friends: one find per section,
+    one $in over counterpart users, one count aggregation.
+    """
+    sections = (section,) if section else FRIEND_LIST_SECTIONS
+    
+    async def load_section(name: str):
+        query = friend_section_query(user_id, name)
+        if cursor:
+            query = {"$and": [query, keyset_filter("created_at", "friendship_id", cursor)]}
+        rows = await db.friendships.find(query, {"_id": 0}).sort(
+            [("created_at", -1), ("friendship_id", -1)]
+        ).limit(limit + 1).to_list(limit + 1)
+        next_cursor = None
+        if len(rows) > limit:
+            rows = rows[:limit]
+            next_cursor = encode_cursor(rows[-1]["created_at"], rows[-1]["friendship_id"])
+        return rows, next_cursor
+    
+    loaded = await asyncio.gather(*[load_section(name) for name in sections], count_friendships(db, user_id))
+    counts = loaded[-1]
+    pages = dict(zip(sections, loaded[:-1]))
+    
+    # Hydrate every counterpart in one query
+    other_ids = {
+        f["addressee_user_id"] if f["requester_user_id"] == user_id else f["requester_user_id"]
+        for rows, _ in pages.values() for f in rows
+    }
+    other_users = {}
+    if other_ids:
+        async for u in db.users.find(
+            {"user_id": {"$in": list(other_ids)}},
+            {"_id": 0, "user_id": 1, "username": 1, "display_name": 1, "email": 1, "avatar_url": 1}
+        ):
+            other_users[u["user_id"]] = u
+    
+    result = {name: [] for name in FRIEND_LIST_SECTIONS}
+    for name, (rows, _) in pages.items():
+        for f in rows:
+            other_user_id = f["addressee_user_id"] if f["requester_user_id"] == user_id else f["requester_user_id"]
+            other_user = other_users.get(other_user_id)
+            result[name].append({
+                "user_id": other_user_id,
+                "username": other_user.get("username") if other_user else None,
+                "display_name": (other_user.get("display_name") or (other_user.get("email") or "").split("@")[0]) if other_user else "PBX User",
+                "email": other_user.get("email") if other_user else None,
+                "avatar_url": other_user.get("avatar_url") if other_user else None,
+                "friendship_id": f["friendship_id"],
+                "status": f["status"],
+                "source": f.get("source"),  # 'invite_auto' if from invite viral loop
+                "invite_id": f.get("invite_id"),  # Original invite ID if from invite
+                "created_at": f["created_at"].isoformat() if f.get("created_at") else None
+            })
+    
+    return {
+        **result,
+        "total_friends": counts["friends"],
+        "pending_count": counts["incoming_requests"],
+        "outgoing_count": counts["outgoing_requests"],
+        "next_cursors": {name: next_cursor for name, (_, next_cursor) in pages.items()}
+    }
+
+
 @router.get("/friends/list")
-async def get_friends_list(request: Request):
-    """Get list of friends and pending requests"""
+async def get_friends_list(
+    request: Request,
+    limit: int = FRIENDS_PAGE_SIZE,
+    section: Optional[Literal["friends", "incoming_requests", "outgoing_requests"]] = None,
+    cursor: Optional[str] = None
+):
+    """
+    Get list of friends and pending requests.
+    First page of every section by default; pass `section` with that section's
+    `next_cursors` entry as `cursor` to page further.
+    """
     user_id = get_user_id_from_headers(request)
     if not user_id:
         raise HTTPException(status_code=401, detail="No session token provided")
     
-    db = get_database()
-    friendships = db.friendships
-    users = db.users
+    if cursor and not section:
+        raise HTTPException(status_code=400, detail="cursor requires section")
     
-    # Get all friendships involving this user
-    cursor = friendships.find({
-        "$or": [
-            {"requester_user_id": user_id},
-            {"addressee_user_id": user_id}
-        ],
-        "status": {"$ne": FriendshipStatus.BLOCKED}
-    })
-    
-    all_friendships = await cursor.to_list(100)
-    
-    friends = []
-    incoming_requests = []
-    outgoing_requests = []
-    
-    for f in all_friendships:
-        # Determine the other user
-        other_user_id = f["addressee_user_id"] if f["requester_user_id"] == user_id else f["requester_user_id"]
-        
-        # Get other user's info
-        other_user = await users.find_one({"user_id": other_user_id}, {"_id": 0})
-        user_info = {
-            "user_id": other_user_id,
-            "username": other_user.get("username") if other_user else None,
-            "display_name": other_user.get("display_name") if other_user else other_user.get("email", "").split("@")[0] if other_user else "PBX User",
-            "email": other_user.get("email") if other_user else None,
-            "avatar_url": other_user.get("avatar_url") if other_user else None,
-            "friendship_id": f["friendship_id"],
-            "status": f["status"],
-            "source": f.get("source"),  # 'invite_auto' if from invite viral loop
-            "invite_id": f.get("invite_id"),  # Original invite ID if from invite
-            "created_at": f["created_at"].isoformat() if f.get("created_at") else None
-        }
-        
-        if f["status"] == FriendshipStatus.ACCEPTED:
-            friends.append(user_info)
-        elif f["status"] == FriendshipStatus.PENDING:
-            if f["requester_user_id"] == user_id:
-                outgoing_requests.append(user_info)
-            else:
-                incoming_requests.append(user_info)
+    db = get_database()
+    limit = max(1, min(limit, FRIENDS_MAX_PAGE_SIZE))
     
-    return {
-        "friends": friends,
-        "incoming_requests": incoming_requests,
-        "outgoing_requests": outgoing_requests,
-        "total_friends": len(friends),
-        "pending_count": len(incoming_requests)
-    }
+    return await load_friends_list(db, user_id, limit, section, cursor)
 
 
 @router.get("/friends/status/{other_user_id}")
@@ -327,12 +480,7 @@ async def get_friendship_status(request: Request, other_user_id: str):
     db = get_database()
     friendships = db.friendships
     
-    friendship = await friendships.find_one({
-        "$or": [
-            {"requester_user_id": user_id, "addressee_user_id": other_user_id},
-            {"requester_user_id": other_user_id, "addressee_user_id": user_id}
-        ]
-    })
+    friendship = await friendships.find_one({"pair_key": pair_key(user_id, other_user_id)})
     
     if not friendship:
         return {"status": "none", "friendship_id": None}
@@ -379,18 +527,8 @@ async def quick_add(request: Request, background_tasks: BackgroundTasks, data: Q
     if not is_email and not is_phone:
         raise HTTPException(status_code=400, detail="Invalid phone or email format")
     
-    # Look up existing PBX user
-    if is_email:
-        existing_user = await users.find_one({"email": contact}, {"_id": 0})
-    else:
-        # Normalize phone - remove spaces, dashes
-        phone_normalized = contact.replace("-", "").replace(" ", "")
-        existing_user = await users.find_one({
-            "$or": [
-                {"phone": phone_normalized},
-                {"phone": contact}
-            ]
-        }, {"_id": 0})
+    # Look up existing PBX user (canonical email / E.164 phone, cached)
+    existing_user = await resolve_user(db, contact)
     
     # If user exists, return for friend request
     if existing_user:
@@ -599,7 +737,7 @@ async def process_invites_on_signup(request: Request, background_tasks: Backgrou
     processed = 0
     friend_requests_created = []
     
-    # Rate limit check per inviter (max 20 auto-requests per day)
+    # Rate limit per inviter (max 20 auto-requests per day)
     today_start = utc_now().replace(hour=0, minute=0, second=0, microsecond=0)
     
     for invite in matching_invites:
@@ -609,53 +747,52 @@ async def process_invites_on_signup(request: Request, background_tasks: Backgrou
         if inviter_user_id == user_id:
             continue
         
-        # Check rate limit for inviter
-        daily_count = await friendships.count_documents({
-            "requester_user_id": inviter_user_id,
-            "created_at": {"$gte": today_start},
-            "source": "invite_auto"
-        })
-        
-        if daily_count >= 20:
-            logger.warning(f"Rate limit reached for inviter {inviter_user_id}")
-            continue
-        
-        # Check if already friends or pending
-        existing = await friendships.find_one({
-            "$or": [
-                {"requester_user_id": inviter_user_id, "addressee_user_id": user_id},
-                {"requester_user_id": user_id, "addressee_user_id": inviter_user_id}
-            ]
-        })
+        # Check if already friends, pending or blocked
+        key = pair_key(inviter_user_id, user_id)
+        existing = await friendships.find_one({"pair_key": key}, {"_id": 1})
         
         if existing:
             # Already have a friendship record, skip
             continue
         
-        # Check if new user has blocked the inviter
-        blocked = await friendships.find_one({
-            "requester_user_id": user_id,
-            "addressee_user_id": inviter_user_id,
-            "status": "blocked"
-        })
+        # Reserve against the inviter's daily counter (one upsert, no history scan).
+        # The first reservation of the day seeds the counter from existing requests.
+        async def count_today(inviter_user_id=inviter_user_id):
+            return await friendships.count_documents({
+                "requester_user_id": inviter_user_id,
+                "created_at": {"$gte": today_start},
+                "source": "invite_auto"
+            })
         
-        if blocked:
+        try:
+            await check_and_reserve(
+                db, inviter_user_id, METRIC_INVITE_FRIEND_REQUESTS, 1, INVITE_AUTO_REQUESTS_PER_DAY,
+                period="day", seed=count_today
+            )
+        except VelocityLimitExceeded:
+            logger.warning(f"Rate limit reached for inviter {inviter_user_id}")
             continue
         
         # Create friend request from inviter to new user
         now = utc_now()
         friendship_id = f"fr_{uuid.uuid4().hex[:12]}"
         
-        await friendships.insert_one({
-            "friendship_id": friendship_id,
-            "requester_user_id": inviter_user_id,
-            "addressee_user_id": user_id,
-            "status": "pending",
-            "source": "invite_auto",  # Mark as auto-created from invite
-            "invite_id": invite.get("invite_id"),
-            "created_at": now,
-            "updated_at": now
-        })
+        try:
+            await friendships.insert_one({
+                "friendship_id": friendship_id,
+                "pair_key": key,
+                "requester_user_id": inviter_user_id,
+                "addressee_user_id": user_id,
+                "status": "pending",
+                "source": "invite_auto",  # Mark as auto-created from invite
+                "invite_id": invite.get("invite_id"),
+                "created_at": now,
+                "updated_at": now
+            })
+        except DuplicateKeyError:
+            # Pair got a friendship concurrently (e.g. a second invite from the same inviter)
+            await release(db, inviter_user_id, METRIC_INVITE_FRIEND_REQUESTS, 1, period="day")
+            continue
         
         # Mark invite as converted
         await invites_coll.update_one(
@@ -686,21 +823,182 @@ async def process_invites_on_signup(request: Request, background_tasks: Backgrou
     }
 
 
+# ============================================================
+# PAGINATION
+# ============================================================
+
+def encode_cursor(sort_value: datetime, tie_breaker: str) -> str:
+    """Opaque keyset cursor for (datetime DESC, id DESC) listings"""
+    raw = f"{sort_value.isoformat()}|{tie_breaker}"
+    return base64.urlsafe_b64encode(raw.encode()).decode()
+
+
+def decode_cursor(cursor: str) -> tuple:
+    """Return (sort_value, tie_breaker) or raise 400"""
+    try:
+        raw = base64.urlsafe_b64decode(cursor.encode()).decode()
+        sort_value, tie_breaker = raw.split("|", 1)
+        return datetime.fromisoformat(sort_value), tie_breaker
+    except Exception:
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+
+
+def keyset_filter(sort_field: str, id_field: str, cursor: str, newer: bool = False) -> dict:
+    """
+    Rows strictly after the cursor in (sort_field DESC, id_field DESC) order,
+    or strictly before it (newer rows) when `newer` is set
+    """
+    sort_value, tie_breaker = decode_cursor(cursor)
+    op = "$gt" if newer else "$lt"
+    return {
+        "$or": [
+            {sort_field: {op: sort_value}},
+            {sort_field: sort_value, id_field: {op: tie_breaker}}
+        ]
+    }
+
+
+def message_page_query(conversation_id: str, cursor: Optional[str] = None, after: Optional[str] = None) -> tuple:
+    """
+    (filter, sort) for one page of chat history on idx_messages_conversation_created_id.
+    `cursor` walks back to older messages (newest first); `after` returns messages
+    newer than a sync cursor (oldest first) for incremental sync.
+    """
+    query = {"conversation_id": conversation_id}
+    if after:
+        query.update(keyset_filter("created_at", "message_id", after, newer=True))
+        return query, [("created_at", 1), ("message_id", 1)]
+    if cursor:
+        query.update(keyset_filter("created_at", "message_id", cursor))
+    return query, [("created_at", -1), ("message_id", -1)]
+
+
+# ============================================================
+# INDEXES
+# ============================================================
+
+async def setup_social_indexes(db):
+    """
+    Create indexes for friendships, conversations, messages and invites.
+    Specs live in database/indexes.py; called on application startup.
+    """
+    return await apply_indexes(db, ["friendships", "conversations", "messages", "invites"])
+
+
 # ============================================================
 # CONVERSATION ENDPOINTS
 # ============================================================
 
+def last_message_summary(message: dict) -> dict:
+    """Inbox preview denormalized onto the conversation as `last_message`"""
+    return {
+        "message_id": message.get("message_id"),
+        "text": message.get("text"),
+        "type": message.get("type"),
+        "sender_user_id": message.get("sender_user_id"),
+        "created_at": message.get("created_at"),
+    }
+
+
+def last_message_update(message: dict) -> tuple:
+    """
+    (filter, update) moving a conversation's last_message forward -
+    a late write never replaces a newer message.
+    """
+    return (
+        {"conversation_id": message["conversation_id"], "last_message_at": {"$lte": message["created_at"]}},
+        {"$set": {"last_message_at": message["created_at"], "last_message": last_message_summary(message)}}
+    )
+
+
+def unread_update(message: dict, recipient_user_id: Optional[str]) -> tuple:
+    """
+    (filter, update) for the per-participant read state: bumps the recipient's
+    unread counter and marks the conversation read for the sender.
+    Unconditional, so a late write still counts as unread.
+    """
+    sender_user_id = message["sender_user_id"]
+    update = {
+        "$set": {f"unread_counts.{sender_user_id}": 0},
+        "$max": {f"read_receipts.{sender_user_id}": message["created_at"]}
+    }
+    if recipient_user_id and recipient_user_id != sender_user_id:
+        update["$inc"] = {f"unread_counts.{recipient_user_id}": 1}
+    return {"conversation_id": message["conversation_id"]}, update
+
+
+def message_updates(message: dict, recipient_user_id: Optional[str]) -> List[UpdateOne]:
+    return [
+        UpdateOne(*last_message_update(message)),
+        UpdateOne(*unread_update(message, recipient_user_id))
+    ]
+
+
+async def set_last_message(db, message: dict, recipient_user_id: Optional[str] = None):
+    """
+    Record a newly inserted message as its conversation's last message and
+    count it as unread for the recipient (one round trip)
+    """
+    await db.conversations.bulk_write(message_updates(message, recipient_user_id), ordered=True)
+
+
+def serialize_message(message: dict) -> dict:
+    """Client shape of a message (GET /messages and realtime `message` events)"""
+    return {
+        "message_id": message.get("message_id"),
+        "conversation_id": message.get("conversation_id"),
+        "sender_user_id": message.get("sender_user_id"),
+        "type": message.get("type"),
+        "text": message.get("text"),
+        "payment": message.get("payment"),
+        "created_at": message.get("created_at").isoformat() if message.get("created_at") else None
+    }
+
+
+async def publish_message(message: dict, recipient_user_id: Optional[str]):
+    """Push a new message to both participants' open streams (sender's other devices too)"""
+    await publish([message["sender_user_id"], recipient_user_id], EVENT_MESSAGE, serialize_message(message))
+
+
+async def set_last_messages(db, messages: List[tuple]):
+    """Bulk variant of set_last_message over (message, recipient_user_id) pairs"""
+    if messages:
+        ops = [op for message, recipient_user_id in messages for op in message_updates(message, recipient_user_id)]
+        await db.conversations.bulk_write(ops, ordered=True)
+
+
+async def backfill_last_messages(db, conversations: List[dict]):
+    """
+    Fill `last_message` on conversations created before it was denormalized.
+    One aggregate + one bulk write; updates the passed documents in place.
+    """
+    conversation_ids = [c["conversation_id"] for c in conversations]
+    latest = {}
+    cursor = db.messages.aggregate([
+        {"$match": {"conversation_id": {"$in": conversation_ids}}},
+        {"$sort": {"created_at": -1}},
+        {"$group": {"_id": "$conversation_id", "message": {"$first": "$$ROOT"}}}
+    ])
+    async for row in cursor:
+        latest[row["_id"]] = last_message_summary(row["message"])
+    
+    ops = []
+    for c in conversations:
+        c["last_message"] = latest.get(c["conversation_id"])
+        ops.append(UpdateOne(
+            {"conversation_id": c["conversation_id"], "last_message": {"$exists": False}},
+            {"$set": {"last_message": c["last_message"]}}
+        ))
+    await db.conversations.bulk_write(ops, ordered=False)
+
+
 async def create_conversation(db, user1_id: str, user2_id: str):
     """Create a conversation between two users (called when friendship accepted)"""
     conversations = db.conversations
+    key = pair_key(user1_id, user2_id)
     
     # Check if conversation already exists
-    existing = await conversations.find_one({
-        "$or": [
-            {"user1_id": user1_id, "user2_id": user2_id},
-            {"user1_id": user2_id, "user2_id": user1_id}
-        ]
-    })
+    existing = await conversations.find_one({"pair_key": key}, {"conversation_id": 1})
     
     if existing:
         return existing.get("conversation_id")
@@ -709,34 +1007,46 @@ async def create_conversation(db, user1_id: str, user2_id: str):
     conversation_id = f"conv_{uuid.uuid4().hex[:12]}"
     now = utc_now()
     
+    system_message = {
+        "message_id": f"msg_{uuid.uuid4().hex[:12]}",
+        "conversation_id": conversation_id,
+        "sender_user_id": "system",
+        "type": MessageType.SYSTEM,
+        "text": "You are now friends! Say hi 👋",
+        "created_at": now
+    }
+    
     conversation = {
         "conversation_id": conversation_id,
+        "pair_key": key,
         "user1_id": user1_id,
         "user2_id": user2_id,
         "created_at": now,
-        "last_message_at": now
+        "last_message_at": now,
+        "last_message": last_message_summary(system_message)
     }
     
-    await conversations.insert_one(conversation)
+    try:
+        await conversations.insert_one(conversation)
+    except DuplicateKeyError:
+        # Concurrent accept/payment created it first
+        existing = await conversations.find_one({"pair_key": key}, {"conversation_id": 1})
+        return existing.get("conversation_id")
     
     # Create system message
-    messages = db.messages
-    await messages.insert_one({
-        "message_id": f"msg_{uuid.uuid4().hex[:12]}",
-        "conversation_id": conversation_id,
-        "sender_user_id": "system",
-        "type": MessageType.SYSTEM,
-        "text": "You are now friends! Say hi 👋",
-        "created_at": now
-    })
+    await db.messages.insert_one(system_message)
     
     logger.info(f"Conversation created: {conversation_id} between {user1_id} and {user2_id}")
     return conversation_id
 
 
 @router.get("/conversations")
-async def get_conversations(request: Request):
-    """Get all conversations for current user"""
+async def get_conversations(request: Request, limit: int = INBOX_PAGE_SIZE, cursor: Optional[str] = None):
+    """
+    Get conversations for current user, most recent first.
+    Two queries per page: conversations (carrying last_message) + counterparties by $in.
+    Pass `next_cursor` back as `cursor` for the next page.
+    """
     user_id = get_user_id_from_headers(request)
     if not user_id:
         raise HTTPException(status_code=401, detail="No session token provided")
@@ -744,34 +1054,49 @@ async def get_conversations(request: Request):
     db = get_database()
     conversations = db.conversations
     users = db.users
-    messages = db.messages
     
-    # Get all conversations
-    cursor = conversations.find({
+    limit = max(1, min(limit, INBOX_MAX_PAGE_SIZE))
+    
+    query = {
         "$or": [
             {"user1_id": user_id},
             {"user2_id": user_id}
         ]
-    }).sort("last_message_at", -1)
-    
-    all_convos = await cursor.to_list(50)
+    }
+    if cursor:
+        query = {"$and": [query, keyset_filter("last_message_at", "conversation_id", cursor)]}
+    
+    # One extra row tells us whether there is another page
+    page = await conversations.find(query, {"_id": 0}).sort(
+        [("last_message_at", -1), ("conversation_id", -1)]
+    ).limit(limit + 1).to_list(limit + 1)
+    
+    next_cursor = None
+    if len(page) > limit:
+        page = page[:limit]
+        next_cursor = encode_cursor(page[-1]["last_message_at"], page[-1]["conversation_id"])
+    
+    other_ids = {c["user2_id"] if c["user1_id"] == user_id else c["user1_id"] for c in page}
+    other_users = {}
+    if other_ids:
+        async for u in users.find(
+            {"user_id": {"$in": list(other_ids)}},
+            {"_id": 0, "user_id": 1, "username": 1, "display_name": 1, "avatar_url": 1}
+        ):
+            other_users[u["user_id"]] = u
+    
+    legacy = [c for c in page if "last_message" not in c]
+    if legacy:
+        await backfill_last_messages(db, legacy)
     
     result = []
-    for c in all_convos:
+    for c in page:
         other_user_id = c["user2_id"] if c["user1_id"] == user_id else c["user1_id"]
+        other_user = other_users.get(other_user_id)
+        last_msg = c.get("last_message")
         
-        # Get other user info
-        other_user = await users.find_one({"user_id": other_user_id}, {"_id": 0})
-        
-        # Get last message
-        last_msg = await messages.find_one(
-            {"conversation_id": c["conversation_id"]},
-            {"_id": 0},
-            sort=[("created_at", -1)]
-        )
-        
-        # Count unread (simplified - no read receipts yet)
-        unread_count = 0
+        # Maintained on send / reset on read - no message counting
+        unread_count = (c.get("unread_counts") or {}).get(user_id, 0)
         
         result.append({
             "conversation_id": c["conversation_id"],
@@ -782,16 +1107,51 @@ async def get_conversations(request: Request):
                 "avatar_url": other_user.get("avatar_url") if other_user else None
             },
             "last_message": {
-                "text": last_msg.get("text") if last_msg else None,
-                "type": last_msg.get("type") if last_msg else None,
-                "sender_user_id": last_msg.get("sender_user_id") if last_msg else None,
-                "created_at": last_msg.get("created_at").isoformat() if last_msg and last_msg.get("created_at") else None
+                "text": last_msg.get("text"),
+                "type": last_msg.get("type"),
+                "sender_user_id": last_msg.get("sender_user_id"),
+                "created_at": last_msg.get("created_at").isoformat() if last_msg.get("created_at") else None
             } if last_msg else None,
             "unread_count": unread_count,
             "last_message_at": c.get("last_message_at").isoformat() if c.get("last_message_at") else None
         })
     
-    return {"conversations": result}
+    return {"conversations": result, "next_cursor": next_cursor}
+
+
+@router.post("/conversations/{conversation_id}/read")
+async def mark_conversation_read(request: Request, conversation_id: str):
+    """Mark a conversation read for the current user (resets unread_count, moves read receipt)"""
+    user_id = get_user_id_from_headers(request)
+    if not user_id:
+        raise HTTPException(status_code=401, detail="No session token provided")
+    
+    db = get_database()
+    now = utc_now()
+    
+    result = await db.conversations.update_one(
+        {
+            "conversation_id": conversation_id,
+            "$or": [
+                {"user1_id": user_id},
+                {"user2_id": user_id}
+            ]
+        },
+        {
+            "$set": {f"unread_counts.{user_id}": 0},
+            "$max": {f"read_receipts.{user_id}": now}
+        }
+    )
+    
+    if result.matched_count == 0:
+        raise HTTPException(status_code=404, detail="Conversation not found")
+    
+    return {
+        "success": True,
+        "conversation_id": conversation_id,
+        "unread_count": 0,
+        "last_read_at": now.isoformat()
+    }
 
 
 @router.get("/conversations/{other_user_id}")
@@ -806,25 +1166,16 @@ async def get_or_create_conversation(request: Request, other_user_id: str):
     friendships = db.friendships
     users = db.users
     
+    key = pair_key(user_id, other_user_id)
+    
     # Check if they are friends
-    friendship = await friendships.find_one({
-        "$or": [
-            {"requester_user_id": user_id, "addressee_user_id": other_user_id},
-            {"requester_user_id": other_user_id, "addressee_user_id": user_id}
-        ],
-        "status": FriendshipStatus.ACCEPTED
-    })
+    friendship = await friendships.find_one({"pair_key": key, "status": FriendshipStatus.ACCEPTED})
     
     if not friendship:
         raise HTTPException(status_code=403, detail="Must be friends to chat")
     
     # Find or create conversation
-    conversation = await conversations.find_one({
-        "$or": [
-            {"user1_id": user_id, "user2_id": other_user_id},
-            {"user1_id": other_user_id, "user2_id": user_id}
-        ]
-    })
+    conversation = await conversations.find_one({"pair_key": key})
     
     if not conversation:
         conversation_id = await create_conversation(db, user_id, other_user_id)
@@ -846,13 +1197,59 @@ async def get_or_create_conversation(request: Request, other_user_id: str):
     }
 
 
+# ============================================================
+# REALTIME EVENTS (SSE)
+# ============================================================
+
+@router.get("/events")
+async def stream_events(request: Request, token: Optional[str] = None):
+    """
+    Server-Sent Events stream of new messages, payment bubbles and friend
+    requests for the current user. EventSource cannot set headers, so the
+    session token may also be passed as `?token=`.
+    """
+    user_id = get_user_id_from_headers(request) or token
+    if not user_id:
+        raise HTTPException(status_code=401, detail="No session token provided")
+    
+    subscription = realtime_hub.subscribe(user_id)
+    
+    async def event_stream():
+        try:
+            yield f"retry: {CLIENT_RETRY_MS}\n\n"
+            while not await request.is_disconnected():
+                event = await subscription.next_event(KEEPALIVE_SECONDS)
+                yield format_sse(event) if event else ": keepalive\n\n"
+        finally:
+            realtime_hub.unsubscribe(subscription)
+    
+    return StreamingResponse(
+        event_stream(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
+
+
 # ============================================================
 # MESSAGE ENDPOINTS
 # ============================================================
 
 @router.get("/messages/{conversation_id}")
-async def get_messages(request: Request, conversation_id: str, limit: int = 50, before: Optional[str] = None):
-    """Get messages for a conversation"""
+async def get_messages(
+    request: Request,
+    conversation_id: str,
+    limit: int = MESSAGES_PAGE_SIZE,
+    cursor: Optional[str] = None,
+    after: Optional[str] = None,
+    before: Optional[str] = None
+):
+    """
+    Get messages for a conversation, oldest first within the page.
+    Keyset pagination on (created_at, message_id):
+    - no cursor: latest page; pass `next_cursor` back as `cursor` for older messages
+    - `after`: messages newer than a previous `sync_cursor` (incremental sync)
+    - `before` (ISO timestamp) is still accepted for older clients
+    """
     user_id = get_user_id_from_headers(request)
     if not user_id:
         raise HTTPException(status_code=401, detail="No session token provided")
@@ -873,28 +1270,47 @@ async def get_messages(request: Request, conversation_id: str, limit: int = 50,
     if not conversation:
         raise HTTPException(status_code=404, detail="Conversation not found")
     
-    # Build query
-    query = {"conversation_id": conversation_id}
-    if before:
+    if cursor and after:
+        raise HTTPException(status_code=400, detail="Use either cursor or after, not both")
+    
+    limit = max(1, min(limit, MESSAGES_MAX_PAGE_SIZE))
+    query, sort = message_page_query(conversation_id, cursor, after)
+    if before and not (cursor or after):
         query["created_at"] = {"$lt": datetime.fromisoformat(before)}
     
-    # Get messages (newest first, then reverse for display)
-    cursor = messages_coll.find(query, {"_id": 0}).sort("created_at", -1).limit(limit)
-    msgs = await cursor.to_list(limit)
-    msgs.reverse()  # Oldest first for display
+    # One extra row tells us whether there is another page
+    msgs = await messages_coll.find(query, {"_id": 0}).sort(sort).limit(limit + 1).to_list(limit + 1)
+    has_more = len(msgs) > limit
+    msgs = msgs[:limit]
     
-    result = []
-    for m in msgs:
-        result.append({
-            "message_id": m.get("message_id"),
-            "sender_user_id": m.get("sender_user_id"),
-            "type": m.get("type"),
-            "text": m.get("text"),
-            "payment": m.get("payment"),
-            "created_at": m.get("created_at").isoformat() if m.get("created_at") else None
-        })
+    if after:
+        next_cursor = None
+    else:
+        next_cursor = encode_cursor(msgs[-1]["created_at"], msgs[-1]["message_id"]) if has_more else None
+        msgs.reverse()  # Oldest first for display
+    
+    # Newest message the client now holds - pass back as `after`
+    if msgs:
+        sync_cursor = encode_cursor(msgs[-1]["created_at"], msgs[-1]["message_id"])
+    else:
+        sync_cursor = after
     
-    return {"messages": result, "conversation_id": conversation_id}
+    result = [serialize_message(m) for m in msgs]
+    
+    # Participant -> last_read_at, for "Seen" indicators
+    read_receipts = {
+        participant: read_at.isoformat()
+        for participant, read_at in (conversation.get("read_receipts") or {}).items()
+    }
+    
+    return {
+        "messages": result,
+        "conversation_id": conversation_id,
+        "read_receipts": read_receipts,
+        "next_cursor": next_cursor,
+        "sync_cursor": sync_cursor,
+        "has_more": has_more
+    }
 
 
 @router.post("/messages/send")
@@ -937,11 +1353,10 @@ async def send_message(request: Request, data: MessageSend):
     
     await messages_coll.insert_one(message)
     
-    # Update conversation last_message_at
-    await conversations.update_one(
-        {"conversation_id": data.conversation_id},
-        {"$set": {"last_message_at": now}}
-    )
+    # Update conversation last_message / last_message_at + recipient's unread count
+    recipient_user_id = conversation["user2_id"] if conversation["user1_id"] == user_id else conversation["user1_id"]
+    await set_last_message(db, message, recipient_user_id)
+    await publish_message(message, recipient_user_id)
     
     logger.info(f"Message sent: {message_id} in {data.conversation_id}")
     
@@ -992,29 +1407,19 @@ async def send_payment_in_chat(request: Request, background_tasks: BackgroundTas
     db = get_database()
     conversations = db.conversations
     messages_coll = db.messages
-    wallets = db.wallets
     users = db.users
     friendships = db.friendships
     
+    key = pair_key(user_id, data.recipient_user_id)
+    
     # Verify they are friends
-    friendship = await friendships.find_one({
-        "$or": [
-            {"requester_user_id": user_id, "addressee_user_id": data.recipient_user_id},
-            {"requester_user_id": data.recipient_user_id, "addressee_user_id": user_id}
-        ],
-        "status": FriendshipStatus.ACCEPTED
-    })
+    friendship = await friendships.find_one({"pair_key": key, "status": FriendshipStatus.ACCEPTED})
     
     if not friendship:
         raise HTTPException(status_code=403, detail="Must be friends to send PBX")
     
     # Get or create conversation
-    conversation = await conversations.find_one({
-        "$or": [
-            {"user1_id": user_id, "user2_id": data.recipient_user_id},
-            {"user1_id": data.recipient_user_id, "user2_id": user_id}
-        ]
-    })
+    conversation = await conversations.find_one({"pair_key": key}, {"conversation_id": 1})
     
     if not conversation:
         conversation_id = await create_conversation(db, user_id, data.recipient_user_id)
@@ -1069,10 +1474,8 @@ async def send_payment_in_chat(request: Request, background_tasks: BackgroundTas
         await messages_coll.insert_one(payment_message)
         
         # Update conversation
-        await conversations.update_one(
-            {"conversation_id": conversation_id},
-            {"$set": {"last_message_at": now}}
-        )
+        await set_last_message(db, payment_message, data.recipient_user_id)
+        await publish_message(payment_message, data.recipient_user_id)
         
         # Send notifications in background (only for new transfers)
         if recipient:
@@ -1095,7 +1498,7 @@ async def send_payment_in_chat(request: Request, background_tasks: BackgroundTas
         logger.info(f"Payment in chat: {tx_id} from {user_id} to {data.recipient_user_id} for ${data.amount_usd}")
     
     # Get updated balance
-    updated_wallet = await wallets.find_one({"user_id": user_id}, {"_id": 0, "usd_balance": 1})
+    updated_wallet = await get_cached_wallet(db, user_id)
     
     return {
         "success": True,
@@ -3,22 +3,41 @@ PBX Users - User management and role persistence
 """
 from fastapi import APIRouter, HTTPException, Request, Response
 from pydantic import BaseModel, EmailStr, field_validator
-from typing import Optional
+from typing import Any, Dict, Optional, Set, Tuple
 from datetime import datetime
+from pymongo.errors import DuplicateKeyError
 import logging
 import re
 
 from database.connection import get_database
+from utils.identifiers import normalize_email, recipient_cache, user_identifiers
+from utils.search import USER_SEARCH_FIELDS, token_filter, user_search_tokens
 
 router = APIRouter(prefix="/api/users", tags=["users"])
 logger = logging.getLogger(__name__)
 
 
-def normalize_email(email: str) -> str:
-    """Normalize email: lowercase and trim whitespace"""
-    if not email:
-        return None
-    return email.lower().strip()
+async def _identity_update(db, user_id: str, set_fields: Dict[str, Any]) -> Tuple[Dict[str, Any], Dict[str, Any], Set[str]]:
+    """
+    $set / $unset for an email change, with `identifiers` and `search_tokens`
+    recomputed so they travel in the same update_one: a key held by another
+    user fails the whole write (DuplicateKeyError) instead of half of it.
+    Returns (set_fields, unset_fields, identifier keys to drop from the recipient cache).
+    """
+    user = await db.users.find_one(
+        {"user_id": user_id},
+        {"_id": 0, "identifiers": 1, "phone": 1, **{field: 1 for field in USER_SEARCH_FIELDS}}
+    ) or {}
+    merged = {**user, **set_fields}
+    keys = user_identifiers(merged)
+    set_fields = {**set_fields, "search_tokens": user_search_tokens(merged)}
+    unset_fields = {}
+    if keys:
+        set_fields["identifiers"] = keys
+    else:
+        # An empty array would collide with other key-less users in the unique index
+        unset_fields["identifiers"] = ""
+    return set_fields, unset_fields, set(user.get("identifiers") or []) | set(keys)
 
 
 class SetRoleRequest(BaseModel):
@@ -47,29 +66,12 @@ def get_user_id_from_headers(request: Request) -> str:
     return token[:36] if token else None
 
 
-async def ensure_indexes(db):
-    """Ensure required indexes exist on users collection"""
-    try:
-        # Create unique sparse index on email (sparse allows multiple nulls)
-        await db.users.create_index(
-            "email",
-            unique=True,
-            sparse=True,
-            name="email_unique_sparse"
-        )
-        # Index on user_id for fast lookups
-        await db.users.create_index("user_id", unique=True, name="user_id_unique")
-    except Exception as e:
-        # Index may already exist, that's fine
-        logger.debug(f"Index creation note: {e}")
-
-
 @router.post("/role")
 async def set_user_role(request: Request, data: SetRoleRequest):
     """
     Set user role (sender or recipient) and optionally email.
     This is called during onboarding and persisted to database.
-    Email is normalized (lowercase/trimmed) and must be unique.
+    Email is normalized (lowercase/trimmed), must be valid and must be unique.
     """
     user_id = get_user_id_from_headers(request)
     
@@ -83,9 +85,6 @@ async def set_user_role(request: Request, data: SetRoleRequest):
         db = get_database()
         users_collection = db.users
         
-        # Ensure indexes exist
-        await ensure_indexes(db)
-        
         now = datetime.utcnow()
         
         # Build update fields
@@ -97,6 +96,8 @@ async def set_user_role(request: Request, data: SetRoleRequest):
         # Add normalized email if provided
         if data.email:
             normalized_email = normalize_email(data.email)
+            if normalized_email is None:
+                raise HTTPException(status_code=400, detail="Invalid email address")
             
             # Check if email is already used by another user
             existing = await users_collection.find_one({
@@ -111,18 +112,25 @@ async def set_user_role(request: Request, data: SetRoleRequest):
             
             set_fields["email"] = normalized_email
         
+        unset_fields, stale_keys = {}, set()
+        if "email" in set_fields:
+            set_fields, unset_fields, stale_keys = await _identity_update(db, user_id, set_fields)
+        
         # Upsert user with role and email
-        await users_collection.update_one(
-            {"user_id": user_id},
-            {
-                "$set": set_fields,
-                "$setOnInsert": {
-                    "user_id": user_id,
-                    "created_at": now
-                }
-            },
-            upsert=True
-        )
+        update = {
+            "$set": set_fields,
+            "$setOnInsert": {
+                "user_id": user_id,
+                "created_at": now
+            }
+        }
+        if unset_fields:
+            update["$unset"] = unset_fields
+        try:
+            await users_collection.update_one({"user_id": user_id}, update, upsert=True)
+        except DuplicateKeyError:
+            raise HTTPException(status_code=409, detail="Email already registered to another account")
+        recipient_cache.invalidate(stale_keys)
         
         logger.info(f"User role set: user_id={user_id}, role={data.role}, email={data.email}")
         
@@ -203,21 +211,34 @@ async def update_user(request: Request):
         
         update_fields = {"updated_at": now}
         if "email" in body:
-            update_fields["email"] = body["email"]
+            email = body["email"]
+            if email:
+                email = normalize_email(email) if isinstance(email, str) else None
+                if email is None:
+                    raise HTTPException(status_code=400, detail="Invalid email address")
+            update_fields["email"] = email or None
         if "role" in body and body["role"] in ['sender', 'recipient']:
             update_fields["role"] = body["role"]
         
-        await users_collection.update_one(
-            {"user_id": user_id},
-            {
-                "$set": update_fields,
-                "$setOnInsert": {
-                    "user_id": user_id,
-                    "created_at": now
-                }
-            },
-            upsert=True
-        )
+        unset_fields, stale_keys = {}, set()
+        if "email" in update_fields:
+            update_fields, unset_fields, stale_keys = await _identity_update(db, user_id, update_fields)
+        
+        update = {
+            "$set": update_fields,
+            "$setOnInsert": {
+                "user_id": user_id,
+                "created_at": now
+            }
+        }
+        if unset_fields:
+            update["$unset"] = unset_fields
+        try:
+            await users_collection.update_one({"user_id": user_id}, update, upsert=True)
+        except DuplicateKeyError:
+            # email_unique_sparse or idx_users_identifiers_unique - nothing was written
+            raise HTTPException(status_code=409, detail="Email already registered to another account")
+        recipient_cache.invalidate(stale_keys)
         
         logger.info(f"User updated: user_id={user_id}")
         
@@ -227,6 +248,8 @@ async def update_user(request: Request):
             "updated_at": now.isoformat()
         }
         
+    except HTTPException:
+        raise
     except Exception as e:
         logger.error(f"Error updating user: {e}")
         raise HTTPException(status_code=500, detail="Failed to update user")
@@ -238,23 +261,15 @@ async def search_users(request: Request, q: str = ""):
     Search PBX users by name, @username, phone, or email.
     Returns matching users for recipient selection.
     """
-    if not q or len(q) < 2:
+    search_filter = token_filter(q)
+    if not search_filter:
         return {"users": []}
     
-    query = q.lower().strip()
-    
     try:
         db = get_database()
         users_collection = db.users
         
-        # Build search query - match email or phone
-        search_filter = {
-            "$or": [
-                {"email": {"$regex": query, "$options": "i"}},
-                {"phone": {"$regex": query, "$options": "i"}},
-                {"display_name": {"$regex": query, "$options": "i"}},
-            ]
-        }
+        # Prefix match on email, phone or name words (search_tokens index)
         
         # Find matching users
         cursor = users_collection.find(
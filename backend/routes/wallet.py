@@ -7,16 +7,16 @@ from fastapi.security import HTTPBearer, HTTPAuthorizationCredentials
 from pydantic import BaseModel
 from typing import Optional
 import os
-import httpx
 import jwt
 from datetime import datetime, timezone
 
 from database.connection import get_database
+from services.fx_rates import fx_rate_service
+from utils.wallet_cache import get_cached_wallet, invalidate_wallet, KEY_SPACE_COMPAT
 
 router = APIRouter(prefix="/api")
 
 # FX rate source
-OPENEXCHANGERATES_API_KEY = os.environ.get("OPENEXCHANGERATES_API_KEY")
 FALLBACK_USD_PHP_RATE = 56.10  # Fallback if API unavailable
 
 # JWT Configuration (match auth.py)
@@ -85,10 +85,15 @@ async def get_wallet_balance(session: dict = Depends(require_session)):
     db = get_database()
     user_id = session["userId"]
     
-    # Try both userId formats (Netlify uses userId, FastAPI uses user_id)
-    wallet = await db.wallets.find_one({"userId": user_id})
-    if not wallet:
-        wallet = await db.wallets.find_one({"user_id": user_id})
+    async def load_wallet():
+        # Try both userId formats (Netlify uses userId, FastAPI uses user_id)
+        wallet = await db.wallets.find_one({"userId": user_id})
+        if not wallet:
+            wallet = await db.wallets.find_one({"user_id": user_id})
+        return wallet
+    
+    # Cached snapshot - a hit skips both lookups
+    wallet = await get_cached_wallet(db, user_id, loader=load_wallet, key_space=KEY_SPACE_COMPAT)
     
     if not wallet:
         # Create default wallet with demo amounts
@@ -113,20 +118,9 @@ async def get_wallet_balance(session: dict = Depends(require_session)):
 
 
 async def get_fx_rate(from_currency: str = "USD", to_currency: str = "PHP") -> float:
-    """Fetch live FX rate from OpenExchangeRates or use fallback"""
-    if OPENEXCHANGERATES_API_KEY:
-        try:
-            async with httpx.AsyncClient() as client:
-                res = await client.get(
-                    f"https://openexchangerates.org/api/latest.json?app_id={OPENEXCHANGERATES_API_KEY}&base=USD",
-                    timeout=5.0
-                )
-                if res.status_code == 200:
-                    data = res.json()
-                    return float(data.get("rates", {}).get(to_currency, FALLBACK_USD_PHP_RATE))
-        except Exception:
-            pass
-    return FALLBACK_USD_PHP_RATE
+    """Get the live FX rate from the shared FX rate service or use fallback"""
+    rate, _ = await fx_rate_service.get_rate(to_currency, fallback=FALLBACK_USD_PHP_RATE)
+    return rate
 
 
 @router.get("/fx/quote")
@@ -211,6 +205,8 @@ async def convert_currency(
         }
     )
     
+    await invalidate_wallet(user_id)
+    
     # Log transaction
     await db.transactions.insert_one({
         "userId": user_id,
@@ -1,5 +1,5 @@
 from fastapi import FastAPI, APIRouter, HTTPException, status, Depends, Request, Response
-from fastapi.responses import JSONResponse
+from fastapi.responses import JSONResponse, StreamingResponse
 from dotenv import load_dotenv
 from starlette.middleware.cors import CORSMiddleware
 from pydantic import BaseModel, Field, ValidationError
@@ -8,8 +8,11 @@ from slowapi.errors import RateLimitExceeded
 import os
 import logging
 from pathlib import Path
-from typing import List
+from typing import List, Literal
 import re
+import csv
+import io
+import json
 from datetime import datetime
 
 # Import database connection
@@ -25,7 +28,7 @@ from models.session_state import (
 )
 
 # Import services
-from services.lead_service import LeadService
+from services.lead_service import LeadService, iter_csv_emails
 from services.session_service import SessionService
 from services.plaid_service import get_plaid_service
 
@@ -46,6 +49,7 @@ from routes.admin import router as admin_router
 from routes.banks import router as banks_router
 from routes.circle import router as circle_router
 from routes.wallet import router as wallet_router
+from routes.activity import router as activity_router
 
 # Import utilities
 from utils.user_helper import get_user_id, get_user_id_from_request
@@ -136,6 +140,32 @@ async def health_check():
             "error": "Database connection failed"  # No detailed error for security
         }
     
+    # Wallet snapshot cache (hit rate, size, backend)
+    from utils.wallet_cache import wallet_cache
+    health_status["components"]["wallet_cache"] = wallet_cache.stats()
+    
+    # Recipient resolution cache (positive + "not on PBX" entries)
+    from utils.identifiers import recipient_cache
+    health_status["components"]["recipient_cache"] = recipient_cache.stats()
+    
+    from services.fx_rates import fx_rate_service
+    health_status["components"]["fx_rates"] = fx_rate_service.stats()
+    
+    from services.http_clients import http_clients
+    health_status["components"]["outbound_http"] = http_clients.stats()
+    
+    from services.sdk_executor import sdk_executor
+    health_status["components"]["sdk_executor"] = sdk_executor.stats()
+    
+    from services.realtime import realtime_hub
+    health_status["components"]["realtime"] = realtime_hub.stats()
+    
+    from services.statement_exports import statement_export_service
+    health_status["components"]["statement_exports"] = statement_export_service.stats()
+    
+    from services.integrity_scanner import integrity_scanner
+    health_status["components"]["integrity_scanner"] = integrity_scanner.stats()
+    
     # Feature flags (loaded from env, no secrets)
     health_status["features"] = {
         "email_notifications": bool(os.environ.get("RESEND_API_KEY")),
@@ -209,21 +239,75 @@ async def create_lead(request: Request, lead_data: LeadCreate):
             detail="Failed to create lead"
         )
 
+# Max rows per GET /api/leads export
+LEADS_EXPORT_MAX = 100_000
+LEAD_EXPORT_FIELDS = ["_id", "email", "created_at"]
+
+
+async def stream_leads(leads, format: str):
+    """Encode leads row by row (JSON array, NDJSON or CSV)"""
+    if format == "csv":
+        buffer = io.StringIO()
+        writer = csv.DictWriter(buffer, fieldnames=LEAD_EXPORT_FIELDS, lineterminator="\r\n")
+        writer.writeheader()
+        async for lead in leads:
+            writer.writerow(lead)
+            yield buffer.getvalue()
+            buffer.seek(0)
+            buffer.truncate()
+        yield buffer.getvalue()
+    elif format == "ndjson":
+        async for lead in leads:
+            yield json.dumps(lead) + "\n"
+    else:
+        separator = "["
+        async for lead in leads:
+            yield separator + json.dumps(lead)
+            separator = ","
+        yield "[]" if separator == "[" else "]"
+
+
 @api_router.get("/leads")
-async def get_all_leads(admin: str = Depends(verify_admin_auth)):
+async def get_all_leads(
+    format: Literal["json", "ndjson", "csv"] = "json",
+    limit: int = 500,
+    skip: int = 0,
+    admin: str = Depends(verify_admin_auth)
+):
     """
-    Get last 500 leads, newest first.
+    Stream leads, newest first (last 500 by default).
+    format: json (array, default), ndjson or csv.
+    Requires Basic Auth: admin:<ADMIN_PASSWORD>
+    """
+    limit = max(1, min(limit, LEADS_EXPORT_MAX))
+    media_types = {"json": "application/json", "ndjson": "application/x-ndjson", "csv": "text/csv"}
+    headers = {}
+    if format == "csv":
+        headers["Content-Disposition"] = f'attachment; filename="pbx-leads-{datetime.utcnow():%Y-%m-%d}.csv"'
+    
+    return StreamingResponse(
+        stream_leads(lead_service.iter_leads(skip=max(0, skip), limit=limit), format),
+        media_type=media_types[format],
+        headers=headers
+    )
+
+
+@api_router.post("/leads/import")
+async def import_leads(request: Request, admin: str = Depends(verify_admin_auth)):
+    """
+    Bulk import a CSV lead list (raw text/csv body, `email` column or first column).
+    Parsed as it streams in and inserted in batches; existing emails are skipped.
     Requires Basic Auth: admin:<ADMIN_PASSWORD>
     """
     try:
-        leads = await lead_service.get_all_leads(skip=0, limit=500)
-        return leads
+        summary = await lead_service.import_leads(iter_csv_emails(request.stream()))
     except Exception as e:
-        logger.error(f"Error fetching leads: {e}")
+        logger.error(f"Error importing leads: {e}")
         raise HTTPException(
             status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
-            detail="Failed to fetch leads"
+            detail="Failed to import leads"
         )
+    return {"status": "ok", **summary}
 
 # ============== State Management Routes ==============
 
@@ -630,6 +714,7 @@ app.include_router(admin_router)
 app.include_router(banks_router)
 app.include_router(circle_router)
 app.include_router(wallet_router)
+app.include_router(activity_router)
 
 # CORS middleware - allow specific origins or wildcard
 cors_origins_env = os.environ.get('CORS_ORIGINS', '*')
@@ -651,6 +736,7 @@ app.add_middleware(
     allow_credentials=allow_credentials_flag,
     allow_methods=["GET", "POST", "PUT", "DELETE", "OPTIONS"],
     allow_headers=["*"],
+    expose_headers=["Content-Disposition"],  # export filenames
     max_age=3600,  # Cache preflight requests for 1 hour
 )
 
@@ -664,12 +750,36 @@ async def startup_event():
         db = await connect_to_mongo()
         logger.info("PBX API connected to MongoDB")
         
-        # Setup ledger and audit indexes
-        from utils.ledger import setup_ledger_indexes
-        from utils.admin import setup_audit_indexes
+        # Indexes for every collection (database/indexes.py registry)
+        from database.indexes import apply_indexes
+        await apply_indexes(db)
+        
+        # One-off data migrations (recorded in schema_migrations, run once)
+        from migrations import run_pending_migrations
+        try:
+            await run_pending_migrations(db)
+        except Exception as e:
+            logger.error(f"Data migration failed (retried on next startup): {e}")
+        
+        # Pooled outbound HTTP clients (FX, Twilio, Resend)
+        from services.http_clients import http_clients
+        await http_clients.start()
+        
+        # Warm FX rates and keep them fresh in the background
+        from services.fx_rates import fx_rate_service
+        await fx_rate_service.start()
+        
+        # Chat / social push (in-process, or Mongo change stream across workers)
+        from services.realtime import realtime_hub
+        await realtime_hub.start(db)
+        
+        # Background statement exports (resumes interrupted jobs)
+        from services.statement_exports import statement_export_service
+        await statement_export_service.start(db)
         
-        await setup_ledger_indexes(db)
-        await setup_audit_indexes(db)
+        # Continuous, rate-limited ledger integrity scan (resumes from its checkpoint)
+        from services.integrity_scanner import integrity_scanner
+        await integrity_scanner.start(db)
         
         logger.info("PBX API started successfully with ledger hardening enabled")
     except Exception as e:
@@ -678,6 +788,18 @@ async def startup_event():
 
 @app.on_event("shutdown")
 async def shutdown_event():
-    """Close MongoDB connection on shutdown."""
+    """Stop background services and close MongoDB connection on shutdown."""
+    from services.fx_rates import fx_rate_service
+    from services.http_clients import http_clients
+    from services.sdk_executor import sdk_executor
+    from services.realtime import realtime_hub
+    from services.statement_exports import statement_export_service
+    from services.integrity_scanner import integrity_scanner
+    await integrity_scanner.stop()
+    await statement_export_service.stop()
+    await realtime_hub.stop()
+    await fx_rate_service.stop()
+    await http_clients.close()
+    sdk_executor.shutdown()
     await close_mongo_connection()
     logger.info("PBX API shut down successfully")
\ No newline at end of file
@@ -0,0 +1,185 @@
+"""
+PBX FX Rates - shared USD rate service (OpenExchangeRates)
+Shared pooled HTTP client (services/http_clients), a TTL cache, single-flight
+refreshes and a background refresher, so quote/lock/convert requests almost never wait on the FX API.
+
+Resolution order for a rate:
+1. Cached rates younger than FX_CACHE_TTL_SECONDS            -> source "live"
+2. One coalesced fetch (concurrent misses share it)          -> source "live"
+3. Last good rates younger than FX_STALE_MAX_AGE_SECONDS     -> source "stale"
+4. Caller's fallback rate                                    -> source "mock"
+"""
+
+from datetime import datetime, timezone
+from typing import Optional, Dict, Any, Tuple
+import asyncio
+import logging
+import os
+import time
+
+import httpx
+
+from services.http_clients import http_clients, OPENEXCHANGERATES
+
+logger = logging.getLogger(__name__)
+
+OPENEXCHANGERATES_API_KEY = os.environ.get("OPENEXCHANGERATES_API_KEY", "")
+
+FX_CACHE_TTL_SECONDS = float(os.environ.get("FX_CACHE_TTL_SECONDS", "60"))
+FX_REFRESH_INTERVAL_SECONDS = float(os.environ.get("FX_REFRESH_INTERVAL_SECONDS", "50"))
+FX_STALE_MAX_AGE_SECONDS = float(os.environ.get("FX_STALE_MAX_AGE_SECONDS", "3600"))
+FX_ERROR_BACKOFF_SECONDS = 10.0  # after a failed fetch, serve stale/fallback without retrying
+
+
+class FxRateService:
+    """USD-based rate table with caching, single-flight fetches and background refresh"""
+
+    def __init__(
+        self,
+        api_key: str = OPENEXCHANGERATES_API_KEY,
+        ttl_seconds: float = FX_CACHE_TTL_SECONDS,
+        refresh_interval: float = FX_REFRESH_INTERVAL_SECONDS,
+        stale_max_age: float = FX_STALE_MAX_AGE_SECONDS
+    ):
+        self.api_key = api_key
+        self.ttl_seconds = ttl_seconds
+        self.refresh_interval = refresh_interval
+        self.stale_max_age = stale_max_age
+
+        self._rates: Optional[Dict[str, float]] = None
+        self._fetched_at = 0.0  # monotonic
+        self._fetched_at_utc: Optional[datetime] = None
+        self._retry_after = 0.0
+        self._inflight: Optional[asyncio.Task] = None
+        self._refresher: Optional[asyncio.Task] = None
+
+        self.metrics = {
+            "hits": 0,
+            "misses": 0,
+            "coalesced": 0,
+            "fetches": 0,
+            "fetch_errors": 0,
+            "stale_served": 0,
+            "fallback_served": 0,
+        }
+
+    # === Lifecycle ===
+
+    async def start(self):
+        """Warm the cache and start the background refresher (no-op without an API key)"""
+        if not self.api_key:
+            logger.warning("OPENEXCHANGERATES_API_KEY not configured, FX rates will use fallback rates")
+            return
+        if self._refresher and not self._refresher.done():
+            return
+        self._refresher = asyncio.create_task(self._refresh_loop(), name="fx-rate-refresher")
+        logger.info(f"FX rate refresher started (every {self.refresh_interval:.0f}s)")
+
+    async def stop(self):
+        if self._refresher:
+            self._refresher.cancel()
+            try:
+                await self._refresher
+            except asyncio.CancelledError:
+                pass
+            self._refresher = None
+
+    async def _refresh_loop(self):
+        while True:
+            try:
+                await self._fetch_coalesced()
+            except Exception as e:
+                # Logged in _fetch - the loop must survive API outages
+                logger.debug(f"FX background refresh failed: {e}")
+            await asyncio.sleep(self.refresh_interval)
+
+    # === Fetching ===
+
+    async def _fetch(self) -> Dict[str, float]:
+        self.metrics["fetches"] += 1
+        try:
+            response = await http_clients.request(
+                OPENEXCHANGERATES, "GET", "/latest.json",
+                params={"app_id": self.api_key, "base": "USD"}
+            )
+            response.raise_for_status()
+            data = response.json()
+            rates = data.get("rates")
+            if not isinstance(rates, dict) or "PHP" not in rates:
+                raise ValueError("Invalid response structure from OpenExchangeRates API")
+        except Exception as e:
+            self.metrics["fetch_errors"] += 1
+            self._retry_after = time.monotonic() + FX_ERROR_BACKOFF_SECONDS
+            if isinstance(e, httpx.TimeoutException):
+                logger.warning("OpenExchangeRates API timeout")
+            else:
+                logger.warning(f"OpenExchangeRates API error: {e}")
+            raise
+
+        self._rates = {currency: float(rate) for currency, rate in rates.items()}
+        self._fetched_at = time.monotonic()
+        self._fetched_at_utc = datetime.now(timezone.utc)
+        logger.info(f"Fetched live FX rates: 1 USD = {self._rates['PHP']} PHP")
+        return self._rates
+
+    async def _fetch_coalesced(self) -> Dict[str, float]:
+        """Single-flight: concurrent callers share one outbound request"""
+        if self._inflight is None or self._inflight.done():
+            self._inflight = asyncio.create_task(self._fetch())
+            # Mark the result retrieved even if every waiter was cancelled
+            self._inflight.add_done_callback(lambda task: task.cancelled() or task.exception())
+        else:
+            self.metrics["coalesced"] += 1
+        # Shield so one cancelled request does not cancel the fetch for everyone else
+        return await asyncio.shield(self._inflight)
+
+    def _age(self) -> float:
+        return time.monotonic() - self._fetched_at
+
+    # === Public API ===
+
+    async def get_rates(self) -> Tuple[Optional[Dict[str, float]], str]:
+        """
+        USD-based rate table and its source: "live", "stale", or (None, "mock")
+        when no usable rates exist.
+        """
+        if not self.api_key:
+            return None, "mock"
+
+        if self._rates is not None and self._age() < self.ttl_seconds:
+            self.metrics["hits"] += 1
+            return self._rates, "live"
+
+        self.metrics["misses"] += 1
+        if time.monotonic() >= self._retry_after:
+            try:
+                return await self._fetch_coalesced(), "live"
+            except Exception:
+                pass
+
+        if self._rates is not None and self._age() < self.stale_max_age:
+            self.metrics["stale_served"] += 1
+            return self._rates, "stale"
+        return None, "mock"
+
+    async def get_rate(self, to_currency: str = "PHP", fallback: float = 0.0) -> Tuple[float, str]:
+        """USD -> to_currency rate and source ("live", "stale" or "mock")"""
+        rates, source = await self.get_rates()
+        if rates is None or to_currency not in rates:
+            self.metrics["fallback_served"] += 1
+            return fallback, "mock"
+        return rates[to_currency], source
+
+    def stats(self) -> Dict[str, Any]:
+        lookups = self.metrics["hits"] + self.metrics["misses"]
+        return {
+            "configured": bool(self.api_key),
+            "refresher_running": bool(self._refresher and not self._refresher.done()),
+            "age_seconds": round(self._age(), 1) if self._rates is not None else None,
+            "last_refresh_at": self._fetched_at_utc.isoformat() if self._fetched_at_utc else None,
+            "hit_rate": round(self.metrics["hits"] / lookups, 4) if lookups else 0.0,
+            **self.metrics,
+        }
+
+
+fx_rate_service = FxRateService()
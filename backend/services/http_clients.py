@@ -0,0 +1,169 @@
+"""
+PBX Outbound HTTP - app-lifetime clients for third-party integrations
+One pooled httpx.AsyncClient per integration, opened in startup_event and
+closed in shutdown_event, so outbound calls reuse warm keep-alive connections
+instead of paying a TCP + TLS handshake per request.
+
+Per integration:
+- base_url, timeouts and connection pool limits
+- HTTP/2 when the server and the `h2` package support it (HTTP/1.1 keep-alive otherwise)
+- retry budget:
+  * connect failures are retried for every method (nothing was sent yet)
+  * idempotent requests (GET) are also retried on timeouts and 5xx responses
+
+Usage:
+    response = await http_clients.request("twilio", "POST", path, data=...)
+"""
+
+from importlib.util import find_spec
+from typing import Dict, Any
+import asyncio
+import logging
+
+import httpx
+
+logger = logging.getLogger(__name__)
+
+HTTP2_AVAILABLE = find_spec("h2") is not None
+IDEMPOTENT_METHODS = {"GET", "HEAD", "OPTIONS"}
+RETRY_BACKOFF_SECONDS = 0.2
+
+
+class Integration:
+    """Connection settings for one third-party API"""
+
+    def __init__(
+        self,
+        name: str,
+        base_url: str,
+        timeout: httpx.Timeout,
+        retries: int = 1,
+        max_connections: int = 20,
+        max_keepalive_connections: int = 10,
+        keepalive_expiry: float = 60.0,
+        verify: bool = True
+    ):
+        self.name = name
+        self.base_url = base_url
+        self.timeout = timeout
+        self.retries = retries
+        self.verify = verify
+        self.limits = httpx.Limits(
+            max_connections=max_connections,
+            max_keepalive_connections=max_keepalive_connections,
+            keepalive_expiry=keepalive_expiry
+        )
+
+
+OPENEXCHANGERATES = "openexchangerates"
+TWILIO = "twilio"
+RESEND = "resend"
+
+INTEGRATIONS: Dict[str, Integration] = {
+    OPENEXCHANGERATES: Integration(
+        OPENEXCHANGERATES,
+        base_url="https://openexchangerates.org/api",
+        timeout=httpx.Timeout(10.0, connect=3.0),
+        retries=2,
+        max_connections=10,
+        max_keepalive_connections=5
+    ),
+    TWILIO: Integration(
+        TWILIO,
+        base_url="https://api.twilio.com/2010-04-01",
+        timeout=httpx.Timeout(10.0, connect=3.0),
+        retries=1
+    ),
+    RESEND: Integration(
+        RESEND,
+        base_url="https://api.resend.com",
+        timeout=httpx.Timeout(15.0, connect=3.0),
+        retries=1
+    ),
+}
+
+
+class OutboundHttp:
+    """Registry of pooled clients, one per integration"""
+
+    def __init__(self, integrations: Dict[str, Integration]):
+        self.integrations = integrations
+        self._clients: Dict[str, httpx.AsyncClient] = {}
+        self.metrics: Dict[str, Dict[str, int]] = {
+            name: {"requests": 0, "retries": 0, "errors": 0} for name in integrations
+        }
+
+    def _build_client(self, integration: Integration) -> httpx.AsyncClient:
+        # Transport-level retries only cover connection failures - safe for POSTs
+        transport = httpx.AsyncHTTPTransport(
+            http2=HTTP2_AVAILABLE,
+            verify=integration.verify,
+            limits=integration.limits,
+            retries=integration.retries
+        )
+        return httpx.AsyncClient(
+            base_url=integration.base_url,
+            timeout=integration.timeout,
+            transport=transport
+        )
+
+    def client(self, name: str) -> httpx.AsyncClient:
+        """Pooled client for an integration (created on first use if start() was not called)"""
+        client = self._clients.get(name)
+        if client is None or client.is_closed:
+            client = self._build_client(self.integrations[name])
+            self._clients[name] = client
+        return client
+
+    async def start(self):
+        for name in self.integrations:
+            self.client(name)
+        logger.info(
+            f"Outbound HTTP clients ready: {', '.join(self.integrations)} "
+            f"({'HTTP/2' if HTTP2_AVAILABLE else 'HTTP/1.1 keep-alive'})"
+        )
+
+    async def close(self):
+        clients, self._clients = self._clients, {}
+        for client in clients.values():
+            await client.aclose()
+
+    async def request(self, name: str, method: str, url: str, **kwargs) -> httpx.Response:
+        """
+        Send a request on the integration's pooled client.
+        Idempotent methods are retried on timeouts and 5xx within the retry budget.
+        """
+        integration = self.integrations[name]
+        metrics = self.metrics[name]
+        attempts = 1 + (integration.retries if method.upper() in IDEMPOTENT_METHODS else 0)
+
+        for attempt in range(attempts):
+            metrics["requests"] += 1
+            if attempt:
+                metrics["retries"] += 1
+                await asyncio.sleep(RETRY_BACKOFF_SECONDS * attempt)
+            try:
+                response = await self.client(name).request(method, url, **kwargs)
+            except httpx.TimeoutException:
+                if attempt + 1 < attempts:
+                    continue
+                metrics["errors"] += 1
+                raise
+            except httpx.HTTPError:
+                metrics["errors"] += 1
+                raise
+            if response.status_code >= 500 and attempt + 1 < attempts:
+                continue
+            if response.status_code >= 500:
+                metrics["errors"] += 1
+            return response
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "http2": HTTP2_AVAILABLE,
+            "open_clients": sorted(name for name, client in self._clients.items() if not client.is_closed),
+            "integrations": self.metrics,
+        }
+
+
+http_clients = OutboundHttp(INTEGRATIONS)
@@ -0,0 +1,294 @@
+"""
+PBX Integrity Scanner - continuous double-entry check of the whole ledger
+/api/admin/integrity/transfer/{tx_id} verifies one transfer on demand. The
+scanner walks every ledger_tx header in (created_at, tx_id) order and checks,
+batch by batch (one aggregate with a $lookup of the entries):
+
+- completed transfers have exactly two entries, a debit and a credit
+- the entries sum to zero and match the header amount and currency
+  (exactly, in amount_minor units - converted from amount for transfers
+  migration 0005 has not backfilled yet)
+- the debit belongs to from_user_id and the credit to to_user_id
+- failed transfers have no entries
+
+Violations are upserted into integrity_findings ({tx_id}:{check}), so a
+rescan never duplicates a finding. Progress is saved in integrity_scan_state
+after every batch and held under a lease: one worker scans at a time, and a
+restarted or replacement worker continues from the checkpoint.
+
+Production safety:
+- reads go to secondaries when there are any (secondaryPreferred)
+- at most INTEGRITY_SCAN_RATE headers per second; batches are small
+- headers younger than INTEGRITY_SCAN_LAG_SECONDS are left for a later pass
+  (the non-transactional path writes the header before its entries)
+"""
+
+from datetime import datetime, timedelta, timezone
+from typing import Any, Dict, List, Optional
+import asyncio
+import logging
+import os
+import time
+import uuid
+
+from pymongo import ReadPreference, UpdateOne
+
+from utils.money import stored_minor
+
+logger = logging.getLogger(__name__)
+
+INTEGRITY_SCANNER_ENABLED = os.environ.get("INTEGRITY_SCANNER_ENABLED", "true").lower() == "true"
+INTEGRITY_SCAN_BATCH_SIZE = int(os.environ.get("INTEGRITY_SCAN_BATCH_SIZE", "100"))
+INTEGRITY_SCAN_RATE = float(os.environ.get("INTEGRITY_SCAN_RATE", "200"))  # headers / second
+INTEGRITY_SCAN_LAG_SECONDS = float(os.environ.get("INTEGRITY_SCAN_LAG_SECONDS", "300"))
+INTEGRITY_SCAN_IDLE_SECONDS = float(os.environ.get("INTEGRITY_SCAN_IDLE_SECONDS", "60"))
+INTEGRITY_SCAN_LEASE_SECONDS = 120
+INTEGRITY_SCAN_ERROR_BACKOFF_SECONDS = 30.0
+
+SCAN_STATE_ID = "ledger_tx"
+
+# Entry fields the checks need
+ENTRY_FIELDS = ["ledger_tx_id", "user_id", "entry_type", "currency", "amount", "amount_minor"]
+
+
+def utc_now():
+    return datetime.now(timezone.utc)
+
+
+def _differs(a: Dict[str, Any], b: Dict[str, Any], sign: int = 1) -> bool:
+    """a.amount != sign * b.amount, compared exactly in minor units"""
+    return stored_minor(a, "amount", a.get("currency")) != sign * stored_minor(b, "amount", b.get("currency"))
+
+
+def check_transfer(header: Dict[str, Any], entries: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+    """Integrity violations for one ledger_tx header and its entries ([] when intact)"""
+    status = header.get("status")
+    if status == "failed":
+        if entries:
+            return [{"check": "entries_on_failed_tx", "detail": f"{len(entries)} entries on a failed transfer"}]
+        return []
+    if status != "completed":
+        return []
+
+    if len(entries) != 2:
+        return [{"check": "entry_count", "detail": f"Expected 2 entries, found {len(entries)}"}]
+
+    findings = []
+    if _differs(entries[0], entries[1], -1):
+        total = sum(e.get("amount") or 0 for e in entries)
+        findings.append({"check": "unbalanced", "detail": f"Entries sum to {total}"})
+
+    debit = next((e for e in entries if e.get("entry_type") == "debit"), None)
+    credit = next((e for e in entries if e.get("entry_type") == "credit"), None)
+    if debit is None or credit is None:
+        findings.append({"check": "entry_types", "detail": "Expected one debit and one credit entry"})
+        return findings
+
+    amount = header.get("amount") or 0
+    if _differs(credit, header) or _differs(debit, header, -1):
+        findings.append({
+            "check": "amount_mismatch",
+            "detail": f"Header amount {amount}, debit {debit.get('amount')}, credit {credit.get('amount')}"
+        })
+    if any(e.get("currency") != header.get("currency") for e in entries):
+        findings.append({"check": "currency_mismatch", "detail": f"Header currency {header.get('currency')}"})
+    if debit.get("user_id") != header.get("from_user_id") or credit.get("user_id") != header.get("to_user_id"):
+        findings.append({
+            "check": "wrong_party",
+            "detail": f"Debit user {debit.get('user_id')}, credit user {credit.get('user_id')}"
+        })
+    return findings
+
+
+def scan_pipeline(checkpoint: Optional[Dict[str, Any]], until: datetime, batch_size: int) -> List[Dict[str, Any]]:
+    """Next batch of headers after the checkpoint, entries attached"""
+    match: Dict[str, Any] = {"created_at": {"$lt": until}}
+    if checkpoint:
+        match = {"$and": [match, {"$or": [
+            {"created_at": {"$gt": checkpoint["created_at"]}},
+            {"created_at": checkpoint["created_at"], "tx_id": {"$gt": checkpoint["tx_id"]}}
+        ]}]}
+    return [
+        {"$match": match},
+        {"$sort": {"created_at": 1, "tx_id": 1}},
+        {"$limit": batch_size},
+        # Entries found through idx_ledger_tx_ref
+        {"$lookup": {"from": "ledger", "localField": "tx_id", "foreignField": "ledger_tx_id", "as": "entries"}},
+        {"$project": {
+            "_id": 0, "tx_id": 1, "status": 1, "amount": 1, "amount_minor": 1, "currency": 1,
+            "from_user_id": 1, "to_user_id": 1, "created_at": 1,
+            **{f"entries.{field}": 1 for field in ENTRY_FIELDS}
+        }},
+    ]
+
+
+class IntegrityScanner:
+    """Background ledger_tx walker with a persisted checkpoint and a lease"""
+
+    def __init__(
+        self,
+        batch_size: int = INTEGRITY_SCAN_BATCH_SIZE,
+        rate: float = INTEGRITY_SCAN_RATE,
+        lag_seconds: float = INTEGRITY_SCAN_LAG_SECONDS,
+        idle_seconds: float = INTEGRITY_SCAN_IDLE_SECONDS
+    ):
+        self.batch_size = batch_size
+        self.rate = rate
+        self.lag_seconds = lag_seconds
+        self.idle_seconds = idle_seconds
+        self.worker_id = f"worker_{uuid.uuid4().hex[:12]}"
+        self._db = None
+        self._task: Optional[asyncio.Task] = None
+        self.metrics = {"batches": 0, "scanned": 0, "findings": 0, "errors": 0, "lease_held": False}
+
+    # === Lifecycle ===
+
+    async def start(self, db):
+        self._db = db
+        if not INTEGRITY_SCANNER_ENABLED:
+            logger.info("Integrity scanner disabled (INTEGRITY_SCANNER_ENABLED=false)")
+            return
+        if self._task and not self._task.done():
+            return
+        self._task = asyncio.create_task(self._loop(), name="integrity-scanner")
+        logger.info(f"Integrity scanner started ({self.rate:.0f} tx/s, batches of {self.batch_size})")
+
+    async def stop(self):
+        if self._task:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+        if self._db is not None and self.metrics["lease_held"]:
+            # Hand the checkpoint straight to the next worker
+            await self._db.integrity_scan_state.update_one(
+                {"_id": SCAN_STATE_ID, "lease_owner": self.worker_id},
+                {"$set": {"lease_until": None}}
+            )
+            self.metrics["lease_held"] = False
+
+    async def _loop(self):
+        while True:
+            try:
+                scanned = await self.scan_batch()
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                self.metrics["errors"] += 1
+                logger.warning(f"Integrity scan batch failed: {e}")
+                await asyncio.sleep(INTEGRITY_SCAN_ERROR_BACKOFF_SECONDS)
+                continue
+            if scanned is None or scanned < self.batch_size:
+                # Another worker holds the lease, or the scan caught up
+                await asyncio.sleep(self.idle_seconds)
+
+    # === Scanning ===
+
+    async def _claim(self) -> Optional[Dict[str, Any]]:
+        """The scan state, if this worker holds (or just took) the lease"""
+        now = utc_now()
+        await self._db.integrity_scan_state.update_one(
+            {"_id": SCAN_STATE_ID},
+            {"$setOnInsert": {"checkpoint": None, "scanned": 0, "findings": 0, "created_at": now}},
+            upsert=True
+        )
+        state = await self._db.integrity_scan_state.find_one_and_update(
+            {
+                "_id": SCAN_STATE_ID,
+                "$or": [{"lease_until": None}, {"lease_until": {"$lt": now}}, {"lease_owner": self.worker_id}]
+            },
+            {"$set": {
+                "lease_owner": self.worker_id,
+                "lease_until": now + timedelta(seconds=INTEGRITY_SCAN_LEASE_SECONDS)
+            }},
+            return_document=True
+        )
+        self.metrics["lease_held"] = state is not None
+        return state
+
+    async def _record_findings(self, findings: List[Dict[str, Any]], now: datetime):
+        ops = [
+            UpdateOne(
+                {"_id": f"{f['tx_id']}:{f['check']}"},
+                {
+                    "$set": {"detail": f["detail"], "last_seen_at": now},
+                    "$setOnInsert": {
+                        "finding_id": f"{f['tx_id']}:{f['check']}",
+                        "tx_id": f["tx_id"], "check": f["check"],
+                        "tx_created_at": f["tx_created_at"],
+                        "status": "open", "first_seen_at": now
+                    }
+                },
+                upsert=True
+            )
+            for f in findings
+        ]
+        await self._db.integrity_findings.bulk_write(ops, ordered=False)
+
+    async def scan_batch(self) -> Optional[int]:
+        """
+        Check the next batch and advance the checkpoint.
+        Returns headers scanned, or None when another worker holds the lease.
+        """
+        state = await self._claim()
+        if state is None:
+            return None
+
+        started = time.monotonic()
+        until = utc_now() - timedelta(seconds=self.lag_seconds)
+        ledger_tx = self._db.ledger_tx.with_options(read_preference=ReadPreference.SECONDARY_PREFERRED)
+        batch = await ledger_tx.aggregate(
+            scan_pipeline(state.get("checkpoint"), until, self.batch_size)
+        ).to_list(self.batch_size)
+        if not batch:
+            return 0
+
+        now = utc_now()
+        findings = []
+        for header in batch:
+            for finding in check_transfer(header, header.get("entries") or []):
+                findings.append({**finding, "tx_id": header["tx_id"], "tx_created_at": header.get("created_at")})
+        if findings:
+            await self._record_findings(findings, now)
+            logger.warning(f"Integrity scan: {len(findings)} violation(s) in {len(batch)} transfers")
+
+        last = batch[-1]
+        result = await self._db.integrity_scan_state.update_one(
+            {"_id": SCAN_STATE_ID, "lease_owner": self.worker_id},
+            {
+                "$set": {"checkpoint": {"created_at": last["created_at"], "tx_id": last["tx_id"]}, "updated_at": now},
+                "$inc": {"scanned": len(batch), "findings": len(findings)}
+            }
+        )
+        if result.matched_count == 0:
+            # Lease lost mid-batch; the new owner rescans it (findings are idempotent)
+            self.metrics["lease_held"] = False
+            return None
+
+        self.metrics["batches"] += 1
+        self.metrics["scanned"] += len(batch)
+        self.metrics["findings"] += len(findings)
+
+        # Rate limit: spread batches so the scan never exceeds `rate` headers/second
+        min_duration = len(batch) / self.rate if self.rate > 0 else 0
+        remaining = min_duration - (time.monotonic() - started)
+        if remaining > 0:
+            await asyncio.sleep(remaining)
+        return len(batch)
+
+    async def status(self) -> Dict[str, Any]:
+        state = await self._db.integrity_scan_state.find_one({"_id": SCAN_STATE_ID}, {"_id": 0}) if self._db is not None else None
+        return {"enabled": INTEGRITY_SCANNER_ENABLED, "state": state, "worker": self.stats()}
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "running": self._task is not None and not self._task.done(),
+            "rate_per_second": self.rate,
+            "batch_size": self.batch_size,
+            **self.metrics,
+        }
+
+
+integrity_scanner = IntegrityScanner()
@@ -1,14 +1,58 @@
 from database.connection import get_database
-from models.lead import Lead, LeadCreate, LeadResponse
-from typing import List, Optional
+from models.lead import LeadCreate, LeadResponse
+from utils.security import validate_email_format
+from typing import AsyncIterator, Dict, List, Optional
 from datetime import datetime
+import codecs
+import csv
 import logging
-from pymongo.errors import DuplicateKeyError
+from pymongo.errors import BulkWriteError, DuplicateKeyError
 
 logger = logging.getLogger(__name__)
 
+# Leads inserted per insert_many during a CSV import
+LEAD_IMPORT_BATCH_SIZE = 1000
+
+DUPLICATE_KEY_ERROR = 11000
+
+
+async def iter_csv_emails(chunks: AsyncIterator[bytes]) -> AsyncIterator[str]:
+    """
+    Yield the email column of a CSV upload as it streams in.
+    Uses the `email` column when the first row is a header, else the first column.
+    """
+    decoder = codecs.getincrementaldecoder("utf-8-sig")(errors="replace")
+    buffer = ""
+    email_column = None
+
+    def emails_in(lines: List[str]):
+        nonlocal email_column
+        for row in csv.reader(lines):
+            if not row:
+                continue
+            if email_column is None:
+                header = [cell.strip().lower() for cell in row]
+                email_column = header.index("email") if "email" in header else 0
+                if "email" in header:
+                    continue
+            if email_column < len(row):
+                yield row[email_column]
+
+    async for chunk in chunks:
+        buffer += decoder.decode(chunk)
+        lines = buffer.split("\n")
+        buffer = lines.pop()
+        for email in emails_in(lines):
+            yield email
+
+    buffer += decoder.decode(b"", final=True)
+    for email in emails_in([buffer]):
+        yield email
+
+
 class LeadService:
     def __init__(self):
+        # Indexes (unique email, created_at) come from database/indexes.py at startup
         self.collection_name = "leads"
 
     async def create_lead(self, lead_data: LeadCreate) -> LeadResponse:
@@ -16,40 +60,83 @@ class LeadService:
         db = get_database()
         collection = db[self.collection_name]
         
-        # Ensure unique index on email
-        await collection.create_index("email", unique=True)
-        
-        lead = Lead(
-            email=lead_data.email,
-            created_at=datetime.utcnow()
-        )
+        doc = {"email": lead_data.email, "created_at": datetime.utcnow()}
         
         try:
-            result = await collection.insert_one(lead.dict(by_alias=True, exclude={"id"}))
-            created_lead = await collection.find_one({"_id": result.inserted_id})
-            
-            # Convert ObjectId to string for response
-            created_lead["_id"] = str(created_lead["_id"])
-            
-            logger.info(f"Created lead with email: {lead.email}")
-            return LeadResponse(**created_lead)
+            result = await collection.insert_one(doc)
         except DuplicateKeyError:
-            logger.warning(f"Duplicate email attempted: {lead.email}")
-            raise ValueError(f"Email {lead.email} is already registered")
+            logger.warning(f"Duplicate email attempted: {doc['email']}")
+            raise ValueError(f"Email {doc['email']} is already registered")
+        
+        logger.info(f"Created lead with email: {doc['email']}")
+        # Built from the inserted document - no read-back
+        return LeadResponse(_id=str(result.inserted_id), email=doc["email"], created_at=doc["created_at"])
 
-    async def get_all_leads(self, skip: int = 0, limit: int = 1000) -> List[LeadResponse]:
-        """Get all leads with pagination."""
+    async def import_leads(self, emails: AsyncIterator[str]) -> Dict[str, int]:
+        """
+        Bulk-insert leads in batches of LEAD_IMPORT_BATCH_SIZE.
+        Existing emails (and repeats within the upload) count as duplicates.
+        """
         db = get_database()
         collection = db[self.collection_name]
         
-        cursor = collection.find().sort("created_at", -1).skip(skip).limit(limit)
-        leads = await cursor.to_list(length=limit)
+        summary = {"received": 0, "inserted": 0, "duplicates": 0, "invalid": 0}
+        seen = set()
+        batch = []
         
-        # Convert ObjectId to string for each lead
-        for lead in leads:
-            lead["_id"] = str(lead["_id"])
+        async def flush():
+            if not batch:
+                return
+            try:
+                result = await collection.insert_many(batch, ordered=False)
+                summary["inserted"] += len(result.inserted_ids)
+            except BulkWriteError as e:
+                details = e.details
+                summary["inserted"] += details.get("nInserted", 0)
+                errors = details.get("writeErrors", [])
+                duplicates = sum(1 for err in errors if err.get("code") == DUPLICATE_KEY_ERROR)
+                summary["duplicates"] += duplicates
+                if duplicates != len(errors):
+                    raise
+            batch.clear()
+        
+        async for raw in emails:
+            summary["received"] += 1
+            email = raw.lower().strip()
+            if not validate_email_format(email):
+                summary["invalid"] += 1
+                continue
+            if email in seen:
+                summary["duplicates"] += 1
+                continue
+            seen.add(email)
+            batch.append({"email": email, "created_at": datetime.utcnow()})
+            if len(batch) >= LEAD_IMPORT_BATCH_SIZE:
+                await flush()
+        await flush()
+        
+        logger.info(
+            f"Lead import: {summary['inserted']} inserted, {summary['duplicates']} duplicates, "
+            f"{summary['invalid']} invalid of {summary['received']}"
+        )
+        return summary
+
+    async def iter_leads(self, skip: int = 0, limit: int = 1000) -> AsyncIterator[dict]:
+        """Stream leads newest first as plain dicts (_id, email, created_at ISO)"""
+        db = get_database()
+        collection = db[self.collection_name]
         
-        return [LeadResponse(**lead) for lead in leads]
+        cursor = collection.find({}, {"email": 1, "created_at": 1}).sort("created_at", -1).skip(skip).limit(limit)
+        async for lead in cursor:
+            yield {
+                "_id": str(lead["_id"]),
+                "email": lead.get("email"),
+                "created_at": lead["created_at"].isoformat() if lead.get("created_at") else None
+            }
+
+    async def get_all_leads(self, skip: int = 0, limit: int = 1000) -> List[dict]:
+        """Get all leads with pagination."""
+        return [lead async for lead in self.iter_leads(skip, limit)]
 
     async def get_lead_by_email(self, email: str) -> Optional[LeadResponse]:
         """Get a lead by email."""
@@ -3,14 +3,13 @@ PBX Transfer Notification Service - Production Complete
 Sends email and SMS notifications for ALL transfer types
 """
 import os
-import asyncio
 import logging
-import resend
 from datetime import datetime, timezone, timedelta
 from typing import Optional, Literal
 from enum import Enum
 
 from services.magic_link import create_magic_link
+from services.http_clients import http_clients, RESEND, TWILIO
 from database.connection import get_database
 
 logger = logging.getLogger(__name__)
@@ -20,9 +19,6 @@ RESEND_API_KEY = os.environ.get("RESEND_API_KEY", "")
 SENDER_EMAIL = os.environ.get("SENDER_EMAIL", "onboarding@resend.dev")
 APP_URL = os.environ.get("APP_URL", "")
 
-# Initialize Resend
-if RESEND_API_KEY:
-    resend.api_key = RESEND_API_KEY
 
 
 class TransferType(str, Enum):
@@ -523,7 +519,7 @@ async def send_email(
     user_id: str,
     transfer_id: str
 ) -> dict:
-    """Send email via Resend"""
+    """Send email via the Resend REST API (pooled client)"""
     if not RESEND_API_KEY:
         logger.warning("RESEND_API_KEY not configured - skipping email notification")
         await track_notification(user_id, transfer_id, "email", "skipped", {"reason": "no_api_key"})
@@ -537,7 +533,13 @@ async def send_email(
             "html": html
         }
         
-        email_result = await asyncio.to_thread(resend.Emails.send, params)
+        response = await http_clients.request(
+            RESEND, "POST", "/emails",
+            json=params,
+            headers={"Authorization": f"Bearer {RESEND_API_KEY}"}
+        )
+        response.raise_for_status()
+        email_result = response.json()
         
         logger.info(f"Email sent to {to_email}, id: {email_result.get('id')}")
         await track_notification(user_id, transfer_id, "email", "sent", {"email_id": email_result.get("id")})
@@ -556,7 +558,7 @@ async def send_sms(
     user_id: str,
     transfer_id: str
 ) -> dict:
-    """Send SMS via Twilio (mock mode if not configured)"""
+    """Send SMS via the Twilio REST API (pooled client, mock mode if not configured)"""
     twilio_sid = os.environ.get("TWILIO_ACCOUNT_SID", "")
     twilio_token = os.environ.get("TWILIO_AUTH_TOKEN", "")
     twilio_phone = os.environ.get("TWILIO_PHONE_NUMBER", "")
@@ -576,19 +578,18 @@ async def send_sms(
         }
     
     try:
-        from twilio.rest import Client
-        
-        client = Client(twilio_sid, twilio_token)
-        result = client.messages.create(
-            body=message,
-            from_=twilio_phone,
-            to=to_phone
+        response = await http_clients.request(
+            TWILIO, "POST", f"/Accounts/{twilio_sid}/Messages.json",
+            data={"Body": message, "From": twilio_phone, "To": to_phone},
+            auth=(twilio_sid, twilio_token)
         )
+        response.raise_for_status()
+        message_sid = response.json().get("sid")
         
-        logger.info(f"SMS sent to {to_phone}, sid: {result.sid}")
-        await track_notification(user_id, transfer_id, "sms", "sent", {"message_sid": result.sid})
+        logger.info(f"SMS sent to {to_phone}, sid: {message_sid}")
+        await track_notification(user_id, transfer_id, "sms", "sent", {"message_sid": message_sid})
         
-        return {"status": "sent", "message_sid": result.sid}
+        return {"status": "sent", "message_sid": message_sid}
         
     except Exception as e:
         logger.error(f"Failed to send SMS to {to_phone}: {e}")
@@ -14,6 +14,7 @@ from utils.plaid_mock import (
     generate_mock_accounts,
     generate_mock_transactions
 )
+from services.sdk_executor import run_blocking, PLAID
 
 logger = logging.getLogger(__name__)
 
@@ -147,7 +148,7 @@ class PlaidService:
                 language='en'
             )
             
-            response = self.client.link_token_create(request)
+            response = await run_blocking(PLAID, self.client.link_token_create, request)
             
             logger.info("[PLAID] Successfully created link token")
             
@@ -198,7 +199,7 @@ class PlaidService:
             from plaid.model.item_public_token_exchange_request import ItemPublicTokenExchangeRequest
             
             request = ItemPublicTokenExchangeRequest(public_token=public_token)
-            response = self.client.item_public_token_exchange(request)
+            response = await run_blocking(PLAID, self.client.item_public_token_exchange, request)
             
             return {
                 "access_token": response['access_token'],
@@ -220,7 +221,7 @@ class PlaidService:
             from plaid.model.accounts_get_request import AccountsGetRequest
             
             request = AccountsGetRequest(access_token=access_token)
-            response = self.client.accounts_get(request)
+            response = await run_blocking(PLAID, self.client.accounts_get, request)
             
             # Transform to match mock format
             accounts = []
@@ -261,7 +262,7 @@ class PlaidService:
             
             # Use transactions sync for latest transactions
             request = TransactionsSyncRequest(access_token=access_token)
-            response = self.client.transactions_sync(request)
+            response = await run_blocking(PLAID, self.client.transactions_sync, request)
             
             # Get added transactions and limit them
             transactions = response.get('added', [])[:limit]
@@ -0,0 +1,218 @@
+"""
+PBX Realtime - push delivery of chat and social events (Server-Sent Events)
+Replaces polling GET /api/social/messages/{conversation_id}: connected clients
+hold one GET /api/social/events stream and receive events as they happen.
+
+Sources:
+1. In-process fan-out (default) - publish() hands the event straight to every
+   subscriber of the target users on this worker
+2. Mongo change stream (REALTIME_CHANGE_STREAMS=true, replica set only) -
+   publish() inserts into `realtime_events`; every worker watches the
+   collection and fans out locally, so multi-worker deployments reach a user
+   whichever worker holds their stream. Falls back to (1) when change
+   streams are unavailable.
+
+Each subscriber has a bounded queue; a slow client loses its oldest events
+and gets a `resync` event telling it to refetch.
+
+Usage:
+    await publish([user_a, user_b], EVENT_MESSAGE, message_data)
+"""
+
+from datetime import datetime, timezone
+from typing import Dict, Any, Iterable, Optional, Set
+import asyncio
+import json
+import logging
+import os
+import uuid
+
+from pymongo.errors import PyMongoError
+
+from database.indexes import apply_indexes
+
+logger = logging.getLogger(__name__)
+
+REALTIME_CHANGE_STREAMS = os.environ.get("REALTIME_CHANGE_STREAMS", "false").lower() == "true"
+SUBSCRIBER_QUEUE_SIZE = int(os.environ.get("REALTIME_QUEUE_SIZE", "100"))
+KEEPALIVE_SECONDS = 15
+CLIENT_RETRY_MS = 3000
+WATCH_RETRY_SECONDS = 2
+
+# Event types
+EVENT_MESSAGE = "message"
+EVENT_FRIEND_REQUEST = "friend_request"
+EVENT_FRIEND_ACCEPTED = "friend_accepted"
+EVENT_RESYNC = "resync"
+
+SOURCE_LOCAL = "local"
+SOURCE_CHANGE_STREAM = "change_stream"
+
+
+def format_sse(event: Dict[str, Any]) -> str:
+    """Serialize an event as an SSE frame"""
+    return f"id: {event['id']}\nevent: {event['type']}\ndata: {json.dumps(event['data'], default=str)}\n\n"
+
+
+class Subscription:
+    """One connected stream - a bounded queue of pending events"""
+
+    def __init__(self, user_id: str, max_queue: int):
+        self.user_id = user_id
+        self.queue: asyncio.Queue = asyncio.Queue(max_queue)
+        self.dropped = 0
+
+    def deliver(self, event: Dict[str, Any]) -> bool:
+        """Enqueue without blocking; on overflow drop the oldest and ask for a resync"""
+        try:
+            self.queue.put_nowait(event)
+            return True
+        except asyncio.QueueFull:
+            pass
+        while not self.queue.empty():
+            self.queue.get_nowait()
+        self.dropped += 1
+        self.queue.put_nowait({"id": event["id"], "type": EVENT_RESYNC, "data": {"reason": "lagging"}})
+        return False
+
+    async def next_event(self, timeout: float) -> Optional[Dict[str, Any]]:
+        """Next event, or None after `timeout` seconds (time to send a keepalive)"""
+        try:
+            return await asyncio.wait_for(self.queue.get(), timeout)
+        except asyncio.TimeoutError:
+            return None
+
+
+class RealtimeHub:
+    """Per-worker registry of subscriptions keyed by user_id"""
+
+    def __init__(self, max_queue: int = SUBSCRIBER_QUEUE_SIZE):
+        self.max_queue = max_queue
+        self._subscribers: Dict[str, Set[Subscription]] = {}
+        self._db = None
+        self._watch_task: Optional[asyncio.Task] = None
+        self.source = SOURCE_LOCAL
+        self.metrics = {"published": 0, "delivered": 0, "dropped": 0, "publish_errors": 0}
+
+    def subscribe(self, user_id: str) -> Subscription:
+        subscription = Subscription(user_id, self.max_queue)
+        self._subscribers.setdefault(user_id, set()).add(subscription)
+        return subscription
+
+    def unsubscribe(self, subscription: Subscription):
+        subscriptions = self._subscribers.get(subscription.user_id)
+        if subscriptions is None:
+            return
+        subscriptions.discard(subscription)
+        if not subscriptions:
+            del self._subscribers[subscription.user_id]
+
+    def _fan_out(self, user_ids: Iterable[str], event: Dict[str, Any]):
+        for user_id in set(user_ids):
+            for subscription in self._subscribers.get(user_id, ()):
+                if subscription.deliver(event):
+                    self.metrics["delivered"] += 1
+                else:
+                    self.metrics["dropped"] += 1
+
+    async def publish(self, user_ids: Iterable[str], event_type: str, data: Dict[str, Any]):
+        """
+        Push an event to every connected stream of the given users.
+        Best effort - never raises into the write path that produced the event.
+        """
+        user_ids = [u for u in set(user_ids) if u and u != "system"]
+        if not user_ids:
+            return
+        event = {
+            "id": f"evt_{uuid.uuid4().hex[:12]}",
+            "type": event_type,
+            "data": data,
+        }
+        self.metrics["published"] += 1
+
+        if self.source == SOURCE_CHANGE_STREAM:
+            try:
+                await self._db.realtime_events.insert_one({
+                    "event_id": event["id"],
+                    "user_ids": user_ids,
+                    "event": json.loads(json.dumps(event, default=str)),
+                    "created_at": datetime.now(timezone.utc),
+                })
+                return
+            except PyMongoError as e:
+                self.metrics["publish_errors"] += 1
+                logger.warning(f"Realtime publish via change stream failed, delivering locally: {e}")
+
+        self._fan_out(user_ids, event)
+
+    async def start(self, db):
+        """Switch to the change-stream source when enabled and supported"""
+        self._db = db
+        if not REALTIME_CHANGE_STREAMS:
+            logger.info("Realtime hub ready (in-process fan-out)")
+            return
+        try:
+            stream = self._open_stream()
+            await stream.try_next()  # raises on standalone servers
+        except PyMongoError as e:
+            logger.warning(f"Change streams unavailable, realtime stays in-process: {e}")
+            return
+        self.source = SOURCE_CHANGE_STREAM
+        self._watch_task = asyncio.create_task(self._watch_loop(stream))
+        logger.info("Realtime hub ready (Mongo change stream on realtime_events)")
+
+    def _open_stream(self, resume_after=None):
+        return self._db.realtime_events.watch(
+            [{"$match": {"operationType": "insert"}}],
+            resume_after=resume_after
+        )
+
+    async def _watch_loop(self, stream):
+        resume_token = None
+        while True:
+            try:
+                async with stream:
+                    async for change in stream:
+                        resume_token = change["_id"]
+                        doc = change["fullDocument"]
+                        self._fan_out(doc["user_ids"], doc["event"])
+            except asyncio.CancelledError:
+                raise
+            except PyMongoError as e:
+                logger.warning(f"Realtime change stream interrupted, resuming: {e}")
+                await asyncio.sleep(WATCH_RETRY_SECONDS)
+            stream = self._open_stream(resume_token)
+
+    async def stop(self):
+        if self._watch_task is not None:
+            self._watch_task.cancel()
+            try:
+                await self._watch_task
+            except asyncio.CancelledError:
+                pass
+            self._watch_task = None
+        self.source = SOURCE_LOCAL
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "source": self.source,
+            "connected_users": len(self._subscribers),
+            "connections": sum(len(s) for s in self._subscribers.values()),
+            **self.metrics,
+        }
+
+
+realtime_hub = RealtimeHub()
+
+
+async def publish(user_ids: Iterable[str], event_type: str, data: Dict[str, Any]):
+    """Publish an event on the shared hub"""
+    await realtime_hub.publish(user_ids, event_type, data)
+
+
+async def setup_realtime_indexes(db):
+    """
+    Create the TTL index on realtime_events.
+    Specs live in database/indexes.py; called on application startup.
+    """
+    return await apply_indexes(db, ["realtime_events"])
@@ -0,0 +1,153 @@
+"""
+PBX SDK Executor - runs blocking third-party SDK calls off the event loop
+The Plaid and Circle SDKs are synchronous; calling them inside `async def`
+handlers stalls every request on the worker for the length of the upstream
+call. run_blocking() hands them to a dedicated, bounded thread pool instead.
+
+Per integration:
+- concurrency limit (threads it may hold at once)
+- queue limit (callers waiting for a slot); beyond it IntegrationBusy is raised
+  so a slow upstream cannot pile up unbounded work
+- metrics: in_flight, queued, max_queue_depth, completed, errors, rejected, avg wait
+
+Usage:
+    response = await run_blocking(PLAID, self.client.accounts_get, request)
+"""
+
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, Any, Callable, Optional
+import asyncio
+import functools
+import logging
+import os
+import time
+
+logger = logging.getLogger(__name__)
+
+SDK_EXECUTOR_MAX_WORKERS = int(os.environ.get("SDK_EXECUTOR_MAX_WORKERS", "16"))
+
+PLAID = "plaid"
+CIRCLE = "circle"
+
+
+class IntegrationBusy(Exception):
+    """Raised when an integration's wait queue is full"""
+
+    def __init__(self, integration: str, max_queue: int):
+        super().__init__(f"{integration} is busy ({max_queue} calls already waiting)")
+        self.integration = integration
+        self.max_queue = max_queue
+
+
+class IntegrationLimiter:
+    """Concurrency slot + queue accounting for one integration"""
+
+    def __init__(self, name: str, max_concurrency: int, max_queue: int):
+        self.name = name
+        self.max_concurrency = max_concurrency
+        self.max_queue = max_queue
+        self.semaphore = asyncio.Semaphore(max_concurrency)
+        self.in_flight = 0
+        self.queued = 0
+        self.max_queue_depth = 0
+        self.completed = 0
+        self.errors = 0
+        self.rejected = 0
+        self.total_wait_ms = 0.0
+
+    def stats(self) -> Dict[str, Any]:
+        started = self.completed + self.errors
+        return {
+            "max_concurrency": self.max_concurrency,
+            "max_queue": self.max_queue,
+            "in_flight": self.in_flight,
+            "queued": self.queued,
+            "max_queue_depth": self.max_queue_depth,
+            "completed": self.completed,
+            "errors": self.errors,
+            "rejected": self.rejected,
+            "avg_wait_ms": round(self.total_wait_ms / started, 2) if started else 0.0,
+        }
+
+
+class SdkExecutor:
+    """Shared thread pool with per-integration limits"""
+
+    def __init__(self, max_workers: int, limits: Dict[str, tuple]):
+        self.max_workers = max_workers
+        self.limiters = {
+            name: IntegrationLimiter(name, concurrency, queue)
+            for name, (concurrency, queue) in limits.items()
+        }
+        self._executor: Optional[ThreadPoolExecutor] = None
+
+    def _get_executor(self) -> ThreadPoolExecutor:
+        if self._executor is None:
+            self._executor = ThreadPoolExecutor(
+                max_workers=self.max_workers,
+                thread_name_prefix="pbx-sdk"
+            )
+        return self._executor
+
+    async def run(self, integration: str, fn: Callable, *args, **kwargs):
+        """Run fn(*args, **kwargs) in the pool, within the integration's limits"""
+        limiter = self.limiters[integration]
+        if limiter.semaphore.locked() and limiter.queued >= limiter.max_queue:
+            limiter.rejected += 1
+            raise IntegrationBusy(integration, limiter.max_queue)
+
+        limiter.queued += 1
+        limiter.max_queue_depth = max(limiter.max_queue_depth, limiter.queued)
+        waited_from = time.perf_counter()
+        try:
+            await limiter.semaphore.acquire()
+        finally:
+            limiter.queued -= 1
+
+        limiter.total_wait_ms += (time.perf_counter() - waited_from) * 1000
+        limiter.in_flight += 1
+        try:
+            loop = asyncio.get_running_loop()
+            result = await loop.run_in_executor(
+                self._get_executor(), functools.partial(fn, *args, **kwargs)
+            )
+            limiter.completed += 1
+            return result
+        except Exception:
+            limiter.errors += 1
+            raise
+        finally:
+            limiter.in_flight -= 1
+            limiter.semaphore.release()
+
+    def shutdown(self):
+        if self._executor is not None:
+            self._executor.shutdown(wait=False, cancel_futures=True)
+            self._executor = None
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "max_workers": self.max_workers,
+            "integrations": {name: limiter.stats() for name, limiter in self.limiters.items()},
+        }
+
+
+# (max concurrency, max queued callers) per integration
+sdk_executor = SdkExecutor(
+    SDK_EXECUTOR_MAX_WORKERS,
+    {
+        PLAID: (
+            int(os.environ.get("PLAID_MAX_CONCURRENCY", "8")),
+            int(os.environ.get("PLAID_MAX_QUEUE", "100")),
+        ),
+        CIRCLE: (
+            int(os.environ.get("CIRCLE_MAX_CONCURRENCY", "4")),
+            int(os.environ.get("CIRCLE_MAX_QUEUE", "50")),
+        ),
+    }
+)
+
+
+async def run_blocking(integration: str, fn: Callable, *args, **kwargs):
+    """Run a blocking SDK call on the shared SDK executor"""
+    return await sdk_executor.run(integration, fn, *args, **kwargs)
@@ -0,0 +1,214 @@
+"""
+PBX Statement Exports - background jobs for large statement exports
+Exports over a long (or open-ended) date range run here instead of in the
+request. A job walks the ledger with utils/statement_export.py and, per batch:
+
+1. writes the encoded bytes as statement_export_chunks {job_id, seq, data}
+2. saves the checkpoint on the job: last (created_at, _id), next seq,
+   row count and encoder state
+
+A chunk is written under a fixed _id before the checkpoint moves past it, so a
+job interrupted anywhere (deploy, crash) resumes from its checkpoint and
+rewrites at most one chunk. Jobs are claimed with a lease; queued jobs and
+running jobs whose lease lapsed are picked up on startup and when polled.
+The finished artifact is streamed back chunk by chunk and expires after
+STATEMENT_EXPORT_TTL_DAYS (TTL indexes on both collections).
+"""
+
+from datetime import datetime, timedelta, timezone
+from typing import Any, Dict, Optional
+import asyncio
+import logging
+import os
+import uuid
+
+from bson import Binary
+
+from utils.statement_export import iter_ledger_batches, make_encoder
+
+logger = logging.getLogger(__name__)
+
+STATEMENT_EXPORT_TTL_DAYS = int(os.environ.get("STATEMENT_EXPORT_TTL_DAYS", "7"))
+STATEMENT_EXPORT_LEASE_SECONDS = 60
+
+JOB_QUEUED = "queued"
+JOB_RUNNING = "running"
+JOB_COMPLETED = "completed"
+JOB_FAILED = "failed"
+
+
+def utc_now():
+    return datetime.now(timezone.utc)
+
+
+class StatementExportService:
+    """Runs statement export jobs in this worker, resuming from checkpoints"""
+
+    def __init__(self):
+        self.worker_id = f"worker_{uuid.uuid4().hex[:12]}"
+        self._db = None
+        self._tasks: Dict[str, asyncio.Task] = {}
+        self.metrics = {"submitted": 0, "resumed": 0, "completed": 0, "failed": 0, "chunks_written": 0}
+
+    # === Lifecycle ===
+
+    async def start(self, db):
+        """Pick up queued jobs and running jobs whose worker went away"""
+        self._db = db
+        async for job in db.statement_exports.find(
+            {"status": {"$in": [JOB_QUEUED, JOB_RUNNING]}},
+            {"_id": 0, "job_id": 1}
+        ):
+            self.metrics["resumed"] += 1
+            self._launch(job["job_id"])
+
+    async def stop(self):
+        """Cancel running jobs - their checkpoints are picked up by the next worker"""
+        tasks = list(self._tasks.values())
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+        self._tasks.clear()
+
+    def _launch(self, job_id: str):
+        if job_id in self._tasks:
+            return
+        task = asyncio.create_task(self._run(job_id), name=f"statement-export-{job_id}")
+        self._tasks[job_id] = task
+        task.add_done_callback(lambda _: self._tasks.pop(job_id, None))
+
+    # === Jobs ===
+
+    async def submit(self, db, user_id: str, query: Dict[str, Any], format: str, title: str, filename: str) -> Dict[str, Any]:
+        now = utc_now()
+        job = {
+            "job_id": f"exp_{uuid.uuid4().hex[:12]}",
+            "user_id": user_id,
+            "status": JOB_QUEUED,
+            "format": format,
+            "title": title,
+            "filename": filename,
+            "query": query,
+            "checkpoint": None,
+            "next_seq": 0,
+            "rows": 0,
+            "size_bytes": 0,
+            "encoder_state": None,
+            "created_at": now,
+            "updated_at": now,
+            "expires_at": now + timedelta(days=STATEMENT_EXPORT_TTL_DAYS),
+        }
+        await db.statement_exports.insert_one(job)
+        job.pop("_id", None)
+        self._db = self._db or db
+        self.metrics["submitted"] += 1
+        self._launch(job["job_id"])
+        return job
+
+    def resume_if_stalled(self, job: Dict[str, Any]):
+        """Re-launch a job whose lease lapsed (its worker stopped mid-export)"""
+        lease_until = job.get("lease_until")
+        if lease_until is not None and lease_until.tzinfo is None:
+            lease_until = lease_until.replace(tzinfo=timezone.utc)
+        if job.get("status") in (JOB_QUEUED, JOB_RUNNING) and (lease_until is None or lease_until < utc_now()):
+            self._launch(job["job_id"])
+
+    async def _claim(self, job_id: str) -> Optional[Dict[str, Any]]:
+        now = utc_now()
+        return await self._db.statement_exports.find_one_and_update(
+            {
+                "job_id": job_id,
+                "status": {"$in": [JOB_QUEUED, JOB_RUNNING]},
+                "$or": [{"lease_until": None}, {"lease_until": {"$lt": now}}, {"lease_owner": self.worker_id}]
+            },
+            {"$set": {
+                "status": JOB_RUNNING,
+                "lease_owner": self.worker_id,
+                "lease_until": now + timedelta(seconds=STATEMENT_EXPORT_LEASE_SECONDS),
+                "updated_at": now
+            }},
+            return_document=True
+        )
+
+    async def _write_chunk(self, job: Dict[str, Any], seq: int, data: bytes):
+        await self._db.statement_export_chunks.replace_one(
+            {"_id": f"{job['job_id']}:{seq:08d}"},
+            {"job_id": job["job_id"], "seq": seq, "data": Binary(data), "expires_at": job["expires_at"]},
+            upsert=True
+        )
+        self.metrics["chunks_written"] += 1
+
+    async def _checkpoint(self, job_id: str, fields: Dict[str, Any]) -> bool:
+        """Save progress and renew the lease; False if another worker took the job over"""
+        now = utc_now()
+        result = await self._db.statement_exports.update_one(
+            {"job_id": job_id, "lease_owner": self.worker_id},
+            {"$set": {
+                **fields,
+                "lease_until": now + timedelta(seconds=STATEMENT_EXPORT_LEASE_SECONDS),
+                "updated_at": now
+            }}
+        )
+        return result.matched_count == 1
+
+    async def _run(self, job_id: str):
+        job = await self._claim(job_id)
+        if job is None:
+            return
+
+        try:
+            encoder = make_encoder(job["format"], job["title"], job.get("encoder_state"))
+            seq, rows, size = job.get("next_seq", 0), job.get("rows", 0), job.get("size_bytes", 0)
+            checkpoint = job.get("checkpoint")
+            after = (checkpoint["created_at"], checkpoint["_id"]) if checkpoint else None
+
+            if seq == 0:
+                data = encoder.begin()
+                await self._write_chunk(job, seq, data)
+                seq, size = seq + 1, size + len(data)
+                if not await self._checkpoint(job_id, {
+                    "next_seq": seq, "size_bytes": size, "encoder_state": encoder.state()
+                }):
+                    return
+
+            async for batch in iter_ledger_batches(self._db, job["query"], after):
+                data = encoder.rows(batch)
+                await self._write_chunk(job, seq, data)
+                seq, rows, size = seq + 1, rows + len(batch), size + len(data)
+                if not await self._checkpoint(job_id, {
+                    "checkpoint": {"created_at": batch[-1]["created_at"], "_id": batch[-1]["_id"]},
+                    "next_seq": seq, "rows": rows, "size_bytes": size,
+                    "encoder_state": encoder.state()
+                }):
+                    logger.warning(f"Statement export {job_id} taken over by another worker")
+                    return
+
+            data = encoder.end()
+            await self._write_chunk(job, seq, data)
+            await self._checkpoint(job_id, {
+                "status": JOB_COMPLETED, "next_seq": seq + 1, "rows": rows,
+                "size_bytes": size + len(data), "encoder_state": None,
+                "completed_at": utc_now()
+            })
+            self.metrics["completed"] += 1
+            logger.info(f"Statement export {job_id} completed ({rows} rows, {size + len(data)} bytes)")
+        except asyncio.CancelledError:
+            # Shutdown - leave the checkpoint for the next worker
+            raise
+        except Exception as e:
+            self.metrics["failed"] += 1
+            logger.error(f"Statement export {job_id} failed: {e}")
+            await self._checkpoint(job_id, {"status": JOB_FAILED, "error": "Export failed"})
+
+    async def iter_artifact(self, db, job_id: str):
+        """Finished export bytes, chunk by chunk"""
+        async for chunk in db.statement_export_chunks.find(
+            {"job_id": job_id}, {"_id": 0, "data": 1}
+        ).sort("seq", 1).batch_size(16):
+            yield bytes(chunk["data"])
+
+    def stats(self) -> Dict[str, Any]:
+        return {"running": len(self._tasks), **self.metrics}
+
+
+statement_export_service = StatementExportService()
@@ -0,0 +1,206 @@
+"""
+Batch Transfer Tests - the sequential fallback (no replica set) under failures
+Tests: a write failing at each step of a chunk leaves every item either paid
+and recorded, refunded and failed, or in doubt with its key kept - and a
+retry with the same keys never pays anyone twice
+
+Needs a MongoDB server: MONGO_URL (default mongodb://localhost:27017)
+"""
+import asyncio
+import os
+import sys
+import uuid
+from pathlib import Path
+
+import pytest
+from pymongo import MongoClient
+from pymongo.errors import OperationFailure, PyMongoError
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+import utils.ledger as ledger  # noqa: E402
+from database.indexes import apply_indexes  # noqa: E402
+from utils.ledger_summaries import check_summaries  # noqa: E402
+
+MONGO_URL = os.environ.get("MONGO_URL", "mongodb://localhost:27017")
+SENDER = "s" * 36
+RECIPIENTS = [f"{i}" * 36 for i in range(1, 5)]
+AMOUNTS = [10.0, 20.0, 30.0, 40.0]
+OPENING_BALANCE = 1000.0
+
+
+class InjectedFailure(PyMongoError):
+    pass
+
+
+class FaultyCollection:
+    """Delegates to a motor collection; `method` raises on the listed call numbers, before writing"""
+
+    def __init__(self, collection, method, fail_on):
+        self._collection = collection
+        self._method = method
+        self._fail_on = fail_on
+        self._calls = 0
+
+    def __getattr__(self, name):
+        attr = getattr(self._collection, name)
+        if name != self._method:
+            return attr
+
+        async def wrapper(*args, **kwargs):
+            self._calls += 1
+            if self._calls in self._fail_on:
+                raise InjectedFailure(f"injected {self._method} failure")
+            return await attr(*args, **kwargs)
+        return wrapper
+
+
+class NoTransactionsClient:
+    def start_session(self, *args, **kwargs):
+        raise OperationFailure("Transaction numbers are only allowed on a replica set member or mongos")
+
+
+class FaultyDb:
+    """Standalone-style database with one faulty collection method"""
+
+    def __init__(self, db, collection=None, method=None, fail_on=()):
+        self._db = db
+        self.client = NoTransactionsClient()
+        self._faulty = {collection: FaultyCollection(db[collection], method, set(fail_on))} if collection else {}
+
+    def __getattr__(self, name):
+        return self._faulty.get(name) or getattr(self._db, name)
+
+    def __getitem__(self, name):
+        return self.__getattr__(name)
+
+
+@pytest.fixture(scope="module")
+def mongo():
+    client = MongoClient(MONGO_URL, serverSelectionTimeoutMS=2000)
+    try:
+        client.admin.command("ping")
+    except PyMongoError:
+        pytest.skip(f"MongoDB not reachable at {MONGO_URL}")
+    yield client
+    client.close()
+
+
+@pytest.fixture
+def db_name(mongo):
+    name = f"pbx_test_batch_{uuid.uuid4().hex[:8]}"
+    yield name
+    mongo.drop_database(name)
+
+
+def batch_items(key_prefix):
+    return [
+        {"index": i, "to_user_id": to_user_id, "amount": amount, "note": None, "idempotency_key": f"{key_prefix}:{i}"}
+        for i, (to_user_id, amount) in enumerate(zip(RECIPIENTS, AMOUNTS))
+    ]
+
+
+def run_batch(db_name, monkeypatch, fault=None):
+    """Pay RECIPIENTS in chunks of two with `fault` injected, then retry the same keys without it"""
+    from motor.motor_asyncio import AsyncIOMotorClient
+    monkeypatch.setattr(ledger, "BATCH_WRITE_CHUNK_SIZE", 2)
+
+    async def scenario():
+        client = AsyncIOMotorClient(MONGO_URL, tz_aware=True)
+        db = client[db_name]
+        try:
+            await apply_indexes(db, ["ledger_tx", "ledger", "wallets"])
+            await db.wallets.insert_one({
+                "user_id": SENDER, "usd_balance": OPENING_BALANCE, "usd_balance_minor": int(OPENING_BALANCE * 100)
+            })
+            first = await ledger.create_batch_transfer_atomic(
+                FaultyDb(db, *fault) if fault else FaultyDb(db), SENDER, batch_items("k")
+            )
+            state = await books(db)
+            retry = await ledger.create_batch_transfer_atomic(FaultyDb(db), SENDER, batch_items("k"))
+            return first, state, retry, await books(db)
+        finally:
+            client.close()
+
+    return asyncio.run(scenario())
+
+
+async def books(db):
+    wallets = {w["user_id"]: w.get("usd_balance", 0) async for w in db.wallets.find({})}
+    headers = [h async for h in db.ledger_tx.find({}, {"_id": 0})]
+    entries = [e async for e in db.ledger.find({}, {"_id": 0})]
+    return {"wallets": wallets, "headers": headers, "entries": entries, "summaries": await check_summaries(db)}
+
+
+def assert_consistent(state):
+    """Money is conserved, completed headers have both entries, failed ones released their key"""
+    wallets = state["wallets"]
+    assert sum(wallets.values()) == pytest.approx(OPENING_BALANCE)
+    for header in state["headers"]:
+        tx_entries = [e for e in state["entries"] if e["ledger_tx_id"] == header["tx_id"]]
+        if header["status"] == "failed":
+            assert tx_entries == []
+            assert "idempotency_key" not in header
+        else:
+            assert len(tx_entries) in (0, 2)
+    assert state["summaries"]["is_consistent"]
+
+
+def assert_paid_once(state):
+    for to_user_id, amount in zip(RECIPIENTS, AMOUNTS):
+        assert state["wallets"][to_user_id] == pytest.approx(amount)
+    assert state["wallets"][SENDER] == pytest.approx(OPENING_BALANCE - sum(AMOUNTS))
+
+
+def statuses(batch):
+    return [r["status"] for r in batch["results"]]
+
+
+def test_no_failure(db_name, monkeypatch):
+    first, state, retry, final = run_batch(db_name, monkeypatch)
+    assert statuses(first) == ["completed"] * 4
+    assert statuses(retry) == ["duplicate"] * 4
+    assert_consistent(state)
+    assert_paid_once(final)
+
+
+@pytest.mark.parametrize("fault", [
+    ("ledger_tx", "insert_many", [2]),
+    ("wallets", "bulk_write", [2]),
+])
+def test_failure_before_credits_refunds_the_chunk(db_name, monkeypatch, fault):
+    first, state, retry, final = run_batch(db_name, monkeypatch, fault)
+    assert statuses(first) == ["completed", "completed", "failed", "failed"]
+    assert first["total_debited"] == pytest.approx(sum(AMOUNTS[:2]))
+    assert state["wallets"][SENDER] == pytest.approx(OPENING_BALANCE - sum(AMOUNTS[:2]))
+    assert_consistent(state)
+    assert statuses(retry) == ["duplicate", "duplicate", "completed", "completed"]
+    assert_paid_once(final)
+
+
+def test_entry_failure_after_credits_completes_the_chunk(db_name, monkeypatch):
+    first, state, retry, final = run_batch(db_name, monkeypatch, ("ledger", "insert_many", [2]))
+    assert statuses(first) == ["completed"] * 4
+    assert len(state["entries"]) == 8
+    assert_consistent(state)
+    assert statuses(retry) == ["duplicate"] * 4
+    assert_paid_once(final)
+
+
+def test_unrecordable_chunk_is_in_doubt_not_failed(db_name, monkeypatch):
+    first, state, retry, final = run_batch(db_name, monkeypatch, ("ledger", "insert_many", range(2, 10)))
+    assert statuses(first) == ["completed", "completed", "unknown", "unknown"]
+    assert first["total_debited"] == pytest.approx(sum(AMOUNTS))
+    assert all("idempotency_key" in h for h in state["headers"])
+    assert_consistent(state)
+    # Keys were kept, so the retry replays instead of paying again
+    assert statuses(retry) == ["duplicate"] * 4
+    assert_paid_once(final)
+
+
+def test_summary_failure_rebuilds_summaries(db_name, monkeypatch):
+    first, state, retry, final = run_batch(db_name, monkeypatch, ("ledger_summaries", "bulk_write", [2]))
+    assert statuses(first) == ["completed"] * 4
+    assert_consistent(state)
+    assert statuses(retry) == ["duplicate"] * 4
+    assert_paid_once(final)
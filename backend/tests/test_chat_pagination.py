@@ -0,0 +1,179 @@
+"""
+Chat History Pagination Tests - keyset cursors on (created_at, message_id)
+Tests: no skipped/duplicated messages within a millisecond, incremental sync,
+index-backed plans (IXSCAN, no in-memory SORT) on long histories
+
+Needs a MongoDB server: MONGO_URL (default mongodb://localhost:27017)
+"""
+import asyncio
+import os
+import sys
+import uuid
+from datetime import datetime, timedelta, timezone
+from pathlib import Path
+
+import pytest
+from pymongo import MongoClient
+from pymongo.errors import PyMongoError
+from starlette.requests import Request
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+import routes.social as social  # noqa: E402
+from routes.social import message_page_query, setup_social_indexes  # noqa: E402
+
+MONGO_URL = os.environ.get("MONGO_URL", "mongodb://localhost:27017")
+TEST_DB = f"pbx_test_chat_{uuid.uuid4().hex[:8]}"
+HISTORY_SIZE = 2000
+MESSAGES_PER_MILLISECOND = 7
+
+USER_A = "a" * 36
+USER_B = "b" * 36
+
+
+@pytest.fixture(scope="module")
+def seeded():
+    client = MongoClient(MONGO_URL, serverSelectionTimeoutMS=2000, tz_aware=True)
+    try:
+        client.admin.command("ping")
+    except PyMongoError:
+        pytest.skip(f"MongoDB not reachable at {MONGO_URL}")
+
+    db = client[TEST_DB]
+    conversation_id = f"conv_{uuid.uuid4().hex[:12]}"
+    db.conversations.insert_one({
+        "conversation_id": conversation_id,
+        "user1_id": USER_A,
+        "user2_id": USER_B,
+    })
+
+    # Many messages share a created_at millisecond - the case `created_at < before` got wrong
+    start = datetime(2025, 1, 1, tzinfo=timezone.utc)
+    db.messages.insert_many([
+        {
+            "message_id": f"msg_{uuid.uuid4().hex[:12]}",
+            "conversation_id": conversation_id,
+            "sender_user_id": USER_A if i % 2 else USER_B,
+            "type": "text",
+            "text": f"message {i}",
+            "created_at": start + timedelta(milliseconds=i // MESSAGES_PER_MILLISECOND),
+        }
+        for i in range(HISTORY_SIZE)
+    ])
+    # Unrelated conversation so the index has to discriminate
+    db.messages.insert_many([
+        {
+            "message_id": f"msg_{uuid.uuid4().hex[:12]}",
+            "conversation_id": "conv_other",
+            "sender_user_id": USER_A,
+            "type": "text",
+            "text": "noise",
+            "created_at": start + timedelta(milliseconds=i),
+        }
+        for i in range(HISTORY_SIZE)
+    ])
+
+    yield client, conversation_id
+
+    client.drop_database(TEST_DB)
+    client.close()
+
+
+def fetch_messages(conversation_id: str, **params):
+    """Call the get_messages route against the test database"""
+    from motor.motor_asyncio import AsyncIOMotorClient
+
+    async def scenario():
+        client = AsyncIOMotorClient(MONGO_URL, tz_aware=True)
+        db = client[TEST_DB]
+        await setup_social_indexes(db)
+        original = social.get_database
+        social.get_database = lambda: db
+        try:
+            request = Request({
+                "type": "http",
+                "headers": [(b"x-session-token", USER_A.encode())],
+                "query_string": b"",
+            })
+            return await social.get_messages(request, conversation_id, **params)
+        finally:
+            social.get_database = original
+            client.close()
+
+    return asyncio.run(scenario())
+
+
+def plan_stages(plan: dict) -> set:
+    stages = {plan.get("stage")}
+    for key in ("inputStage", "queryPlan"):
+        if key in plan:
+            stages |= plan_stages(plan[key])
+    for child in plan.get("inputStages", []):
+        stages |= plan_stages(child)
+    return stages
+
+
+class TestKeysetPagination:
+    """Walking the whole history returns every message exactly once"""
+
+    def test_backward_pages_cover_history_once(self, seeded):
+        _, conversation_id = seeded
+        seen = []
+        page = fetch_messages(conversation_id, limit=100)
+        while True:
+            seen.extend(m["message_id"] for m in page["messages"])
+            if not page["next_cursor"]:
+                break
+            page = fetch_messages(conversation_id, limit=100, cursor=page["next_cursor"])
+
+        assert len(seen) == HISTORY_SIZE
+        assert len(set(seen)) == HISTORY_SIZE
+
+    def test_after_cursor_returns_only_newer_messages(self, seeded):
+        client, conversation_id = seeded
+        latest = fetch_messages(conversation_id, limit=10)
+        assert latest["has_more"]
+
+        newer = fetch_messages(conversation_id, after=latest["sync_cursor"])
+        assert newer["messages"] == []
+        assert newer["sync_cursor"] == latest["sync_cursor"]
+
+        # Two messages in the same millisecond as the newest one
+        newest_at = datetime.fromisoformat(latest["messages"][-1]["created_at"])
+        added = [f"msg_zzzz{i:08d}" for i in range(2)]
+        client[TEST_DB].messages.insert_many([
+            {
+                "message_id": message_id,
+                "conversation_id": conversation_id,
+                "sender_user_id": USER_B,
+                "type": "text",
+                "text": "new",
+                "created_at": newest_at,
+            }
+            for message_id in added
+        ])
+        try:
+            newer = fetch_messages(conversation_id, after=latest["sync_cursor"])
+            assert [m["message_id"] for m in newer["messages"]] == added
+        finally:
+            client[TEST_DB].messages.delete_many({"message_id": {"$in": added}})
+
+
+class TestQueryPlans:
+    """Long histories are served from idx_messages_conversation_created_id"""
+
+    @pytest.mark.parametrize("mode", ["latest", "cursor", "after"])
+    def test_index_scan_without_in_memory_sort(self, seeded, mode):
+        client, conversation_id = seeded
+        page = fetch_messages(conversation_id, limit=50)
+        cursor = page["next_cursor"] if mode == "cursor" else None
+        after = fetch_messages(conversation_id, limit=50, cursor=page["next_cursor"])["sync_cursor"] \
+            if mode == "after" else None
+
+        query, sort = message_page_query(conversation_id, cursor, after)
+        explain = client[TEST_DB].messages.find(query).sort(sort).limit(51).explain()
+        stages = plan_stages(explain["queryPlanner"]["winningPlan"])
+
+        assert "IXSCAN" in stages, stages
+        assert "SORT" not in stages, stages
+        assert "COLLSCAN" not in stages, stages
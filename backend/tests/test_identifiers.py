@@ -0,0 +1,98 @@
+"""
+Identifier Tests - recipient identifiers normalize to one canonical key
+Tests: email / phone normalization, resolve_user caching (hits and "not on PBX")
+"""
+import asyncio
+import sys
+from pathlib import Path
+
+import pytest
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from utils.identifiers import identifier_key, recipient_cache, resolve_user, user_identifiers  # noqa: E402
+
+MARIA = {"user_id": "u1", "email": "maria@example.com", "phone": "+639171234567"}
+
+
+class CountingUsers:
+    """Stands in for db.users - answers find_one by identifier key and counts round trips"""
+
+    def __init__(self, users):
+        self.by_key = {key: u for u in users for key in user_identifiers(u)}
+        self.queries = 0
+
+    async def find_one(self, query, projection=None):
+        self.queries += 1
+        user = self.by_key.get(query["identifiers"])
+        return dict(user) if user else None
+
+
+class FakeDb:
+    def __init__(self, users):
+        self.users = CountingUsers(users)
+
+
+@pytest.fixture(autouse=True)
+def empty_cache():
+    recipient_cache.clear()
+    yield
+    recipient_cache.clear()
+
+
+@pytest.mark.parametrize("typed", [
+    "+639171234567",
+    "+63 917 123 4567",
+    "+63-917-123-4567",
+    "0063 917 123 4567",
+    "0917 123 4567",
+    "(0917) 123-4567",
+    "9171234567",
+])
+def test_phone_variants_share_a_key(typed):
+    assert identifier_key(typed) == "phone:+639171234567"
+
+
+def test_email_is_lowercased_and_trimmed():
+    assert identifier_key("  Maria@Example.COM ") == "email:maria@example.com"
+
+
+@pytest.mark.parametrize("typed", ["", "maria", "12", "not@an@email", "+63 abc"])
+def test_invalid_identifiers_have_no_key(typed):
+    assert identifier_key(typed) is None
+
+
+def test_resolution_is_cached():
+    db = FakeDb([MARIA])
+
+    async def run():
+        first = await resolve_user(db, "Maria@example.com")
+        second = await resolve_user(db, "maria@EXAMPLE.com ")
+        return first, second
+
+    first, second = asyncio.run(run())
+    assert first["user_id"] == second["user_id"] == "u1"
+    assert db.users.queries == 1
+
+
+def test_not_on_pbx_is_cached():
+    db = FakeDb([MARIA])
+
+    async def run():
+        return [await resolve_user(db, "0918 000 0000") for _ in range(3)]
+
+    assert asyncio.run(run()) == [None, None, None]
+    assert db.users.queries == 1
+
+
+def test_invalidate_drops_negative_entry():
+    db = FakeDb([])
+
+    async def run():
+        assert await resolve_user(db, "new@example.com") is None
+        db.users.by_key["email:new@example.com"] = {"user_id": "u2", "email": "new@example.com"}
+        recipient_cache.invalidate(["email:new@example.com"])
+        return await resolve_user(db, "new@example.com")
+
+    assert asyncio.run(run())["user_id"] == "u2"
+    assert db.users.queries == 2
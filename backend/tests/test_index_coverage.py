@@ -0,0 +1,211 @@
+"""
+Index Coverage Tests - every hot query shape is served by an index
+Applies database/indexes.py to a scratch database and runs explain() on the
+query shapes used by routes/*, services/* and utils/*; any COLLSCAN fails.
+Add a shape here when adding a query, and an index to the registry with it.
+
+Needs a MongoDB server: MONGO_URL (default mongodb://localhost:27017)
+"""
+import asyncio
+import os
+import sys
+import uuid
+from datetime import datetime, timezone
+from pathlib import Path
+
+import pytest
+from bson import ObjectId
+from pymongo import MongoClient
+from pymongo.errors import PyMongoError
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from database.indexes import INDEXES, apply_indexes  # noqa: E402
+
+MONGO_URL = os.environ.get("MONGO_URL", "mongodb://localhost:27017")
+TEST_DB = f"pbx_test_indexes_{uuid.uuid4().hex[:8]}"
+
+NOW = datetime(2025, 1, 1, tzinfo=timezone.utc)
+UID = "u" * 36
+
+# (name, collection, filter, sort)
+QUERY_SHAPES = [
+    # Identity
+    ("auth.login_by_email", "users", {"email": "a@example.com"}, None),
+    ("users.get_by_user_id", "users", {"user_id": UID}, None),
+    ("users.email_taken", "users", {"email": "a@example.com", "user_id": {"$ne": UID}}, None),
+    ("identifiers.resolve_user", "users", {"identifiers": "phone:+639171234567"}, None),
+    ("transfers.batch_recipients", "users", {"$or": [
+        {"user_id": {"$in": [UID]}},
+        {"identifiers": {"$in": ["email:a@example.com", "phone:+639171234567"]}}
+    ]}, None),
+    ("admin.list_users", "users", {}, [("created_at", -1)]),
+    ("profiles.by_handle", "profiles", {"handle": "maria"}, None),
+    ("profiles.by_user", "profiles", {"user_id": UID}, None),
+    ("profiles.personal", "profiles", {"user_id": UID, "type": "personal"}, None),
+    ("profiles.by_profile_id", "profiles", {"profile_id": "prof_1"}, None),
+    ("businesses.discover", "profiles", {"type": "business"}, [("verified", -1), ("created_at", -1)]),
+    ("businesses.discover_category", "profiles", {"type": "business", "category": "Food & Dining"},
+     [("verified", -1), ("created_at", -1)]),
+    ("auth.session_by_token", "sessions", {"token": "tok"}, None),
+    ("session_states.by_user", "session_states", {"user_id": UID}, None),
+    ("magic_link.verify", "magic_links", {"token_hash": "h", "used": False, "expires_at": {"$gt": NOW}}, None),
+    ("magic_link.cleanup", "magic_links", {"$or": [
+        {"expires_at": {"$lt": NOW}},
+        {"used": True, "used_at": {"$lt": NOW}}
+    ]}, None),
+    ("leads.by_email", "leads", {"email": "a@example.com"}, None),
+    ("leads.list", "leads", {}, [("created_at", -1)]),
+
+    # Money
+    ("wallet.by_user_id", "wallets", {"user_id": UID}, None),
+    ("wallet.legacy_by_userId", "wallets", {"userId": UID}, None),
+    ("ledger.tx_by_id", "ledger_tx", {"tx_id": "tx_1"}, None),
+    ("ledger.tx_by_idempotency_key", "ledger_tx", {"idempotency_key": {"$in": ["k1", "k2"]}}, None),
+    ("admin.ledger_tx_by_sender", "ledger_tx", {"from_user_id": UID}, [("created_at", -1)]),
+    ("admin.ledger_tx_list", "ledger_tx", {}, [("created_at", -1)]),
+    ("ledger.entries_by_tx", "ledger", {"ledger_tx_id": "tx_1"}, None),
+    ("recipient.transactions", "ledger", {"user_id": UID}, [("created_at", -1)]),
+    ("recipient.bill_payments", "ledger", {"user_id": UID, "type": "bill_payment"}, [("created_at", -1)]),
+    ("transfers.incoming", "ledger", {"user_id": UID, "type": "internal_transfer_in"}, [("created_at", -1)]),
+    ("admin.ledger_list", "ledger", {}, [("created_at", -1)]),
+    ("statements.summary", "ledger_summaries", {"user_id": UID, "period": "all"}, None),
+    ("statements.monthly_rollups", "ledger_summaries", {"user_id": UID, "period": {"$gte": "2025-01", "$lt": "2025-06"}}, None),
+    ("statements.export_batch", "ledger", {"$and": [
+        {"user_id": UID, "created_at": {"$gte": NOW}},
+        {"$or": [{"created_at": {"$gt": NOW}}, {"created_at": NOW, "_id": {"$gt": ObjectId()}}]}
+    ]}, [("created_at", 1), ("_id", 1)]),
+    ("statements.export_job", "statement_exports", {"job_id": "exp_1", "user_id": UID}, None),
+    ("statements.export_resume", "statement_exports", {"status": {"$in": ["queued", "running"]}}, None),
+    ("statements.export_chunks", "statement_export_chunks", {"job_id": "exp_1"}, [("seq", 1)]),
+    ("integrity.scan_batch", "ledger_tx", {"$and": [
+        {"created_at": {"$lt": NOW}},
+        {"$or": [{"created_at": {"$gt": NOW}}, {"created_at": NOW, "tx_id": {"$gt": "tx_1"}}]}
+    ]}, [("created_at", 1), ("tx_id", 1)]),
+    ("integrity.open_findings", "integrity_findings", {"status": "open"}, [("first_seen_at", -1)]),
+    ("integrity.findings_by_tx", "integrity_findings", {"tx_id": "tx_1"}, None),
+    ("reconciliation.wallet_shard", "wallets", {"user_id": {"$type": "string", "$gte": "a", "$lt": "m"}}, None),
+    ("reconciliation.ledger_shard", "ledger", {"user_id": {"$type": "string", "$gte": "a", "$lt": "m"}}, None),
+    ("reconciliation.running", "reconciliation_runs", {"status": "running"}, None),
+    ("reconciliation.run", "reconciliation_runs", {"run_id": "recon_1"}, None),
+    ("statements.edge_month", "ledger", {"user_id": UID, "created_at": {"$gte": NOW}}, None),
+    ("velocity.user_counters", "velocity_counters", {"user_id": UID, "metric": "transfer_out"}, [("bucket", -1)]),
+    ("fx_locks.by_lock_id", "fx_locks", {"lock_id": "fxl_1", "user_id": UID}, None),
+    ("billers.saved", "saved_billers", {"user_id": UID}, None),
+    ("billers.exists", "saved_billers", {"user_id": UID, "biller_code": "MERALCO", "account_no": "1"}, None),
+    ("banks.list", "linked_banks", {"user_id": UID, "status": {"$ne": "removed"}}, None),
+    ("banks.verified", "linked_banks", {"id": "bank_1", "user_id": UID, "status": "verified"}, None),
+    ("auth.legacy_banks", "banks", {"user_id": UID}, [("created_at", -1)]),
+    ("banks.pending_transfers", "pending_transfers", {"user_id": UID}, [("created_at", -1)]),
+
+    # Activity feed (routes/activity.py) - per-source keyset pages
+    ("activity.ledger", "ledger", {"user_id": UID, "$or": [
+        {"created_at": {"$lt": NOW}},
+        {"created_at": NOW, "_id": {"$lt": ObjectId()}}
+    ]}, [("created_at", -1), ("_id", -1)]),
+    ("activity.ledger_typed", "ledger", {"user_id": UID, "type": {"$in": ["bill_payment", "transfer_out"]}},
+     [("created_at", -1), ("_id", -1)]),
+    ("activity.bank_transfers", "pending_transfers", {"user_id": UID, "created_at": {"$lte": NOW}},
+     [("created_at", -1), ("_id", -1)]),
+    ("activity.circle", "transactions", {"user_id": UID}, [("created_at", -1), ("_id", -1)]),
+    ("activity.wallet", "transactions", {"userId": UID, "from": "USD"}, [("createdAt", -1), ("_id", -1)]),
+
+    # Audit
+    ("admin.audit_by_actor", "audit_log", {"actor_user_id": UID}, [("created_at", -1)]),
+    ("admin.audit_list", "audit_log", {}, [("created_at", -1)]),
+
+    # Social
+    ("social.friendship_by_pair", "friendships", {"pair_key": f"{UID}:v"}, None),
+    ("social.friends_section", "friendships", {"requester_user_id": UID, "status": "accepted"},
+     [("created_at", -1), ("friendship_id", -1)]),
+    ("social.inbox", "conversations", {"$or": [{"user1_id": UID}, {"user2_id": UID}]},
+     [("last_message_at", -1), ("conversation_id", -1)]),
+    ("social.conversation_by_pair", "conversations", {"pair_key": f"{UID}:v"}, None),
+    ("social.conversation_by_id", "conversations", {"conversation_id": "conv_1"}, None),
+    ("social.messages_page", "messages", {"conversation_id": "conv_1"}, [("created_at", -1), ("message_id", -1)]),
+    ("social.payment_message_replay", "messages", {"payment.tx_id": "tx_1"}, None),
+    ("social.pending_invites", "invites", {"inviter_user_id": UID, "status": "pending"}, [("created_at", -1)]),
+    ("social.all_invites", "invites", {"inviter_user_id": UID}, [("created_at", -1)]),
+    ("social.invite_by_id", "invites", {"invite_id": "inv_1", "inviter_user_id": UID, "status": "pending"}, None),
+    ("social.invites_on_signup", "invites", {
+        "status": "pending",
+        "created_at": {"$gte": NOW},
+        "$or": [{"contact": "a@example.com", "contact_type": "email"}]
+    }, None),
+
+    # Notifications
+    ("notifications.recent_sms", "notification_logs", {
+        "user_id": UID, "channel": "sms", "status": "sent", "created_at": {"$gte": NOW}
+    }, None),
+    ("notifications.link_opened", "notification_logs", {"user_id": UID, "metadata.token_hash": "h"}, None),
+    ("notifications.preferences", "notification_preferences", {"user_id": UID}, None),
+
+    # Search (utils/search.py tokens)
+    ("users.search", "users", {"search_tokens": "mar"}, None),
+    ("profiles.search_people", "profiles", {"type": "personal", "search_tokens": {"$all": ["maria", "santos"]}}, None),
+    ("profiles.search_businesses", "profiles", {"type": "business", "search_tokens": "sari"}, None),
+    ("profiles.exact_handle", "profiles", {"handle": "maria", "type": "personal"}, None),
+]
+
+
+def apply_registry() -> bool:
+    """Run apply_indexes against the scratch database"""
+    from motor.motor_asyncio import AsyncIOMotorClient
+
+    async def apply():
+        motor_client = AsyncIOMotorClient(MONGO_URL)
+        try:
+            return await apply_indexes(motor_client[TEST_DB])
+        finally:
+            motor_client.close()
+
+    return asyncio.run(apply())
+
+
+@pytest.fixture(scope="module")
+def db():
+    client = MongoClient(MONGO_URL, serverSelectionTimeoutMS=2000)
+    try:
+        client.admin.command("ping")
+    except PyMongoError:
+        pytest.skip(f"MongoDB not reachable at {MONGO_URL}")
+
+    assert apply_registry(), "Some registry indexes could not be created"
+
+    yield client[TEST_DB]
+
+    client.drop_database(TEST_DB)
+    client.close()
+
+
+def plan_stages(plan: dict) -> set:
+    stages = {plan.get("stage")}
+    for key in ("inputStage", "queryPlan"):
+        if key in plan:
+            stages |= plan_stages(plan[key])
+    for child in plan.get("inputStages", []):
+        stages |= plan_stages(child)
+    return stages
+
+
+class TestRegistry:
+    """Registry is applied idempotently"""
+
+    def test_reapply_is_noop(self, db):
+        before = {name: db[name].index_information() for name in INDEXES}
+        assert apply_registry()
+        assert {name: db[name].index_information() for name in INDEXES} == before
+
+
+class TestQueryShapes:
+    """No query shape falls back to a collection scan"""
+
+    @pytest.mark.parametrize("name,collection,query,sort", QUERY_SHAPES)
+    def test_no_collscan(self, db, name, collection, query, sort):
+        cursor = db[collection].find(query)
+        if sort:
+            cursor = cursor.sort(sort)
+        explain = cursor.limit(50).explain()
+        stages = plan_stages(explain["queryPlanner"]["winningPlan"])
+
+        assert "COLLSCAN" not in stages, f"{name}: {stages}"
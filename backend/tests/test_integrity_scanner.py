@@ -0,0 +1,65 @@
+"""
+Integrity Scanner Tests - double-entry checks on a ledger_tx header and its entries
+Tests: intact transfers, missing / unbalanced / misattributed entries, failed transfers
+"""
+import sys
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from services.integrity_scanner import check_transfer  # noqa: E402
+
+HEADER = {
+    "tx_id": "tx_1", "status": "completed", "amount": 25.0, "currency": "USD",
+    "from_user_id": "alice", "to_user_id": "bob",
+}
+
+
+def entries(debit_amount=-25.0, credit_amount=25.0, debit_user="alice", credit_user="bob", currency="USD"):
+    return [
+        {"ledger_tx_id": "tx_1", "user_id": debit_user, "entry_type": "debit", "currency": currency, "amount": debit_amount},
+        {"ledger_tx_id": "tx_1", "user_id": credit_user, "entry_type": "credit", "currency": currency, "amount": credit_amount},
+    ]
+
+
+def checks(header, rows):
+    return [finding["check"] for finding in check_transfer(header, rows)]
+
+
+def test_intact_transfer_has_no_findings():
+    assert check_transfer(HEADER, entries()) == []
+
+
+def test_missing_entry():
+    assert checks(HEADER, entries()[:1]) == ["entry_count"]
+
+
+def test_unbalanced_entries():
+    assert checks(HEADER, entries(credit_amount=30.0)) == ["unbalanced", "amount_mismatch"]
+
+
+def test_balanced_but_wrong_amount():
+    assert checks(HEADER, entries(debit_amount=-20.0, credit_amount=20.0)) == ["amount_mismatch"]
+
+
+def test_credit_to_wrong_user():
+    assert checks(HEADER, entries(credit_user="mallory")) == ["wrong_party"]
+
+
+def test_currency_mismatch():
+    assert checks(HEADER, entries(currency="PHP")) == ["currency_mismatch"]
+
+
+def test_failed_transfer_must_have_no_entries():
+    failed = {**HEADER, "status": "failed"}
+    assert check_transfer(failed, []) == []
+    assert checks(failed, entries()) == ["entries_on_failed_tx"]
+
+
+def test_minor_units_are_compared_exactly():
+    header = {**HEADER, "amount_minor": 2500}
+    rows = entries(credit_amount=24.9995)
+    rows[0]["amount_minor"], rows[1]["amount_minor"] = -2500, 2499
+    assert checks(header, rows) == ["unbalanced", "amount_mismatch"]
+    rows[1]["amount_minor"] = 2500
+    assert checks(header, rows) == []
@@ -0,0 +1,47 @@
+"""
+Money Tests - float amounts to exact integer minor units
+Tests: rounding, float noise, sums, $inc bodies for wallets, reads of un-backfilled documents
+"""
+import sys
+from pathlib import Path
+
+from bson.int64 import Int64
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from utils.money import (  # noqa: E402
+    balance_inc, entry_amount, from_minor, stored_minor, sum_minor, to_minor, wallet_balances
+)
+
+
+def test_to_minor_rounds_half_up():
+    assert to_minor(12.345) == 1235
+    assert to_minor(-12.345) == -1235
+    assert to_minor(None) == 0
+    assert isinstance(to_minor(1.0), Int64)
+
+
+def test_float_noise_does_not_lose_a_cent():
+    assert to_minor(0.1 + 0.2) == 30
+    assert to_minor(1.15) == 115
+    assert from_minor(115) == 1.15
+
+
+def test_sum_minor_is_exact():
+    assert sum_minor([0.1] * 10) == 100
+    assert sum(0.1 for _ in range(10)) != 1.0
+
+
+def test_balance_and_entry_fields():
+    assert balance_inc("PHP", -10.5) == {"php_balance": -10.5, "php_balance_minor": -1050}
+    assert balance_inc("USD", 0.3, minor=30) == {"usd_balance": 0.3, "usd_balance_minor": 30}
+    assert entry_amount(25.0, "USD") == {"amount": 25.0, "amount_minor": 2500}
+    assert wallet_balances() == {"usd_balance": 0.0, "usd_balance_minor": 0, "php_balance": 0.0, "php_balance_minor": 0}
+
+
+def test_stored_minor_prefers_the_minor_field():
+    assert stored_minor({"amount": 0.1 + 0.2, "amount_minor": 31}, "amount") == 31
+    # Written before migration 0005
+    assert stored_minor({"amount": 0.1 + 0.2}, "amount") == 30
+    assert stored_minor({"usd_balance": 12.345}, "usd_balance", "USD") == 1235
+    assert stored_minor({}, "php_balance", "PHP") == 0
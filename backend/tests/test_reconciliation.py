@@ -0,0 +1,61 @@
+"""
+Book Reconciliation Tests - wallets joined against ledger totals (integer minor units)
+Tests: balanced books, exact mismatches and thresholds, ledger-only users and currencies
+"""
+import sys
+from pathlib import Path
+
+import pandas as pd
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from reconciliation import discrepancy_records, find_discrepancies  # noqa: E402
+
+
+def wallets(*rows):
+    frame = pd.DataFrame(rows, columns=["user_id", "currency", "wallet_balance_minor"])
+    return frame.astype({"wallet_balance_minor": "int64"})
+
+
+def ledger(*rows):
+    frame = pd.DataFrame(rows, columns=["user_id", "currency", "ledger_total_minor", "entries"])
+    return frame.astype({"ledger_total_minor": "int64", "entries": "int64"})
+
+
+def test_balanced_book_has_no_discrepancies():
+    result = find_discrepancies(
+        wallets(("u1", "USD", 10000), ("u1", "PHP", 0)),
+        ledger(("u1", "USD", 10000, 3)),
+    )
+    assert result.empty
+
+
+def test_one_cent_off_is_a_mismatch():
+    result = find_discrepancies(wallets(("u1", "USD", 10000)), ledger(("u1", "USD", 9999, 2)))
+    assert result["difference_minor"].tolist() == [1]
+    assert result["difference"].tolist() == [0.01]
+
+
+def test_mismatches_above_threshold_sorted_by_size():
+    result = find_discrepancies(
+        wallets(("u1", "USD", 10000), ("u2", "USD", 5000), ("u3", "USD", 1000)),
+        ledger(("u1", "USD", 9000, 2), ("u2", "USD", 4999, 1), ("u3", "USD", 3500, 4)),
+        threshold=0.01,
+    )
+    assert list(result["user_id"]) == ["u3", "u1"]
+    assert list(result["difference"]) == [-25.0, 10.0]
+    assert set(result["issue"]) == {"balance_mismatch"}
+
+
+def test_ledger_without_wallet_is_reported():
+    result = find_discrepancies(wallets(("u1", "USD", 500)), ledger(("u1", "USD", 500, 1), ("u9", "PHP", 25000, 2)))
+    assert discrepancy_records(result) == [{
+        "user_id": "u9", "currency": "PHP", "wallet_balance": 0.0, "ledger_total": 250.0,
+        "entries": 2, "difference": -250.0, "issue": "missing_wallet",
+    }]
+
+
+def test_wallet_without_ledger_is_reported():
+    result = find_discrepancies(wallets(("u1", "PHP", 120000)), ledger())
+    assert discrepancy_records(result)[0]["difference"] == 1200.0
+    assert result["entries"].tolist() == [0]
@@ -0,0 +1,101 @@
+"""
+SDK Executor Tests - blocking SDK calls must not stall the event loop
+Tests: unrelated endpoint latency during a slow Plaid call, queue limits
+"""
+import asyncio
+import sys
+import time
+from pathlib import Path
+
+import httpx
+import pytest
+from fastapi import FastAPI
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from services.plaid_service import PlaidService  # noqa: E402
+from services.sdk_executor import SdkExecutor, IntegrationBusy, PLAID, sdk_executor  # noqa: E402
+
+PLAID_DELAY_SECONDS = 0.5
+
+
+class SlowPlaidStub:
+    """Stands in for plaid_api.PlaidApi - blocks its thread like the real SDK"""
+
+    def accounts_get(self, request):
+        time.sleep(PLAID_DELAY_SECONDS)
+        return {"accounts": []}
+
+
+def build_app() -> FastAPI:
+    plaid = PlaidService.__new__(PlaidService)
+    plaid.mode = "SANDBOX"
+    plaid.client = SlowPlaidStub()
+
+    app = FastAPI()
+
+    @app.get("/plaid/accounts")
+    async def accounts():
+        return await plaid.get_accounts("access-sandbox-test")
+
+    @app.get("/ping")
+    async def ping():
+        return {"ok": True}
+
+    return app
+
+
+class TestEventLoopNotBlocked:
+    """Unrelated endpoints keep their latency while a Plaid call is in flight"""
+
+    def test_ping_latency_during_slow_plaid_call(self):
+        async def scenario():
+            transport = httpx.ASGITransport(app=build_app())
+            async with httpx.AsyncClient(transport=transport, base_url="http://test") as client:
+                plaid_call = asyncio.create_task(client.get("/plaid/accounts"))
+                await asyncio.sleep(0.05)  # Plaid call is now blocking its worker thread
+
+                latencies = []
+                for _ in range(5):
+                    start = time.perf_counter()
+                    response = await client.get("/ping")
+                    latencies.append(time.perf_counter() - start)
+                    assert response.status_code == 200
+
+                assert not plaid_call.done(), "Plaid stub finished before pings were measured"
+                plaid_response = await plaid_call
+                return latencies, plaid_response
+
+        latencies, plaid_response = asyncio.run(scenario())
+
+        assert plaid_response.status_code == 200
+        assert plaid_response.json() == {"accounts": []}
+        assert max(latencies) < 0.1, f"/ping stalled behind Plaid: {max(latencies):.3f}s"
+        assert sdk_executor.stats()["integrations"][PLAID]["completed"] >= 1
+
+
+class TestIntegrationLimits:
+    """Per-integration concurrency and queue limits"""
+
+    def test_queue_limit_rejects_excess_calls(self):
+        executor = SdkExecutor(max_workers=4, limits={PLAID: (1, 1)})
+
+        async def scenario():
+            running = asyncio.create_task(executor.run(PLAID, time.sleep, 0.2))
+            await asyncio.sleep(0.01)
+            waiting = asyncio.create_task(executor.run(PLAID, time.sleep, 0.01))
+            await asyncio.sleep(0.01)
+
+            with pytest.raises(IntegrationBusy):
+                await executor.run(PLAID, time.sleep, 0.01)
+
+            await asyncio.gather(running, waiting)
+
+        asyncio.run(scenario())
+        executor.shutdown()
+
+        stats = executor.stats()["integrations"][PLAID]
+        assert stats["completed"] == 2
+        assert stats["rejected"] == 1
+        assert stats["max_queue_depth"] == 1
+        assert stats["in_flight"] == 0
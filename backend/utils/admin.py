@@ -18,6 +18,11 @@ from fastapi import HTTPException, Request
 import uuid
 import logging
 
+from utils.ledger import insert_ledger_entries
+from utils.money import balance_field, balance_inc, entry_amount, money_fields
+from utils.wallet_cache import invalidate_wallet
+from database.indexes import apply_indexes
+
 logger = logging.getLogger(__name__)
 
 
@@ -286,48 +291,9 @@ async def get_audit_logs(
 async def setup_audit_indexes(db):
     """
     Create indexes for audit_log collection.
-    Should be called on application startup.
+    Specs live in database/indexes.py; called on application startup.
     """
-    try:
-        audit_log = db.audit_log
-        
-        # Unique audit_id
-        await audit_log.create_index(
-            "audit_id",
-            unique=True,
-            name="idx_audit_id"
-        )
-        
-        # Query by actor
-        await audit_log.create_index(
-            [("actor_user_id", 1), ("created_at", -1)],
-            name="idx_audit_actor"
-        )
-        
-        # Query by target
-        await audit_log.create_index(
-            [("target_type", 1), ("target_id", 1), ("created_at", -1)],
-            name="idx_audit_target"
-        )
-        
-        # Query by action type
-        await audit_log.create_index(
-            [("action", 1), ("created_at", -1)],
-            name="idx_audit_action"
-        )
-        
-        # Time-based queries
-        await audit_log.create_index(
-            "created_at",
-            name="idx_audit_created"
-        )
-        
-        logger.info("Audit log indexes created successfully")
-        return True
-        
-    except Exception as e:
-        logger.warning(f"Audit index creation warning (may already exist): {e}")
-        return False
+    return await apply_indexes(db, ["audit_log"])
 
 
 async def create_adjustment_entry(
@@ -363,13 +329,12 @@ async def create_adjustment_entry(
     
     now = utc_now()
     wallets = db.wallets
-    ledger = db.ledger
     
-    balance_field = "usd_balance" if currency == "USD" else "php_balance"
+    field = balance_field(currency)
     
     # Get before state
     wallet_before = await wallets.find_one({"user_id": target_user_id}, {"_id": 0})
-    balance_before = wallet_before.get(balance_field, 0) if wallet_before else 0
+    balance_before = wallet_before.get(field, 0) if wallet_before else 0
     
     # Create adjustment tx_id
     tx_id = f"adj_{uuid.uuid4().hex[:12]}"
@@ -382,33 +347,34 @@ async def create_adjustment_entry(
         "type": "adjustment",
         "entry_type": "adjustment",
         "currency": currency,
-        "amount": amount,
+        **entry_amount(amount, currency),
         "adjustment_reason": reason,
         "adjusted_by": admin_user_id,
         "status": "completed",
         "created_at": now
     }
     
-    await ledger.insert_one(ledger_entry)
+    await insert_ledger_entries(db, [ledger_entry])
     
     # Update wallet
     if wallet_before:
         await wallets.update_one(
             {"user_id": target_user_id},
-            {"$inc": {balance_field: amount}, "$set": {"updated_at": now}}
+            {"$inc": balance_inc(currency, amount), "$set": {"updated_at": now}}
         )
     else:
         # Create wallet
         await wallets.insert_one({
             "user_id": target_user_id,
-            balance_field: amount,
+            **money_fields(field, amount, currency),
             "created_at": now,
             "updated_at": now
         })
+    await invalidate_wallet(target_user_id)
     
     # Get after state
     wallet_after = await wallets.find_one({"user_id": target_user_id}, {"_id": 0})
-    balance_after = wallet_after.get(balance_field, 0) if wallet_after else 0
+    balance_after = wallet_after.get(field, 0) if wallet_after else 0
     
     # Write audit log
     audit_entry = await write_audit_event(
@@ -8,6 +8,8 @@ import logging
 from typing import Dict, Any, Optional
 from datetime import datetime
 
+from services.sdk_executor import run_blocking, CIRCLE
+
 logger = logging.getLogger(__name__)
 
 # Circle Configuration
@@ -55,7 +57,7 @@ class CircleClient:
             
             api = WalletSetsApi(self.client)
             request = CreateWalletSetRequest.from_dict({"name": name})
-            response = api.create_wallet_set(request)
+            response = await run_blocking(CIRCLE, api.create_wallet_set, request)
             
             return {
                 "wallet_set_id": response.data.wallet_set.id,
@@ -89,7 +91,7 @@ class CircleClient:
                 "account_type": "EOA",
                 "count": 1
             })
-            response = api.create_wallets(request)
+            response = await run_blocking(CIRCLE, api.create_wallets, request)
             
             wallet = response.data.wallets[0]
             return {
@@ -112,7 +114,7 @@ class CircleClient:
             from circle.web3.developer_controlled_wallets import WalletsApi
             
             api = WalletsApi(self.client)
-            response = api.get_wallet_token_balance(id=wallet_id)
+            response = await run_blocking(CIRCLE, api.get_wallet_token_balance, id=wallet_id)
             
             usdc_balance = 0.0
             for token_balance in response.data.token_balances:
@@ -0,0 +1,171 @@
+"""
+PBX FX Rate Locks - server-side USD -> PHP rate locks
+A lock stores the rate the user was quoted; executing against it needs no FX
+lookup. Locks are single use and consumed in the same transaction as the
+wallet update, so a lock can never price two conversions.
+
+Collection:
+- fx_locks: {lock_id, user_id, rate, mid_market_rate, source, amount_usd, status,
+  created_at, expires_at, consumed_at}
+  status: "active" -> "consumed"; expired locks are removed by the TTL monitor
+"""
+
+from datetime import datetime, timezone, timedelta
+from typing import Dict, Any, Tuple
+import logging
+import uuid
+
+from utils.ledger import _transactions_unsupported
+from utils.money import balance_inc
+from utils.wallet_cache import invalidate_wallet
+from database.indexes import apply_indexes
+
+logger = logging.getLogger(__name__)
+
+LOCK_ACTIVE = "active"
+LOCK_CONSUMED = "consumed"
+
+
+class FxLockError(Exception):
+    """Raised when a lock cannot be used (missing, expired, used, or amount too large)"""
+
+    def __init__(self, message: str):
+        super().__init__(message)
+        self.message = message
+
+
+class InsufficientUsdBalance(Exception):
+    """Raised when the wallet cannot cover the conversion (aborts the transaction)"""
+
+
+def utc_now():
+    """Return current UTC datetime"""
+    return datetime.now(timezone.utc)
+
+
+def _as_utc(value: datetime) -> datetime:
+    # Mongo returns naive UTC datetimes unless the client is tz_aware
+    return value if value.tzinfo else value.replace(tzinfo=timezone.utc)
+
+
+async def create_fx_lock(
+    db,
+    user_id: str,
+    rate: float,
+    mid_market_rate: float,
+    source: str,
+    amount_usd: float,
+    duration_seconds: int
+) -> Dict[str, Any]:
+    """Persist a rate lock and return it (without _id)"""
+    now = utc_now()
+    lock = {
+        "lock_id": f"lock_{uuid.uuid4().hex[:12]}",
+        "user_id": user_id,
+        "rate": rate,
+        "mid_market_rate": mid_market_rate,
+        "source": source,
+        "amount_usd": amount_usd,
+        "status": LOCK_ACTIVE,
+        "created_at": now,
+        "expires_at": now + timedelta(seconds=duration_seconds),
+        "consumed_at": None,
+    }
+    await db.fx_locks.insert_one(lock)
+    lock.pop("_id", None)
+    return lock
+
+
+async def _lock_error(db, user_id: str, lock_id: str, amount_usd: float, now) -> FxLockError:
+    """Explain why a lock could not be consumed (error path only)"""
+    lock = await db.fx_locks.find_one({"lock_id": lock_id, "user_id": user_id}, {"_id": 0})
+    if not lock or _as_utc(lock["expires_at"]) <= now:
+        return FxLockError("Rate lock has expired. Please lock a new rate.")
+    if lock.get("status") != LOCK_ACTIVE:
+        return FxLockError("Rate lock has already been used. Please lock a new rate.")
+    if amount_usd > lock.get("amount_usd", 0):
+        return FxLockError(
+            f"Amount exceeds the locked amount of ${lock['amount_usd']:.2f}. Please lock a new rate."
+        )
+    return FxLockError("Rate lock is no longer valid. Please lock a new rate.")
+
+
+async def convert_with_lock(
+    db,
+    user_id: str,
+    lock_id: str,
+    amount_usd: float
+) -> Tuple[Dict[str, Any], float]:
+    """
+    Convert USD -> PHP at a locked rate.
+
+    Consumes the lock and applies the wallet $inc in one transaction (sequential
+    writes with the lock restored on failure where transactions are unavailable).
+
+    Returns:
+        (lock, amount_php)
+
+    Raises:
+        FxLockError: lock missing, expired, already used, or amount above the lock
+        InsufficientUsdBalance: the lock is left active
+    """
+    now = utc_now()
+    lock_query = {
+        "lock_id": lock_id,
+        "user_id": user_id,
+        "status": LOCK_ACTIVE,
+        "expires_at": {"$gt": now},
+        "amount_usd": {"$gte": amount_usd},
+    }
+    consume = {"$set": {"status": LOCK_CONSUMED, "consumed_at": now}}
+    state = {}
+
+    async def consume_and_convert(session=None):
+        # Pre-update document - rate and source never change once locked
+        lock = await db.fx_locks.find_one_and_update(
+            lock_query, consume, projection={"_id": 0}, session=session
+        )
+        if lock is None:
+            raise await _lock_error(db, user_id, lock_id, amount_usd, now)
+        amount_php = round(amount_usd * lock["rate"], 2)
+        result = await db.wallets.update_one(
+            {"user_id": user_id, "usd_balance": {"$gte": amount_usd}},
+            {
+                "$inc": {**balance_inc("USD", -amount_usd), **balance_inc("PHP", amount_php)},
+                "$set": {"updated_at": now}
+            },
+            session=session
+        )
+        if result.modified_count == 0:
+            raise InsufficientUsdBalance()
+        state["lock"], state["amount_php"] = lock, amount_php
+
+    try:
+        async with await db.client.start_session() as session:
+            await session.with_transaction(consume_and_convert)
+    except (FxLockError, InsufficientUsdBalance):
+        raise
+    except Exception as e:
+        if not _transactions_unsupported(e):
+            raise
+        logger.warning("MongoDB transactions not available, falling back to sequential FX lock writes")
+        try:
+            await consume_and_convert()
+        except InsufficientUsdBalance:
+            # Wallet was not touched - give the lock back so the user can retry
+            await db.fx_locks.update_one(
+                {"lock_id": lock_id, "status": LOCK_CONSUMED},
+                {"$set": {"status": LOCK_ACTIVE, "consumed_at": None}}
+            )
+            raise
+
+    await invalidate_wallet(user_id)
+    return state["lock"], state["amount_php"]
+
+
+async def setup_fx_lock_indexes(db):
+    """
+    Create indexes for fx_locks.
+    Specs live in database/indexes.py; called on application startup.
+    """
+    return await apply_indexes(db, ["fx_locks"])
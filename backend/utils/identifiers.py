@@ -0,0 +1,170 @@
+"""
+PBX Identifiers - canonical email / phone keys for recipient resolution
+Every user carries `identifiers`: ["email:<lowercased email>", "phone:<E.164>"],
+held unique by idx_users_identifiers_unique. Whatever the sender typed
+("Maria.Santos@Example.com ", "0917 123 4567", "+63-917-123-4567") is reduced
+to the same key, so resolving a recipient is one exact-match lookup.
+
+Resolutions are cached per process for a short TTL, including "not on PBX"
+answers, so a retyped or re-submitted recipient field does not re-hit Mongo.
+Writers that change a user's email/phone set user_identifiers() in the same
+update (routes/users.py) and drop this worker's cached entries; other
+workers pick the change up within RECIPIENT_NEGATIVE_TTL_SECONDS /
+RECIPIENT_CACHE_TTL_SECONDS.
+"""
+
+from collections import OrderedDict
+from typing import Any, Dict, Iterable, List, Optional
+import copy
+import logging
+import os
+import re
+import time
+
+from utils.security import validate_email_format
+
+logger = logging.getLogger(__name__)
+
+RECIPIENT_CACHE_TTL_SECONDS = float(os.environ.get("RECIPIENT_CACHE_TTL_SECONDS", "60"))
+RECIPIENT_NEGATIVE_TTL_SECONDS = float(os.environ.get("RECIPIENT_NEGATIVE_TTL_SECONDS", "10"))
+RECIPIENT_CACHE_MAX_ENTRIES = int(os.environ.get("RECIPIENT_CACHE_MAX_ENTRIES", "10000"))
+
+# National numbers without a country code are read as Philippine numbers
+DEFAULT_COUNTRY_CODE = os.environ.get("PHONE_DEFAULT_COUNTRY_CODE", "63")
+
+# Fields returned for a resolved recipient
+RECIPIENT_PROJECTION = {
+    "_id": 0, "user_id": 1, "email": 1, "phone": 1, "full_name": 1, "display_name": 1, "role": 1
+}
+
+_NOT_FOUND = {}
+
+
+def normalize_email(email: Optional[str]) -> Optional[str]:
+    email = (email or "").strip().lower()
+    return email if email and validate_email_format(email) else None
+
+
+def normalize_phone(phone: Optional[str]) -> Optional[str]:
+    """
+    E.164 form of a phone number, or None if it cannot be one.
+    "+63 917 123 4567", "0063...", "09171234567" and "9171234567" all give
+    +639171234567; other national numbers take DEFAULT_COUNTRY_CODE.
+    """
+    phone = (phone or "").strip()
+    if not phone or not re.fullmatch(r"\+?[\d\s().\-]+", phone):
+        return None
+    digits = re.sub(r"\D", "", phone)
+
+    if phone.startswith("+"):
+        pass
+    elif digits.startswith("00"):
+        digits = digits[2:]
+    elif digits.startswith("0"):
+        # Trunk prefix of a national number
+        digits = DEFAULT_COUNTRY_CODE + digits[1:]
+    elif len(digits) == 10:
+        digits = DEFAULT_COUNTRY_CODE + digits
+
+    if not 8 <= len(digits) <= 15 or digits.startswith("0"):
+        return None
+    return f"+{digits}"
+
+
+def identifier_key(identifier: Optional[str]) -> Optional[str]:
+    """Canonical key for a free-form email or phone, or None if it is neither"""
+    identifier = (identifier or "").strip()
+    if "@" in identifier:
+        email = normalize_email(identifier)
+        return f"email:{email}" if email else None
+    phone = normalize_phone(identifier)
+    return f"phone:{phone}" if phone else None
+
+
+def user_identifiers(user: Dict[str, Any]) -> List[str]:
+    """Identifier keys for a user document (email and phone, when valid)"""
+    keys = []
+    email = normalize_email(user.get("email"))
+    if email:
+        keys.append(f"email:{email}")
+    phone = normalize_phone(user.get("phone"))
+    if phone:
+        keys.append(f"phone:{phone}")
+    return keys
+
+
+class RecipientCache:
+    """LRU + TTL map of identifier key -> user (or a not-found marker)"""
+
+    def __init__(self, max_entries: int, ttl_seconds: float, negative_ttl_seconds: float):
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        self.negative_ttl_seconds = negative_ttl_seconds
+        self.hits = 0
+        self.negative_hits = 0
+        self.misses = 0
+        self._entries: "OrderedDict[str, tuple]" = OrderedDict()
+
+    def get(self, key: str) -> Optional[Dict[str, Any]]:
+        """Cached user, _NOT_FOUND for a cached miss, None if not cached"""
+        entry = self._entries.get(key)
+        if entry is None or entry[0] <= time.monotonic():
+            self._entries.pop(key, None)
+            self.misses += 1
+            return None
+        self._entries.move_to_end(key)
+        if entry[1] is _NOT_FOUND:
+            self.negative_hits += 1
+            return _NOT_FOUND
+        self.hits += 1
+        return copy.deepcopy(entry[1])
+
+    def set(self, key: str, user: Optional[Dict[str, Any]]):
+        if user is None:
+            self._entries[key] = (time.monotonic() + self.negative_ttl_seconds, _NOT_FOUND)
+        else:
+            self._entries[key] = (time.monotonic() + self.ttl_seconds, copy.deepcopy(user))
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+
+    def invalidate(self, keys: Iterable[str]):
+        for key in keys:
+            self._entries.pop(key, None)
+
+    def clear(self):
+        self._entries.clear()
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "entries": len(self._entries),
+            "ttl_seconds": self.ttl_seconds,
+            "negative_ttl_seconds": self.negative_ttl_seconds,
+            "hits": self.hits,
+            "negative_hits": self.negative_hits,
+            "misses": self.misses,
+        }
+
+
+recipient_cache = RecipientCache(
+    RECIPIENT_CACHE_MAX_ENTRIES, RECIPIENT_CACHE_TTL_SECONDS, RECIPIENT_NEGATIVE_TTL_SECONDS
+)
+
+
+async def resolve_user(db, identifier: str) -> Optional[Dict[str, Any]]:
+    """
+    The PBX user an email/phone belongs to (RECIPIENT_PROJECTION fields),
+    or None when it is not a valid identifier or not on PBX.
+    """
+    key = identifier_key(identifier)
+    if key is None:
+        return None
+
+    cached = recipient_cache.get(key)
+    if cached is not None:
+        return None if cached is _NOT_FOUND else cached
+
+    user = await db.users.find_one({"identifiers": key}, RECIPIENT_PROJECTION)
+    recipient_cache.set(key, user)
+    return user
+
@@ -6,11 +6,24 @@ Collections:
 - ledger_tx: Journal header (one per transfer)
 - ledger: Individual postings (debit/credit lines)
 - wallets: Balance snapshot (derived from ledger)
+- velocity_counters: Per-sender daily outgoing total (see utils/velocity.py)
+- ledger_summaries: Running totals per user / type / currency (see utils/ledger_summaries.py)
 """
 
 from datetime import datetime, timezone
-from typing import Optional, Dict, Any, Tuple
+from typing import Optional, Dict, Any, Tuple, List, Callable, Awaitable
 from fastapi import HTTPException, Request
+from pymongo import UpdateOne
+from pymongo.errors import BulkWriteError, DuplicateKeyError
+from utils.velocity import (
+    METRIC_TRANSFER_OUT, VelocityLimitExceeded, check_and_reserve, release, get_usage, get_remaining
+)
+from utils.ledger_summaries import rebuild_summaries, record_summaries
+from utils.money import (
+    Int64, balance_field, balance_inc, entry_amount, from_minor, minor_field, stored_minor, sum_minor
+)
+from utils.wallet_cache import invalidate_wallet
+from database.indexes import apply_indexes
 import uuid
 import logging
 
@@ -85,129 +98,169 @@ async def check_idempotency_collision(
     return False
 
 
-async def create_transfer_atomic(
+def _transactions_unsupported(error: Exception) -> bool:
+    """True if the error means the deployment cannot run multi-document transactions"""
+    error_str = str(error).lower()
+    return "transaction" in error_str and ("replica" in error_str or "not supported" in error_str)
+
+
+def _is_idempotency_key_conflict(error: DuplicateKeyError) -> bool:
+    """True if a DuplicateKeyError was raised by the ledger_tx idempotency_key index"""
+    details = error.details or {}
+    key_pattern = details.get("keyPattern") or {}
+    if key_pattern:
+        return "idempotency_key" in key_pattern
+    return "idempotency_key" in str(error)
+
+
+def _same_transfer(existing: Dict[str, Any], amount: float, from_user_id: str, to_user_id: str) -> bool:
+    """True if a stored ledger_tx header matches the parameters of a repeated request"""
+    return (existing.get("amount") == amount and
+            existing.get("from_user_id") == from_user_id and
+            existing.get("to_user_id") == to_user_id)
+
+
+async def _idempotent_replay(
     db,
-    from_user_id: str,
-    to_user_id: str,
+    idempotency_key: str,
     amount: float,
-    currency: str = "USD",
-    note: Optional[str] = None,
-    idempotency_key: Optional[str] = None,
-    transfer_type: str = "pbx_transfer",
-    metadata: Optional[Dict[str, Any]] = None
+    from_user_id: str,
+    to_user_id: str
 ) -> Tuple[Dict[str, Any], bool]:
     """
-    Create an atomic PBX-to-PBX transfer using MongoDB transactions.
-    
-    This function:
-    1. Checks idempotency (returns existing tx if duplicate)
-    2. Validates sender has sufficient balance
-    3. Creates ledger_tx header
-    4. Creates two ledger entries (debit + credit)
-    5. Updates both wallets atomically
-    
-    Returns:
-        Tuple of (transaction_result, is_duplicate)
-        - transaction_result: The ledger_tx document
-        - is_duplicate: True if this was a duplicate request (idempotent replay)
-    
-    Raises:
-        HTTPException: On validation failures or insufficient balance
+    Resolve an idempotency key that the unique index rejected.
+    Returns the original transaction, or raises 409 if the parameters differ.
     """
-    now = utc_now()
-    
-    # Check idempotency first - return existing if duplicate
-    if idempotency_key:
-        existing = await check_idempotency(db, idempotency_key)
-        if existing:
-            # Check for collision (same key, different body)
-            if (existing.get("amount") != amount or 
-                existing.get("from_user_id") != from_user_id or 
-                existing.get("to_user_id") != to_user_id):
-                raise HTTPException(
-                    status_code=409,
-                    detail={
-                        "error": "idempotency_collision",
-                        "message": "This idempotency key was already used with different parameters",
-                        "original_tx_id": existing.get("tx_id")
-                    }
-                )
-            # Same request repeated - return original result (idempotent replay)
-            logger.info(f"Idempotent replay detected: {idempotency_key} -> {existing.get('tx_id')}")
-            return existing, True
-    
-    # Validate amount
-    if amount <= 0:
-        raise HTTPException(status_code=400, detail="Amount must be greater than 0")
-    
-    if amount > 5000:
-        raise HTTPException(status_code=400, detail="Amount exceeds single transaction limit of $5,000")
-    
-    # Self-transfer check
-    if from_user_id == to_user_id:
-        raise HTTPException(status_code=400, detail="Cannot transfer to yourself")
-    
-    # Get collections
-    wallets = db.wallets
-    ledger = db.ledger
-    ledger_tx = db.ledger_tx
-    
-    # DO NOT check balance here - do it atomically in the update operation
-    # This prevents race conditions where balance changes between check and update
-    
-    # Ensure sender wallet exists (but don't check balance yet)
-    sender_wallet = await wallets.find_one({"user_id": from_user_id})
-    if not sender_wallet:
-        # Auto-create wallet with 0 balance
-        sender_wallet = {
-            "user_id": from_user_id,
-            "usd_balance": 0.0,
-            "php_balance": 0.0,
-            "created_at": now,
-            "updated_at": now
-        }
-        await wallets.insert_one(sender_wallet)
-        # New wallet has 0 balance - will fail balance check below
-        sender_wallet = await wallets.find_one({"user_id": from_user_id})
-    
-    balance_field = "usd_balance" if currency == "USD" else "php_balance"
+    existing = await check_idempotency(db, idempotency_key)
+    if not existing:
+        # The conflicting insert was rolled back between our write and this read
+        raise HTTPException(status_code=409, detail="Concurrent request with the same idempotency key, please retry")
     
-    # Quick pre-check for user feedback (not authoritative - atomic check is in update)
-    current_balance = sender_wallet.get(balance_field, 0)
-    if current_balance < amount:
+    # Check for collision (same key, different body)
+    if not _same_transfer(existing, amount, from_user_id, to_user_id):
         raise HTTPException(
-            status_code=400,
+            status_code=409,
             detail={
-                "error": "insufficient_balance",
-                "message": f"Insufficient balance. Available: {currency} {current_balance:.2f}, Required: {currency} {amount:.2f}",
-                "available": current_balance,
-                "required": amount,
-                "currency": currency
+                "error": "idempotency_collision",
+                "message": "This idempotency key was already used with different parameters",
+                "original_tx_id": existing.get("tx_id")
             }
         )
-    
-    # Ensure recipient wallet exists
-    recipient_wallet = await wallets.find_one({"user_id": to_user_id})
-    if not recipient_wallet:
-        recipient_wallet = {
-            "user_id": to_user_id,
-            "usd_balance": 0.0,
-            "php_balance": 0.0,
-            "created_at": now,
-            "updated_at": now
+    # Same request repeated - return original result (idempotent replay)
+    logger.info(f"Idempotent replay detected: {idempotency_key} -> {existing.get('tx_id')}")
+    return existing, True
+
+
+async def _insufficient_balance_error(db, from_user_id: str, amount: float, currency: str) -> HTTPException:
+    """Build the insufficient-balance error (failure path only - costs one read)"""
+    field = balance_field(currency)
+    wallet = await db.wallets.find_one({"user_id": from_user_id}, {"_id": 0, field: 1})
+    current_balance = wallet.get(field, 0) if wallet else 0
+    return HTTPException(
+        status_code=400,
+        detail={
+            "error": "insufficient_balance",
+            "message": f"Insufficient balance. Available: {currency} {current_balance:.2f}, Required: {currency} {amount:.2f}",
+            "available": current_balance,
+            "required": amount,
+            "currency": currency
+        }
+    )
+
+
+class _InsufficientBalance(Exception):
+    """Raised inside the write pipeline when the conditional sender debit matches nothing"""
+
+
+def _sender_debit(from_user_id: str, amount: float, currency: str, now, amount_minor: Optional[int] = None) -> Tuple[dict, dict]:
+    """Sender debit (filter, update) - conditional on sufficient balance, the authoritative check"""
+    debit_minor = None if amount_minor is None else -amount_minor
+    return (
+        {"user_id": from_user_id, balance_field(currency): {"$gte": amount}},
+        {"$inc": balance_inc(currency, -amount, debit_minor), "$set": {"updated_at": now}}
+    )
+
+
+def _recipient_credit(to_user_id: str, amount: float, currency: str, now, amount_minor: Optional[int] = None) -> Tuple[dict, dict]:
+    """Recipient credit (filter, update) - upserts the wallet with $setOnInsert instead of read-then-insert"""
+    other_field = balance_field("PHP" if currency == "USD" else "USD")
+    return (
+        {"user_id": to_user_id},
+        {
+            "$inc": balance_inc(currency, amount, amount_minor),
+            "$set": {"updated_at": now},
+            "$setOnInsert": {other_field: 0.0, minor_field(other_field): Int64(0), "created_at": now}
         }
-        await wallets.insert_one(recipient_wallet)
+    )
+
+
+def _sender_debited(result) -> bool:
+    """The debit matched iff both wallet operations matched (or upserted) a document"""
+    return result.matched_count + result.upserted_count >= 2
+
+
+async def _daily_limit_error(db, user_id: str, limit: float, now) -> HTTPException:
+    """Build the daily-limit error (failure path only - costs one read)"""
+    remaining = await get_remaining(db, user_id, METRIC_TRANSFER_OUT, limit, period="day", now=now)
+    return HTTPException(
+        status_code=400,
+        detail=f"Transfer exceeds daily PBX limit. You have ${remaining:,.2f} remaining today. Daily limit: ${limit:,.0f}."
+    )
+
+
+def _sent_today(db, user_id: str, now) -> Callable[[], Awaitable[float]]:
+    """
+    Seed for the sender's daily transfer_out counter: today's outgoing entries,
+    so transfers made before the counter existed still count (idx_ledger_user_type_created_id)
+    """
+    start_of_day = now.replace(hour=0, minute=0, second=0, microsecond=0)
     
-    # Generate transaction ID
-    tx_id = generate_tx_id()
+    async def seed() -> float:
+        rows = await db.ledger.aggregate([
+            {"$match": {"user_id": user_id, "type": "internal_transfer_out", "created_at": {"$gte": start_of_day}}},
+            {"$group": {"_id": None, "total": {"$sum": {"$abs": "$amount"}}}}
+        ]).to_list(1)
+        return rows[0]["total"] if rows else 0.0
     
-    # Prepare documents
+    return seed
+
+
+async def _reserve_transfer_out(db, user_id: str, amount: float, daily_limit: Optional[float], now, session=None):
+    """Add `amount` to the sender's daily transfer_out counter (seeded from the ledger on first use)"""
+    await check_and_reserve(
+        db, user_id, METRIC_TRANSFER_OUT, amount, daily_limit,
+        period="day", session=session, seed=_sent_today(db, user_id, now), now=now
+    )
+
+
+async def get_daily_transfer_total(db, user_id: str) -> float:
+    """Total sent today (UTC) by a user - one indexed read"""
+    return await get_usage(db, user_id, METRIC_TRANSFER_OUT, period="day")
+
+
+def _build_transfer_documents(
+    tx_id: str,
+    from_user_id: str,
+    to_user_id: str,
+    amount: float,
+    currency: str,
+    note: Optional[str],
+    idempotency_key: Optional[str],
+    transfer_type: str,
+    metadata: Optional[Dict[str, Any]],
+    now,
+    entry_fields: Optional[Dict[str, Dict[str, Any]]] = None
+) -> Tuple[dict, dict, dict]:
+    """
+    Build the ledger_tx header and the debit/credit entries for one transfer.
+    entry_fields: optional {"debit": {...}, "credit": {...}} display fields merged into the entries
+    """
     # 1. Ledger TX header (journal entry)
     ledger_tx_doc = {
         "tx_id": tx_id,
         "type": transfer_type,
         "currency": currency,
-        "amount": amount,
+        **entry_amount(amount, currency),
         "from_user_id": from_user_id,
         "to_user_id": to_user_id,
         "status": "completed",
@@ -228,7 +281,7 @@ async def create_transfer_atomic(
         "type": "internal_transfer_out",
         "entry_type": "debit",
         "currency": currency,
-        "amount": -amount,
+        **entry_amount(-amount, currency),
         "counterparty_user_id": to_user_id,
         "note": note,
         "status": "completed",
@@ -242,118 +295,172 @@ async def create_transfer_atomic(
         "type": "internal_transfer_in",
         "entry_type": "credit",
         "currency": currency,
-        "amount": amount,
+        **entry_amount(amount, currency),
         "counterparty_user_id": from_user_id,
         "note": note,
         "status": "completed",
         "created_at": now
     }
+    if entry_fields:
+        debit_entry.update(entry_fields.get("debit") or {})
+        credit_entry.update(entry_fields.get("credit") or {})
+    return ledger_tx_doc, debit_entry, credit_entry
+
+
+async def create_transfer_atomic(
+    db,
+    from_user_id: str,
+    to_user_id: str,
+    amount: float,
+    currency: str = "USD",
+    note: Optional[str] = None,
+    idempotency_key: Optional[str] = None,
+    transfer_type: str = "pbx_transfer",
+    metadata: Optional[Dict[str, Any]] = None,
+    daily_limit: Optional[float] = None,
+    entry_fields: Optional[Dict[str, Dict[str, Any]]] = None
+) -> Tuple[Dict[str, Any], bool]:
+    """
+    Create an atomic PBX-to-PBX transfer using MongoDB transactions.
+    
+    Write pipeline (5 round trips on a replica set):
+    1. Insert ledger_tx header - the unique idempotency_key index rejects replays,
+       so there is no pre-read; a DuplicateKeyError resolves to the original tx
+    2. Add the amount to the sender's daily counter - conditional on daily_limit if given
+    3. One bulk write for both wallets: conditional sender debit + recipient upsert
+    4. One insert_many for both ledger entries (debit + credit)
+    5. Commit
+    
+    Returns:
+        Tuple of (transaction_result, is_duplicate)
+        - transaction_result: The ledger_tx document
+        - is_duplicate: True if this was a duplicate request (idempotent replay)
+    
+    Raises:
+        HTTPException: On validation failures or insufficient balance
+    """
+    # Validate amount
+    if amount <= 0:
+        raise HTTPException(status_code=400, detail="Amount must be greater than 0")
+    
+    if amount > 5000:
+        raise HTTPException(status_code=400, detail="Amount exceeds single transaction limit of $5,000")
+    
+    # Self-transfer check
+    if from_user_id == to_user_id:
+        raise HTTPException(status_code=400, detail="Cannot transfer to yourself")
+    
+    now = utc_now()
+    
+    tx_id = generate_tx_id()
+    ledger_tx_doc, debit_entry, credit_entry = _build_transfer_documents(
+        tx_id, from_user_id, to_user_id, amount, currency, note,
+        idempotency_key, transfer_type, metadata, now, entry_fields
+    )
+    
+    sender_debit = _sender_debit(from_user_id, amount, currency, now)
+    recipient_credit = _recipient_credit(to_user_id, amount, currency, now)
+    # Both wallet mutations travel as one ordered bulk write
+    wallet_ops = [
+        UpdateOne(*sender_debit),
+        UpdateOne(*recipient_credit, upsert=True),
+    ]
+    
+    async def write_pipeline(session):
+        await db.ledger_tx.insert_one(ledger_tx_doc, session=session)
+        await _reserve_transfer_out(db, from_user_id, amount, daily_limit, now, session=session)
+        result = await db.wallets.bulk_write(wallet_ops, ordered=True, session=session)
+        if not _sender_debited(result):
+            # Aborts the transaction - the recipient credit is rolled back with it
+            raise _InsufficientBalance()
+        await db.ledger.insert_many([debit_entry, credit_entry], ordered=True, session=session)
+        await record_summaries(db, [debit_entry, credit_entry], session=session)
     
     # Execute atomic transaction using MongoDB session
     # Note: This requires MongoDB replica set. For standalone, we use optimistic approach.
     try:
-        # Try transaction approach first (requires replica set)
         async with await db.client.start_session() as session:
-            async with session.start_transaction():
-                # Insert ledger_tx header
-                await ledger_tx.insert_one(ledger_tx_doc, session=session)
-                
-                # Insert ledger entries
-                await ledger.insert_one(debit_entry, session=session)
-                await ledger.insert_one(credit_entry, session=session)
-                
-                # Update sender wallet (debit)
-                result = await wallets.update_one(
-                    {
-                        "user_id": from_user_id,
-                        f"{balance_field}": {"$gte": amount}  # Ensure still has balance
-                    },
-                    {"$inc": {balance_field: -amount}, "$set": {"updated_at": now}},
-                    session=session
-                )
-                
-                if result.modified_count == 0:
-                    raise HTTPException(
-                        status_code=400,
-                        detail="Insufficient balance (concurrent modification)"
-                    )
-                
-                # Update recipient wallet (credit)
-                await wallets.update_one(
-                    {"user_id": to_user_id},
-                    {"$inc": {balance_field: amount}, "$set": {"updated_at": now}},
-                    session=session
-                )
-                
-                logger.info(f"Transfer completed atomically: {tx_id} ({from_user_id} -> {to_user_id}, {currency} {amount})")
+            # with_transaction retries TransientTransactionError (e.g. write conflicts
+            # between concurrent requests carrying the same idempotency key)
+            await session.with_transaction(write_pipeline)
         
+        await invalidate_wallet(from_user_id, to_user_id)
+        logger.info(f"Transfer completed atomically: {tx_id} ({from_user_id} -> {to_user_id}, {currency} {amount})")
         return ledger_tx_doc, False
         
+    except _InsufficientBalance:
+        raise await _insufficient_balance_error(db, from_user_id, amount, currency)
+    except VelocityLimitExceeded:
+        raise await _daily_limit_error(db, from_user_id, daily_limit, now)
+    except DuplicateKeyError as e:
+        if idempotency_key and _is_idempotency_key_conflict(e):
+            return await _idempotent_replay(db, idempotency_key, amount, from_user_id, to_user_id)
+        raise
     except Exception as e:
         # Check if it's a transaction not supported error (standalone MongoDB)
-        error_str = str(e).lower()
-        if "transaction" in error_str and ("replica" in error_str or "not supported" in error_str):
+        if _transactions_unsupported(e):
             logger.warning("MongoDB transactions not available, falling back to sequential writes")
             return await _create_transfer_sequential(
-                db, ledger_tx, ledger, wallets,
-                ledger_tx_doc, debit_entry, credit_entry,
-                from_user_id, to_user_id, amount, balance_field, now, tx_id
+                db, ledger_tx_doc, debit_entry, credit_entry, sender_debit, recipient_credit,
+                from_user_id, to_user_id, amount, currency, now, tx_id, idempotency_key, daily_limit
             )
         raise
 
 
 async def _create_transfer_sequential(
-    db, ledger_tx, ledger, wallets,
-    ledger_tx_doc, debit_entry, credit_entry,
-    from_user_id, to_user_id, amount, balance_field, now, tx_id
+    db, ledger_tx_doc, debit_entry, credit_entry, sender_debit, recipient_credit,
+    from_user_id, to_user_id, amount, currency, now, tx_id, idempotency_key, daily_limit=None
 ):
     """
     Fallback for environments without replica set.
     Uses optimistic concurrency with ATOMIC balance check.
     The balance check is part of the update query itself - not a separate read.
     """
+    ledger_tx = db.ledger_tx
+    
     try:
         # Insert ledger_tx header first (idempotency protection via unique index)
         await ledger_tx.insert_one(ledger_tx_doc)
-        
-        # ATOMIC: Update sender wallet ONLY IF balance is sufficient
-        # This is the authoritative balance check - not the pre-check above
-        result = await wallets.update_one(
-            {
-                "user_id": from_user_id,
-                balance_field: {"$gte": amount}  # Atomic balance check
-            },
+    except DuplicateKeyError as e:
+        if idempotency_key and _is_idempotency_key_conflict(e):
+            return await _idempotent_replay(db, idempotency_key, amount, from_user_id, to_user_id)
+        raise
+    
+    async def release_key(failure_reason: str):
+        # Release the idempotency key so the client can retry
+        await ledger_tx.update_one(
+            {"tx_id": tx_id},
             {
-                "$inc": {balance_field: -amount},
-                "$set": {"updated_at": now}
+                "$set": {"status": "failed", "failure_reason": failure_reason, "updated_at": now},
+                "$unset": {"idempotency_key": ""}
             }
         )
+    
+    try:
+        await _reserve_transfer_out(db, from_user_id, amount, daily_limit, now)
+    except VelocityLimitExceeded:
+        await release_key("daily_limit_exceeded")
+        raise await _daily_limit_error(db, from_user_id, daily_limit, now)
+    
+    try:
+        # ATOMIC: Update sender wallet ONLY IF balance is sufficient
+        # This is the authoritative balance check - there is no pre-read
+        result = await db.wallets.update_one(*sender_debit)
         
-        if result.modified_count == 0:
+        if result.matched_count == 0:
             # Balance was insufficient at the moment of atomic update
-            # This catches race conditions where balance changed between pre-check and now
-            await ledger_tx.update_one(
-                {"tx_id": tx_id},
-                {"$set": {"status": "failed", "failure_reason": "insufficient_balance_concurrent", "updated_at": now}}
-            )
-            raise HTTPException(
-                status_code=400,
-                detail={
-                    "error": "insufficient_balance",
-                    "message": "Insufficient balance (concurrent debit detected)"
-                }
-            )
+            await release(db, from_user_id, METRIC_TRANSFER_OUT, amount, period="day", now=now)
+            await release_key("insufficient_balance")
+            raise await _insufficient_balance_error(db, from_user_id, amount, currency)
         
-        # Insert ledger entries
-        await ledger.insert_one(debit_entry)
-        await ledger.insert_one(credit_entry)
+        # Credit recipient (this is safe - only adds funds)
+        await db.wallets.update_one(*recipient_credit, upsert=True)
         
-        # Update recipient wallet (this is safe - only adds funds)
-        await wallets.update_one(
-            {"user_id": to_user_id},
-            {"$inc": {balance_field: amount}, "$set": {"updated_at": now}}
-        )
+        # Insert both ledger entries in one round trip
+        await db.ledger.insert_many([debit_entry, credit_entry], ordered=True)
+        await _record_summaries_or_rebuild(db, [debit_entry, credit_entry])
         
+        await invalidate_wallet(from_user_id, to_user_id)
         logger.info(f"Transfer completed sequentially: {tx_id} ({from_user_id} -> {to_user_id})")
         return ledger_tx_doc, False
         
@@ -362,6 +469,7 @@ async def _create_transfer_sequential(
     except Exception as e:
         # Log error and attempt to mark transaction as failed
         logger.error(f"Transfer failed: {tx_id} - {str(e)}")
+        await invalidate_wallet(from_user_id, to_user_id)
         try:
             await ledger_tx.update_one(
                 {"tx_id": tx_id},
@@ -372,6 +480,403 @@ async def _create_transfer_sequential(
         raise HTTPException(status_code=500, detail="Transfer failed due to system error")
 
 
+# ============================================================
+# LEDGER ENTRIES OUTSIDE TRANSFERS
+# ============================================================
+
+async def _record_summaries_or_rebuild(db, entries: List[dict]):
+    """
+    record_summaries without a transaction around it: the entries are already in,
+    so a failed (possibly partly applied) summary write is repaired by rebuilding
+    the users' summaries instead of failing the write that produced them.
+    """
+    try:
+        await record_summaries(db, entries)
+    except Exception as e:
+        logger.error(f"Summary write failed, rebuilding: {e}")
+        for user_id in {entry["user_id"] for entry in entries}:
+            try:
+                await rebuild_summaries(db, user_id)
+            except Exception:
+                logger.exception(
+                    f"Ledger summaries for {user_id} need a rebuild (POST /ops/ledger-summaries/{user_id}/rebuild)"
+                )
+
+
+async def insert_ledger_entries(db, entries: List[dict]):
+    """
+    Insert ledger entries that are not part of a transfer (FX conversions, admin
+    adjustments, business payments) and apply them to ledger_summaries in the
+    same transaction. Without a replica set the entries go in first and the
+    summaries follow (_record_summaries_or_rebuild).
+    """
+    async def write_pipeline(session):
+        await db.ledger.insert_many(entries, ordered=True, session=session)
+        await record_summaries(db, entries, session=session)
+    
+    try:
+        async with await db.client.start_session() as session:
+            await session.with_transaction(write_pipeline)
+        return
+    except Exception as e:
+        if not _transactions_unsupported(e):
+            raise
+    
+    await db.ledger.insert_many(entries, ordered=True)
+    await _record_summaries_or_rebuild(db, entries)
+
+
+# ============================================================
+# BATCH TRANSFERS
+# ============================================================
+
+# Documents per insert_many / bulk_write inside a batch (also the progress granularity)
+BATCH_WRITE_CHUNK_SIZE = 500
+
+BatchProgressCallback = Callable[[int, int], Awaitable[None]]
+
+
+def _batch_item_result(
+    item: Dict[str, Any],
+    status: str,
+    tx_id: Optional[str] = None,
+    error: Optional[str] = None
+) -> Dict[str, Any]:
+    """Per-item outcome returned by create_batch_transfer_atomic"""
+    return {
+        "index": item["index"],
+        "status": status,
+        "to_user_id": item["to_user_id"],
+        "amount": item["amount"],
+        "tx_id": tx_id,
+        "error": error
+    }
+
+
+def _validate_batch_item(from_user_id: str, item: Dict[str, Any]) -> Optional[str]:
+    """Same rules as create_transfer_atomic, reported per item instead of raised"""
+    if item["amount"] <= 0:
+        return "Amount must be greater than 0"
+    if item["amount"] > 5000:
+        return "Amount exceeds single transaction limit of $5,000"
+    if item["to_user_id"] == from_user_id:
+        return "Cannot transfer to yourself"
+    return None
+
+
+def _chunked(prepared: List[tuple]):
+    """Yield (processed_so_far, chunk) pairs of BATCH_WRITE_CHUNK_SIZE"""
+    for start in range(0, len(prepared), BATCH_WRITE_CHUNK_SIZE):
+        chunk = prepared[start:start + BATCH_WRITE_CHUNK_SIZE]
+        yield start + len(chunk), chunk
+
+
+def _recipient_credit_ops(chunk: List[tuple], currency: str, now) -> List[UpdateOne]:
+    """One upsert per distinct recipient in the chunk"""
+    amounts: Dict[str, List[float]] = {}
+    for item, _, _, _ in chunk:
+        amounts.setdefault(item["to_user_id"], []).append(item["amount"])
+    return [
+        UpdateOne(*_recipient_credit(to_user_id, sum(credits), currency, now, sum_minor(credits, currency)), upsert=True)
+        for to_user_id, credits in amounts.items()
+    ]
+
+
+async def _resolve_batch_replays(
+    db,
+    from_user_id: str,
+    pending: List[Dict[str, Any]],
+    results: Dict[int, Dict[str, Any]]
+) -> List[Dict[str, Any]]:
+    """
+    Resolve already-used idempotency keys with one $in read.
+    Replays are recorded as duplicates (or collisions); the rest are returned for writing.
+    """
+    keys = [item["idempotency_key"] for item in pending if item.get("idempotency_key")]
+    if not keys:
+        return pending
+    
+    existing = {}
+    cursor = db.ledger_tx.find(
+        {"idempotency_key": {"$in": keys}},
+        {"_id": 0, "idempotency_key": 1, "tx_id": 1, "amount": 1, "from_user_id": 1, "to_user_id": 1}
+    )
+    async for doc in cursor:
+        existing[doc["idempotency_key"]] = doc
+    
+    to_write = []
+    for item in pending:
+        doc = existing.get(item.get("idempotency_key"))
+        if doc is None:
+            to_write.append(item)
+        elif _same_transfer(doc, item["amount"], from_user_id, item["to_user_id"]):
+            results[item["index"]] = _batch_item_result(item, "duplicate", tx_id=doc.get("tx_id"))
+        else:
+            results[item["index"]] = _batch_item_result(
+                item, "failed", tx_id=doc.get("tx_id"), error="idempotency_collision"
+            )
+    return to_write
+
+
+async def create_batch_transfer_atomic(
+    db,
+    from_user_id: str,
+    items: List[Dict[str, Any]],
+    currency: str = "USD",
+    transfer_type: str = "pbx_transfer",
+    metadata: Optional[Dict[str, Any]] = None,
+    on_progress: Optional[BatchProgressCallback] = None,
+    daily_limit: Optional[float] = None
+) -> Dict[str, Any]:
+    """
+    Pay many recipients from one sender (payroll-style payouts).
+    
+    items: [{"index", "to_user_id", "amount", "note", "idempotency_key"}]
+    
+    Each item becomes a normal transfer (one ledger_tx header + debit/credit entries,
+    tagged with metadata.batch_id), but the writes are batched:
+    1. One $in read resolves items whose idempotency key was already used
+    2. Reserve the batch total on the sender's daily counter - conditional on
+       daily_limit if given, the same counter single transfers use
+    3. One conditional sender debit for the batch total
+    4. Per chunk: insert_many headers, one bulk_write of recipient upserts,
+       insert_many entries - then on_progress(processed, total)
+    5. Commit (replica set) - the whole batch succeeds or fails together
+    
+    Returns:
+        {"batch_id", "currency", "total_debited", "results"} - results in item order;
+        each item completed / duplicate / failed, or unknown when the sequential
+        fallback credited it but could not record it (see _write_batch_sequential)
+    
+    Raises:
+        HTTPException: 400 if the balance or the remaining daily limit does not
+        cover the batch total (nothing is paid)
+    """
+    now = utc_now()
+    batch_id = f"batch_{uuid.uuid4().hex[:16]}"
+    
+    results: Dict[int, Dict[str, Any]] = {}
+    pending = []
+    seen_keys = set()
+    for item in items:
+        error = _validate_batch_item(from_user_id, item)
+        key = item.get("idempotency_key")
+        if not error and key and key in seen_keys:
+            error = "Duplicate idempotency key within batch"
+        if error:
+            results[item["index"]] = _batch_item_result(item, "failed", error=error)
+            continue
+        if key:
+            seen_keys.add(key)
+        pending.append(item)
+    
+    total_debited = 0.0
+    for attempt in range(2):
+        to_write = await _resolve_batch_replays(db, from_user_id, pending, results)
+        if not to_write:
+            break
+        
+        prepared = []
+        for item in to_write:
+            tx_id = generate_tx_id()
+            item_metadata = {**(metadata or {}), "batch_id": batch_id}
+            prepared.append((item, *_build_transfer_documents(
+                tx_id, from_user_id, item["to_user_id"], item["amount"], currency,
+                item.get("note"), item.get("idempotency_key"), transfer_type, item_metadata, now
+            )))
+        total = sum(item["amount"] for item in to_write)
+        
+        try:
+            written, in_doubt = await _write_batch(
+                db, prepared, from_user_id, total, currency, now, on_progress, daily_limit
+            )
+        except DuplicateKeyError as e:
+            # A concurrent request claimed one of our keys after the pre-read -
+            # nothing from this attempt was kept, so resolve replays again
+            if attempt == 0 and _is_idempotency_key_conflict(e):
+                logger.warning(f"Batch {batch_id}: idempotency key race, retrying")
+                continue
+            raise HTTPException(status_code=409, detail="Concurrent request with the same idempotency key, please retry")
+        
+        written_tx_ids = {header["tx_id"] for _, header, _, _ in written}
+        in_doubt_tx_ids = {header["tx_id"] for _, header, _, _ in in_doubt}
+        for item, header, _, _ in prepared:
+            if header["tx_id"] in written_tx_ids:
+                results[item["index"]] = _batch_item_result(item, "completed", tx_id=header["tx_id"])
+                total_debited += item["amount"]
+            elif header["tx_id"] in in_doubt_tx_ids:
+                # Paid but not fully recorded; the key is kept, so a retry replays it
+                results[item["index"]] = _batch_item_result(
+                    item, "unknown", tx_id=header["tx_id"], error="Transfer outcome unknown - do not resend, check its status"
+                )
+                total_debited += item["amount"]
+            else:
+                results[item["index"]] = _batch_item_result(
+                    item, "failed", tx_id=header["tx_id"], error="Transfer failed due to system error"
+                )
+        break
+    
+    logger.info(
+        f"Batch {batch_id} completed: {from_user_id} paid {len(pending)} items, {currency} {total_debited}"
+    )
+    return {
+        "batch_id": batch_id,
+        "currency": currency,
+        "total_debited": total_debited,
+        "results": [results[item["index"]] for item in items]
+    }
+
+
+async def _write_batch(
+    db, prepared, from_user_id, total, currency, now, on_progress, daily_limit=None
+) -> Tuple[List[tuple], List[tuple]]:
+    """
+    Write a prepared batch in one transaction.
+    Returns (written, in_doubt) - in_doubt is only ever non-empty on the sequential fallback.
+    """
+    sender_debit = _sender_debit(
+        from_user_id, total, currency, now, sum_minor([item["amount"] for item, _, _, _ in prepared], currency)
+    )
+    
+    async def write_pipeline(session):
+        await _reserve_transfer_out(db, from_user_id, total, daily_limit, now, session=session)
+        result = await db.wallets.update_one(*sender_debit, session=session)
+        if result.matched_count == 0:
+            raise _InsufficientBalance()
+        for processed, chunk in _chunked(prepared):
+            await db.ledger_tx.insert_many([header for _, header, _, _ in chunk], ordered=True, session=session)
+            await db.wallets.bulk_write(_recipient_credit_ops(chunk, currency, now), ordered=False, session=session)
+            entries = [entry for _, _, debit, credit in chunk for entry in (debit, credit)]
+            await db.ledger.insert_many(entries, ordered=True, session=session)
+            await record_summaries(db, entries, session=session)
+            if on_progress:
+                await on_progress(processed, len(prepared))
+    
+    try:
+        async with await db.client.start_session() as session:
+            await session.with_transaction(write_pipeline)
+        await invalidate_wallet(from_user_id, *{item["to_user_id"] for item, _, _, _ in prepared})
+        return prepared, []
+    except _InsufficientBalance:
+        raise await _insufficient_balance_error(db, from_user_id, total, currency)
+    except VelocityLimitExceeded:
+        raise await _daily_limit_error(db, from_user_id, daily_limit, now)
+    except Exception as e:
+        if _transactions_unsupported(e):
+            logger.warning("MongoDB transactions not available, falling back to sequential batch writes")
+            return await _write_batch_sequential(
+                db, prepared, sender_debit, from_user_id, total, currency, now, on_progress, daily_limit
+            )
+        raise
+
+
+async def _finish_batch_chunk(db, entries: List[dict]):
+    """
+    Ledger entries and summaries for a chunk whose recipients were credited.
+    Entries that already landed are skipped (idx_ledger_unique_entry); summaries
+    are only recorded after every entry is in, so none of them was counted yet.
+    """
+    try:
+        await db.ledger.insert_many(entries, ordered=False)
+    except BulkWriteError as e:
+        if e.details.get("writeConcernErrors") or any(
+            error.get("code") != 11000 for error in e.details.get("writeErrors", [])
+        ):
+            raise
+    await _record_summaries_or_rebuild(db, entries)
+
+
+async def _write_batch_sequential(
+    db, prepared, sender_debit, from_user_id, total, currency, now, on_progress, daily_limit=None
+) -> Tuple[List[tuple], List[tuple]]:
+    """
+    Fallback for environments without replica set.
+    Reserves and debits the total up front, then writes chunk by chunk. When a
+    chunk fails:
+    - before its credits landed: it and the rest of the batch are refunded,
+      their headers marked failed and their idempotency keys released
+    - after its credits landed: its entries are written (again) so it completes;
+      if that fails too its headers and keys are left as they are and the items
+      are returned as in doubt - a retry with the same key replays, never re-pays
+    Returns (written, in_doubt).
+    """
+    try:
+        await _reserve_transfer_out(db, from_user_id, total, daily_limit, now)
+    except VelocityLimitExceeded:
+        raise await _daily_limit_error(db, from_user_id, daily_limit, now)
+    result = await db.wallets.update_one(*sender_debit)
+    if result.matched_count == 0:
+        await release(db, from_user_id, METRIC_TRANSFER_OUT, total, period="day", now=now)
+        raise await _insufficient_balance_error(db, from_user_id, total, currency)
+    
+    written: List[tuple] = []
+    in_doubt: List[tuple] = []
+    stage = None
+    entries: List[dict] = []
+    try:
+        for processed, chunk in _chunked(prepared):
+            stage = "headers"
+            await db.ledger_tx.insert_many([header for _, header, _, _ in chunk], ordered=True)
+            stage = "credits"
+            try:
+                await db.wallets.bulk_write(_recipient_credit_ops(chunk, currency, now), ordered=False)
+            except BulkWriteError as e:
+                if e.details.get("nModified") or e.details.get("nUpserted"):
+                    stage = "partially_credited"
+                raise
+            stage = "entries"
+            entries = [entry for _, _, debit, credit in chunk for entry in (debit, credit)]
+            await db.ledger.insert_many(entries, ordered=True)
+            written.extend(chunk)
+            stage = None
+            await _record_summaries_or_rebuild(db, entries)
+            if on_progress:
+                await on_progress(processed, len(prepared))
+    except Exception as e:
+        unwritten = prepared[len(written):]
+        if stage in ("entries", "partially_credited"):
+            # The in-flight chunk credited recipients - complete it, never refund it
+            chunk, unwritten = unwritten[:BATCH_WRITE_CHUNK_SIZE], unwritten[BATCH_WRITE_CHUNK_SIZE:]
+            try:
+                if stage == "partially_credited":
+                    # Some credits landed, some did not - entries for all would be wrong too
+                    in_doubt.extend(chunk)
+                else:
+                    await _finish_batch_chunk(db, entries)
+                    written.extend(chunk)
+            except Exception:
+                in_doubt.extend(chunk)
+            if in_doubt:
+                logger.error(f"Batch items credited but not recorded: {[h['tx_id'] for _, h, _, _ in in_doubt]}")
+        
+        # Nothing in `unwritten` credited anyone
+        refund_amounts = [item["amount"] for item, _, _, _ in unwritten]
+        refund = sum(refund_amounts)
+        logger.error(f"Batch write failed after {len(written)} items - refunding {currency} {refund}: {str(e)}")
+        try:
+            if refund > 0:
+                await db.wallets.update_one(
+                    {"user_id": from_user_id},
+                    {"$inc": balance_inc(currency, refund, sum_minor(refund_amounts, currency)), "$set": {"updated_at": utc_now()}}
+                )
+                await release(db, from_user_id, METRIC_TRANSFER_OUT, refund, period="day", now=now)
+            if unwritten:
+                await db.ledger_tx.update_many(
+                    {"tx_id": {"$in": [header["tx_id"] for _, header, _, _ in unwritten]}},
+                    {
+                        "$set": {"status": "failed", "failure_reason": str(e), "updated_at": utc_now()},
+                        "$unset": {"idempotency_key": ""}
+                    }
+                )
+        except Exception:
+            logger.exception("Batch failure cleanup did not complete")
+        if isinstance(e, DuplicateKeyError) and not written and not in_doubt:
+            await invalidate_wallet(from_user_id)
+            raise
+    await invalidate_wallet(from_user_id, *{item["to_user_id"] for item, _, _, _ in prepared})
+    return written, in_doubt
+
+
 async def get_transfer_by_tx_id(db, tx_id: str) -> Optional[Dict[str, Any]]:
     """Get a transfer by its transaction ID"""
     ledger_tx = db.ledger_tx
@@ -413,14 +918,16 @@ async def verify_ledger_integrity(db, tx_id: str) -> Dict[str, Any]:
             "entries_count": len(entries)
         }
     
-    # Sum amounts (should be 0 for balanced entries)
-    total = sum(e.get("amount", 0) for e in entries)
+    # Sum amounts in minor units (exactly 0 for balanced entries)
+    total_minor = sum(stored_minor(e, "amount", e.get("currency")) for e in entries)
+    total = from_minor(total_minor, header.get("currency"))
     
-    if abs(total) > 0.001:  # Allow tiny floating point variance
+    if total_minor != 0:
         return {
             "valid": False,
             "error": "Ledger entries do not balance",
             "total": total,
+            "total_minor": total_minor,
             "entries": entries
         }
     
@@ -438,61 +945,14 @@ async def verify_ledger_integrity(db, tx_id: str) -> Dict[str, Any]:
         "tx_id": tx_id,
         "header": header,
         "entries": entries,
-        "sum": total
+        "sum": total,
+        "sum_minor": total_minor
     }
 
 
 async def setup_ledger_indexes(db):
     """
-    Create necessary indexes for ledger collections.
-    Should be called on application startup.
+    Create indexes for the ledger collections and wallets.
+    Specs live in database/indexes.py; called on application startup.
     """
-    try:
-        # Unique index on idempotency_key (sparse to allow null)
-        await db.ledger_tx.create_index(
-            "idempotency_key",
-            unique=True,
-            sparse=True,
-            name="idx_ledger_tx_idempotency_key"
-        )
-        
-        # Unique index on tx_id
-        await db.ledger_tx.create_index(
-            "tx_id",
-            unique=True,
-            name="idx_ledger_tx_tx_id"
-        )
-        
-        # Index for querying by user
-        await db.ledger_tx.create_index(
-            [("from_user_id", 1), ("created_at", -1)],
-            name="idx_ledger_tx_from_user"
-        )
-        await db.ledger_tx.create_index(
-            [("to_user_id", 1), ("created_at", -1)],
-            name="idx_ledger_tx_to_user"
-        )
-        
-        # Ledger entries indexes
-        await db.ledger.create_index(
-            "ledger_tx_id",
-            name="idx_ledger_tx_ref"
-        )
-        await db.ledger.create_index(
-            [("user_id", 1), ("created_at", -1)],
-            name="idx_ledger_user_created"
-        )
-        
-        # Compound unique index to prevent duplicate entries
-        await db.ledger.create_index(
-            [("tx_id", 1), ("user_id", 1), ("entry_type", 1)],
-            unique=True,
-            name="idx_ledger_unique_entry"
-        )
-        
-        logger.info("Ledger indexes created successfully")
-        return True
-        
-    except Exception as e:
-        logger.warning(f"Index creation warning (may already exist): {e}")
-        return False
+    return await apply_indexes(db, ["ledger_tx", "ledger", "ledger_summaries", "wallets"])
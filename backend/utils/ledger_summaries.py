@@ -0,0 +1,248 @@
+"""
+PBX Ledger Summaries - running totals per user / entry type / currency
+Replaces the unbounded $group over a user's whole ledger on every statement
+request. Each ledger insert also $inc's small documents in ledger_summaries:
+
+- period "all"      lifetime total and count
+- period "YYYY-MM"  monthly rollup (LEDGER_SUMMARY_MONTHLY, on by default)
+
+`total` is the float sum statements display; `total_minor` is the exact sum
+of amount_minor (see utils/money.py) and what check_summaries compares.
+
+Writers call record_summaries(db, entries, session) in the transaction that
+inserts the entries (transfers in utils/ledger.py; everything else through
+utils.ledger.insert_ledger_entries), so on a replica set the summary moves
+with the ledger it describes. Without transactions the summary write follows
+the insert, and one that fails is repaired by rebuilding the users' summaries;
+if even that fails, the users are logged and check_summaries() - which
+compares them with the full aggregate - reports them until
+rebuild_summaries() (backfill / repair, see migrations/m0004) runs.
+"""
+
+from datetime import datetime, timezone
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+import logging
+import os
+
+from pymongo import UpdateOne
+
+from utils.money import AMOUNT_MINOR, Int64, stored_minor
+
+logger = logging.getLogger(__name__)
+
+LEDGER_SUMMARY_MONTHLY = os.environ.get("LEDGER_SUMMARY_MONTHLY", "true").lower() == "true"
+
+PERIOD_ALL = "all"
+
+WRITE_CHUNK_SIZE = 1000
+
+SummaryKey = Tuple[str, str, str, str]  # (user_id, period, type, currency)
+
+
+def utc_now():
+    return datetime.now(timezone.utc)
+
+
+def month_period(when: datetime) -> str:
+    return when.strftime("%Y-%m")
+
+
+def summary_id(user_id: str, period: str, entry_type: str, currency: str) -> str:
+    return f"{user_id}|{period}|{entry_type}|{currency}"
+
+
+def _entry_periods(entry: Dict[str, Any]) -> List[str]:
+    periods = [PERIOD_ALL]
+    created_at = entry.get("created_at")
+    if LEDGER_SUMMARY_MONTHLY and isinstance(created_at, datetime):
+        periods.append(month_period(created_at))
+    return periods
+
+
+def summary_ops(entries: Iterable[Dict[str, Any]], now: Optional[datetime] = None) -> List[UpdateOne]:
+    """One upsert per (user, period, type, currency) touched by the entries"""
+    now = now or utc_now()
+    deltas: Dict[SummaryKey, List[float]] = {}
+    for entry in entries:
+        amount = entry.get("amount") or 0
+        amount_minor = stored_minor(entry, "amount", entry.get("currency"))
+        for period in _entry_periods(entry):
+            key = (entry["user_id"], period, entry.get("type"), entry.get("currency"))
+            total = deltas.setdefault(key, [0, 0, 0])
+            total[0] += amount
+            total[1] += amount_minor
+            total[2] += 1
+
+    return [
+        UpdateOne(
+            {"_id": summary_id(*key)},
+            {
+                "$inc": {"total": total, "total_minor": Int64(total_minor), "count": count},
+                "$set": {"updated_at": now},
+                "$setOnInsert": {
+                    "user_id": key[0], "period": key[1], "type": key[2], "currency": key[3]
+                }
+            },
+            upsert=True
+        )
+        for key, (total, total_minor, count) in deltas.items()
+    ]
+
+
+async def record_summaries(db, entries: Iterable[Dict[str, Any]], session=None):
+    """Apply ledger entries to the running totals (call with the entries' session)"""
+    ops = summary_ops(entries)
+    if ops:
+        await db.ledger_summaries.bulk_write(ops, ordered=False, session=session)
+
+
+async def get_summary_totals(db, user_id: str, period: str = PERIOD_ALL) -> Dict[str, Dict[str, float]]:
+    """{type: {currency: total}} for one period"""
+    totals: Dict[str, Dict[str, float]] = {}
+    async for doc in db.ledger_summaries.find(
+        {"user_id": user_id, "period": period},
+        {"_id": 0, "type": 1, "currency": 1, "total": 1}
+    ):
+        totals.setdefault(doc["type"], {})[doc["currency"]] = doc["total"]
+    return totals
+
+
+def _as_utc(when: datetime) -> datetime:
+    # Monthly buckets are UTC months
+    return when.astimezone(timezone.utc) if when.tzinfo else when.replace(tzinfo=timezone.utc)
+
+
+def _month_start(when: datetime) -> datetime:
+    return when.replace(day=1, hour=0, minute=0, second=0, microsecond=0)
+
+
+def _next_month(when: datetime) -> datetime:
+    start = _month_start(when)
+    return start.replace(year=start.year + 1, month=1) if start.month == 12 else start.replace(month=start.month + 1)
+
+
+async def get_range_totals(db, user_id: str, start: datetime, end: datetime) -> Dict[str, Dict[str, float]]:
+    """
+    {type: {currency: total}} for entries with start <= created_at <= end.
+    Whole months come from the monthly rollups; only the partial months at
+    either edge are aggregated from the ledger (bounded by idx_ledger_user_created_id).
+    """
+    start, end = _as_utc(start), _as_utc(end)
+    totals: Dict[str, Dict[str, float]] = {}
+
+    def add(entry_type, currency, amount):
+        by_currency = totals.setdefault(entry_type, {})
+        by_currency[currency] = by_currency.get(currency, 0) + amount
+
+    async def aggregate(match_range: Dict[str, datetime]):
+        pipeline = [
+            {"$match": {"user_id": user_id, "created_at": match_range}},
+            {"$group": {"_id": {"type": "$type", "currency": "$currency"}, "total": {"$sum": "$amount"}}}
+        ]
+        async for doc in db.ledger.aggregate(pipeline):
+            add(doc["_id"]["type"], doc["_id"]["currency"], doc["total"])
+
+    first_full = start if start == _month_start(start) else _next_month(start)
+    after_last_full = _month_start(end)
+
+    if not LEDGER_SUMMARY_MONTHLY or first_full >= after_last_full:
+        await aggregate({"$gte": start, "$lte": end})
+        return totals
+
+    if start < first_full:
+        await aggregate({"$gte": start, "$lt": first_full})
+    async for doc in db.ledger_summaries.find({
+        "user_id": user_id,
+        "period": {"$gte": month_period(first_full), "$lt": month_period(after_last_full)}
+    }, {"_id": 0, "type": 1, "currency": 1, "total": 1}):
+        add(doc["type"], doc["currency"], doc["total"])
+    await aggregate({"$gte": after_last_full, "$lte": end})
+    return totals
+
+
+def _summary_pipeline(match: Dict[str, Any]) -> List[Dict[str, Any]]:
+    group_id = {"user_id": "$user_id", "type": "$type", "currency": "$currency"}
+    if LEDGER_SUMMARY_MONTHLY:
+        group_id["month"] = {"$dateToString": {"format": "%Y-%m", "date": "$created_at"}}
+    return [
+        {"$match": match},
+        {"$group": {
+            "_id": group_id,
+            "total": {"$sum": "$amount"},
+            "total_minor": {"$sum": AMOUNT_MINOR},
+            "count": {"$sum": 1}
+        }}
+    ]
+
+
+async def _expected_summaries(db, match: Dict[str, Any]) -> Dict[str, Dict[str, Any]]:
+    """Summary documents as the full ledger aggregate says they should be"""
+    expected: Dict[str, Dict[str, Any]] = {}
+
+    def add(group, period, row):
+        _id = summary_id(group["user_id"], period, group.get("type"), group.get("currency"))
+        doc = expected.setdefault(_id, {
+            "user_id": group["user_id"], "period": period,
+            "type": group.get("type"), "currency": group.get("currency"),
+            "total": 0, "total_minor": Int64(0), "count": 0
+        })
+        doc["total"] += row["total"]
+        doc["total_minor"] = Int64(doc["total_minor"] + int(row["total_minor"] or 0))
+        doc["count"] += row["count"]
+
+    async for row in db.ledger.aggregate(_summary_pipeline(match), allowDiskUse=True):
+        add(row["_id"], PERIOD_ALL, row)
+        if row["_id"].get("month"):
+            add(row["_id"], row["_id"]["month"], row)
+    return expected
+
+
+async def rebuild_summaries(db, user_id: Optional[str] = None) -> Dict[str, int]:
+    """
+    Recompute summaries from the ledger (all users, or one) and replace the
+    stored documents. Entries written while this runs may be counted twice or
+    missed - run it before traffic, or check_summaries after and rebuild the
+    users that mismatch (see migrations/m0004_ledger_summaries.py).
+    """
+    match = {"user_id": user_id} if user_id else {}
+    expected = await _expected_summaries(db, match)
+    now = utc_now()
+
+    ops = [
+        UpdateOne({"_id": _id}, {"$set": {**doc, "updated_at": now}}, upsert=True)
+        for _id, doc in expected.items()
+    ]
+    for start in range(0, len(ops), WRITE_CHUNK_SIZE):
+        await db.ledger_summaries.bulk_write(ops[start:start + WRITE_CHUNK_SIZE], ordered=False)
+
+    # Drop summaries whose entries no longer exist (everything current was just stamped)
+    stale = await db.ledger_summaries.delete_many({**match, "updated_at": {"$lt": now}})
+    return {"summaries_written": len(ops), "summaries_removed": stale.deleted_count}
+
+
+async def check_summaries(db, user_id: Optional[str] = None) -> Dict[str, Any]:
+    """Compare stored summaries with the full ledger aggregate (total_minor and count, exactly)"""
+    match = {"user_id": user_id} if user_id else {}
+    expected = await _expected_summaries(db, match)
+    stored = {doc["_id"]: doc async for doc in db.ledger_summaries.find(match)}
+
+    mismatches = []
+    for _id in set(expected) | set(stored):
+        want, have = expected.get(_id), stored.get(_id)
+        want, have = want or {}, have or {}
+        want_minor, have_minor = int(want.get("total_minor", 0)), int(have.get("total_minor", 0))
+        want_count, have_count = want.get("count", 0), have.get("count", 0)
+        if want_minor != have_minor or want_count != have_count:
+            mismatches.append({
+                "summary_id": _id,
+                "user_id": (want or have)["user_id"],
+                "ledger_total": round(want.get("total", 0), 2), "summary_total": round(have.get("total", 0), 2),
+                "ledger_total_minor": want_minor, "summary_total_minor": have_minor,
+                "ledger_count": want_count, "summary_count": have_count,
+            })
+
+    return {
+        "checked": len(set(expected) | set(stored)),
+        "mismatches": mismatches,
+        "is_consistent": not mismatches,
+    }
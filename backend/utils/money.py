@@ -0,0 +1,102 @@
+"""
+PBX Money - exact integer minor units (cents / centavos) next to the float fields
+Balances and ledger amounts are floats, so sums drift and every check needs a
+tolerance. Each money field now has an int64 twin holding minor units:
+
+    usd_balance -> usd_balance_minor     php_balance -> php_balance_minor
+    amount      -> amount_minor          (ledger entries, ledger_tx headers)
+
+Writers build both from one value with these helpers, so the pair moves in the
+same $inc / insert. $inc and $sum over the *_minor fields are exact, and the
+reconciliation checks (book and per-user), the integrity checks and the
+ledger summaries compare them with ==. Reads and the balance guards stay on
+the float fields for now; existing documents are backfilled by
+migrations/m0005_minor_units, and documents it has not reached yet are read
+through stored_minor() / LEGACY_AMOUNT_MINOR.
+
+Amounts are converted through Decimal(str(x)), so 0.1 + 0.2 style noise never
+turns 10 cents into 9 (ROUND_HALF_UP at the currency's minor-unit precision).
+"""
+
+from decimal import Decimal, ROUND_HALF_UP
+from typing import Any, Dict, Iterable, Optional, Union
+
+from bson.int64 import Int64
+
+# Minor-unit digits per currency (ISO 4217 exponent)
+MINOR_UNIT_DIGITS = {"USD": 2, "PHP": 2}
+DEFAULT_MINOR_UNIT_DIGITS = 2
+
+# Wallet balance field per currency
+BALANCE_FIELDS = {"USD": "usd_balance", "PHP": "php_balance"}
+
+MINOR_SUFFIX = "_minor"
+
+Number = Union[int, float, Decimal]
+
+
+def minor_digits(currency: Optional[str]) -> int:
+    return MINOR_UNIT_DIGITS.get((currency or "").upper(), DEFAULT_MINOR_UNIT_DIGITS)
+
+
+def to_minor(amount: Optional[Number], currency: Optional[str] = "USD") -> Int64:
+    """12.345 USD -> 1235 (stored as BSON int64)"""
+    if amount is None:
+        return Int64(0)
+    value = amount if isinstance(amount, Decimal) else Decimal(str(amount))
+    return Int64(int(value.scaleb(minor_digits(currency)).quantize(Decimal(1), rounding=ROUND_HALF_UP)))
+
+
+def from_minor(minor: Optional[int], currency: Optional[str] = "USD") -> float:
+    """1235 -> 12.35"""
+    return float(Decimal(int(minor or 0)).scaleb(-minor_digits(currency)))
+
+
+def sum_minor(amounts: Iterable[Number], currency: Optional[str] = "USD") -> Int64:
+    """Exact total of amounts, each rounded to minor units first (as their entries are)"""
+    return Int64(sum(int(to_minor(amount, currency)) for amount in amounts))
+
+
+def minor_field(field: str) -> str:
+    return f"{field}{MINOR_SUFFIX}"
+
+
+def stored_minor(doc: Dict[str, Any], field: str, currency: Optional[str] = "USD") -> int:
+    """doc[field_minor], or doc[field] converted when the document predates the minor fields"""
+    minor = doc.get(minor_field(field))
+    return int(minor) if minor is not None else int(to_minor(doc.get(field), currency))
+
+
+# $amount in minor units for ledger rows not yet backfilled with amount_minor (aggregation expression)
+LEGACY_AMOUNT_MINOR = {"$toLong": {"$round": [{"$multiply": ["$amount", 10 ** DEFAULT_MINOR_UNIT_DIGITS]}, 0]}}
+
+# $amount_minor, falling back to LEGACY_AMOUNT_MINOR
+AMOUNT_MINOR = {"$ifNull": ["$amount_minor", LEGACY_AMOUNT_MINOR]}
+
+
+def balance_field(currency: str) -> str:
+    return BALANCE_FIELDS["USD" if currency == "USD" else "PHP"]
+
+
+def money_fields(field: str, amount: Number, currency: Optional[str]) -> Dict[str, Any]:
+    """{field: amount, field_minor: minor units} - for inserts, $set and $inc alike"""
+    return {field: amount, minor_field(field): to_minor(amount, currency)}
+
+
+def balance_inc(currency: str, amount: Number, minor: Optional[int] = None) -> Dict[str, Any]:
+    """
+    $inc body moving a wallet balance (float and minor units together).
+    Pass `minor` when the amount is a total of entries - their sum_minor().
+    """
+    field = balance_field(currency)
+    return {field: amount, minor_field(field): Int64(minor) if minor is not None else to_minor(amount, currency)}
+
+
+def entry_amount(amount: Number, currency: str) -> Dict[str, Any]:
+    """amount / amount_minor for a ledger entry or header"""
+    return money_fields("amount", amount, currency)
+
+
+def wallet_balances(usd: Number = 0.0, php: Number = 0.0) -> Dict[str, Any]:
+    """Both balance pairs for a new wallet document"""
+    return {**money_fields("usd_balance", usd, "USD"), **money_fields("php_balance", php, "PHP")}
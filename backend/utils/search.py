@@ -0,0 +1,143 @@
+"""
+PBX Search Tokens - indexed prefix search for people and businesses
+Replaces unanchored case-insensitive $regex scans (which cannot use an index
+and interpolated raw user input) with a multikey `search_tokens` field:
+
+- each searchable field is normalized (lowercase, accents stripped) and split
+  into words; every word contributes its edge n-grams ("mar", "mari", "maria")
+- whole values (handle, email, phone digits) contribute their prefixes too, so
+  "maria.s" and "0917" still match
+- a search is an equality match on the query's tokens ($all), served by
+  idx_users_search_tokens / idx_profiles_type_search_tokens
+
+Tokens are written alongside the fields they derive from (insert / $set on
+users and profiles); migrations/m0002_search_tokens backfills older documents.
+"""
+
+from typing import Dict, Iterable, List, Optional
+import re
+import unicodedata
+
+MIN_TOKEN_LENGTH = 2
+MAX_TOKEN_LENGTH = 20
+MAX_QUERY_TERMS = 4
+
+# Fields each document type is searchable by
+USER_SEARCH_FIELDS = ("display_name", "email", "phone")
+PERSONAL_PROFILE_SEARCH_FIELDS = ("handle", "display_name")
+BUSINESS_PROFILE_SEARCH_FIELDS = ("handle", "business_name")
+
+_WORD_SPLIT = re.compile(r"[^a-z0-9]+")
+
+# Profile documents as returned to clients - search_tokens is an index field only
+PROFILE_PROJECTION = {"_id": 0, "search_tokens": 0}
+
+
+def normalize(text: str) -> str:
+    """Lowercase, strip accents and a leading @"""
+    text = unicodedata.normalize("NFKD", text or "")
+    text = "".join(ch for ch in text if not unicodedata.combining(ch))
+    return text.lower().strip().lstrip("@")
+
+
+def edge_ngrams(value: str) -> List[str]:
+    return [value[:n] for n in range(MIN_TOKEN_LENGTH, min(len(value), MAX_TOKEN_LENGTH) + 1)]
+
+
+def field_tokens(field: str, value: Optional[str]) -> set:
+    if not value:
+        return set()
+    text = normalize(str(value))
+    tokens = set()
+
+    if field == "phone":
+        digits = re.sub(r"\D", "", text)
+        # Full international number, the national part (last 10 digits) and
+        # its trunk-prefixed local form ("0917...")
+        for number in {digits, digits[-10:], "0" + digits[-10:]}:
+            tokens.update(edge_ngrams(number))
+        return tokens
+
+    for word in _WORD_SPLIT.split(text):
+        tokens.update(edge_ngrams(word))
+    if field in ("handle", "email"):
+        tokens.update(edge_ngrams(text))
+    return tokens
+
+
+def search_tokens(doc: Dict, fields: Iterable[str]) -> List[str]:
+    """Sorted token list for the given fields of a document"""
+    tokens = set()
+    for field in fields:
+        tokens |= field_tokens(field, doc.get(field))
+    return sorted(tokens)
+
+
+def user_search_tokens(user: Dict) -> List[str]:
+    return search_tokens(user, USER_SEARCH_FIELDS)
+
+
+def profile_search_tokens(profile: Dict) -> List[str]:
+    fields = BUSINESS_PROFILE_SEARCH_FIELDS if profile.get("type") == "business" else PERSONAL_PROFILE_SEARCH_FIELDS
+    return search_tokens(profile, fields)
+
+
+def query_terms(q: str) -> List[str]:
+    """
+    Tokens a search query must match (all of them).
+    A phone number or a single identifier ("maria_s", "jose.reyes@") is one
+    term matching a whole-value prefix; multi-word queries match every word.
+    """
+    text = normalize(q)
+    if len(text) < MIN_TOKEN_LENGTH:
+        return []
+
+    digits = re.sub(r"\D", "", text)
+    if len(digits) >= MIN_TOKEN_LENGTH and re.fullmatch(r"[\d\s()+\-.]+", text):
+        # Phone number typed with formatting
+        return [digits[:MAX_TOKEN_LENGTH]]
+
+    if not re.search(r"\s", text):
+        return [text[:MAX_TOKEN_LENGTH]]
+
+    words = {w[:MAX_TOKEN_LENGTH] for w in _WORD_SPLIT.split(text) if len(w) >= MIN_TOKEN_LENGTH}
+    # Longest (most selective) word first - it bounds the index scan
+    return sorted(words, key=lambda w: (-len(w), w))[:MAX_QUERY_TERMS]
+
+
+def token_filter(q: str) -> Optional[Dict]:
+    """Mongo filter on search_tokens, or None if the query is too short"""
+    terms = query_terms(q)
+    if not terms:
+        return None
+    if len(terms) == 1:
+        return {"search_tokens": terms[0]}
+    return {"search_tokens": {"$all": terms}}
+
+
+def handle_rank(q: str, handle: Optional[str]) -> int:
+    """0 = exact handle match, 1 = handle prefix, 2 = other field matched"""
+    query = normalize(q)
+    handle = normalize(handle or "")
+    if handle and handle == query:
+        return 0
+    if handle and handle.startswith(query):
+        return 1
+    return 2
+
+
+async def refresh_user_search_tokens(db, user_id: str):
+    """
+    Recompute a user's tokens after a partial update ($set of email / phone /
+    display_name) where the other fields are not in hand
+    """
+    user = await db.users.find_one(
+        {"user_id": user_id},
+        {"_id": 0, **{field: 1 for field in USER_SEARCH_FIELDS}}
+    )
+    if user is None:
+        return
+    await db.users.update_one(
+        {"user_id": user_id},
+        {"$set": {"search_tokens": user_search_tokens(user)}}
+    )
@@ -0,0 +1,268 @@
+"""
+PBX Statement Export - ledger rows to CSV / NDJSON / PDF in bounded memory
+The ledger is walked in keyset batches of EXPORT_BATCH_SIZE, oldest first, on
+(created_at, _id) (idx_ledger_user_created_id read backwards), and each batch
+is encoded and handed off before the next is read. Memory stays flat whatever
+the row count.
+
+Encoders share one shape, so the same code serves a StreamingResponse and the
+background job in services/statement_exports.py:
+    begin() -> bytes, rows(batch) -> bytes, end() -> bytes
+    state() -> dict   (checkpoint; pass back as `state=` to resume)
+
+The PDF encoder writes objects as it goes and keeps only byte offsets and the
+current page's lines, so a multi-year statement never sits in memory. It uses
+the built-in Courier font (Latin-1 text), no PDF library needed.
+"""
+
+from datetime import datetime
+from typing import Any, AsyncIterator, Dict, List, Optional, Tuple
+import csv
+import io
+import json
+
+EXPORT_BATCH_SIZE = 500
+
+EXPORT_FORMATS = {
+    "csv": ("text/csv", "csv"),
+    "ndjson": ("application/x-ndjson", "ndjson"),
+    "pdf": ("application/pdf", "pdf"),
+}
+EXPORT_FIELDS = ["date", "txn_id", "type", "category", "description", "currency", "amount"]
+EXPORT_PROJECTION = {
+    "_id": 1, "created_at": 1, "txn_id": 1, "tx_id": 1, "type": 1,
+    "category": 1, "description": 1, "currency": 1, "amount": 1
+}
+
+Checkpoint = Tuple[datetime, Any]  # (created_at, _id) of the last exported entry
+
+
+def export_query(
+    user_id: str,
+    start: Optional[datetime] = None,
+    end: Optional[datetime] = None,
+    entry_type: Optional[str] = None,
+    currency: Optional[str] = None
+) -> Dict[str, Any]:
+    """Ledger filter for one statement (same filters as GET /statements)"""
+    query: Dict[str, Any] = {"user_id": user_id}
+    if entry_type:
+        query["type"] = entry_type
+    if currency:
+        query["currency"] = currency
+    if start or end:
+        query["created_at"] = {}
+        if start:
+            query["created_at"]["$gte"] = start
+        if end:
+            query["created_at"]["$lte"] = end
+    return query
+
+
+async def iter_ledger_batches(
+    db,
+    query: Dict[str, Any],
+    after: Optional[Checkpoint] = None,
+    batch_size: int = EXPORT_BATCH_SIZE
+) -> AsyncIterator[List[Dict[str, Any]]]:
+    """Ledger entries matching `query`, oldest first, `batch_size` at a time, after `after`"""
+    while True:
+        page_query = query
+        if after:
+            page_query = {"$and": [query, {"$or": [
+                {"created_at": {"$gt": after[0]}},
+                {"created_at": after[0], "_id": {"$gt": after[1]}}
+            ]}]}
+        batch = await db.ledger.find(page_query, EXPORT_PROJECTION).sort(
+            [("created_at", 1), ("_id", 1)]
+        ).limit(batch_size).to_list(batch_size)
+        if not batch:
+            return
+        yield batch
+        if len(batch) < batch_size:
+            return
+        after = (batch[-1]["created_at"], batch[-1]["_id"])
+
+
+def statement_row(entry: Dict[str, Any]) -> Dict[str, Any]:
+    created_at = entry.get("created_at")
+    return {
+        "date": created_at.isoformat() if isinstance(created_at, datetime) else str(created_at or ""),
+        "txn_id": entry.get("txn_id") or entry.get("tx_id"),
+        "type": entry.get("type"),
+        "category": entry.get("category"),
+        "description": entry.get("description"),
+        "currency": entry.get("currency"),
+        "amount": entry.get("amount"),
+    }
+
+
+# ============================================================
+# ENCODERS
+# ============================================================
+
+class CsvEncoder:
+    def __init__(self, title: str = "", state: Optional[Dict[str, Any]] = None):
+        self._buffer = io.StringIO()
+        self._writer = csv.DictWriter(self._buffer, fieldnames=EXPORT_FIELDS, lineterminator="\r\n")
+
+    def _drain(self) -> bytes:
+        data = self._buffer.getvalue().encode()
+        self._buffer.seek(0)
+        self._buffer.truncate()
+        return data
+
+    def begin(self) -> bytes:
+        self._writer.writeheader()
+        return self._drain()
+
+    def rows(self, batch: List[Dict[str, Any]]) -> bytes:
+        self._writer.writerows(statement_row(entry) for entry in batch)
+        return self._drain()
+
+    def end(self) -> bytes:
+        return b""
+
+    def state(self) -> Dict[str, Any]:
+        return {}
+
+
+class NdjsonEncoder:
+    def __init__(self, title: str = "", state: Optional[Dict[str, Any]] = None):
+        pass
+
+    def begin(self) -> bytes:
+        return b""
+
+    def rows(self, batch: List[Dict[str, Any]]) -> bytes:
+        return "".join(json.dumps(statement_row(entry)) + "\n" for entry in batch).encode()
+
+    def end(self) -> bytes:
+        return b""
+
+    def state(self) -> Dict[str, Any]:
+        return {}
+
+
+class PdfEncoder:
+    """
+    Incremental PDF writer. Object numbers: 1 catalog, 2 page tree, 3 font,
+    then a (content stream, page) pair per page. The page tree and catalog
+    are written last, followed by the cross-reference table.
+    """
+
+    LINES_PER_PAGE = 60
+    LINE_WIDTH = 110  # characters of Courier 8pt across a letter page
+
+    def __init__(self, title: str = "PBX Statement", state: Optional[Dict[str, Any]] = None):
+        state = state or {}
+        self.title = title
+        self.position = state.get("position", 0)      # bytes written so far
+        self.offsets = state.get("offsets", [None, None, None])  # byte offset per object number - 1
+        self.pages = state.get("pages", [])            # page object numbers
+        self.lines = state.get("lines", [])            # current (unwritten) page
+
+    def _emit(self, data: bytes) -> bytes:
+        self.position += len(data)
+        return data
+
+    def _object(self, number: int, body: bytes) -> bytes:
+        while len(self.offsets) < number:
+            self.offsets.append(None)
+        self.offsets[number - 1] = self.position
+        return self._emit(f"{number} 0 obj\n".encode() + body + b"\nendobj\n")
+
+    @staticmethod
+    def _text(line: str) -> bytes:
+        line = line.encode("latin-1", "replace").decode("latin-1")
+        return line.replace("\\", "\\\\").replace("(", "\\(").replace(")", "\\)").encode("latin-1")
+
+    def _page_header(self) -> List[str]:
+        return [
+            f"{self.title}  -  page {len(self.pages) + 1}",
+            "",
+            f"{'Date':<19}  {'Type':<22}  {'Cur':<4}  {'Amount':>14}  Description",
+            "-" * self.LINE_WIDTH,
+        ]
+
+    def _flush_page(self) -> bytes:
+        content = b"BT /F1 8 Tf 12 TL 40 760 Td\n"
+        for line in self._page_header() + self.lines:
+            content += b"(" + self._text(line[:self.LINE_WIDTH]) + b") Tj T*\n"
+        content += b"ET"
+
+        stream_number = len(self.offsets) + 1
+        page_number = stream_number + 1
+        out = self._object(
+            stream_number,
+            f"<< /Length {len(content)} >>\nstream\n".encode() + content + b"\nendstream"
+        )
+        out += self._object(
+            page_number,
+            f"<< /Type /Page /Parent 2 0 R /MediaBox [0 0 612 792] "
+            f"/Resources << /Font << /F1 3 0 R >> >> /Contents {stream_number} 0 R >>".encode()
+        )
+        self.pages.append(page_number)
+        self.lines = []
+        return out
+
+    def begin(self) -> bytes:
+        out = self._emit(b"%PDF-1.4\n%\xe2\xe3\xcf\xd3\n")
+        out += self._object(3, b"<< /Type /Font /Subtype /Type1 /BaseFont /Courier /Encoding /WinAnsiEncoding >>")
+        return out
+
+    def rows(self, batch: List[Dict[str, Any]]) -> bytes:
+        out = b""
+        for entry in batch:
+            row = statement_row(entry)
+            amount = row["amount"]
+            amount = f"{amount:,.2f}" if isinstance(amount, (int, float)) else str(amount or "")
+            self.lines.append(
+                f"{row['date'][:19]:<19}  {str(row['type'] or ''):<22.22}  {str(row['currency'] or ''):<4}  "
+                f"{amount:>14}  {row['description'] or row['category'] or ''}"
+            )
+            if len(self.lines) == self.LINES_PER_PAGE:
+                out += self._flush_page()
+        return out
+
+    def end(self) -> bytes:
+        out = b""
+        if not self.pages and not self.lines:
+            self.lines.append("No transactions in this period.")
+        if self.lines:
+            out += self._flush_page()
+        kids = " ".join(f"{number} 0 R" for number in self.pages)
+        out += self._object(2, f"<< /Type /Pages /Kids [{kids}] /Count {len(self.pages)} >>".encode())
+        out += self._object(1, b"<< /Type /Catalog /Pages 2 0 R >>")
+
+        xref_at = self.position
+        xref = f"xref\n0 {len(self.offsets) + 1}\n0000000000 65535 f \n"
+        xref += "".join(f"{offset:010d} 00000 n \n" for offset in self.offsets)
+        xref += f"trailer\n<< /Size {len(self.offsets) + 1} /Root 1 0 R >>\nstartxref\n{xref_at}\n%%EOF\n"
+        return out + self._emit(xref.encode())
+
+    def state(self) -> Dict[str, Any]:
+        return {"position": self.position, "offsets": self.offsets, "pages": self.pages, "lines": self.lines}
+
+
+ENCODERS = {"csv": CsvEncoder, "ndjson": NdjsonEncoder, "pdf": PdfEncoder}
+
+
+def make_encoder(format: str, title: str = "PBX Statement", state: Optional[Dict[str, Any]] = None):
+    return ENCODERS[format](title, state)
+
+
+async def stream_statement(db, query: Dict[str, Any], format: str, title: str = "PBX Statement") -> AsyncIterator[bytes]:
+    """Encoded statement, one chunk per ledger batch"""
+    encoder = make_encoder(format, title)
+    yield encoder.begin()
+    async for batch in iter_ledger_batches(db, query):
+        chunk = encoder.rows(batch)
+        if chunk:
+            yield chunk
+    yield encoder.end()
+
+
+def export_filename(start: Optional[datetime], end: Optional[datetime], format: str) -> str:
+    period = "-".join(d.strftime("%Y-%m-%d") for d in (start, end) if d) or "all"
+    return f"PBX_Statement_{period}.{EXPORT_FORMATS[format][1]}"
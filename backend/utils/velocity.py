@@ -0,0 +1,189 @@
+"""
+PBX Velocity Counters - O(1) limit checks
+Bucketed per-user counters maintained with $inc in the same write path as the
+mutation they limit, so a limit check is one indexed document operation instead
+of a scan over history.
+
+Collection:
+- velocity_counters: {_id: "<user_id>:<metric>:<bucket>", user_id, metric, period,
+  bucket, value, count, updated_at, expires_at}
+
+Periods:
+- day:   bucket "YYYY-MM-DD" (UTC), expires two days after the bucket starts
+- month: bucket "YYYY-MM" (UTC), expires two months after the bucket starts
+- total: bucket "all", never expires (lifetime counts such as business profiles)
+"""
+
+from datetime import datetime, timezone, timedelta
+from typing import Optional, Callable, Awaitable
+from pymongo.errors import DuplicateKeyError
+from database.indexes import apply_indexes
+import logging
+
+logger = logging.getLogger(__name__)
+
+
+# Metrics
+METRIC_TRANSFER_OUT = "transfer_out"  # USD sent PBX-to-PBX (amount)
+METRIC_INVITE_FRIEND_REQUESTS = "invite_friend_requests"  # auto friend requests from invites (count)
+METRIC_BUSINESS_PROFILES = "business_profiles"  # business profiles owned (count)
+
+PERIODS = ("day", "month", "total")
+
+
+class VelocityLimitExceeded(Exception):
+    """Raised when a reservation would take a counter past its limit"""
+
+    def __init__(self, metric: str, limit: float):
+        super().__init__(f"Velocity limit exceeded for {metric} (limit {limit})")
+        self.metric = metric
+        self.limit = limit
+
+
+def utc_now():
+    """Return current UTC datetime"""
+    return datetime.now(timezone.utc)
+
+
+def _bucket(period: str, now) -> tuple:
+    """Return (bucket label, bucket start, expires_at) for a period"""
+    if period == "day":
+        start = now.replace(hour=0, minute=0, second=0, microsecond=0)
+        return start.strftime("%Y-%m-%d"), start, start + timedelta(days=2)
+    if period == "month":
+        start = now.replace(day=1, hour=0, minute=0, second=0, microsecond=0)
+        return start.strftime("%Y-%m"), start, start + timedelta(days=62)
+    if period == "total":
+        return "all", None, None
+    raise ValueError(f"Unknown velocity period: {period}")
+
+
+def counter_id(user_id: str, metric: str, period: str = "day", now=None) -> str:
+    """_id of the counter document for the bucket containing `now`"""
+    label, _, _ = _bucket(period, now or utc_now())
+    return f"{user_id}:{metric}:{label}"
+
+
+def _counter_update(user_id: str, metric: str, period: str, amount: float, now) -> dict:
+    label, start, expires_at = _bucket(period, now)
+    on_insert = {"user_id": user_id, "metric": metric, "period": period, "bucket": label}
+    if start is not None:
+        on_insert["bucket_start"] = start
+        on_insert["expires_at"] = expires_at
+    return {
+        "$inc": {"value": amount, "count": 1},
+        "$set": {"updated_at": now},
+        "$setOnInsert": on_insert
+    }
+
+
+async def check_and_reserve(
+    db,
+    user_id: str,
+    metric: str,
+    amount: float,
+    limit: Optional[float],
+    period: str = "day",
+    session=None,
+    seed: Optional[Callable[[], Awaitable[float]]] = None,
+    now=None
+):
+    """
+    Add `amount` to the user's counter, failing if it would exceed `limit`.
+
+    One round trip: a conditional upsert on {_id, value <= limit - amount}. A full
+    counter matches nothing, the upsert then collides on _id -> VelocityLimitExceeded.
+    With limit=None the amount is only recorded.
+
+    seed: for counters introduced over existing data - called once, when the bucket
+    has no document yet, to count what happened before the counter existed.
+
+    Raises:
+        VelocityLimitExceeded
+    """
+    now = now or utc_now()
+    _id = counter_id(user_id, metric, period, now)
+    update = _counter_update(user_id, metric, period, amount, now)
+
+    query = {"_id": _id}
+    if limit is not None:
+        if amount > limit:
+            raise VelocityLimitExceeded(metric, limit)
+        query["value"] = {"$lte": limit - amount}
+
+    if seed is not None:
+        return await _reserve_seeded(db, _id, query, update, metric, amount, limit, seed, session)
+
+    try:
+        await db.velocity_counters.update_one(query, update, upsert=True, session=session)
+    except DuplicateKeyError:
+        if limit is None and session is None:
+            # Lost an insert race for this bucket - it exists now
+            await db.velocity_counters.update_one({"_id": _id}, update)
+            return
+        if limit is None:
+            raise
+        raise VelocityLimitExceeded(metric, limit)
+
+
+async def _reserve_seeded(db, _id, query, update, metric, amount, limit, seed, session):
+    """Reserve against a counter that may need seeding from existing data"""
+    counters = db.velocity_counters
+    for _ in range(2):
+        result = await counters.update_one(query, update, session=session)
+        if result.matched_count:
+            return
+        if await counters.find_one({"_id": _id}, {"_id": 1}, session=session):
+            raise VelocityLimitExceeded(metric, limit)
+
+        # First use of this bucket - start from the existing count
+        base = await seed()
+        if limit is not None and base + amount > limit:
+            raise VelocityLimitExceeded(metric, limit)
+        doc = {"_id": _id, "value": base + amount, "count": 1, **update["$set"], **update["$setOnInsert"]}
+        try:
+            await counters.insert_one(doc, session=session)
+            return
+        except DuplicateKeyError:
+            # A concurrent request seeded the bucket first - reserve against it
+            continue
+    raise VelocityLimitExceeded(metric, limit)
+
+
+async def release(
+    db,
+    user_id: str,
+    metric: str,
+    amount: float,
+    period: str = "day",
+    session=None,
+    now=None
+):
+    """Undo a reservation (failed mutation, or a deleted object for total counters)"""
+    await db.velocity_counters.update_one(
+        {"_id": counter_id(user_id, metric, period, now)},
+        {"$inc": {"value": -amount, "count": -1}},
+        session=session
+    )
+
+
+async def get_usage(db, user_id: str, metric: str, period: str = "day", now=None) -> float:
+    """Current counter value - one indexed read"""
+    counter = await db.velocity_counters.find_one(
+        {"_id": counter_id(user_id, metric, period, now)},
+        {"value": 1}
+    )
+    return counter.get("value", 0.0) if counter else 0.0
+
+
+async def get_remaining(db, user_id: str, metric: str, limit: float, period: str = "day", now=None) -> float:
+    """How much of `limit` is left in the current bucket"""
+    return max(0.0, limit - await get_usage(db, user_id, metric, period, now))
+
+
+async def setup_velocity_indexes(db):
+    """
+    Create indexes for velocity_counters.
+    Specs live in database/indexes.py; called on application startup.
+    """
+    return await apply_indexes(db, ["velocity_counters"])
@@ -0,0 +1,283 @@
+"""
+PBX Wallet Cache - balance snapshot cache with write-through invalidation
+Serves wallet reads (balance endpoints, post-transfer new_balance) without a
+round trip to db.wallets.
+
+Backends:
+- In-process LRU + TTL (default) - one cache per worker process
+- Redis, shared across workers (set WALLET_CACHE_REDIS_URL)
+
+Rules for writers:
+- Every wallet mutation calls invalidate_wallet() AFTER the write (or its
+  transaction) has committed
+- Readers go through get_cached_wallet(); a fill carries the user's cache
+  version read before the load and is only stored if no invalidation bumped
+  it since, so a read that raced a write is never cached. Snapshots only
+  enter the cache that way - a writer that just created a wallet lets the
+  next read fill it
+
+Coherence: the Redis backend keeps the versions in Redis and fills with a
+compare-and-set, so a stale snapshot cannot outlive the write that replaced
+it on any worker. The in-process backend only sees invalidations made by its
+own process: with several workers, another worker may serve a snapshot up to
+WALLET_CACHE_TTL_SECONDS older than a write - run multi-worker deployments
+with WALLET_CACHE_REDIS_URL. Reads after a write in the same request (e.g.
+post-transfer new_balance) always miss, since that worker just invalidated.
+"""
+
+from collections import OrderedDict
+from typing import Optional, Dict, Any, Callable, Awaitable, List
+import copy
+import logging
+import os
+import time
+
+logger = logging.getLogger(__name__)
+
+WALLET_CACHE_TTL_SECONDS = float(os.environ.get("WALLET_CACHE_TTL_SECONDS", "15"))
+WALLET_CACHE_MAX_ENTRIES = int(os.environ.get("WALLET_CACHE_MAX_ENTRIES", "10000"))
+WALLET_CACHE_REDIS_URL = os.environ.get("WALLET_CACHE_REDIS_URL")
+
+# Key spaces - routes/wallet.py resolves wallets by userId first (Netlify schema),
+# everything else by user_id, so the two lookups are cached separately
+KEY_SPACE_USER_ID = "user_id"
+KEY_SPACE_COMPAT = "compat"
+KEY_SPACES = (KEY_SPACE_USER_ID, KEY_SPACE_COMPAT)
+
+WalletLoader = Callable[[], Awaitable[Optional[Dict[str, Any]]]]
+
+
+class InMemoryWalletBackend:
+    """LRU + TTL dict - per process, versions are invalidation epochs of this process"""
+
+    name = "memory"
+
+    def __init__(self, max_entries: int, ttl_seconds: float):
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        self.evictions = 0
+        self._entries: "OrderedDict[str, tuple]" = OrderedDict()
+        # A fill that started before the last invalidation of its user is dropped
+        self._epoch = 0
+        self._floor = 0
+        self._invalidated_at: Dict[str, int] = {}
+
+    async def get(self, key: str) -> Optional[Dict[str, Any]]:
+        entry = self._entries.get(key)
+        if entry is None:
+            return None
+        expires_at, value = entry
+        if expires_at <= time.monotonic():
+            del self._entries[key]
+            return None
+        self._entries.move_to_end(key)
+        return copy.deepcopy(value)
+
+    def _store(self, key: str, value: Dict[str, Any]):
+        self._entries[key] = (time.monotonic() + self.ttl_seconds, copy.deepcopy(value))
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+            self.evictions += 1
+
+    async def version(self, user_id: str) -> int:
+        return self._epoch
+
+    async def fill(self, key: str, value: Dict[str, Any], user_id: str, version: int) -> bool:
+        if version < self._floor or self._invalidated_at.get(user_id, 0) > version:
+            return False
+        self._store(key, value)
+        return True
+
+    async def invalidate(self, user_ids: List[str], keys: List[str]):
+        for user_id in user_ids:
+            self._epoch += 1
+            self._invalidated_at[user_id] = self._epoch
+        if len(self._invalidated_at) > self.max_entries:
+            # Forget per-user epochs; fills older than now are all refused instead
+            self._invalidated_at.clear()
+            self._floor = self._epoch
+        for key in keys:
+            self._entries.pop(key, None)
+
+    def size(self) -> int:
+        return len(self._entries)
+
+
+# KEYS: version key, snapshot key - ARGV: expected version, snapshot, ttl ms
+_REDIS_FILL_SCRIPT = """
+if tonumber(redis.call('GET', KEYS[1]) or '0') == tonumber(ARGV[1]) then
+    redis.call('SET', KEYS[2], ARGV[2], 'PX', ARGV[3])
+    return 1
+end
+return 0
+"""
+
+
+class RedisWalletBackend:
+    """
+    Shared cache in Redis - snapshots are stored as Extended JSON so datetimes survive.
+    Per-user versions live next to them (INCR on invalidate); fills are a
+    compare-and-set script against the version read before the load.
+    """
+
+    name = "redis"
+    prefix = "pbx:wallet:"
+    version_prefix = "pbx:wallet-version:"
+    version_ttl_ms = 24 * 3600 * 1000  # refreshed by every invalidation
+
+    def __init__(self, url: str, ttl_seconds: float):
+        import redis.asyncio as redis_asyncio
+        from bson import json_util
+
+        self._json = json_util
+        self._redis = redis_asyncio.from_url(url)
+        self._fill = self._redis.register_script(_REDIS_FILL_SCRIPT)
+        self.ttl_ms = int(ttl_seconds * 1000)
+        self.evictions = 0
+
+    async def get(self, key: str) -> Optional[Dict[str, Any]]:
+        raw = await self._redis.get(self.prefix + key)
+        return self._json.loads(raw) if raw else None
+
+    async def version(self, user_id: str) -> int:
+        return int(await self._redis.get(self.version_prefix + user_id) or 0)
+
+    async def fill(self, key: str, value: Dict[str, Any], user_id: str, version: int) -> bool:
+        stored = await self._fill(
+            keys=[self.version_prefix + user_id, self.prefix + key],
+            args=[version, self._json.dumps(value), self.ttl_ms]
+        )
+        return bool(stored)
+
+    async def invalidate(self, user_ids: List[str], keys: List[str]):
+        # Bump first: a fill that loaded before the write can no longer land,
+        # and one that landed before the bump is deleted right after
+        pipe = self._redis.pipeline(transaction=True)
+        for user_id in user_ids:
+            pipe.incr(self.version_prefix + user_id)
+            pipe.pexpire(self.version_prefix + user_id, self.version_ttl_ms)
+        pipe.delete(*[self.prefix + key for key in keys])
+        await pipe.execute()
+
+    def size(self) -> int:
+        return -1
+
+    async def close(self):
+        await self._redis.close()
+
+
+class WalletCache:
+    """Wallet snapshot cache with hit/miss accounting and stale-fill protection"""
+
+    def __init__(self, backend):
+        self.backend = backend
+        self.hits = 0
+        self.misses = 0
+        self.fills = 0
+        self.stale_fills = 0
+        self.invalidations = 0
+        self.errors = 0
+
+    @staticmethod
+    def _key(user_id: str, key_space: str) -> str:
+        return f"{key_space}:{user_id}"
+
+    async def get(
+        self,
+        user_id: str,
+        loader: WalletLoader,
+        key_space: str = KEY_SPACE_USER_ID
+    ) -> Optional[Dict[str, Any]]:
+        """Cached snapshot, or the loader's result (cached if no write raced the read)"""
+        key = self._key(user_id, key_space)
+        try:
+            cached = await self.backend.get(key)
+            # Read before the load: an invalidation after this point refuses the fill
+            version = None if cached is not None else await self.backend.version(user_id)
+        except Exception as e:
+            self.errors += 1
+            logger.warning(f"Wallet cache read failed: {e}")
+            cached = version = None
+        if cached is not None:
+            self.hits += 1
+            return cached
+
+        self.misses += 1
+        wallet = await loader()
+        if wallet is not None:
+            wallet.pop("_id", None)
+            if version is not None:
+                await self._fill(user_id, wallet, key, version)
+        return wallet
+
+    async def _fill(self, user_id: str, wallet: Dict[str, Any], key: str, version: int):
+        try:
+            if await self.backend.fill(key, wallet, user_id, version):
+                self.fills += 1
+            else:
+                self.stale_fills += 1
+        except Exception as e:
+            self.errors += 1
+            logger.warning(f"Wallet cache write failed: {e}")
+
+    async def invalidate(self, *user_ids: str):
+        user_ids = [user_id for user_id in user_ids if user_id]
+        if not user_ids:
+            return
+        keys = [self._key(user_id, key_space) for user_id in user_ids for key_space in KEY_SPACES]
+        self.invalidations += len(user_ids)
+        try:
+            await self.backend.invalidate(user_ids, keys)
+        except Exception as e:
+            self.errors += 1
+            logger.warning(f"Wallet cache invalidation failed: {e}")
+
+    def stats(self) -> Dict[str, Any]:
+        lookups = self.hits + self.misses
+        return {
+            "backend": self.backend.name,
+            "ttl_seconds": WALLET_CACHE_TTL_SECONDS,
+            "entries": self.backend.size(),
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": round(self.hits / lookups, 4) if lookups else 0.0,
+            "fills": self.fills,
+            "stale_fills": self.stale_fills,
+            "invalidations": self.invalidations,
+            "evictions": self.backend.evictions,
+            "errors": self.errors,
+        }
+
+
+def _build_backend():
+    if WALLET_CACHE_REDIS_URL:
+        try:
+            backend = RedisWalletBackend(WALLET_CACHE_REDIS_URL, WALLET_CACHE_TTL_SECONDS)
+            logger.info("Wallet cache using Redis backend")
+            return backend
+        except Exception as e:
+            logger.warning(f"Redis wallet cache unavailable, using in-process cache: {e}")
+    return InMemoryWalletBackend(WALLET_CACHE_MAX_ENTRIES, WALLET_CACHE_TTL_SECONDS)
+
+
+wallet_cache = WalletCache(_build_backend())
+
+
+async def get_cached_wallet(
+    db,
+    user_id: str,
+    loader: Optional[WalletLoader] = None,
+    key_space: str = KEY_SPACE_USER_ID
+) -> Optional[Dict[str, Any]]:
+    """Wallet snapshot for a user (no _id). Default loader: db.wallets by user_id"""
+    if loader is None:
+        async def loader():
+            return await db.wallets.find_one({"user_id": user_id}, {"_id": 0})
+    return await wallet_cache.get(user_id, loader, key_space)
+
+
+async def invalidate_wallet(*user_ids: str):
+    """Drop cached snapshots after a wallet mutation"""
+    await wallet_cache.invalidate(*user_ids)
+
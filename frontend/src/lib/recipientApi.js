@@ -194,12 +194,31 @@ export async function getStatements(options = {}) {
   return res.json();
 }
 
-export async function exportStatementPdf(startDate, endDate) {
+export async function exportStatementPdf(startDate, endDate, format = 'pdf') {
   const res = await fetch(`${API_BASE}/api/recipient/statements/export`, {
     method: 'POST',
     headers: getHeaders(),
-    body: JSON.stringify({ start_date: startDate, end_date: endDate }),
+    body: JSON.stringify({ start_date: startDate, end_date: endDate, format }),
   });
-  if (!res.ok) throw new Error('Failed to export PDF');
+  if (!res.ok) throw new Error('Failed to export statement');
+  // Long ranges are exported in the background: 202 with the job to poll
+  if (res.status === 202) return { job: await res.json() };
+  const match = /filename="([^"]+)"/.exec(res.headers.get('Content-Disposition') || '');
+  return { blob: await res.blob(), filename: match ? match[1] : `PBX_Statement.${format}` };
+}
+
+export async function getStatementExport(jobId) {
+  const res = await fetch(`${API_BASE}/api/recipient/statements/export/${jobId}`, {
+    headers: getHeaders(),
+  });
+  if (!res.ok) throw new Error('Failed to fetch export status');
   return res.json();
 }
+
+export async function downloadStatementExport(jobId) {
+  const res = await fetch(`${API_BASE}/api/recipient/statements/export/${jobId}/download`, {
+    headers: getHeaders(),
+  });
+  if (!res.ok) throw new Error('Failed to download statement');
+  return res.blob();
+}
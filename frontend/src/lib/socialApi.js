@@ -208,3 +208,37 @@ export async function sendPaymentInChat(recipientUserId, amountUsd, note = null)
   
   return data;
 }
+
+// ============================================================
+// REALTIME EVENTS
+// ============================================================
+
+/**
+ * Subscribe to pushed chat/social events (Server-Sent Events).
+ * handlers: { message, friend_request, friend_accepted, resync, error }
+ * Returns an unsubscribe function.
+ */
+export function subscribeToEvents(handlers = {}) {
+  const session = getSession();
+  if (!session?.token || typeof EventSource === 'undefined') {
+    return () => {};
+  }
+  
+  // EventSource cannot send headers - token goes in the query string
+  const source = new EventSource(
+    `${API_BASE}/api/social/events?token=${encodeURIComponent(session.token)}`
+  );
+  
+  ['message', 'friend_request', 'friend_accepted', 'resync'].forEach((type) => {
+    source.addEventListener(type, (e) => {
+      if (handlers[type]) {
+        handlers[type](JSON.parse(e.data));
+      }
+    });
+  });
+  if (handlers.error) {
+    source.onerror = handlers.error;
+  }
+  
+  return () => source.close();
+}
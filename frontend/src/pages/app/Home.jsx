@@ -158,7 +158,7 @@ export default function Home() {
       
       try {
         const backendUrl = process.env.REACT_APP_BACKEND_URL || '';
-        const res = await fetch(`${backendUrl}/api/recipient/statements?limit=5`, {
+        const res = await fetch(`${backendUrl}/api/activity?limit=5`, {
           headers: {
             'Content-Type': 'application/json',
             'X-Session-Token': session.token,
@@ -167,7 +167,7 @@ export default function Home() {
         
         if (res.ok) {
           const data = await res.json();
-          setRecentActivity(data.transactions || []);
+          setRecentActivity(data.items || []);
         }
       } catch (err) {
         console.error("Failed to fetch activity:", err);
@@ -481,7 +481,7 @@ export default function Home() {
         ) : (
           <div className="divide-y divide-gray-100">
             {recentActivity.slice(0, 5).map((tx, idx) => (
-              <div key={tx.tx_id || idx} className="px-4 py-3 flex items-center gap-3">
+              <div key={tx.id || idx} className="px-4 py-3 flex items-center gap-3">
                 <div className={`w-10 h-10 rounded-full flex items-center justify-center ${
                   tx.amount > 0 ? "bg-green-100" : "bg-red-100"
                 }`}>
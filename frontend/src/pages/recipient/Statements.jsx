@@ -3,7 +3,7 @@
  * Date range filter, category filter, download PDF
  */
 import React, { useState, useEffect } from "react";
-import { getStatements, exportStatementPdf } from "../../lib/recipientApi";
+import { getStatements, exportStatementPdf, getStatementExport, downloadStatementExport } from "../../lib/recipientApi";
 
 export default function Statements() {
   const [transactions, setTransactions] = useState([]);
@@ -50,7 +50,24 @@ export default function Statements() {
     setExporting(true);
     try {
       const result = await exportStatementPdf(dateRange.start, dateRange.end);
-      alert(`Statement generated: ${result.filename}`);
+      let { blob, filename } = result;
+      if (result.job) {
+        // Large range: poll the background export, then download it
+        let job = result.job;
+        while (job.status === 'queued' || job.status === 'running') {
+          await new Promise((resolve) => setTimeout(resolve, 2000));
+          job = await getStatementExport(job.job_id);
+        }
+        if (job.status !== 'completed') throw new Error('Statement export failed');
+        blob = await downloadStatementExport(job.job_id);
+        filename = job.filename;
+      }
+      const url = URL.createObjectURL(blob);
+      const link = document.createElement('a');
+      link.href = url;
+      link.download = filename;
+      link.click();
+      URL.revokeObjectURL(url);
     } catch (error) {
       console.error('Export failed:', error);
     } finally {
@@ -6,7 +6,7 @@
 import React, { useState, useEffect, useRef, useCallback } from "react";
 import { useParams, useNavigate, useSearchParams } from "react-router-dom";
 import { useSession } from "../../contexts/SessionContext";
-import { getConversation, getMessages, sendMessage, sendPaymentInChat } from "../../lib/socialApi";
+import { getConversation, getMessages, sendMessage, sendPaymentInChat, subscribeToEvents } from "../../lib/socialApi";
 
 export default function Chat() {
   const { userId } = useParams();
@@ -55,18 +55,35 @@ export default function Chat() {
 
   useEffect(() => {
     fetchData();
+  }, [fetchData]);
+
+  // New messages are pushed over SSE; a slow poll only covers missed events
+  useEffect(() => {
+    const conversationId = conversation?.conversation_id;
+    if (!conversationId) return;
     
-    // Poll for new messages every 3 seconds
-    const interval = setInterval(() => {
-      if (conversation?.conversation_id) {
-        getMessages(conversation.conversation_id).then(data => {
-          setMessages(data.messages || []);
-        }).catch(console.error);
-      }
-    }, 3000);
+    const refresh = () => {
+      getMessages(conversationId).then(data => {
+        setMessages(data.messages || []);
+      }).catch(console.error);
+    };
+    
+    const unsubscribe = subscribeToEvents({
+      message: (msg) => {
+        if (msg.conversation_id !== conversationId) return;
+        setMessages(prev => (
+          prev.some(m => m.message_id === msg.message_id) ? prev : [...prev, msg]
+        ));
+      },
+      resync: refresh,
+    });
+    const interval = setInterval(refresh, 30000);
     
-    return () => clearInterval(interval);
-  }, [fetchData, conversation?.conversation_id]);
+    return () => {
+      unsubscribe();
+      clearInterval(interval);
+    };
+  }, [conversation?.conversation_id]);
 
   // Scroll to bottom on new messages
   useEffect(() => {